@@ -1,9 +1,49 @@
 #!/bin/bash
 # Ansible automation script with SSH agent
-# Usage: ./ansible_with_agent.sh <playbook> [ansible options]
+# Usage: ./ansible_with_agent.sh [--profile default|fast] <playbook> [ansible options]
+#
+# Connection profiles (ANSIBLE_CONNECTION_PROFILE also selects one):
+#   default  ansible.cfg as is (pipelining off, ControlPersist 60s)
+#   fast     SSH pipelining + ControlPersist 300s with a short %C control
+#            path; runs ssh_pipelining_preflight.yaml first and aborts if
+#            sudo requiretty is on for any host of the playbook (see
+#            SSH_PASSPHRASE_IMPLEMENTATION.md "Connection Profiles")
 
 set -e  # Exit on error
 
+PROFILE="${ANSIBLE_CONNECTION_PROFILE:-default}"
+case "$1" in
+    --profile)
+        PROFILE="$2"
+        shift 2
+        ;;
+    --profile=*)
+        PROFILE="${1#--profile=}"
+        shift
+        ;;
+esac
+
+case "$PROFILE" in
+    default)
+        ;;
+    fast)
+        # Module source goes over the become stdin instead of an SFTP/SCP
+        # upload plus a second exec; needs !requiretty on the targets
+        export ANSIBLE_PIPELINING=True
+        # One master connection per host for the whole run; %C (hash of
+        # local host, remote host, port, user) keeps the socket path short
+        export ANSIBLE_SSH_ARGS="-C -o ControlMaster=auto -o ControlPersist=300s -o ServerAliveInterval=30 -o ServerAliveCountMax=4"
+        export ANSIBLE_SSH_CONTROL_PATH_DIR="$HOME/.ansible/cp"
+        export ANSIBLE_SSH_CONTROL_PATH='%(directory)s/%%C'
+        mkdir -p "$ANSIBLE_SSH_CONTROL_PATH_DIR"
+        chmod 700 "$ANSIBLE_SSH_CONTROL_PATH_DIR"
+        ;;
+    *)
+        echo "❌ Unknown connection profile: $PROFILE (use default or fast)"
+        exit 2
+        ;;
+esac
+
 echo "=========================================="
 echo "Ansible Automation with SSH Agent"
 echo "=========================================="
@@ -39,6 +79,30 @@ else
     exit 1
 fi
 
+echo ""
+echo "Connection profile: $PROFILE"
+
+if [ "$PROFILE" = "fast" ]; then
+    echo "Running pipelining preflight (sudo requiretty check)..."
+    # Check exactly the hosts the playbook targets (same inventory/limit/extra
+    # vars); the playbook itself is the first argument
+    PREFLIGHT_HOSTS=$(ansible-playbook "$@" --list-hosts --vault-password-file ./vault_password_client.sh 2>/dev/null \
+        | awk '/hosts \([0-9]+\):/ { listing = 1; next } /^[[:space:]]*$/ || /play #/ { listing = 0 } listing { print $1 }' \
+        | sort -u | paste -sd, -)
+    if [ -z "$PREFLIGHT_HOSTS" ]; then
+        echo "❌ Preflight failed: could not list the hosts of $1 (ansible-playbook --list-hosts)"
+        ssh-agent -k
+        exit 1
+    fi
+    if ! ansible-playbook ssh_pipelining_preflight.yaml "${@:2}" -e "preflight_hosts=$PREFLIGHT_HOSTS" --vault-password-file ./vault_password_client.sh; then
+        echo "❌ Preflight failed: pipelining is not safe on every target"
+        echo "   Fix sudoers (Defaults:<user> !requiretty) or rerun with --profile default"
+        ssh-agent -k
+        exit 1
+    fi
+    echo "✅ Preflight passed"
+fi
+
 echo ""
 echo "Running Ansible playbook..."
 echo "------------------------------------------"
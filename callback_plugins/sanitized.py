@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Sanitizing Stdout Callback for Ansible
+
+Default stdout callback with every line of output passed through one
+compiled SanitizationEngine (filter_plugins/security_filters.py) at display
+time: task results, loop item labels, host names, warnings and verbose
+messages. The same engine is attached to the log_path logger when one is
+configured.
+
+This is defence in depth, not a replacement for per-task
+``| sanitize_security`` / ``| wg_sanitize`` calls: the engine only knows
+network identifiers and WireGuard keys, and it is not active when another
+stdout callback is selected. log_path stays disabled in ansible.cfg.
+"""
+
+import logging
+import os
+import sys
+
+from ansible.plugins.callback.default import CallbackModule as DefaultCallbackModule
+from ansible.utils import display as display_module
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "filter_plugins"))
+from security_filters import SanitizationEngine
+
+DOCUMENTATION = r"""
+name: sanitized
+type: stdout
+short_description: default output with IPs, ports and WireGuard keys masked
+description:
+  - Same output as the builtin default callback, but every message passes
+    through SanitizationEngine before it is displayed or logged.
+extends_documentation_fragment:
+  - default_callback
+  - result_format_callback
+options:
+  mask_char:
+    description: Character used for masking.
+    type: str
+    default: "*"
+    env:
+      - name: ANSIBLE_SANITIZED_MASK_CHAR
+    ini:
+      - section: callback_sanitized
+        key: mask_char
+"""
+
+
+class _SanitizingDisplay:
+    """Proxy around Display that sanitizes the message of every call."""
+
+    def __init__(self, display, engine):
+        self._display = display
+        self._engine = engine
+
+    def __getattr__(self, name):
+        attr = getattr(self._display, name)
+        if not callable(attr):
+            return attr
+        engine = self._engine
+
+        def wrapper(*args, **kwargs):
+            if args and isinstance(args[0], str):
+                args = (engine(args[0]),) + args[1:]
+            for key in ("msg", "host"):
+                if isinstance(kwargs.get(key), str):
+                    kwargs[key] = engine(kwargs[key])
+            return attr(*args, **kwargs)
+
+        return wrapper
+
+
+class _SanitizingLogFilter(logging.Filter):
+    """Sanitize records written to log_path, including core -vvv messages."""
+
+    def __init__(self, engine):
+        super().__init__()
+        self._engine = engine
+
+    def filter(self, record):
+        record.msg = self._engine(record.getMessage())
+        record.args = ()
+        return True
+
+
+class CallbackModule(DefaultCallbackModule):
+    """Default callback with output-time sanitization."""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "stdout"
+    CALLBACK_NAME = "sanitized"
+
+    def __init__(self):
+        super().__init__()
+        self._engine = SanitizationEngine()
+        self._display = _SanitizingDisplay(self._display, self._engine)
+        self._log_filter = None
+        self._install_log_filter()
+
+    def set_options(self, task_keys=None, var_options=None, direct=None):
+        super().set_options(task_keys=task_keys, var_options=var_options, direct=direct)
+        mask_char = self.get_option("mask_char")
+        if mask_char != self._engine.mask_char:
+            self._engine = SanitizationEngine(mask_char=mask_char)
+            self._display._engine = self._engine
+            self._install_log_filter()
+
+    def _install_log_filter(self):
+        logger = display_module.logger
+        if logger is None:
+            return
+        if self._log_filter is not None:
+            logger.removeFilter(self._log_filter)
+        self._log_filter = _SanitizingLogFilter(self._engine)
+        logger.addFilter(self._log_filter)
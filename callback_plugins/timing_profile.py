@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Timing Profile Callback for Ansible
+
+Records wall time per task, role, host and loop item for long multi-role
+playbooks (kuber_cluster_deploy.yaml, dns_full_deployment.yaml,
+wireguard_manage.yaml, ...) and emits, at the end of the run:
+
+  - the top-N slowest tasks on stdout
+  - a flame-graph-compatible folded-stack file (flamegraph.pl / speedscope)
+  - a JSON profile with per-task, per-role and per-host totals
+
+Host, task and item labels are passed through ``sanitize_security`` before
+being displayed or written, so inventory IPs never reach the profile files.
+
+The JSON profile also embeds ``wg_routing_cache`` hit/miss counters from the
+memoized WireGuard routing filters (filter_plugins/wg_routing_filters.py).
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "filter_plugins"))
+from security_filters import sanitize_security
+
+try:
+    from ansible.plugins.callback import CallbackBase
+except ImportError:
+    # Lets tests/ import TimingProfile without Ansible installed
+    CallbackBase = object
+
+DOCUMENTATION = r"""
+name: timing_profile
+type: aggregate
+short_description: Per-task, per-role, per-host and per-item timing profile
+description:
+  - Records wall time for every task result and loop item.
+  - Prints the top-N slowest tasks and writes folded-stack and JSON profiles.
+requirements:
+  - enable in ansible.cfg (callbacks_enabled = timing_profile)
+options:
+  top_n:
+    description: Number of slowest tasks to print.
+    type: int
+    default: 20
+    env:
+      - name: ANSIBLE_TIMING_PROFILE_TOP_N
+    ini:
+      - section: callback_timing_profile
+        key: top_n
+  output_dir:
+    description: Directory for <playbook>-<timestamp>.json/.folded files.
+      Empty disables file output.
+    type: str
+    default: /tmp/ansible_profiles
+    env:
+      - name: ANSIBLE_TIMING_PROFILE_DIR
+    ini:
+      - section: callback_timing_profile
+        key: output_dir
+  sanitize:
+    description: Pass host/task/item labels through sanitize_security.
+    type: bool
+    default: true
+    env:
+      - name: ANSIBLE_TIMING_PROFILE_SANITIZE
+    ini:
+      - section: callback_timing_profile
+        key: sanitize
+"""
+
+ITEM_LABEL_MAX = 60
+
+
+def _frame(label):
+    """Make a label safe for the folded-stack format (';' separates frames)."""
+    return str(label).replace(";", ":").replace("\n", " ").strip() or "-"
+
+
+class TimingProfile:
+    """Collects timing records independently of the Ansible callback API."""
+
+    def __init__(self, clock=time.monotonic, sanitize=True):
+        self._clock = clock
+        self._sanitize = sanitize
+        self._running = {}
+        self._extra = {}
+        self.playbook = ""
+        self.play = ""
+        self.records = []
+
+    def label(self, text):
+        text = "" if text is None else str(text)
+        return sanitize_security(text) if self._sanitize else text
+
+    def start(self, host, task_key, task, role=""):
+        """Mark the start of task on host."""
+        now = self._clock()
+        self._running[(host, task_key)] = {
+            "host": self.label(host),
+            "task": self.label(task),
+            "role": role or "",
+            "play": self.label(self.play),
+            "start": now,
+            "last": now,
+            "items": [],
+        }
+
+    def item(self, host, task_key, label, status="ok"):
+        """Record a loop item finishing; its time is measured from the previous item."""
+        run = self._running.get((host, task_key))
+        if run is None:
+            return
+        now = self._clock()
+        item_label = self.label(label)
+        if len(item_label) > ITEM_LABEL_MAX:
+            item_label = item_label[:ITEM_LABEL_MAX - 3] + "..."
+        run["items"].append({"item": item_label, "duration": now - run["last"], "status": status})
+        run["last"] = now
+
+    def finish(self, host, task_key, status="ok"):
+        """Close the task on host and store its record."""
+        run = self._running.pop((host, task_key), None)
+        if run is None:
+            return None
+        record = {
+            "playbook": self.playbook,
+            "play": run["play"],
+            "role": run["role"],
+            "task": run["task"],
+            "host": run["host"],
+            "status": status,
+            "duration": self._clock() - run["start"],
+            "items": run["items"],
+        }
+        self.records.append(record)
+        return record
+
+    def add_section(self, name, provider):
+        """Register a callable whose dict result is embedded in the JSON profile.
+
+        Used for cache statistics and other counters collected elsewhere.
+        """
+        self._extra[name] = provider
+
+    def _task_id(self, record):
+        return (record["play"], record["role"], record["task"])
+
+    def task_totals(self):
+        """Aggregate records per task (play, role, task) across hosts."""
+        totals = {}
+        for rec in self.records:
+            entry = totals.setdefault(self._task_id(rec), {
+                "play": rec["play"], "role": rec["role"], "task": rec["task"],
+                "total": 0.0, "max": 0.0, "hosts": 0, "slowest_host": "",
+            })
+            entry["total"] += rec["duration"]
+            entry["hosts"] += 1
+            if rec["duration"] >= entry["max"]:
+                entry["max"] = rec["duration"]
+                entry["slowest_host"] = rec["host"]
+        return list(totals.values())
+
+    def top(self, n=20):
+        """Return the n slowest tasks by total wall time across hosts."""
+        return sorted(self.task_totals(), key=lambda t: t["total"], reverse=True)[:n]
+
+    def _totals_by(self, key):
+        totals = {}
+        for rec in self.records:
+            name = rec[key] or "(no role)"
+            totals[name] = totals.get(name, 0.0) + rec["duration"]
+        return dict(sorted(totals.items(), key=lambda kv: kv[1], reverse=True))
+
+    def folded(self):
+        """Return folded-stack lines: playbook;play;role;task;host[;item] <ms>."""
+        counts = {}
+        for rec in self.records:
+            stack = [rec["playbook"], rec["play"]]
+            if rec["role"]:
+                stack.append(rec["role"])
+            stack.extend([rec["task"], rec["host"]])
+            frames = [_frame(f) for f in stack]
+            if rec["items"]:
+                for item in rec["items"]:
+                    key = ";".join(frames + [_frame(item["item"])])
+                    counts[key] = counts.get(key, 0) + item["duration"]
+            else:
+                key = ";".join(frames)
+                counts[key] = counts.get(key, 0) + rec["duration"]
+        return [
+            "{} {}".format(stack, int(round(seconds * 1000)))
+            for stack, seconds in counts.items()
+            if int(round(seconds * 1000)) > 0
+        ]
+
+    def to_dict(self):
+        """Return the full JSON-serialisable profile."""
+        profile = {
+            "playbook": self.playbook,
+            "total_seconds": sum(r["duration"] for r in self.records),
+            "tasks": self.top(len(self.records)),
+            "roles": self._totals_by("role"),
+            "hosts": self._totals_by("host"),
+            "records": self.records,
+        }
+        for name, provider in self._extra.items():
+            profile[name] = provider()
+        return profile
+
+
+def _routing_cache_stats(since):
+    """Return wg_routing_filters cache counters for events after since."""
+    try:
+        from wg_routing_filters import cache_stats
+    except ImportError:
+        return {}
+    return cache_stats(since=since)
+
+
+class CallbackModule(CallbackBase):
+    """Ansible callback that feeds TimingProfile and writes the results."""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "aggregate"
+    CALLBACK_NAME = "timing_profile"
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super().__init__()
+        self.profile = None
+
+    def set_options(self, task_keys=None, var_options=None, direct=None):
+        super().set_options(task_keys=task_keys, var_options=var_options, direct=direct)
+        self.profile = TimingProfile(sanitize=self.get_option("sanitize"))
+
+    def v2_playbook_on_start(self, playbook):
+        self.profile.playbook = os.path.basename(playbook._file_name)
+        started = time.time()
+        self.profile.add_section("wg_routing_cache", lambda: _routing_cache_stats(started))
+
+    def v2_playbook_on_play_start(self, play):
+        self.profile.play = play.get_name().strip()
+
+    def v2_runner_on_start(self, host, task):
+        role = task._role.get_name() if task._role else ""
+        self.profile.start(host.get_name(), task._uuid, task.get_name().strip(), role)
+
+    def _item(self, result, status):
+        label = result._result.get("_ansible_item_label", result._result.get("item"))
+        self.profile.item(result._host.get_name(), result._task._uuid, label, status)
+
+    def v2_runner_item_on_ok(self, result):
+        self._item(result, "ok")
+
+    def v2_runner_item_on_failed(self, result):
+        self._item(result, "failed")
+
+    def v2_runner_item_on_skipped(self, result):
+        self._item(result, "skipped")
+
+    def _finish(self, result, status):
+        self.profile.finish(result._host.get_name(), result._task._uuid, status)
+
+    def v2_runner_on_ok(self, result):
+        self._finish(result, "ok")
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._finish(result, "failed")
+
+    def v2_runner_on_skipped(self, result):
+        self._finish(result, "skipped")
+
+    def v2_runner_on_unreachable(self, result):
+        self._finish(result, "unreachable")
+
+    def v2_playbook_on_stats(self, stats):
+        top_n = self.get_option("top_n")
+        self._display.banner("TIMING PROFILE (top {})".format(top_n))
+        for entry in self.profile.top(top_n):
+            role = "{} : ".format(entry["role"]) if entry["role"] else ""
+            self._display.display(
+                "{:>9.2f}s  {}{}  ({} host(s), max {:.2f}s on {})".format(
+                    entry["total"], role, entry["task"], entry["hosts"],
+                    entry["max"], entry["slowest_host"],
+                )
+            )
+
+        output_dir = self.get_option("output_dir")
+        if not output_dir:
+            return
+        os.makedirs(output_dir, mode=0o700, exist_ok=True)
+        stem = os.path.join(
+            output_dir,
+            "{}-{}".format(
+                os.path.splitext(self.profile.playbook)[0] or "playbook",
+                datetime.now().strftime("%Y%m%d-%H%M%S"),
+            ),
+        )
+        with open(stem + ".json", "w") as fh:
+            json.dump(self.profile.to_dict(), fh, indent=2, default=str)
+        with open(stem + ".folded", "w") as fh:
+            fh.write("\n".join(self.profile.folded()) + "\n")
+        self._display.display("Profile written to {}.json / {}.folded".format(stem, stem))
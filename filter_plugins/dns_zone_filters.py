@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Unbound Zone Filters for Ansible
+
+Builds the dns_server zone (``/etc/unbound/unbound.conf.d/zone.conf``) from
+``dns_records`` in one pass instead of a looped ``assert`` and ``debug`` per
+record:
+
+  - validates names, types and addresses and collects every problem
+  - drops exact duplicates and rejects conflicts (same name with different
+    values, CNAME next to other types)
+  - sorts records deterministically and indexes them by name and address
+  - generates one ``local-data-ptr`` per address (first name wins unless a
+    record sets ``ptr: true``; ``ptr: false`` skips it)
+  - renders the complete ``server:`` block
+
+Record format (vault_dns_records)::
+
+    - {type: A, name: k8s-api, ip: 203.0.113.10}
+    - {type: AAAA, name: k8s-api, ip: "2001:db8::10"}
+    - {type: CNAME, name: api, target: k8s-api}
+"""
+
+import ipaddress
+import re
+
+try:
+    from ansible.errors import AnsibleFilterError
+except ImportError:
+    # Lets tests/ import the filters without Ansible installed
+    AnsibleFilterError = ValueError
+
+SUPPORTED_TYPES = ("A", "AAAA", "CNAME")
+ADDRESS_TYPES = {"A": 4, "AAAA": 6}
+
+_LABEL_RE = re.compile(r"^(?!-)[a-z0-9_-]{1,63}(?<!-)$")
+
+BEGIN_MARKER = "# BEGIN ANSIBLE MANAGED DNS ZONE"
+END_MARKER = "# END ANSIBLE MANAGED DNS ZONE"
+
+
+def _fqdn(name, zone):
+    """Return the absolute name for a zone-relative (or absolute) record name."""
+    if name.endswith("."):
+        return name
+    return "{}.{}.".format(name, zone) if zone else name + "."
+
+
+def _valid_name(name):
+    return all(_LABEL_RE.match(label) for label in name.rstrip(".").split("."))
+
+
+def _normalize(record, index, zone):
+    """Return (normalized record, error) for one dns_records entry."""
+    if not isinstance(record, dict):
+        return None, "record #{}: expected a mapping, got {!r}".format(index, record)
+
+    name = str(record.get("name") or "").strip().lower()
+    rtype = str(record.get("type") or "").strip().upper()
+    label = name or "#{}".format(index)
+    if not name:
+        return None, "record {}: missing name".format(label)
+    if not rtype:
+        return None, "record {}: missing type".format(label)
+    if rtype not in SUPPORTED_TYPES:
+        return None, "record {}: unsupported type {} (supported: {})".format(
+            label, rtype, ", ".join(SUPPORTED_TYPES))
+    if not _valid_name(name):
+        return None, "record {}: invalid DNS name".format(label)
+
+    if rtype in ADDRESS_TYPES:
+        raw = record.get("ip")
+        if raw in (None, ""):
+            return None, "record {}: {} record without ip".format(label, rtype)
+        try:
+            address = ipaddress.ip_address(str(raw).strip())
+        except ValueError:
+            return None, "record {}: invalid IP address {!r}".format(label, raw)
+        if address.version != ADDRESS_TYPES[rtype]:
+            return None, "record {}: {} record needs an IPv{} address, got {}".format(
+                label, rtype, ADDRESS_TYPES[rtype], address)
+        value = str(address)
+    else:
+        target = str(record.get("target") or record.get("ip") or "").strip().lower()
+        if not target or not _valid_name(target):
+            return None, "record {}: CNAME needs a valid target".format(label)
+        value = _fqdn(target, zone)
+
+    return {
+        "name": name,
+        "fqdn": _fqdn(name, zone),
+        "type": rtype,
+        "value": value,
+        "ptr": record.get("ptr"),
+    }, None
+
+
+def _address_key(value):
+    address = ipaddress.ip_address(value)
+    return address.version, address.packed
+
+
+def _sort_key(record):
+    # Reverse labels so names group by parent domain, then type and value
+    value = record["value"]
+    if record["type"] in ADDRESS_TYPES:
+        value = _address_key(value)[1].hex()
+    return (tuple(reversed(record["fqdn"].rstrip(".").split("."))), record["type"], value)
+
+
+def dns_zone_model(dns_records, dns_zone, generate_ptr=True, allow_multi_value=False,
+                   strict=True):
+    """Validate, deduplicate, sort and index dns_records in one pass.
+
+    Args:
+        dns_records: list of {type, name, ip|target[, ptr]} dicts
+        dns_zone: zone appended to relative names (e.g. "cluster.local")
+        generate_ptr: emit local-data-ptr entries for A/AAAA records
+        allow_multi_value: allow several A/AAAA values per name (round robin)
+        strict: raise AnsibleFilterError listing every error; when false the
+                invalid records are dropped and reported in 'errors'
+
+    Returns:
+        dict with records (sorted), by_name, by_ip, ptr, duplicates, errors,
+        summary and rendered (the complete zone.conf body)
+    """
+    zone = str(dns_zone or "").strip().strip(".").lower()
+    errors = []
+    duplicates = []
+    seen = set()
+    by_name = {}
+
+    for index, record in enumerate(dns_records or []):
+        normalized, error = _normalize(record, index, zone)
+        if error:
+            errors.append(error)
+            continue
+        identity = (normalized["fqdn"], normalized["type"], normalized["value"])
+        if identity in seen:
+            duplicates.append("{} {} {}".format(*identity))
+            continue
+        seen.add(identity)
+        by_name.setdefault(normalized["fqdn"], []).append(normalized)
+
+    records = []
+    for fqdn, entries in by_name.items():
+        types = {r["type"] for r in entries}
+        if "CNAME" in types and len(entries) > 1:
+            errors.append("{}: CNAME cannot coexist with other records ({})".format(
+                fqdn, ", ".join(sorted(types))))
+            continue
+        conflict = [t for t in sorted(types) if sum(r["type"] == t for r in entries) > 1]
+        if conflict and not allow_multi_value:
+            errors.append("{}: conflicting {} values: {}".format(
+                fqdn, "/".join(conflict),
+                ", ".join(sorted(r["value"] for r in entries if r["type"] in conflict))))
+            continue
+        records.extend(entries)
+
+    if errors and strict:
+        raise AnsibleFilterError(
+            "dns_records validation failed:\n  - " + "\n  - ".join(errors))
+
+    records.sort(key=_sort_key)
+
+    by_ip = {}
+    for record in records:
+        if record["type"] in ADDRESS_TYPES:
+            by_ip.setdefault(record["value"], []).append(record["fqdn"])
+
+    ptr = {}
+    if generate_ptr:
+        for record in records:
+            if record["type"] not in ADDRESS_TYPES or record["ptr"] is False:
+                continue
+            if record["value"] not in ptr or record["ptr"] is True:
+                ptr[record["value"]] = record["fqdn"]
+        ptr = dict(sorted(ptr.items(), key=lambda kv: _address_key(kv[0])))
+
+    index = {}
+    for record in records:
+        index.setdefault(record["fqdn"], []).append(
+            {"type": record["type"], "value": record["value"]})
+
+    model = {
+        "zone": zone,
+        "records": [
+            {"name": r["name"], "fqdn": r["fqdn"], "type": r["type"], "value": r["value"]}
+            for r in records
+        ],
+        "by_name": index,
+        "by_ip": by_ip,
+        "ptr": ptr,
+        "duplicates": duplicates,
+        "errors": errors,
+        "summary": {
+            "records": len(records),
+            "names": len(index),
+            "ptr": len(ptr),
+            "duplicates": len(duplicates),
+            "errors": len(errors),
+            "by_type": {t: sum(r["type"] == t for r in records)
+                        for t in SUPPORTED_TYPES if any(r["type"] == t for r in records)},
+        },
+    }
+    model["local_data"] = local_data_lines(model)
+    model["rendered"] = render_zone(model)
+    return model
+
+
+def local_data_lines(model):
+    """Return the Unbound local-data / local-data-ptr lines for a zone model."""
+    lines = [
+        'local-data: "{} {} {}"'.format(r["fqdn"], r["type"], r["value"])
+        for r in model["records"]
+    ]
+    lines.extend(
+        'local-data-ptr: "{} {}"'.format(ip, fqdn) for ip, fqdn in model["ptr"].items()
+    )
+    return lines
+
+
+def render_zone(model):
+    """Render the managed zone.conf body (server: clause with all local data)."""
+    body = ["    " + line for line in local_data_lines(model)]
+    return "\n".join([BEGIN_MARKER, "server:"] + body + [END_MARKER]) + "\n"
+
+
+def dns_zone_render(dns_records, dns_zone, **kwargs):
+    """Shortcut returning only the rendered zone.conf body."""
+    return dns_zone_model(dns_records, dns_zone, **kwargs)["rendered"]
+
+
+class FilterModule:
+    def filters(self):
+        return {
+            "dns_zone_model": dns_zone_model,
+            "dns_zone_render": dns_zone_render,
+        }
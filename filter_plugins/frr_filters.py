@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""FRR BGP Config Filters for Ansible
+
+Builds the ``router bgp`` section of the bgp_router_frr role's
+``/etc/frr/frr.conf`` from ``bgp_router_neighbors`` in one pass, instead of
+two template loops that re-check every neighbor and the update-source guard:
+
+  - validates the local ASN, router ID, MetalLB pool and every neighbor
+    (IPv4 address, ASN in 1-4294967295, not the router itself) and collects
+    every problem
+  - drops exact duplicates and rejects the same address with different ASNs
+  - sorts neighbors by address so the rendered config is deterministic
+  - resolves the update-source once (empty or ``[placeholder]`` omits it)
+  - renders the neighbor and address-family lines that frr.conf.j2 prints
+
+Neighbor format (vault_bgp_router_neighbors)::
+
+    - {address: 100.65.0.11, asn: 64513}
+    - {address: 100.65.0.12, asn: 64513}
+"""
+
+import ipaddress
+import re
+
+try:
+    from ansible.errors import AnsibleFilterError
+except ImportError:
+    # Lets tests/ import the filters without Ansible installed
+    AnsibleFilterError = ValueError
+
+MAX_ASN = 4294967295
+
+_PLACEHOLDER_RE = re.compile(r"^\[.*\]$")
+
+
+def _placeholder(value):
+    return bool(_PLACEHOLDER_RE.match(str(value).strip()))
+
+
+def _asn(value):
+    """Return the ASN as int, or None when it is not a valid 4-byte ASN."""
+    text = str(value).strip()
+    if not text.isdigit():
+        return None
+    asn = int(text)
+    return asn if 1 <= asn <= MAX_ASN else None
+
+
+def _normalize(neighbor, index, router_id):
+    """Return (normalized neighbor, error) for one bgp_router_neighbors entry."""
+    if not isinstance(neighbor, dict):
+        return None, "neighbor #{}: expected a mapping, got {!r}".format(index, neighbor)
+
+    raw_address = str(neighbor.get("address") or "").strip()
+    if not raw_address or _placeholder(raw_address):
+        return None, "neighbor #{}: missing address{}".format(
+            index, " ({})".format(raw_address) if raw_address else "")
+    label = raw_address
+    try:
+        address = ipaddress.ip_address(raw_address)
+    except ValueError:
+        return None, "neighbor {}: invalid IP address".format(label)
+    if address.version != 4:
+        return None, "neighbor {}: only IPv4 neighbors are supported".format(label)
+    if router_id is not None and address == router_id:
+        return None, "neighbor {}: address is the router ID of this router".format(label)
+
+    raw_asn = neighbor.get("asn")
+    if raw_asn in (None, "") or _placeholder(raw_asn):
+        return None, "neighbor {}: missing asn".format(label)
+    asn = _asn(raw_asn)
+    if asn is None:
+        return None, "neighbor {}: invalid asn {!r}".format(label, raw_asn)
+
+    return {"address": str(address), "asn": asn}, None
+
+
+def frr_bgp_model(bgp_router_neighbors, asn, router_id, pool_cidr, update_source="",
+                  description="k8s-metallb-speaker", timers="10 30", route_map="FROM-K8S",
+                  strict=True):
+    """Validate, deduplicate and sort the BGP neighbors and render frr.conf lines.
+
+    Args:
+        bgp_router_neighbors: list of {address, asn} dicts
+        asn: local ASN
+        router_id: BGP router ID (IPv4)
+        pool_cidr: MetalLB pool accepted by the METALLB-POOL prefix-list
+        update_source: interface for update-source (empty/placeholder omits it)
+        description: neighbor description
+        timers: "keepalive holdtime" for every neighbor
+        route_map: inbound route-map applied in the IPv4 address family
+        strict: raise AnsibleFilterError listing every error; when false the
+                invalid neighbors are dropped and reported in 'errors'
+
+    Returns:
+        dict with asn, router_id, pool, update_source, neighbors (sorted),
+        duplicates, errors, summary, neighbor_lines, address_family_lines and
+        rendered (the complete router bgp section)
+    """
+    errors = []
+
+    local_asn = _asn(asn) if asn not in (None, "") and not _placeholder(asn) else None
+    if local_asn is None:
+        errors.append("local asn {!r} is missing or invalid".format(asn))
+
+    rid = None
+    try:
+        rid = ipaddress.IPv4Address(str(router_id or "").strip())
+    except ValueError:
+        errors.append("router ID {!r} is not an IPv4 address".format(router_id))
+
+    pool = ""
+    try:
+        pool = str(ipaddress.IPv4Network(str(pool_cidr or "").strip(), strict=False))
+    except ValueError:
+        errors.append("MetalLB pool {!r} is not an IPv4 CIDR".format(pool_cidr))
+
+    source = str(update_source or "").strip()
+    if _placeholder(source):
+        source = ""
+
+    by_address = {}
+    duplicates = []
+    for index, neighbor in enumerate(bgp_router_neighbors or []):
+        normalized, error = _normalize(neighbor, index, rid)
+        if error:
+            errors.append(error)
+            continue
+        existing = by_address.get(normalized["address"])
+        if existing is None:
+            by_address[normalized["address"]] = normalized
+        elif existing["asn"] == normalized["asn"]:
+            duplicates.append(normalized["address"])
+        else:
+            errors.append("neighbor {}: conflicting asn {} and {}".format(
+                normalized["address"], existing["asn"], normalized["asn"]))
+            existing["conflict"] = True
+
+    neighbors = sorted(
+        (n for n in by_address.values() if not n.get("conflict")),
+        key=lambda n: ipaddress.IPv4Address(n["address"]).packed,
+    )
+    if not neighbors:
+        errors.append("no valid BGP neighbors")
+
+    if errors and strict:
+        raise AnsibleFilterError(
+            "bgp_router_neighbors validation failed:\n  - " + "\n  - ".join(errors))
+
+    neighbor_lines = []
+    address_family_lines = []
+    for neighbor in neighbors:
+        address = neighbor["address"]
+        neighbor_lines += [
+            " neighbor {} remote-as {}".format(address, neighbor["asn"]),
+            " neighbor {} description {}".format(address, description),
+            " neighbor {} timers {}".format(address, timers),
+        ]
+        if source:
+            neighbor_lines.append(" neighbor {} update-source {}".format(address, source))
+        address_family_lines += [
+            "  neighbor {} activate".format(address),
+            "  neighbor {} route-map {} in".format(address, route_map),
+        ]
+
+    model = {
+        "asn": local_asn,
+        "router_id": str(rid) if rid else "",
+        "pool": pool,
+        "update_source": source,
+        "neighbors": neighbors,
+        "duplicates": duplicates,
+        "errors": errors,
+        "summary": {
+            "neighbors": len(neighbors),
+            "remote_asns": sorted({n["asn"] for n in neighbors}),
+            "duplicates": len(duplicates),
+            "errors": len(errors),
+        },
+        "neighbor_lines": neighbor_lines,
+        "address_family_lines": address_family_lines,
+    }
+    model["rendered"] = render_router_bgp(model)
+    return model
+
+
+def render_router_bgp(model):
+    """Render the ``router bgp`` section (without a trailing newline)."""
+    lines = [
+        "router bgp {}".format(model["asn"]),
+        " bgp router-id {}".format(model["router_id"]),
+        " no bgp ebgp-requires-policy",
+        " no bgp network import-check",
+        "",
+    ]
+    lines += model["neighbor_lines"]
+    lines += ["", " address-family ipv4 unicast"]
+    lines += model["address_family_lines"]
+    lines.append(" exit-address-family")
+    return "\n".join(lines)
+
+
+class FilterModule:
+    def filters(self):
+        return {
+            "frr_bgp_model": frr_bgp_model,
+        }
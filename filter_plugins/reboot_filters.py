@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Reboot Report Filters for Ansible
+
+Aggregates the per-host ``reboot_status`` module results on the controller
+into one fleet report, instead of a looped set_fact per host:
+
+  - hosts that need a reboot, do not, or returned no usable result
+  - the reason per host (flag file, kernel mismatch) and the hosts per reason
+  - which hosts each pending package (reboot-required.pkgs) affects
+  - one report line per host with uptime and kernels
+
+The ``required`` list is meant to be fed to the topology filters
+(filter_plugins/topology_filters.py) to plan reboot waves::
+
+    report: "{{ hostvars | reboot_report(play_hosts) }}"
+    waves: "{{ report.required | topology_waves(groups, topology_policy | default({})) }}"
+"""
+
+try:
+    from ansible.errors import AnsibleFilterError
+except ImportError:
+    # Lets tests/ import the filters without Ansible installed
+    AnsibleFilterError = ValueError
+
+
+def _uptime(seconds):
+    seconds = int(seconds or 0)
+    days, rest = divmod(seconds, 86400)
+    return "{}d{}h".format(days, rest // 3600) if days else "{}h{}m".format(
+        rest // 3600, rest % 3600 // 60)
+
+
+def reboot_report(hostvars, hosts, key="reboot_status_result"):
+    """Build the fleet reboot report from registered reboot_status results.
+
+    Args:
+        hostvars: hostvars (or any {host: vars} mapping)
+        hosts: hosts to report on (e.g. play_hosts)
+        key: variable the reboot_status result was registered as
+
+    Returns:
+        dict with required, not_required, unknown, by_reason, packages
+        ({package: [hosts]}), by_host, summary and lines
+    """
+    if isinstance(hosts, str):
+        raise AnsibleFilterError("reboot_report expects a list of hosts, got a string")
+
+    required, not_required, unknown = [], [], []
+    by_reason, packages, by_host, lines = {}, {}, {}, []
+    for host in hosts or []:
+        result = (hostvars.get(host) or {}).get(key) if hasattr(hostvars, "get") else None
+        if not isinstance(result, dict) or result.get("failed") or result.get("skipped") \
+                or "reboot_required" not in result:
+            unknown.append(host)
+            msg = result.get("msg") if isinstance(result, dict) else None
+            lines.append("{}: UNKNOWN ({})".format(host, msg or "no result"))
+            continue
+        entry = {
+            "reboot_required": bool(result["reboot_required"]),
+            "reasons": list(result.get("reasons") or []),
+            "packages": list(result.get("packages") or []),
+            "uptime_seconds": int(result.get("uptime_seconds") or 0),
+            "running_kernel": result.get("running_kernel", ""),
+            "installed_kernel": result.get("installed_kernel", ""),
+        }
+        by_host[host] = entry
+        (required if entry["reboot_required"] else not_required).append(host)
+        for reason in entry["reasons"]:
+            by_reason.setdefault(reason, []).append(host)
+        for package in entry["packages"]:
+            packages.setdefault(package, []).append(host)
+
+        detail = "uptime {}".format(_uptime(entry["uptime_seconds"]))
+        if entry["installed_kernel"] and entry["installed_kernel"] != entry["running_kernel"]:
+            detail += ", kernel {} -> {}".format(entry["running_kernel"], entry["installed_kernel"])
+        if entry["packages"]:
+            detail += ", pkgs: {}".format(", ".join(entry["packages"]))
+        lines.append("{}: {}{} ({})".format(
+            host,
+            "REBOOT" if entry["reboot_required"] else "ok",
+            " [{}]".format(", ".join(entry["reasons"])) if entry["reasons"] else "",
+            detail,
+        ))
+
+    return {
+        "required": required,
+        "not_required": not_required,
+        "unknown": unknown,
+        "by_reason": by_reason,
+        "packages": dict(sorted(packages.items())),
+        "by_host": by_host,
+        "summary": {
+            "hosts": len(required) + len(not_required) + len(unknown),
+            "required": len(required),
+            "not_required": len(not_required),
+            "unknown": len(unknown),
+        },
+        "lines": lines,
+    }
+
+
+class FilterModule:
+    def filters(self):
+        return {
+            "reboot_report": reboot_report,
+        }
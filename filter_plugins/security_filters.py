@@ -307,6 +307,110 @@ def truncate_keys_in_string(text: str, key_length: int = 20, suffix: str = "..."
     return re.sub(key_pattern, truncate_key_match, str(text))
 
 
+# Port context with a guard so digits that start a dotted IPv4 address are
+# left for IP_PORT_RE; this lets both patterns share one alternation.
+PORT_CTX_INLINE = (
+    r"\b(?i:port|ports|listen(?:ing)?|bind|binds|tcp|udp)\s*(?::)?\s*"
+    r"(?P<ctx_port>\d{1,5})\b(?!\.\d{1,3}\.\d{1,3}\.\d{1,3})"
+)
+
+SECRET_CTX = (
+    r"(?P<secret_label>(?i:private key:|preshared key:|PrivateKey\s*=|PresharedKey\s*=)\s*)"
+    r"(?P<secret>[^\s\"',]+)"
+)
+
+WG_KEY = r"(?<![A-Za-z0-9+/])(?P<wg_key>[A-Za-z0-9+/]{43}=)"
+
+
+class SanitizationEngine:
+    """
+    Single compiled sanitizer for whole-output masking.
+
+    Combines WireGuard secret redaction, WireGuard key truncation and the
+    sanitize_security IP/port masking into one regex alternation, so a block
+    of text is scanned once instead of once per filter. Output matches
+    sanitize_security for IP/port data and is idempotent (already-masked
+    text is left unchanged).
+
+    Used by callback_plugins/sanitized.py to mask every task result and log
+    line at output time.
+
+    Example:
+        engine = SanitizationEngine()
+        engine("PrivateKey = abc...=\nEndpoint = [internal-ip]:51840")
+        -> "PrivateKey = [REDACTED]\nEndpoint = ***.168.1.100.:***1840"
+
+    Args:
+        mask_char: Character to use for masking (default: *)
+        redact_secrets: Redact private/preshared keys (default: True)
+        truncate_keys: Truncate other WireGuard keys (default: True)
+        key_length: Characters of a WireGuard key to keep (default: 20)
+    """
+
+    def __init__(self, mask_char: str = "*", redact_secrets: bool = True,
+                 truncate_keys: bool = True, key_length: int = 20):
+        self.mask_char = mask_char
+        self.key_length = key_length
+        parts = []
+        if redact_secrets:
+            parts.append(SECRET_CTX)
+        if truncate_keys:
+            parts.append(WG_KEY)
+        parts.append(IP_PORT_RE.pattern)
+        parts.append(PORT_CTX_INLINE)
+        self.pattern = re.compile("|".join(parts))
+
+    def _replace(self, m: re.Match) -> str:
+        groups = m.groupdict()
+        if groups.get("secret") is not None:
+            return m.group("secret_label") + "[REDACTED]"
+        if groups.get("wg_key") is not None:
+            return m.group("wg_key")[:self.key_length] + "...[TRUNCATED]"
+        if groups.get("ip") is not None:
+            if groups.get("port"):
+                return mask_ip(m.group("ip")) + ".:" + mask_port(m.group("port"), self.mask_char)
+            return mask_ip(m.group("ip"))
+        port = m.group("ctx_port")
+        return m.group(0).replace(port, mask_port(port, self.mask_char))
+
+    def __call__(self, text):
+        if not text:
+            return text
+        return self.pattern.sub(self._replace, str(text))
+
+
+def sanitize_output(text: str, mask_char: str = "*") -> str:
+    """
+    Sanitize arbitrary command output in a single pass.
+
+    Filter wrapper around SanitizationEngine: redacts WireGuard private and
+    preshared keys, truncates other WireGuard keys and masks IPs/ports like
+    sanitize_security.
+
+    Example:
+        "private key: abc...=, endpoint: [internal-ip]:51840"
+        -> "private key: [REDACTED], endpoint: ***.168.1.100.:***1840"
+
+    Args:
+        text: Text to sanitize
+        mask_char: Character to use for masking (default: *)
+
+    Returns:
+        Sanitized text
+    """
+    return _engine_for(mask_char)(text)
+
+
+_ENGINES = {}
+
+
+def _engine_for(mask_char: str) -> SanitizationEngine:
+    engine = _ENGINES.get(mask_char)
+    if engine is None:
+        engine = _ENGINES[mask_char] = SanitizationEngine(mask_char=mask_char)
+    return engine
+
+
 class FilterModule:
     """Ansible filter plugin for security sanitization."""
 
@@ -315,6 +419,7 @@ class FilterModule:
         return {
             # Network masking filters
             "sanitize_security": sanitize_security,
+            "sanitize_output": sanitize_output,
             "mask_ip": mask_ip,
             "mask_port": mask_port,
 
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Topology-aware batching filters for Ansible
+
+Computes safe rolling-update waves from inventory group roles so mutation
+playbooks no longer need ``serial: 1`` to be safe:
+
+  - WireGuard servers: one at a time, alone in their wave (every tunnel
+    depends on them)
+  - control planes: one per wave (etcd/API quorum is never at risk)
+  - BGP routers: one per site per wave (each site keeps an announcing router)
+  - workers: a bounded batch (25%) per wave, so workloads and Longhorn
+    replicas keep running elsewhere
+  - everything else: one per wave
+
+A play uses the ordered host list as its pattern and the wave sizes as its
+``serial`` list; Ansible keeps the pattern order for batching, so every
+batch is exactly one wave::
+
+    - hosts: "{{ 'wireguard_cluster' | topology_hosts(groups, topology_policy | default({}), ansible_limit | default('')) }}"
+      serial: "{{ 'wireguard_cluster' | topology_serial(groups, topology_policy | default({}), ansible_limit | default('')) }}"
+
+``topology_policy`` overrides DEFAULT_POLICY. Set it in vault_secrets.yml
+(a play vars_file) or with ``-e``: group_vars are not visible when Ansible
+templates a play's ``hosts`` and ``serial``, so a policy there is silently
+ignored. Roles are matched in order and the first role whose groups contain
+a host wins. Its ``max_parallel`` map ({role name: value}) changes single
+roles without restating the role list, e.g. ``{"max_parallel": {"worker": 1}}``.
+"""
+
+import copy
+import fnmatch
+import math
+import re
+
+try:
+    from ansible.errors import AnsibleFilterError
+except ImportError:
+    # Lets tests/ import the filters without Ansible installed
+    AnsibleFilterError = ValueError
+
+DEFAULT_POLICY = {
+    # max_parallel: hosts per wave (0 = unlimited) or "N%" of the role's hosts;
+    # exclusive roles get waves of their own, ahead of all other roles
+    "roles": [
+        {"name": "wireguard_server", "groups": ["wireguard_servers"],
+         "max_parallel": 1, "exclusive": True},
+        {"name": "control_plane", "groups": ["planes_all", "kuber_small_planes"],
+         "max_parallel": 1},
+        {"name": "bgp_router", "groups": ["bgp_routers", "bay_bgp"],
+         "max_parallel": 1, "per_site": True},
+        {"name": "dns_server", "groups": ["dns_servers"], "max_parallel": 1},
+        {"name": "load_balancer", "groups": ["keepalived_hosts"], "max_parallel": 1},
+        {"name": "worker", "groups": ["workers_all", "vas_workers_all"], "max_parallel": "25%"},
+    ],
+    # site name -> groups; hosts in none of them use the host name prefix
+    # before the first '_' or '-' (bay_worker1 -> bay)
+    "sites": {},
+    # max_parallel for hosts that match no role
+    "default_max_parallel": 1,
+    # role name -> max_parallel, applied on top of "roles"
+    "max_parallel": {},
+}
+
+
+def _merge_policy(policy):
+    merged = copy.deepcopy(DEFAULT_POLICY)
+    for key, value in (policy or {}).items():
+        merged[key] = copy.deepcopy(value)
+    for role in merged["roles"]:
+        if role.get("name") in (merged.get("max_parallel") or {}):
+            role["max_parallel"] = merged["max_parallel"][role["name"]]
+    return merged
+
+
+def _patterns(pattern):
+    if isinstance(pattern, (list, tuple)):
+        return [str(p).strip() for p in pattern if str(p).strip()]
+    return [p.strip() for p in re.split(r"[:,]", str(pattern or "")) if p.strip()]
+
+
+def _read_host_file(path):
+    """Hosts listed in an @file pattern (e.g. a .retry file), one per line."""
+    try:
+        with open(path) as fh:
+            return [line.strip() for line in fh if line.strip()]
+    except (IOError, OSError) as exc:
+        raise AnsibleFilterError("cannot read host file {}: {}".format(path, exc))
+
+
+def _resolve(name, groups_dict):
+    """Resolve one group name, host name, glob or ~regex into an ordered host list."""
+    if name in groups_dict:
+        return list(groups_dict[name])
+    all_hosts = groups_dict.get("all", [])
+    if name.startswith("~"):
+        # Like Ansible: re.search against group and host names
+        try:
+            regex = re.compile(name[1:])
+        except re.error as exc:
+            raise AnsibleFilterError("invalid host pattern {}: {}".format(name, exc))
+        matched = []
+        for group, hosts in groups_dict.items():
+            if regex.search(group):
+                matched.extend(hosts)
+        matched.extend(h for h in all_hosts if regex.search(h))
+        return matched
+    if any(ch in name for ch in "*?["):
+        matched = []
+        for group, hosts in groups_dict.items():
+            if fnmatch.fnmatch(group, name):
+                matched.extend(hosts)
+        matched.extend(h for h in all_hosts if fnmatch.fnmatch(h, name))
+        return matched
+    return [name] if name in all_hosts else []
+
+
+def resolve_hosts(pattern, groups_dict, limit=None):
+    """Evaluate a host pattern (and --limit) against the groups dict.
+
+    Supports group and host names, globs, ~regex, @file (hosts listed one
+    per line, as in --limit @site.retry), ':'/',' unions, '&' intersections
+    and '!' exclusions. Order follows the pattern, then inventory order
+    within each group.
+    """
+    def expand(expr):
+        parts = []
+        for part in _patterns(expr):
+            if part.startswith("@"):
+                parts.extend(_read_host_file(part[1:]))
+            else:
+                parts.append(part)
+        return parts
+
+    def evaluate(expr):
+        hosts, include, intersect, exclude = [], [], [], []
+        for part in expand(expr):
+            if part.startswith("!"):
+                exclude.append(part[1:])
+            elif part.startswith("&"):
+                intersect.append(part[1:])
+            else:
+                include.append(part)
+        seen = set()
+        for part in include:
+            for host in _resolve(part, groups_dict):
+                if host not in seen:
+                    seen.add(host)
+                    hosts.append(host)
+        for part in intersect:
+            keep = set(_resolve(part, groups_dict))
+            hosts = [h for h in hosts if h in keep]
+        for part in exclude:
+            drop = set(_resolve(part, groups_dict))
+            hosts = [h for h in hosts if h not in drop]
+        return hosts
+
+    hosts = evaluate(pattern)
+    if limit:
+        allowed = set(evaluate(limit))
+        hosts = [h for h in hosts if h in allowed]
+    return hosts
+
+
+def _site(host, groups_dict, sites):
+    for site, site_groups in (sites or {}).items():
+        for group in site_groups:
+            if host in groups_dict.get(group, []):
+                return site
+    return re.split(r"[_-]", host, maxsplit=1)[0]
+
+
+def _max_parallel(role, count):
+    """Hosts per wave for role: an int (0 = unlimited) or "N%" of count."""
+    value = role.get("max_parallel", 0)
+    try:
+        if isinstance(value, str) and value.strip().endswith("%"):
+            percent = float(value.strip()[:-1])
+            if percent <= 0:
+                raise ValueError(value)
+            return max(1, int(math.ceil(count * percent / 100.0)))
+        return int(value or 0)
+    except (TypeError, ValueError):
+        raise AnsibleFilterError(
+            "topology_policy role {} has invalid max_parallel {!r}".format(
+                role.get("name"), value))
+
+
+def _chunks(hosts, size):
+    if not size or size <= 0:
+        return [hosts] if hosts else []
+    return [hosts[i:i + size] for i in range(0, len(hosts), size)]
+
+
+def topology_plan(pattern, groups_dict, policy=None, limit=None):
+    """Assign hosts to roles/sites and split them into safe waves.
+
+    Args:
+        pattern: play host pattern (group name, 'a:b' union, list, ...)
+        groups_dict: Ansible groups dict (groups variable)
+        policy: topology_policy overrides (roles, sites, default_max_parallel,
+            max_parallel)
+        limit: ansible_limit, applied like --limit
+
+    Returns:
+        dict with waves (list of host lists), hosts (flattened wave order),
+        serial (wave sizes) and assignments ({host: {role, site, wave}})
+    """
+    policy = _merge_policy(policy)
+    hosts = resolve_hosts(pattern, groups_dict, limit)
+
+    role_hosts = []
+    assigned = {}
+    for role in policy["roles"]:
+        members = set()
+        for group in role.get("groups", []):
+            members.update(groups_dict.get(group, []))
+        picked = [h for h in hosts if h in members and h not in assigned]
+        for host in picked:
+            assigned[host] = role["name"]
+        role_hosts.append((role, picked))
+    rest = [h for h in hosts if h not in assigned]
+    role_hosts.append((
+        {"name": "other", "max_parallel": policy.get("default_max_parallel", 0)},
+        rest,
+    ))
+
+    exclusive_waves = []
+    role_waves = []
+    assignments = {}
+    for role, members in role_hosts:
+        max_parallel = _max_parallel(role, len(members))
+        if role.get("per_site"):
+            by_site = {}
+            for host in members:
+                by_site.setdefault(_site(host, groups_dict, policy.get("sites")), []).append(host)
+            per_site = {site: _chunks(site_hosts, max_parallel)
+                        for site, site_hosts in by_site.items()}
+            depth = max((len(c) for c in per_site.values()), default=0)
+            waves = [
+                [h for site in by_site for h in (per_site[site][i] if i < len(per_site[site]) else [])]
+                for i in range(depth)
+            ]
+        else:
+            waves = _chunks(members, max_parallel)
+        (exclusive_waves if role.get("exclusive") else role_waves).append(waves)
+
+    waves = [wave for waves_ in exclusive_waves for wave in waves_]
+    depth = max((len(w) for w in role_waves), default=0)
+    for index in range(depth):
+        wave = [h for waves_ in role_waves if index < len(waves_) for h in waves_[index]]
+        if wave:
+            waves.append(wave)
+
+    for role, members in role_hosts:
+        for host in members:
+            assignments[host] = {
+                "role": role["name"],
+                "site": _site(host, groups_dict, policy.get("sites")),
+                "wave": next(i + 1 for i, wave in enumerate(waves) if host in wave),
+            }
+
+    return {
+        "waves": waves,
+        "hosts": [h for wave in waves for h in wave],
+        "serial": [len(wave) for wave in waves] or [1],
+        "assignments": assignments,
+    }
+
+
+def topology_waves(pattern, groups_dict, policy=None, limit=None):
+    """Return the list of waves (host lists) for pattern."""
+    return topology_plan(pattern, groups_dict, policy, limit)["waves"]
+
+
+def topology_hosts(pattern, groups_dict, policy=None, limit=None):
+    """Return the hosts of pattern in wave order (use as the play's hosts)."""
+    hosts = topology_plan(pattern, groups_dict, policy, limit)["hosts"]
+    # An empty list would make the play fail to parse; match nothing instead
+    return hosts or pattern
+
+
+def topology_serial(pattern, groups_dict, policy=None, limit=None):
+    """Return wave sizes for pattern (use as the play's serial list)."""
+    return topology_plan(pattern, groups_dict, policy, limit)["serial"]
+
+
+class FilterModule:
+    def filters(self):
+        return {
+            "topology_plan": topology_plan,
+            "topology_waves": topology_waves,
+            "topology_hosts": topology_hosts,
+            "topology_serial": topology_serial,
+        }
@@ -2,9 +2,34 @@
 """WireGuard Routing Filters for Ansible
 
 Helpers to compute per-peer AllowedIPs assignments based on Ansible
-group membership, avoiding complex Jinja2 set operations.
+group membership, avoiding complex Jinja2 set operations, plus single-pass
+client port assignment, per-host peer lookup and the render fingerprint used
+to skip unchanged server.conf.j2/client.conf.j2 deployments.
+
+The filters registered with Ansible are memoized through RoutingCache:
+results are keyed by a stable hash of vault_wg_peers, the group memberships
+the peers actually reference and the CIDR arguments, and kept in an
+in-process LRU plus an optional on-disk store in ~/.ansible (private to the
+controller user). With ``serial: 1`` every host batch (and every
+later run with unchanged inputs) reuses the first computation.
 """
 
+import copy
+import hashlib
+import json
+import atexit
+import multiprocessing.util
+import os
+import stat
+import time
+from collections import OrderedDict
+
+try:
+    from ansible.errors import AnsibleFilterError
+except ImportError:
+    # Lets tests/ import the filters without Ansible installed
+    AnsibleFilterError = ValueError
+
 
 def peers_in_groups(wg_peers, groups_dict, target_group_members):
     """Return names of wg_peers whose host_group has members in target_group_members.
@@ -163,10 +188,429 @@ def validate_vip_overrides(metallb_pool_cidr, vas_vip_overrides):
     return warnings
 
 
+def _port_number(value, what):
+    try:
+        port = int(str(value).strip())
+    except (TypeError, ValueError):
+        raise AnsibleFilterError("{} is not a port number: {!r}".format(what, value))
+    if not 0 < port < 65536:
+        raise AnsibleFilterError("{} out of range: {}".format(what, port))
+    return port
+
+
+def wg_assign_client_ports(wg_peers, port_start, port_end=None):
+    """Fill in client_listen_port for every peer in one pass.
+
+    Peers without an explicit client_listen_port get port_start + their index
+    in vault_wg_peers (the scheme assign_ports.yaml always used, so existing
+    peers keep their ports). Ports are returned as strings, explicit values
+    are kept as given.
+
+    Use in playbooks:
+        {{ vault_wg_peers | wg_assign_client_ports(vault_wg_client_port_start,
+                                                   vault_wg_client_port_end) }}
+
+    Args:
+        wg_peers: list of dicts from vault_wg_peers
+        port_start: first auto-assigned port (int or numeric string)
+        port_end: optional last allowed auto-assigned port; ignored unless numeric
+
+    Returns:
+        new list of peer dicts with client_listen_port set
+
+    Raises:
+        AnsibleFilterError: two peers end up on the same port, an explicit
+        port is invalid, or an auto-assigned port falls outside the range
+    """
+    result = []
+    owners = {}
+    start = None
+    end = None
+    if port_end is not None and str(port_end).strip().isdigit():
+        end = int(str(port_end).strip())
+
+    for index, peer in enumerate(wg_peers or []):
+        name = peer.get("name", "#{}".format(index))
+        explicit = peer.get("client_listen_port")
+        if explicit not in (None, ""):
+            port = _port_number(explicit, "client_listen_port of peer {}".format(name))
+            value = explicit
+        else:
+            if start is None:
+                start = _port_number(port_start, "vault_wg_client_port_start")
+            port = start + index
+            if end is not None and port > end:
+                raise AnsibleFilterError(
+                    "Auto-assigned port {} for peer {} is beyond vault_wg_client_port_end {}".format(
+                        port, name, end
+                    )
+                )
+            value = str(port)
+
+        if port in owners:
+            raise AnsibleFilterError(
+                "client_listen_port {} collision: peers {} and {}".format(port, owners[port], name)
+            )
+        owners[port] = name
+
+        updated = dict(peer)
+        updated["client_listen_port"] = value
+        result.append(updated)
+    return result
+
+
+def wg_peers_for_host(wg_peers, groups_dict, hostname):
+    """Return the peers whose host_group contains hostname, in vault order.
+
+    Replaces the per-peer set_fact loop in deploy_peers.yaml; each referenced
+    group is converted to a set once.
+
+    Args:
+        wg_peers: list of dicts from vault_wg_peers
+        groups_dict: Ansible groups dict (groups variable)
+        hostname: inventory_hostname
+
+    Returns:
+        list of peer dicts (empty if the host is not a WireGuard peer)
+    """
+    members = {}
+    result = []
+    for peer in wg_peers or []:
+        host_group = peer.get("host_group")
+        if not host_group or host_group not in groups_dict:
+            continue
+        if host_group not in members:
+            members[host_group] = set(groups_dict[host_group] or [])
+        if hostname in members[host_group]:
+            result.append(peer)
+    return result
+
+
+def wg_config_fingerprint(params, wg_peers, groups_dict, hostname, bgp_group="bgp_routers"):
+    """Return a sha256 fingerprint of every input a host's WireGuard config uses.
+
+    server.conf.j2 and client.conf.j2 only look at the groups dict to decide
+    whether the host belongs to a peer's host_group and whether a peer's group
+    overlaps bgp_routers, so the groups dict is reduced to those bits per
+    peer; unrelated inventory changes do not change the fingerprint.
+
+    Use in playbooks:
+        {{ {'template': lookup('file', ...), 'private_key': ..., ...}
+           | wg_config_fingerprint(vault_wg_peers, groups, inventory_hostname) }}
+
+    Args:
+        params: dict of template inputs (template source, keys, ports, rules,
+                extra CIDRs, ...)
+        wg_peers: list of dicts from vault_wg_peers
+        groups_dict: Ansible groups dict (groups variable)
+        hostname: inventory_hostname
+        bgp_group: group the templates treat as BGP routers
+
+    Returns:
+        hex digest string
+    """
+    bgp_hosts = set(groups_dict.get(bgp_group, []) or [])
+    peers_view = []
+    for peer in wg_peers or []:
+        host_group = peer.get("host_group")
+        members = set(groups_dict.get(host_group, []) or []) if host_group else set()
+        peers_view.append({
+            "peer": peer,
+            "group_known": bool(host_group) and host_group in groups_dict,
+            "local": hostname in members,
+            "bgp": bool(members & bgp_hosts),
+        })
+    return _stable_hash({
+        "params": params,
+        "peers": peers_view,
+        "host_in_bgp": hostname in bgp_hosts,
+    })
+
+
+# ---------------------------------------------------------------------------
+# Memoization
+# ---------------------------------------------------------------------------
+
+CACHE_MAXSIZE = 128
+CACHE_DIR = os.path.join("~", ".ansible", "wg_routing_cache")
+STATS_FILE = "stats.log"
+STATS_MAX_BYTES = 1024 * 1024
+
+
+def _stable_hash(value):
+    """Return a sha256 hex digest of value that is stable across runs."""
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _relevant_groups(wg_peers, groups_dict):
+    """Return only the groups referenced by a peer host_group.
+
+    The full Ansible groups dict changes whenever any inventory group does;
+    keying on the referenced groups keeps cache hits stable.
+    """
+    relevant = {}
+    for peer in wg_peers or []:
+        host_group = peer.get("host_group")
+        if host_group and host_group not in relevant:
+            relevant[host_group] = sorted(groups_dict.get(host_group, []))
+    return relevant
+
+
+def _default_cache_location():
+    """Resolve (cache_dir, ttl) from the environment or Ansible fact cache settings.
+
+    WG_ROUTING_CACHE_DIR overrides the location; an empty value disables the
+    on-disk cache. Otherwise the cache lives in ~/.ansible/wg_routing_cache
+    (the entries hold vault peer data, so never in a shared directory) when
+    fact caching is configured, and reuses fact_caching_timeout as its TTL.
+    """
+    ttl = 86400
+    if "WG_ROUTING_CACHE_DIR" in os.environ:
+        return os.environ["WG_ROUTING_CACHE_DIR"] or None, ttl
+    try:
+        from ansible import constants as C
+    except ImportError:
+        return None, ttl
+    ttl = int(getattr(C, "CACHE_PLUGIN_TIMEOUT", ttl) or ttl)
+    if not getattr(C, "CACHE_PLUGIN_CONNECTION", None):
+        return None, ttl
+    return os.path.expanduser(CACHE_DIR), ttl
+
+
+def _private_dir(path):
+    """Create path (0700) if needed; True only for a real directory that is
+    owned by the current user and not accessible to group or others."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return (stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid()
+            and not st.st_mode & 0o077)
+
+
+class RoutingCache:
+    """Two-level memo cache: in-process LRU plus optional on-disk JSON store.
+
+    Ansible templates set_fact in forked workers, so the in-process LRU only
+    lives for one templating pass; the on-disk store (content-addressed, so it
+    never goes stale) carries results across tasks, serial batches and runs.
+    It is only used when the directory is private to the current user.
+    Hit/miss counters are kept in memory and appended to stats.log once,
+    when the process (controller or forked worker) exits.
+    """
+
+    def __init__(self, maxsize=CACHE_MAXSIZE, cache_dir=None, ttl=86400):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._lru = OrderedDict()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0}
+        self._pid = None
+        self._trusted = None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _disk_enabled(self):
+        if not self.cache_dir:
+            return False
+        if self._trusted is None:
+            self._trusted = _private_dir(self.cache_dir)
+        return self._trusted
+
+    def _record(self, event):
+        if self._pid != os.getpid():
+            # First event in this process: counters inherited over fork belong
+            # to the parent, which flushes them itself.
+            self._pid = os.getpid()
+            self._counters = dict.fromkeys(self._counters, 0)
+            if self._disk_enabled():
+                atexit.register(self.flush_stats)
+                # Forked multiprocessing workers skip atexit but run finalizers.
+                multiprocessing.util.Finalize(None, self.flush_stats, exitpriority=0)
+        self._counters[event] += 1
+
+    def flush_stats(self):
+        """Append this process's counters to stats.log as one line and reset them."""
+        if self._pid != os.getpid() or not any(self._counters.values()):
+            return
+        if self._disk_enabled():
+            try:
+                stats_path = os.path.join(self.cache_dir, STATS_FILE)
+                if os.path.exists(stats_path) and os.path.getsize(stats_path) > STATS_MAX_BYTES:
+                    os.replace(stats_path, stats_path + ".1")
+                with open(stats_path, "a") as fh:
+                    fh.write("{:.3f} {hits} {disk_hits} {misses}\n".format(
+                        time.time(), **self._counters))
+            except OSError:
+                pass
+        self._counters = dict.fromkeys(self._counters, 0)
+
+    def _disk_get(self, key):
+        if not self._disk_enabled():
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key, value):
+        if not self._disk_enabled():
+            return
+        try:
+            tmp = "{}.{}.tmp".format(self._path(key), os.getpid())
+            with open(tmp, "w") as fh:
+                json.dump(value, fh)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self._path(key))
+        except (OSError, TypeError, ValueError):
+            pass
+
+    def _lru_put(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def get_or_compute(self, name, key_parts, compute):
+        """Return a copy of the cached result for key_parts, computing it on a miss."""
+        key = "{}-{}".format(name, _stable_hash(key_parts))
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self._record("hits")
+            return copy.deepcopy(self._lru[key])
+
+        value = self._disk_get(key)
+        if value is not None:
+            self._record("disk_hits")
+        else:
+            value = compute()
+            self._record("misses")
+            self._disk_put(key, value)
+        self._lru_put(key, value)
+        return copy.deepcopy(value)
+
+    def clear(self):
+        """Drop in-process entries and counters (the on-disk store is kept)."""
+        self._lru.clear()
+        self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self, since=None):
+        """Return hit/miss counters for the profiling output.
+
+        Without ``since`` only this process's counters are returned. With
+        ``since`` (epoch seconds, e.g. the playbook start) the counters other
+        processes flushed to stats.log after that time are added, so forked
+        workers are included.
+        """
+        counters = dict(self._counters)
+        if since is not None and time.time() < since:
+            counters = dict.fromkeys(self._counters, 0)
+        source = "process"
+        if since is not None and self._disk_enabled():
+            stats_path = os.path.join(self.cache_dir, STATS_FILE)
+            try:
+                with open(stats_path) as fh:
+                    for line in fh:
+                        fields = line.split()
+                        if len(fields) != 4 or float(fields[0]) < since:
+                            continue
+                        for event, count in zip(("hits", "disk_hits", "misses"), fields[1:]):
+                            counters[event] += int(count)
+                source = "disk"
+            except (OSError, ValueError):
+                pass
+        lookups = sum(counters.values())
+        counters.update({
+            "lookups": lookups,
+            "hit_ratio": round((counters["hits"] + counters["disk_hits"]) / lookups, 3) if lookups else 0.0,
+            "lru_entries": len(self._lru),
+            "cache_dir": self.cache_dir or "",
+            "source": source,
+        })
+        return counters
+
+
+_CACHE = None
+
+
+def get_cache():
+    """Return the module-wide RoutingCache, creating it on first use."""
+    global _CACHE
+    if _CACHE is None:
+        cache_dir, ttl = _default_cache_location()
+        _CACHE = RoutingCache(cache_dir=cache_dir, ttl=ttl)
+    return _CACHE
+
+
+def cache_stats(since=None):
+    """Return RoutingCache statistics (used by the timing_profile callback)."""
+    return get_cache().stats(since=since)
+
+
+def cached_peers_in_groups(wg_peers, groups_dict, target_group_members):
+    """Memoized peers_in_groups (registered as the peers_in_groups filter)."""
+    wg_peers = list(wg_peers or [])
+    key_parts = [wg_peers, _relevant_groups(wg_peers, groups_dict), sorted(target_group_members or [])]
+    return get_cache().get_or_compute(
+        "peers_in_groups", key_parts,
+        lambda: peers_in_groups(wg_peers, groups_dict, target_group_members),
+    )
+
+
+def cached_build_peers_extra_cidrs(
+    wg_peers,
+    groups_dict,
+    bgp_router_hosts,
+    worker_hosts,
+    metallb_pool_cidr,
+    pod_cidr,
+    db_wg_route_cidr=None,
+    db_hosts=None,
+):
+    """Memoized build_peers_extra_cidrs (registered as the build_peers_extra_cidrs filter)."""
+    wg_peers = list(wg_peers or [])
+    key_parts = [
+        wg_peers,
+        _relevant_groups(wg_peers, groups_dict),
+        list(bgp_router_hosts or []),
+        list(worker_hosts or []),
+        metallb_pool_cidr,
+        pod_cidr,
+        db_wg_route_cidr,
+        list(db_hosts or []),
+    ]
+    return get_cache().get_or_compute(
+        "build_peers_extra_cidrs", key_parts,
+        lambda: build_peers_extra_cidrs(
+            wg_peers, groups_dict, bgp_router_hosts, worker_hosts,
+            metallb_pool_cidr, pod_cidr, db_wg_route_cidr, db_hosts,
+        ),
+    )
+
+
+def cached_validate_vip_overrides(metallb_pool_cidr, vas_vip_overrides):
+    """Memoized validate_vip_overrides (registered as the validate_vip_overrides filter)."""
+    key_parts = [metallb_pool_cidr, list(vas_vip_overrides or [])]
+    return get_cache().get_or_compute(
+        "validate_vip_overrides", key_parts,
+        lambda: validate_vip_overrides(metallb_pool_cidr, vas_vip_overrides),
+    )
+
+
 class FilterModule:
     def filters(self):
         return {
-            "peers_in_groups": peers_in_groups,
-            "build_peers_extra_cidrs": build_peers_extra_cidrs,
-            "validate_vip_overrides": validate_vip_overrides,
+            "peers_in_groups": cached_peers_in_groups,
+            "build_peers_extra_cidrs": cached_build_peers_extra_cidrs,
+            "validate_vip_overrides": cached_validate_vip_overrides,
+            "wg_assign_client_ports": wg_assign_client_ports,
+            "wg_peers_for_host": wg_peers_for_host,
+            "wg_config_fingerprint": wg_config_fingerprint,
         }
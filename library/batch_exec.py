@@ -0,0 +1,231 @@
+#!/usr/bin/python
+"""Batch command execution
+
+Ansible module used by the verify roles. Runs a list of named, read-only probe
+commands on the target in a bounded thread pool, each with its own timeout,
+and returns every rc/stdout/stderr in one result. A verify role collapses its
+dozens of ``ansible.builtin.command`` tasks (one module transfer and SSH exec
+each) into a single task per host, then reads the outputs by name.
+
+Commands run without a shell unless ``shell: true`` is set. A command that
+exceeds its timeout is killed together with its process group (pipelines
+included) and reported with ``timed_out: true`` and rc -9.
+"""
+
+import os
+import shlex
+import signal
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DOCUMENTATION = r"""
+---
+module: batch_exec
+short_description: Run named probe commands concurrently with per-command timeouts
+description:
+  - Runs every command in C(commands) on the target in a thread pool of at most
+    C(parallelism) workers and returns all results in one C(outputs) mapping.
+  - Intended for read-only verification probes; the module never reports
+    C(changed).
+options:
+  commands:
+    description:
+      - Commands as C(name) (unique, used as key in C(outputs)), C(cmd) (string
+        or argv list), optional C(shell) (run through C(/bin/sh -c)),
+        C(timeout) (seconds, overrides the module default) and C(stdin).
+    type: list
+    elements: dict
+    required: true
+  parallelism:
+    description: Maximum concurrently running commands.
+    type: int
+    default: 8
+  timeout:
+    description: Default per-command timeout in seconds.
+    type: int
+    default: 10
+  fail_on_error:
+    description: Fail the task when a command exits non-zero or times out.
+    type: bool
+    default: false
+"""
+
+EXAMPLES = r"""
+- name: Run HAProxy probe commands
+  batch_exec:
+    commands:
+      - {name: active, cmd: systemctl is-active haproxy}
+      - {name: config_check, cmd: haproxy -c -f /etc/haproxy/haproxy.cfg, timeout: 20}
+      - {name: listening, cmd: "ss -tlnp | grep -c ':6443 '", shell: true}
+  register: haproxy_probe
+"""
+
+RETURN = r"""
+outputs:
+  description: >-
+    {name: {rc, stdout, stdout_lines, stderr, timed_out, elapsed_ms}} for every
+    command, shaped like an ansible.builtin.command result.
+  type: dict
+  returned: always
+failed:
+  description: Names of commands that exited non-zero or timed out, in input order.
+  type: list
+  returned: always
+timed_out:
+  description: Names of commands killed after their timeout.
+  type: list
+  returned: always
+elapsed_ms:
+  description: Wall time of the whole batch.
+  type: float
+  returned: always
+"""
+
+TIMEOUT_RC = -9
+NOT_FOUND_RC = 127
+
+
+def validate_commands(commands, default_timeout=10):
+    """Normalize the commands option; raise ValueError listing every problem.
+
+    Returns:
+        list of {name, argv, timeout, stdin}
+    """
+    normalized, errors, seen = [], [], set()
+    for index, command in enumerate(commands or []):
+        if not isinstance(command, dict):
+            errors.append("command #{}: expected a mapping, got {!r}".format(index, command))
+            continue
+        name = str(command.get("name") or "").strip()
+        label = name or "#{}".format(index)
+        if not name:
+            errors.append("command #{}: missing name".format(index))
+        elif name in seen:
+            errors.append("command {}: duplicate name".format(name))
+        seen.add(name)
+
+        cmd = command.get("cmd")
+        if command.get("shell"):
+            argv = ["/bin/sh", "-c", cmd if isinstance(cmd, str) else " ".join(
+                shlex.quote(str(arg)) for arg in cmd or [])]
+        elif isinstance(cmd, (list, tuple)):
+            argv = [str(arg) for arg in cmd]
+        else:
+            argv = shlex.split(str(cmd or ""))
+        if not cmd or not argv or (command.get("shell") and not argv[2].strip()):
+            errors.append("command {}: missing cmd".format(label))
+
+        timeout = command.get("timeout", default_timeout)
+        try:
+            timeout = float(timeout)
+            if timeout <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append("command {}: invalid timeout {!r}".format(label, command.get("timeout")))
+        normalized.append({"name": name, "argv": argv, "timeout": timeout,
+                           "stdin": command.get("stdin")})
+    if errors:
+        raise ValueError("batch_exec commands are invalid:\n  - " + "\n  - ".join(errors))
+    return normalized
+
+
+def _kill_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        proc.kill()
+
+
+def run_command(argv, timeout, stdin=None, clock=time.monotonic):
+    """Run one command; kill its whole process group when it times out."""
+    started = clock()
+    timed_out = False
+    try:
+        proc = subprocess.Popen(
+            argv,
+            stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+    except OSError as exc:
+        return {"rc": NOT_FOUND_RC, "stdout": "", "stderr": str(exc), "timed_out": False,
+                "elapsed_ms": round((clock() - started) * 1000, 1)}
+    try:
+        out, err = proc.communicate(
+            input=stdin.encode() if stdin is not None else None, timeout=timeout)
+        rc = proc.returncode
+    except subprocess.TimeoutExpired:
+        _kill_group(proc)
+        out, err = proc.communicate()
+        rc, timed_out = TIMEOUT_RC, True
+    return {
+        "rc": rc,
+        "stdout": out.decode(errors="replace").rstrip("\n"),
+        "stderr": err.decode(errors="replace").rstrip("\n"),
+        "timed_out": timed_out,
+        "elapsed_ms": round((clock() - started) * 1000, 1),
+    }
+
+
+def run_batch(commands, parallelism=8, runner=run_command, clock=time.monotonic):
+    """Run validated commands concurrently and collect the results by name.
+
+    Args:
+        commands: validate_commands() result
+        parallelism: maximum concurrent commands
+        runner: callable(argv, timeout, stdin) -> result dict
+
+    Returns:
+        dict with outputs, failed, timed_out and elapsed_ms
+    """
+    started = clock()
+    outputs = {}
+    if commands:
+        with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(commands)))) as pool:
+            results = pool.map(lambda c: runner(c["argv"], c["timeout"], c["stdin"]), commands)
+            for command, result in zip(commands, results):
+                result["cmd"] = command["argv"]
+                result["stdout_lines"] = result["stdout"].splitlines()
+                result["stderr_lines"] = result["stderr"].splitlines()
+                outputs[command["name"]] = result
+    names = [c["name"] for c in commands or []]
+    return {
+        "outputs": outputs,
+        "failed": [n for n in names if outputs[n]["rc"] != 0],
+        "timed_out": [n for n in names if outputs[n]["timed_out"]],
+        "elapsed_ms": round((clock() - started) * 1000, 1),
+    }
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            commands=dict(type="list", elements="dict", required=True),
+            parallelism=dict(type="int", default=8),
+            timeout=dict(type="int", default=10),
+            fail_on_error=dict(type="bool", default=False),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+
+    try:
+        commands = validate_commands(params["commands"], params["timeout"])
+    except ValueError as exc:
+        module.fail_json(msg=str(exc))
+
+    result = run_batch(commands, params["parallelism"])
+    if params["fail_on_error"] and result["failed"]:
+        module.fail_json(msg="Commands failed: {}".format(", ".join(result["failed"])),
+                         changed=False, **result)
+    module.exit_json(changed=False, **result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/python
+"""Calico BGP bulk apply
+
+Ansible module used by the calico_bgp_config role. Renders the Calico
+BGPConfiguration and every BGPPeer into one multi-document manifest, fetches
+the live objects with a single ``kubectl get ... -o json`` list call, diffs
+them in memory and applies only the changed objects with one
+``kubectl apply --server-side`` call, instead of one ``kubectl apply`` process
+and API round trip per object.
+
+Objects are compared on the fields this module sets (spec keys and labels),
+which is what server-side apply owns for its field manager; fields added by
+Calico or other managers do not count as drift.
+"""
+
+import copy
+import ipaddress
+import json
+import re
+
+DOCUMENTATION = r"""
+---
+module: calico_bgp_apply
+short_description: Diff and bulk-apply Calico BGPConfiguration and BGPPeer objects
+description:
+  - Renders the BGPConfiguration C(default) and the BGPPeers into one
+    multi-document manifest (JSON documents separated by C(---)).
+  - Fetches live objects with one C(kubectl get bgpconfigurations,bgppeers -o json).
+  - Applies only created or changed objects with one
+    C(kubectl apply --server-side) call and reports the status per object.
+  - With C(prune), managed BGPPeers that are no longer listed are deleted
+    in one C(kubectl delete) call.
+options:
+  bgp_configuration:
+    description: Spec of the BGPConfiguration C(default) (omit to leave it alone).
+    type: dict
+  peers:
+    description: BGPPeers as C(name) plus spec fields (C(peerIP), C(asNumber),
+      optional C(node), C(nodeSelector), C(peerSelector), ...).
+    type: list
+    elements: dict
+    default: []
+  prune:
+    description: Delete BGPPeers labelled as managed by this module that are
+      not in C(peers).
+    type: bool
+    default: false
+  field_manager:
+    description: Server-side apply field manager.
+    type: str
+    default: ansible-calico-bgp
+  kubeconfig:
+    description: Kubeconfig used by kubectl.
+    type: path
+    default: /etc/kubernetes/admin.conf
+  kubectl:
+    description: kubectl binary.
+    type: str
+    default: kubectl
+"""
+
+EXAMPLES = r"""
+- name: Apply Calico BGP objects
+  calico_bgp_apply:
+    bgp_configuration:
+      listenPort: 178
+      bindMode: NodeIP
+    peers:
+      - {name: edge-router, peerIP: 100.65.0.1, asNumber: 64512}
+  register: calico_bgp_apply
+"""
+
+RETURN = r"""
+objects:
+  description: Per object kind, name and status (created, changed, unchanged, pruned).
+  type: list
+  returned: always
+summary:
+  description: Object counts per status.
+  type: dict
+  returned: always
+configuration_changed:
+  description: Whether the BGPConfiguration was created or a spec field of it
+    changed (a label-only update does not count; calico-node only needs a
+    restart for spec changes such as C(listenPort)).
+  type: bool
+  returned: always
+manifest:
+  description: The full rendered multi-document manifest.
+  type: str
+  returned: always
+"""
+
+API_VERSION = "crd.projectcalico.org/v1"
+RESOURCES = {
+    "BGPConfiguration": "bgpconfigurations.crd.projectcalico.org",
+    "BGPPeer": "bgppeers.crd.projectcalico.org",
+}
+MANAGED_LABEL = "app.kubernetes.io/managed-by"
+MANAGED_VALUE = "ansible-calico-bgp"
+
+_NAME_RE = re.compile(r"^[a-z0-9]([-a-z0-9.]{0,251}[a-z0-9])?$")
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+
+def _object(kind, name, spec):
+    return {
+        "apiVersion": API_VERSION,
+        "kind": kind,
+        "metadata": {"name": name, "labels": {MANAGED_LABEL: MANAGED_VALUE}},
+        "spec": spec,
+    }
+
+
+def _validate_peer(peer, index):
+    """Return (name, spec, errors) for one peers entry."""
+    if not isinstance(peer, dict):
+        return None, None, ["peer #{}: expected a mapping, got {!r}".format(index, peer)]
+    spec = {k: v for k, v in peer.items() if k != "name"}
+    name = str(peer.get("name") or "").strip()
+    label = name or "#{}".format(index)
+    errors = []
+    if not _NAME_RE.match(name):
+        errors.append("peer {}: invalid or missing name".format(label))
+    peer_ip = str(spec.get("peerIP") or "").strip()
+    host = peer_ip
+    if peer_ip.startswith("[") and "]:" in peer_ip:
+        host = peer_ip[1:peer_ip.index("]:")]
+    elif peer_ip.count(":") == 1:
+        host = peer_ip.split(":", 1)[0]
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        if not spec.get("peerSelector"):
+            errors.append("peer {}: invalid or missing peerIP {!r}".format(label, peer_ip))
+    if "asNumber" in spec:
+        try:
+            spec["asNumber"] = int(spec["asNumber"])
+            if not 1 <= spec["asNumber"] <= 4294967295:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append("peer {}: invalid asNumber {!r}".format(label, peer.get("asNumber")))
+    elif not spec.get("peerSelector"):
+        errors.append("peer {}: missing asNumber".format(label))
+    return name, spec, errors
+
+
+def render_objects(bgp_configuration=None, peers=None):
+    """Build the desired objects; raise ValueError listing every invalid peer."""
+    objects, errors, seen = [], [], set()
+    if bgp_configuration is not None:
+        spec = dict(bgp_configuration)
+        if "listenPort" in spec:
+            spec["listenPort"] = int(spec["listenPort"])
+        objects.append(_object("BGPConfiguration", "default", spec))
+    for index, peer in enumerate(peers or []):
+        name, spec, peer_errors = _validate_peer(peer, index)
+        if not peer_errors and name in seen:
+            peer_errors = ["peer {}: duplicate name".format(name)]
+        errors.extend(peer_errors)
+        if not peer_errors:
+            seen.add(name)
+            objects.append(_object("BGPPeer", name, spec))
+    if errors:
+        raise ValueError("Calico BGP objects are invalid:\n  - " + "\n  - ".join(errors))
+    return objects
+
+
+def render_manifest(objects):
+    """Multi-document manifest (JSON documents are valid YAML documents)."""
+    return "".join("---\n" + json.dumps(obj, indent=2, sort_keys=True) + "\n" for obj in objects)
+
+
+# ---------------------------------------------------------------------------
+# Diff
+# ---------------------------------------------------------------------------
+
+
+def _same(desired, live):
+    """Whether every field in desired has the same value in live."""
+    if isinstance(desired, dict):
+        return isinstance(live, dict) and all(
+            _same(value, live.get(key)) for key, value in desired.items())
+    if isinstance(desired, list):
+        return isinstance(live, list) and len(desired) == len(live) and all(
+            _same(d, l) for d, l in zip(desired, live))
+    if isinstance(desired, (int, float)) and not isinstance(desired, bool) \
+            and isinstance(live, str):
+        return str(desired) == live
+    return desired == live
+
+
+def diff_objects(desired, live_items, prune=False):
+    """Compare desired objects with the live list.
+
+    Returns:
+        list of {kind, name, status, fields} where status is created, changed,
+        unchanged or pruned; fields lists the differing top-level spec keys
+    """
+    live = {(o.get("kind"), o.get("metadata", {}).get("name")): o for o in live_items or []}
+    results = []
+    wanted = set()
+    for obj in desired:
+        key = (obj["kind"], obj["metadata"]["name"])
+        wanted.add(key)
+        current = live.get(key)
+        if current is None:
+            results.append({"kind": key[0], "name": key[1], "status": "created",
+                            "fields": sorted(obj["spec"])})
+            continue
+        fields = sorted(k for k, v in obj["spec"].items()
+                        if not _same(v, current.get("spec", {}).get(k)))
+        if not _same(obj["metadata"]["labels"], current.get("metadata", {}).get("labels") or {}):
+            fields.append("metadata.labels")
+        results.append({"kind": key[0], "name": key[1],
+                        "status": "changed" if fields else "unchanged", "fields": fields})
+    if prune:
+        for (kind, name), obj in sorted(live.items()):
+            labels = obj.get("metadata", {}).get("labels") or {}
+            if kind == "BGPPeer" and (kind, name) not in wanted \
+                    and labels.get(MANAGED_LABEL) == MANAGED_VALUE:
+                results.append({"kind": kind, "name": name, "status": "pruned", "fields": []})
+    return results
+
+
+def summarize(results):
+    summary = {"created": 0, "changed": 0, "unchanged": 0, "pruned": 0}
+    for result in results:
+        summary[result["status"]] += 1
+    return summary
+
+
+def configuration_changed(results):
+    """Whether the BGPConfiguration was created or had a spec field changed.
+
+    Adding the managed-by label to an existing BGPConfiguration (first run
+    against a cluster where it was created by hand) is applied but does not
+    count, so it does not trigger a calico-node restart.
+    """
+    return any(
+        r["kind"] == "BGPConfiguration"
+        and (r["status"] == "created"
+             or (r["status"] == "changed"
+                 and any(f != "metadata.labels" for f in r["fields"])))
+        for r in results)
+
+
+def plan(desired, live_items, prune=False):
+    """Diff and return (results, objects to apply, (kind, name) to delete)."""
+    results = diff_objects(desired, live_items, prune)
+    by_key = {(o["kind"], o["metadata"]["name"]): o for o in desired}
+    to_apply = [copy.deepcopy(by_key[(r["kind"], r["name"])]) for r in results
+                if r["status"] in ("created", "changed")]
+    to_delete = [(r["kind"], r["name"]) for r in results if r["status"] == "pruned"]
+    return results, to_apply, to_delete
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            bgp_configuration=dict(type="dict"),
+            peers=dict(type="list", elements="dict", default=[]),
+            prune=dict(type="bool", default=False),
+            field_manager=dict(type="str", default="ansible-calico-bgp"),
+            kubeconfig=dict(type="path", default="/etc/kubernetes/admin.conf"),
+            kubectl=dict(type="str", default="kubectl"),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    kubectl = params["kubectl"]
+    env = {"KUBECONFIG": params["kubeconfig"]}
+
+    try:
+        desired = render_objects(params["bgp_configuration"], params["peers"])
+    except ValueError as exc:
+        module.fail_json(msg=str(exc))
+
+    rc, out, err = module.run_command(
+        [kubectl, "get", ",".join(RESOURCES.values()), "-o", "json"], environ_update=env)
+    if rc != 0:
+        if "resource type" in (err or ""):
+            module.fail_json(msg=(
+                "Calico CRDs (bgpconfigurations/bgppeers.crd.projectcalico.org) are not "
+                "available. Ensure Calico CRDs are installed and the API server is reachable."),
+                stderr=err)
+        module.fail_json(msg="kubectl get failed", rc=rc, stderr=err)
+
+    results, to_apply, to_delete = plan(desired, json.loads(out).get("items", []),
+                                        params["prune"])
+    result = {
+        "changed": bool(to_apply or to_delete),
+        "objects": results,
+        "summary": summarize(results),
+        "configuration_changed": configuration_changed(results),
+        "manifest": render_manifest(desired),
+    }
+
+    if module.check_mode:
+        module.exit_json(**result)
+
+    if to_apply:
+        rc, out, err = module.run_command(
+            [kubectl, "apply", "--server-side", "--force-conflicts",
+             "--field-manager", params["field_manager"], "-f", "-"],
+            data=render_manifest(to_apply), environ_update=env)
+        if rc != 0:
+            module.fail_json(msg="kubectl apply --server-side failed", rc=rc, stderr=err,
+                             **result)
+        result["apply_stdout"] = out
+    if to_delete:
+        rc, out, err = module.run_command(
+            [kubectl, "delete", RESOURCES["BGPPeer"]] + [name for _, name in to_delete],
+            environ_update=env)
+        if rc != 0:
+            module.fail_json(msg="kubectl delete failed", rc=rc, stderr=err, **result)
+    module.exit_json(**result)
+
+
+if __name__ == "__main__":
+    main()
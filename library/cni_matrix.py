@@ -0,0 +1,365 @@
+#!/usr/bin/python
+"""CNI connectivity matrix
+
+Ansible module used by the kuber_cni_test role. Given one probe pod per node
+(selected by label), it runs the full N x N pod-to-pod reachability and
+latency matrix plus service and DNS checks from inside the probes:
+
+  - one ``kubectl get pods -o json`` call finds the probes, their IPs and nodes
+  - every probe gets a generated busybox ``sh`` script that starts all of its
+    checks as background jobs and prints one result line per target
+  - the ``kubectl exec`` of every probe runs concurrently (bounded by
+    ``parallelism``), so the wall time is roughly one probe's slowest check
+    instead of the sum of N^2 sequential ``kubectl exec`` calls
+
+Results are merged into one JSON result: a compact per-node matrix, the
+failed pairs and latency percentiles for pod, service and DNS checks.
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DOCUMENTATION = r"""
+---
+module: cni_matrix
+short_description: Run a concurrent pod/service/DNS connectivity matrix
+description:
+  - Lists probe pods with one C(kubectl get pods -l <selector> -o json) call.
+  - Runs every check of a probe concurrently inside it and all probes
+    concurrently with C(kubectl exec), then aggregates the results.
+  - Probe images need a busybox-compatible C(sh), C(wget), C(nslookup) and
+    C(date +%s%N) (e.g. nginx:alpine).
+options:
+  namespace:
+    description: Namespace of the probe pods.
+    type: str
+    required: true
+  selector:
+    description: Label selector of the probe pods (one per node).
+    type: str
+    default: app=test-pod
+  port:
+    description: HTTP port every probe pod serves.
+    type: int
+    default: 80
+  services:
+    description: Extra HTTP targets checked from every probe (C(name), C(url)).
+    type: list
+    elements: dict
+    default: []
+  dns_names:
+    description: Names resolved with nslookup from every probe.
+    type: list
+    elements: str
+    default: []
+  samples:
+    description: Requests per target (latency percentiles use every success).
+    type: int
+    default: 3
+  request_timeout:
+    description: Seconds per request (wget -T).
+    type: int
+    default: 5
+  parallelism:
+    description: Maximum concurrent kubectl exec processes.
+    type: int
+    default: 16
+  kubeconfig:
+    description: Kubeconfig used by kubectl.
+    type: path
+    default: /etc/kubernetes/admin.conf
+  kubectl:
+    description: kubectl binary.
+    type: str
+    default: kubectl
+"""
+
+EXAMPLES = r"""
+- name: Run connectivity matrix
+  cni_matrix:
+    namespace: cni-test
+    selector: app=test-pod
+    services:
+      - {name: clusterip, url: "http://203.0.113.20:8080/"}
+    dns_names:
+      - kubernetes.default.svc.cluster.local
+  register: cni_matrix_result
+"""
+
+RETURN = r"""
+probes:
+  description: Probe pods (name, node, ip, ready).
+  type: list
+  returned: always
+matrix:
+  description: "{source node: {target node: {ok, sent, p50_ms}}} for pod-to-pod checks."
+  type: dict
+  returned: always
+matrix_lines:
+  description: One compact line per source node (target=p50 ms or FAIL).
+  type: list
+  returned: always
+failures:
+  description: Failed checks as "source -> target (kind)".
+  type: list
+  returned: always
+latency_ms:
+  description: count/p50/p90/p99/max per kind (pod, service, dns).
+  type: dict
+  returned: always
+summary:
+  description: Pair counts and failures per kind.
+  type: dict
+  returned: always
+"""
+
+KINDS = ("pod", "service", "dns")
+
+
+def _condition(obj, cond_type):
+    for cond in obj.get("status", {}).get("conditions") or []:
+        if cond.get("type") == cond_type:
+            return cond.get("status") == "True"
+    return False
+
+
+def probe_pods(items):
+    """Return probe facts (name, node, ip, ready) sorted by node."""
+    probes = []
+    for pod in items or []:
+        if pod.get("kind", "Pod") != "Pod":
+            continue
+        probes.append({
+            "name": pod.get("metadata", {}).get("name"),
+            "node": pod.get("spec", {}).get("nodeName") or "",
+            "ip": pod.get("status", {}).get("podIP") or "",
+            "ready": _condition(pod, "Ready"),
+        })
+    return sorted(probes, key=lambda p: (p["node"], p["name"]))
+
+
+def _quote(value):
+    return "'" + str(value).replace("'", "'\"'\"'") + "'"
+
+
+def probe_targets(probes, port, services=None, dns_names=None):
+    """Build the (kind, name, command) checks every probe runs."""
+    targets = [
+        ("pod", p["node"], "wget -q -O /dev/null -T {{timeout}} http://{}:{}/".format(p["ip"], port))
+        for p in probes if p["ip"]
+    ]
+    targets += [
+        ("service", s["name"], "wget -q -O /dev/null -T {{timeout}} {}".format(_quote(s["url"])))
+        for s in services or []
+    ]
+    targets += [("dns", name, "nslookup {}".format(_quote(name))) for name in dns_names or []]
+    return targets
+
+
+def probe_script(targets, samples=3, timeout=5):
+    """Return the sh script a probe runs: every target as a background job.
+
+    Each job prints ``R <kind> <name> <ok> <us> <us> ...`` (microseconds of
+    every successful sample); the script waits for all jobs.
+    """
+    lines = [
+        "probe() {",
+        "  kind=$1; name=$2; shift 2",
+        "  ok=0; times=''; i=0",
+        "  while [ $i -lt {} ]; do".format(int(samples)),
+        "    t0=$(date +%s%N)",
+        "    if sh -c \"$*\" >/dev/null 2>&1; then",
+        "      t1=$(date +%s%N); ok=$((ok + 1)); times=\"$times $(( (t1 - t0) / 1000 ))\"",
+        "    fi",
+        "    i=$((i + 1))",
+        "  done",
+        "  echo \"R $kind $name $ok$times\"",
+        "}",
+    ]
+    for kind, name, command in targets:
+        lines.append("probe {} {} {} &".format(
+            kind, _quote(name), _quote(command.replace("{timeout}", str(int(timeout))))))
+    lines.append("wait")
+    return "\n".join(lines) + "\n"
+
+
+def parse_probe_output(text):
+    """Parse ``R kind name ok us...`` lines into {(kind, name): (ok, [ms, ...])}."""
+    results = {}
+    for line in (text or "").splitlines():
+        fields = line.split()
+        if len(fields) < 4 or fields[0] != "R" or fields[1] not in KINDS:
+            continue
+        try:
+            ok = int(fields[3])
+            times = [int(us) / 1000.0 for us in fields[4:]]
+        except ValueError:
+            continue
+        results[(fields[1], fields[2])] = (ok, times)
+    return results
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(-(-pct * len(ordered) // 100)), 1)
+    return round(ordered[min(rank, len(ordered)) - 1], 3)
+
+
+def _latency(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": round(max(values), 3) if values else None,
+    }
+
+
+def build_matrix(probes, outputs, targets, samples=3):
+    """Aggregate per-probe outputs into the matrix, failures and percentiles.
+
+    Args:
+        probes: probe_pods() result
+        outputs: {probe name: (rc, stdout, stderr)}
+        targets: probe_targets() result (what every probe was asked to check)
+        samples: requests per target
+
+    Returns:
+        dict (see RETURN)
+    """
+    matrix, services, dns = {}, {}, {}
+    failures, errors = [], []
+    latencies = {kind: [] for kind in KINDS}
+    counts = {kind: {"checks": 0, "failed": 0} for kind in KINDS}
+    same_node = {"checks": 0, "failed": 0}
+
+    for probe in probes:
+        src = probe["node"]
+        rc, out, err = outputs.get(probe["name"], (1, "", "not run"))
+        parsed = parse_probe_output(out)
+        if rc != 0 and not parsed:
+            errors.append("{}: {}".format(probe["name"], (err or "exec failed").strip()))
+        per_kind = {"pod": matrix.setdefault(src, {}),
+                    "service": services.setdefault(src, {}),
+                    "dns": dns.setdefault(src, {})}
+        for kind, name, _ in targets:
+            ok, times = parsed.get((kind, name), (0, []))
+            per_kind[kind][name] = {
+                "ok": ok == samples,
+                "sent": samples,
+                "received": ok,
+                "p50_ms": percentile(times, 50),
+            }
+            latencies[kind].extend(times)
+            counts[kind]["checks"] += 1
+            passed = ok == samples
+            if not passed:
+                counts[kind]["failed"] += 1
+                failures.append("{} -> {} ({})".format(src, name, kind))
+            if kind == "pod" and name == src:
+                same_node["checks"] += 1
+                same_node["failed"] += 0 if passed else 1
+
+    matrix_lines = [
+        "{}: {}".format(src, " ".join(
+            "{}={}".format(dst, "{}ms".format(cell["p50_ms"]) if cell["ok"]
+                           else "FAIL({}/{})".format(cell["received"], cell["sent"]))
+            for dst, cell in sorted(row.items())))
+        for src, row in sorted(matrix.items())
+    ]
+    return {
+        "probes": probes,
+        "matrix": matrix,
+        "matrix_lines": matrix_lines,
+        "services": services,
+        "dns": dns,
+        "failures": failures,
+        "errors": errors,
+        "latency_ms": {kind: _latency(values) for kind, values in latencies.items()},
+        "summary": {
+            "probes": len(probes),
+            "pod_pairs": counts["pod"]["checks"],
+            "pod_failed": counts["pod"]["failed"],
+            "same_node_failed": same_node["failed"],
+            "cross_node_failed": counts["pod"]["failed"] - same_node["failed"],
+            "service_failed": counts["service"]["failed"],
+            "dns_failed": counts["dns"]["failed"],
+            "ok": not failures and not errors and bool(probes),
+        },
+    }
+
+
+def run_probes(run, probes, script, exec_argv, parallelism=16):
+    """Run the probe script in every probe pod concurrently.
+
+    Args:
+        run: callable(argv, data) -> (rc, stdout, stderr)
+        exec_argv: callable(pod name) -> kubectl exec argv (script on stdin)
+        parallelism: maximum concurrent execs
+
+    Returns:
+        {probe name: (rc, stdout, stderr)}
+    """
+    names = [p["name"] for p in probes]
+    if not names:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(names)))) as pool:
+        results = pool.map(lambda name: run(exec_argv(name), script), names)
+        return dict(zip(names, results))
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            namespace=dict(type="str", required=True),
+            selector=dict(type="str", default="app=test-pod"),
+            port=dict(type="int", default=80),
+            services=dict(type="list", elements="dict", default=[]),
+            dns_names=dict(type="list", elements="str", default=[]),
+            samples=dict(type="int", default=3),
+            request_timeout=dict(type="int", default=5),
+            parallelism=dict(type="int", default=16),
+            kubeconfig=dict(type="path", default="/etc/kubernetes/admin.conf"),
+            kubectl=dict(type="str", default="kubectl"),
+        ),
+        supports_check_mode=False,
+    )
+    params = module.params
+    env = {"KUBECONFIG": params["kubeconfig"]}
+    kubectl, namespace = params["kubectl"], params["namespace"]
+
+    rc, out, err = module.run_command(
+        [kubectl, "get", "pods", "-n", namespace, "-l", params["selector"], "-o", "json"],
+        environ_update=env)
+    if rc != 0:
+        module.fail_json(msg="kubectl get pods failed", rc=rc, stderr=err)
+    probes = probe_pods(json.loads(out).get("items", []))
+    ready = [p for p in probes if p["ready"] and p["ip"]]
+
+    targets = probe_targets(ready, params["port"], params["services"], params["dns_names"])
+    script = probe_script(targets, params["samples"], params["request_timeout"])
+
+    def run(argv, data):
+        return module.run_command(argv, data=data, binary_data=True, environ_update=env)
+
+    def exec_argv(name):
+        return [kubectl, "exec", "-i", "-n", namespace, name, "--", "sh", "-s"]
+
+    started = time.monotonic()
+    outputs = run_probes(run, ready, script, exec_argv, params["parallelism"])
+    result = build_matrix(ready, outputs, targets, params["samples"])
+    result["not_ready"] = [p["name"] for p in probes if p not in ready]
+    result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    module.exit_json(changed=False, **result)
+
+
+if __name__ == "__main__":
+    main()
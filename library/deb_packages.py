@@ -0,0 +1,574 @@
+#!/usr/bin/python
+"""Debian package state and upgrade planning
+
+Ansible module used by the upgrade_deb role. Reads ``/var/lib/dpkg/status``,
+``/var/lib/apt/extended_states`` and the downloaded apt ``*_Packages`` lists
+once into an indexed package map, then computes in memory:
+
+  - the upgrade set: installed packages with a newer candidate version
+  - the hold set: upgradable packages held by dpkg selections or ``hold``
+  - the autoremove set: automatically installed packages no longer reachable
+    from a manually installed, essential or protected package and not matching
+    ``APT::NeverAutoRemove`` from ``apt-config dump`` (the kernels kept by
+    ``apt.conf.d/01autoremove-kernels`` included)
+
+With ``apply`` the upgrades run as one safe ``apt-get upgrade --with-new-pkgs
+--no-remove`` transaction limited to the planned names, which aborts rather
+than remove anything. Removals are opt-in and left to ``apt-get autoremove``;
+otherwise the module only reports the plan, which is fast enough to run across
+the whole fleet at once.
+
+Candidates follow apt's default priorities (500 for normal suites, 100 for
+backports-style ``NotAutomatic``/``ButAutomaticUpgrades`` suites, 1 for
+experimental-style ones, 100 for the installed version). Pins from
+/etc/apt/preferences are not evaluated; apt-get still resolves the final
+transaction.
+"""
+
+import glob
+import gzip
+import os
+import re
+import time
+
+DOCUMENTATION = r"""
+---
+module: deb_packages
+short_description: Plan and apply Debian upgrades from one read of the dpkg/apt state
+description:
+  - Parses the dpkg status database, apt extended states and apt lists once and
+    returns the upgrade, hold and autoremove sets.
+  - With C(apply), runs all upgrades as a single safe apt-get upgrade that never
+    removes packages, then C(apt-get autoremove) when C(autoremove) is set.
+options:
+  update_cache:
+    description: Run C(apt-get update) first (skipped when the lists are newer
+      than C(cache_valid_time)).
+    type: bool
+    default: false
+  cache_valid_time:
+    description: Seconds the apt lists are considered fresh.
+    type: int
+    default: 0
+  apply:
+    description: Execute the plan. In check mode or when false only the plan is returned.
+    type: bool
+    default: false
+  autoremove:
+    description: Include the autoremove set in the plan and run C(apt-get
+      autoremove) after the upgrade.
+    type: bool
+    default: false
+  hold:
+    description: Extra package names to hold back (in addition to dpkg holds).
+    type: list
+    elements: str
+    default: []
+  never_autoremove:
+    description: Regular expressions of package names never autoremoved, in
+      addition to C(APT::NeverAutoRemove) (the running kernel is always kept).
+    type: list
+    elements: str
+    default: []
+  root:
+    description: Filesystem root holding var/lib/dpkg and var/lib/apt.
+    type: path
+    default: /
+"""
+
+EXAMPLES = r"""
+- name: Plan Debian upgrades
+  deb_packages:
+    update_cache: true
+    cache_valid_time: 3600
+  register: deb_plan
+
+- name: Upgrade, then autoremove
+  deb_packages:
+    apply: true
+    autoremove: true
+    hold: [containerd.io]
+  register: deb_upgrade
+"""
+
+RETURN = r"""
+upgrades:
+  description: Packages to upgrade (name, arch, installed, candidate).
+  type: list
+  returned: always
+held:
+  description: Upgradable packages held back (name, arch, installed, candidate, reason).
+  type: list
+  returned: always
+autoremove:
+  description: Names of automatically installed packages nothing depends on.
+  type: list
+  returned: always
+summary:
+  description: Counts of installed, upgradable, held and autoremovable packages.
+  type: dict
+  returned: always
+transaction:
+  description: The apt-get upgrade argv (null when nothing is upgradable).
+  type: list
+  returned: always
+autoremove_command:
+  description: The apt-get autoremove argv (null unless autoremove found packages).
+  type: list
+  returned: always
+packages_upgraded_count:
+  description: Number of upgraded packages (0 unless the transaction ran).
+  type: int
+  returned: always
+"""
+
+DEPENDENCY_FIELDS = ("Pre-Depends", "Depends", "Recommends", "Suggests")
+DPKG_OPTIONS = ("--force-confdef", "--force-confold")
+
+_DEP_NAME_RE = re.compile(r"^\s*([^\s(:\[]+)")
+_NEVER_AUTOREMOVE_RE = re.compile(r'^APT::NeverAutoRemove::\s+"(.*)";$')
+
+
+# ---------------------------------------------------------------------------
+# Versions
+# ---------------------------------------------------------------------------
+
+
+def _order(char):
+    if char.isdigit():
+        return 0
+    if char.isalpha():
+        return ord(char)
+    if char == "~":
+        return -1
+    return ord(char) + 256
+
+
+def _verrevcmp(a, b):
+    """dpkg's comparison of an upstream version or revision string."""
+    i = j = 0
+    while i < len(a) or j < len(b):
+        first_diff = 0
+        while (i < len(a) and not a[i].isdigit()) or (j < len(b) and not b[j].isdigit()):
+            ac = _order(a[i]) if i < len(a) else 0
+            bc = _order(b[j]) if j < len(b) else 0
+            if ac != bc:
+                return ac - bc
+            i += 1
+            j += 1
+        while i < len(a) and a[i] == "0":
+            i += 1
+        while j < len(b) and b[j] == "0":
+            j += 1
+        while i < len(a) and a[i].isdigit() and j < len(b) and b[j].isdigit():
+            if not first_diff:
+                first_diff = ord(a[i]) - ord(b[j])
+            i += 1
+            j += 1
+        if i < len(a) and a[i].isdigit():
+            return 1
+        if j < len(b) and b[j].isdigit():
+            return -1
+        if first_diff:
+            return first_diff
+    return 0
+
+
+def _split_version(version):
+    epoch, _, rest = version.partition(":") if ":" in version else ("0", "", version)
+    upstream, _, revision = rest.rpartition("-") if "-" in rest else (rest, "", "")
+    return int(epoch or 0), upstream, revision
+
+
+def compare_versions(a, b):
+    """Compare two Debian versions; negative, zero or positive like dpkg."""
+    ea, ua, ra = _split_version(a)
+    eb, ub, rb = _split_version(b)
+    if ea != eb:
+        return ea - eb
+    return _verrevcmp(ua, ub) or _verrevcmp(ra, rb)
+
+
+# ---------------------------------------------------------------------------
+# Parsers
+# ---------------------------------------------------------------------------
+
+
+def parse_paragraphs(lines, fields=None):
+    """Yield deb822 paragraphs as dicts, keeping only ``fields`` when given."""
+    para, last = {}, None
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            if para:
+                yield para
+            para, last = {}, None
+            continue
+        if line[0] in " \t":
+            if last is not None:
+                para[last] += "\n" + line.strip()
+            continue
+        key, _, value = line.partition(":")
+        if fields is None or key in fields:
+            para[key], last = value.strip(), key
+        else:
+            last = None
+    if para:
+        yield para
+
+
+def parse_dependencies(value):
+    """Return alternative groups of package names from a Depends-style field."""
+    groups = []
+    for clause in (value or "").split(","):
+        names = []
+        for alternative in clause.split("|"):
+            match = _DEP_NAME_RE.match(alternative)
+            if match:
+                names.append(match.group(1))
+        if names:
+            groups.append(names)
+    return groups
+
+
+_STATUS_FIELDS = {"Package", "Architecture", "Version", "Status", "Essential", "Protected",
+                  "Provides"} | set(DEPENDENCY_FIELDS)
+
+
+def parse_status(lines):
+    """Index installed packages of the dpkg status file by (name, arch)."""
+    installed = {}
+    for para in parse_paragraphs(lines, _STATUS_FIELDS):
+        want, _, state = (para.get("Status", "").split() + ["", "", ""])[:3]
+        if state not in ("installed", "half-configured", "unpacked", "triggers-awaited",
+                         "triggers-pending"):
+            continue
+        key = (para.get("Package"), para.get("Architecture", "all"))
+        installed[key] = {
+            "name": key[0],
+            "arch": key[1],
+            "version": para.get("Version", ""),
+            "state": state,
+            "hold": want == "hold",
+            "essential": para.get("Essential") == "yes" or para.get("Protected") == "yes",
+            "provides": [g[0] for g in parse_dependencies(para.get("Provides"))],
+            "depends": [group for field in DEPENDENCY_FIELDS
+                        for group in parse_dependencies(para.get(field))],
+        }
+    return installed
+
+
+def parse_extended_states(lines):
+    """Return the set of (name, arch) marked Auto-Installed."""
+    auto = set()
+    for para in parse_paragraphs(lines, {"Package", "Architecture", "Auto-Installed"}):
+        if para.get("Auto-Installed") == "1":
+            auto.add((para.get("Package"), para.get("Architecture", "all")))
+    return auto
+
+
+def parse_release_flags(lines):
+    """Return (not_automatic, but_automatic_upgrades) from an (In)Release file."""
+    flags, lines = {}, iter(lines)
+    for line in lines:
+        if line.startswith("-----BEGIN PGP SIGNED MESSAGE"):
+            # Skip the armor headers (Hash: ...) up to the blank line.
+            for header in lines:
+                if not header.strip():
+                    break
+            continue
+        if not line.strip() or line.startswith(" "):
+            break
+        key, _, value = line.partition(":")
+        flags[key.strip()] = value.strip().lower()
+    return flags.get("NotAutomatic") == "yes", flags.get("ButAutomaticUpgrades") == "yes"
+
+
+def parse_never_autoremove(lines):
+    """Return the APT::NeverAutoRemove patterns from ``apt-config dump`` output."""
+    patterns = []
+    for line in lines:
+        match = _NEVER_AUTOREMOVE_RE.match(line.strip())
+        if match and match.group(1):
+            patterns.append(match.group(1))
+    return patterns
+
+
+def _open_list(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def _release_for(path):
+    """Find the (In)Release file of the suite a *_Packages list belongs to."""
+    base = os.path.basename(path)
+    marker = base.find("_dists_")
+    if marker == -1:
+        return None
+    suite = base[marker + len("_dists_"):].split("_", 1)[0]
+    prefix = os.path.join(os.path.dirname(path), base[:marker] + "_dists_" + suite)
+    for name in ("_InRelease", "_Release"):
+        if os.path.exists(prefix + name):
+            return prefix + name
+    return None
+
+
+def suite_priority(release_lines):
+    """Default apt pin priority of a suite from its (In)Release header."""
+    not_automatic, but_upgrades = parse_release_flags(release_lines)
+    if not not_automatic:
+        return 500
+    return 100 if but_upgrades else 1
+
+
+def candidate_version(versions, installed_version=None):
+    """Pick the apt candidate from {version: priority}.
+
+    The installed version has at least priority 100; the highest priority wins,
+    then the highest version, and a priority below 1000 never downgrades.
+    """
+    versions = dict(versions)
+    if installed_version:
+        versions[installed_version] = max(versions.get(installed_version, 0), 100)
+    best = None
+    for version, priority in versions.items():
+        if best is None or priority > best[1] or (
+                priority == best[1] and compare_versions(version, best[0]) > 0):
+            best = (version, priority)
+    if best and installed_version and compare_versions(best[0], installed_version) < 0:
+        return installed_version
+    return best[0] if best else None
+
+
+def load_candidates(lists_dir, installed=None):
+    """Return {(name, arch): candidate version} from the apt lists.
+
+    Suites get apt's default priorities: 500, or 100 for NotAutomatic suites
+    with ButAutomaticUpgrades (backports) and 1 for other NotAutomatic suites
+    (experimental), so backports only upgrade packages installed from them.
+    """
+    installed = installed or {}
+    available = {}
+    paths = sorted(glob.glob(os.path.join(lists_dir, "*_Packages"))
+                   + glob.glob(os.path.join(lists_dir, "*_Packages.gz")))
+    for path in paths:
+        priority = 500
+        release = _release_for(path)
+        if release:
+            with open(release, encoding="utf-8", errors="replace") as fh:
+                priority = suite_priority(fh)
+        with _open_list(path) as fh:
+            for para in parse_paragraphs(fh, {"Package", "Architecture", "Version"}):
+                key = (para.get("Package"), para.get("Architecture", "all"))
+                versions = available.setdefault(key, {})
+                version = para.get("Version", "")
+                versions[version] = max(versions.get(version, 0), priority)
+    return {
+        key: candidate_version(versions, installed.get(key, {}).get("version"))
+        for key, versions in available.items()
+    }
+
+
+# ---------------------------------------------------------------------------
+# Planning
+# ---------------------------------------------------------------------------
+
+
+def reachable(installed, auto, keep_patterns=()):
+    """Return (name, arch) of every installed package kept by a root package."""
+    by_name, providers = {}, {}
+    for key, pkg in installed.items():
+        by_name.setdefault(pkg["name"], []).append(key)
+        for virtual in pkg["provides"]:
+            providers.setdefault(virtual, []).append(key)
+    patterns = [re.compile(p) for p in keep_patterns]
+    roots = [key for key, pkg in installed.items()
+             if key not in auto or pkg["essential"] or pkg["hold"]
+             or any(p.search(pkg["name"]) for p in patterns)]
+
+    kept, stack = set(roots), list(roots)
+    while stack:
+        pkg = installed[stack.pop()]
+        for group in pkg["depends"]:
+            for name in group:
+                # Keep every installed alternative and provider (conservative).
+                for target in by_name.get(name, []) + providers.get(name, []):
+                    if target not in kept:
+                        kept.add(target)
+                        stack.append(target)
+    return kept
+
+
+def plan_changes(installed, candidates, auto=None, hold=(), never_autoremove=(),
+                 autoremove=False):
+    """Compute the upgrade, hold and autoremove sets.
+
+    Args:
+        installed: parse_status() result
+        candidates: load_candidates() result
+        auto: parse_extended_states() result
+        hold: extra package names to hold back
+        never_autoremove: regular expressions of names that are never removed
+
+    Returns:
+        dict with upgrades, held, autoremove and summary
+    """
+    auto = auto or set()
+    extra_hold = set(hold or [])
+    upgrades, held = [], []
+    for key in sorted(installed):
+        pkg = installed[key]
+        candidate = candidates.get(key)
+        if candidate is None or compare_versions(candidate, pkg["version"]) <= 0:
+            continue
+        entry = {"name": pkg["name"], "arch": pkg["arch"],
+                 "installed": pkg["version"], "candidate": candidate}
+        if pkg["hold"] or pkg["name"] in extra_hold:
+            held.append(dict(entry, reason="dpkg hold" if pkg["hold"] else "hold option"))
+        else:
+            upgrades.append(entry)
+
+    removable = []
+    if autoremove:
+        kept = reachable(installed, auto, never_autoremove)
+        removable = sorted({installed[key]["name"] for key in installed if key not in kept})
+
+    return {
+        "upgrades": upgrades,
+        "held": held,
+        "autoremove": removable,
+        "summary": {
+            "installed": len(installed),
+            "upgradable": len(upgrades) + len(held),
+            "upgrades": len(upgrades),
+            "held": len(held),
+            "autoremove": len(removable),
+        },
+    }
+
+
+def _dpkg_argv(dpkg_options):
+    argv = []
+    for option in dpkg_options:
+        argv += ["-o", "Dpkg::Options::={}".format(option)]
+    return argv
+
+
+def transaction_argv(plan, dpkg_options=DPKG_OPTIONS):
+    """Return the single apt-get upgrade applying the plan (None when empty).
+
+    ``--no-remove`` makes apt-get abort instead of removing a package to
+    resolve a conflict, so the upgrade stays as safe as ``apt-get upgrade``.
+    """
+    names = sorted({u["name"] for u in plan["upgrades"]})
+    if not names:
+        return None
+    argv = ["apt-get", "upgrade", "-y", "--with-new-pkgs", "--no-remove"]
+    return argv + _dpkg_argv(dpkg_options) + names
+
+
+def autoremove_argv(plan, dpkg_options=DPKG_OPTIONS):
+    """Return the apt-get autoremove call for a non-empty autoremove set."""
+    if not plan["autoremove"]:
+        return None
+    return ["apt-get", "autoremove", "-y"] + _dpkg_argv(dpkg_options)
+
+
+def build_state(root="/", hold=(), never_autoremove=(), autoremove=False):
+    """Read the dpkg/apt state under root once and return the plan."""
+    with open(os.path.join(root, "var/lib/dpkg/status"), encoding="utf-8",
+              errors="replace") as fh:
+        installed = parse_status(fh)
+    auto = set()
+    extended = os.path.join(root, "var/lib/apt/extended_states")
+    if os.path.exists(extended):
+        with open(extended, encoding="utf-8", errors="replace") as fh:
+            auto = parse_extended_states(fh)
+    candidates = load_candidates(os.path.join(root, "var/lib/apt/lists"), installed)
+    plan = plan_changes(installed, candidates, auto, hold, never_autoremove, autoremove)
+    plan["auto_upgraded"] = sorted({u["name"] for u in plan["upgrades"]
+                                    if (u["name"], u["arch"]) in auto})
+    return plan
+
+
+def lists_age(lists_dir, now):
+    """Seconds since the newest apt list was written (None without lists)."""
+    mtimes = [os.path.getmtime(p) for p in glob.glob(os.path.join(lists_dir, "*_Packages*"))]
+    return now - max(mtimes) if mtimes else None
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            update_cache=dict(type="bool", default=False),
+            cache_valid_time=dict(type="int", default=0),
+            apply=dict(type="bool", default=False),
+            autoremove=dict(type="bool", default=False),
+            hold=dict(type="list", elements="str", default=[]),
+            never_autoremove=dict(type="list", elements="str", default=[]),
+            root=dict(type="path", default="/"),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    env = {"DEBIAN_FRONTEND": "noninteractive"}
+    lists_dir = os.path.join(params["root"], "var/lib/apt/lists")
+
+    cache_updated = False
+    if params["update_cache"]:
+        age = lists_age(lists_dir, time.time())
+        if age is None or age > params["cache_valid_time"]:
+            rc, _, err = module.run_command(["apt-get", "update", "-q"], environ_update=env)
+            if rc != 0:
+                module.fail_json(msg="apt-get update failed", rc=rc, stderr=err)
+            cache_updated = True
+
+    # Keep what apt itself keeps (APT::NeverAutoRemove, including the kernels
+    # listed by 01autoremove-kernels); the running kernel is always kept.
+    release = os.uname().release
+    keep = list(params["never_autoremove"]) + [r"-{}$".format(re.escape(release))]
+    if params["autoremove"]:
+        rc, out, err = module.run_command(["apt-config", "dump"])
+        if rc != 0:
+            module.fail_json(msg="apt-config dump failed", rc=rc, stderr=err)
+        keep += parse_never_autoremove(out.splitlines())
+    try:
+        plan = build_state(params["root"], params["hold"], keep, params["autoremove"])
+    except OSError as exc:
+        module.fail_json(msg="Cannot read dpkg/apt state: {}".format(exc))
+
+    result = dict(plan, cache_updated=cache_updated, packages_upgraded_count=0,
+                  transaction=transaction_argv(plan), autoremove_command=autoremove_argv(plan))
+    if not params["apply"] or module.check_mode or (
+            result["transaction"] is None and result["autoremove_command"] is None):
+        module.exit_json(changed=cache_updated, **result)
+
+    stdout = []
+    if result["transaction"]:
+        rc, out, err = module.run_command(result["transaction"], environ_update=env)
+        if rc != 0:
+            module.fail_json(msg="apt-get transaction failed", rc=rc, stdout=out, stderr=err,
+                             **result)
+        if plan["auto_upgraded"]:
+            # Named packages can end up marked manual; restore their auto flag.
+            module.run_command(["apt-mark", "auto"] + plan["auto_upgraded"],
+                               environ_update=env)
+        result["packages_upgraded_count"] = len(plan["upgrades"])
+        stdout.append(out)
+    if result["autoremove_command"]:
+        rc, out, err = module.run_command(result["autoremove_command"], environ_update=env)
+        if rc != 0:
+            module.fail_json(msg="apt-get autoremove failed", rc=rc, stdout=out, stderr=err,
+                             **result)
+        stdout.append(out)
+    result["stdout"] = "".join(stdout)
+    module.exit_json(changed=True, **result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/python
+"""Single-pass folder state checker
+
+Ansible module that stats and classifies every path in a folders list in one
+invocation, replacing the per-item ``stat`` / ``command`` loops in
+``common/tasks/check_folders_*.yaml``.
+
+Each entry is classified as one of:
+  - missing            path does not exist
+  - exists             path exists (and ownership matches, if requested)
+  - mounted            path exists and is an active mount point
+  - ownership_mismatch path exists but owner/group differ from the entry
+
+/proc/mounts and /etc/fstab are read once per invocation, so NFS entries
+(``server`` + ``path`` keys) also report whether they are mounted and whether
+they are present in fstab.
+"""
+
+import grp
+import os
+import pwd
+
+DOCUMENTATION = r"""
+---
+module: folder_state
+short_description: Stat and classify a list of folders in one pass
+description:
+  - Stats every entry of C(folders) and classifies it as missing, exists,
+    mounted or ownership_mismatch.
+  - Reads /proc/mounts and /etc/fstab once for all entries.
+options:
+  folders:
+    description: List of dicts (e.g. C(nfs_exports) or C(nfs_mounts)).
+    type: list
+    elements: dict
+    required: true
+  path_key:
+    description: Key in each entry holding the local path to check.
+    type: str
+    default: path
+  check_ownership:
+    description:
+      - Compare C(owner)/C(group) keys of each entry with the path.
+      - Entries with C(skip_create) are pre-existing paths the role does not
+        manage and are never ownership-checked.
+    type: bool
+    default: false
+  mounts_file:
+    description: Mount table to read.
+    type: path
+    default: /proc/mounts
+  fstab_file:
+    description: fstab to read for NFS C(server):C(path) entries.
+    type: path
+    default: /etc/fstab
+"""
+
+EXAMPLES = r"""
+- name: Classify NFS mount points
+  folder_state:
+    folders: "{{ nfs_mounts }}"
+    path_key: mount_point
+  register: folder_state_result
+
+- name: Fail if any mount point already exists
+  ansible.builtin.fail:
+    msg: "Already exist: {{ folder_state_result.summary.present | join(', ') }}"
+  when: folder_state_result.summary.present | length > 0
+"""
+
+RETURN = r"""
+folders:
+  description: Per-entry results, in input order.
+  type: list
+  returned: always
+summary:
+  description: Paths grouped by state plus C(present) (every existing path)
+    and C(in_fstab) (C(server):C(path) sources found in fstab).
+  type: dict
+  returned: always
+"""
+
+STATES = ("missing", "exists", "mounted", "ownership_mismatch")
+
+
+def _unescape_mount_field(field):
+    """Decode the octal escapes (\\040 etc.) used in /proc/mounts and fstab."""
+    if "\\" not in field:
+        return field
+    out = []
+    i = 0
+    while i < len(field):
+        octal = field[i + 1:i + 4]
+        if field[i] == "\\" and len(octal) == 3 and all(c in "01234567" for c in octal):
+            out.append(chr(int(octal, 8)))
+            i += 4
+        else:
+            out.append(field[i])
+            i += 1
+    return "".join(out)
+
+
+def _normalize(path):
+    """Strip trailing slashes so '/data/' and '/data' compare equal."""
+    if not path:
+        return path
+    return path.rstrip("/") or "/"
+
+
+def parse_mount_table(text):
+    """Parse /proc/mounts or fstab text into a list of (source, target) tuples.
+
+    Comments and blank lines are skipped.
+    """
+    entries = []
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split()
+        if len(fields) < 2:
+            continue
+        entries.append(
+            (_normalize(_unescape_mount_field(fields[0])),
+             _normalize(_unescape_mount_field(fields[1])))
+        )
+    return entries
+
+
+def _read_text(path):
+    try:
+        with open(path) as fh:
+            return fh.read()
+    except (IOError, OSError):
+        return ""
+
+
+def _owner_name(uid):
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
+
+
+def _group_name(gid):
+    try:
+        return grp.getgrgid(gid).gr_name
+    except KeyError:
+        return str(gid)
+
+
+def _matches(expected, actual_name, actual_id):
+    if expected is None:
+        return True
+    expected = str(expected)
+    return expected == actual_name or expected == str(actual_id)
+
+
+def classify_folders(folders, path_key="path", check_ownership=False,
+                     mounts_text="", fstab_text="", stat_func=os.stat):
+    """Classify every folder entry in a single pass.
+
+    Args:
+        folders: list of dicts (nfs_exports / nfs_mounts style)
+        path_key: key holding the local path ("path" or "mount_point")
+        check_ownership: compare entry owner/group with the filesystem
+            (entries with skip_create are never checked)
+        mounts_text: contents of /proc/mounts
+        fstab_text: contents of /etc/fstab
+        stat_func: os.stat replacement (tests)
+
+    Returns:
+        tuple (results, summary)
+    """
+    mounts = parse_mount_table(mounts_text)
+    mount_targets = {target for _, target in mounts}
+    fstab_sources = {source for source, _ in parse_mount_table(fstab_text)}
+
+    results = []
+    summary = {state: [] for state in STATES}
+    summary.update({"present": [], "in_fstab": []})
+
+    for entry in folders or []:
+        path = entry.get(path_key)
+        item = {"item": entry, "path": path, "source": None}
+
+        try:
+            st = stat_func(path) if path else None
+        except (IOError, OSError):
+            st = None
+
+        norm_path = _normalize(path)
+        remote = None
+        if entry.get("server") and entry.get("path"):
+            remote = "{}:{}".format(entry["server"], _normalize(entry["path"]))
+            item["source"] = remote
+
+        item["exists"] = st is not None
+        item["mounted"] = norm_path in mount_targets
+        item["in_fstab"] = remote in fstab_sources if remote else False
+
+        if st is None:
+            item["state"] = "missing"
+        else:
+            item["owner"] = _owner_name(st.st_uid)
+            item["group"] = _group_name(st.st_gid)
+            owner_ok = _matches(entry.get("owner"), item["owner"], st.st_uid)
+            group_ok = _matches(entry.get("group"), item["group"], st.st_gid)
+            if check_ownership and not entry.get("skip_create") \
+                    and not (owner_ok and group_ok):
+                item["state"] = "ownership_mismatch"
+            elif item["mounted"]:
+                item["state"] = "mounted"
+            else:
+                item["state"] = "exists"
+            summary["present"].append(path)
+
+        summary[item["state"]].append(path)
+        if item["in_fstab"]:
+            summary["in_fstab"].append(remote)
+        results.append(item)
+
+    return results, summary
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            folders=dict(type="list", elements="dict", required=True),
+            path_key=dict(type="str", default="path"),
+            check_ownership=dict(type="bool", default=False),
+            mounts_file=dict(type="path", default="/proc/mounts"),
+            fstab_file=dict(type="path", default="/etc/fstab"),
+        ),
+        supports_check_mode=True,
+    )
+
+    results, summary = classify_folders(
+        module.params["folders"],
+        path_key=module.params["path_key"],
+        check_ownership=module.params["check_ownership"],
+        mounts_text=_read_text(module.params["mounts_file"]),
+        fstab_text=_read_text(module.params["fstab_file"]),
+    )
+
+    module.exit_json(changed=False, folders=results, summary=summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/python
+"""FRR BGP session and route-table snapshot
+
+Ansible module that runs ``vtysh -c 'show bgp summary json' -c 'show ip route
+json'`` once on a BGP router and derives everything the BGP verify tasks
+check, instead of grepping and awk-ing the text output of several vtysh calls:
+
+  - neighbors indexed by address (state, remote AS, uptime, prefixes
+    received/sent) and the Established count
+  - routes indexed by prefix (protocol, selected, installed next hops)
+  - the MetalLB prefixes: every route permitted by the METALLB-POOL
+    prefix-list of /etc/frr/frr.conf (FRR first-match, ge/le semantics),
+    the speakers each one is received from and the expected speakers missing
+
+Session state and prefix counts can be written as node-exporter textfile
+metrics (``textfile_dir``).
+"""
+
+import ipaddress
+import json
+import os
+import re
+
+DOCUMENTATION = r"""
+---
+module: frr_bgp_snapshot
+short_description: Parse FRR BGP summary and route table into indexed facts
+description:
+  - Runs C(vtysh -c 'show bgp summary json' -c 'show ip route json') once.
+  - Evaluates the prefix-list named C(prefix_list) from C(config_file)
+    against the route table and checks which speakers (BGP next hops) every
+    MetalLB prefix is received from.
+  - Installed next hops are the ECMP paths FRR selected (bgp multipath is on
+    by default), which is every speaker announcing the prefix with the same
+    AS path.
+options:
+  vtysh:
+    description: vtysh binary.
+    type: str
+    default: vtysh
+  config_file:
+    description: FRR configuration containing the prefix-list.
+    type: path
+    default: /etc/frr/frr.conf
+  prefix_list:
+    description: Prefix-list that selects MetalLB prefixes.
+    type: str
+    default: METALLB-POOL
+  pool_cidr:
+    description: Fallback pool (treated as C(permit <pool_cidr> le 32)) when
+      the prefix-list is not found in C(config_file).
+    type: str
+    default: ""
+  expected_speakers:
+    description: Neighbor addresses every MetalLB prefix must be received
+      from. Empty (default) accepts any speaker; MetalLB speakers only run
+      on workers and, with externalTrafficPolicy Local, only nodes with
+      endpoints announce a service IP.
+    type: list
+    elements: str
+    default: []
+  expected_neighbors:
+    description: Neighbor addresses that must have a session configured
+      (reported in C(neighbors_missing) together with C(expected_speakers)).
+    type: list
+    elements: str
+    default: []
+  expected_prefixes:
+    description: Prefixes that must be present (e.g. LoadBalancer IPs as /32).
+    type: list
+    elements: str
+    default: []
+  textfile_dir:
+    description: node-exporter textfile directory; metrics are written only
+      when the directory exists.
+    type: path
+    default: ""
+  metrics_file:
+    description: Metrics file name inside C(textfile_dir).
+    type: str
+    default: frr_bgp.prom
+"""
+
+EXAMPLES = r"""
+- name: Collect FRR BGP snapshot
+  frr_bgp_snapshot:
+    expected_neighbors: "{{ bgp_router_neighbors | map(attribute='address') | list }}"
+    textfile_dir: /var/lib/node_exporter/textfile_collector
+  register: frr_bgp
+
+- name: Assert every MetalLB prefix is received from every speaker
+  ansible.builtin.assert:
+    that:
+      - frr_bgp.pool.ok
+"""
+
+RETURN = r"""
+neighbors:
+  description: Per-neighbor facts keyed by address (state, established, remote_as, uptime_ms, prefixes_received, prefixes_sent, description).
+  type: dict
+  returned: always
+established_count:
+  description: Number of Established sessions.
+  type: int
+  returned: always
+routes:
+  description: Selected route per prefix (protocol, installed, nexthops).
+  type: dict
+  returned: always
+pool:
+  description: prefixes (per prefix speakers and missing_speakers), missing_prefixes, expected_speakers, ok.
+  type: dict
+  returned: always
+"""
+
+PREFIX_LIST_RE = re.compile(
+    r"^\s*ip prefix-list\s+(?P<name>\S+)\s+(?:seq\s+(?P<seq>\d+)\s+)?"
+    r"(?P<action>permit|deny)\s+(?P<prefix>\S+)"
+    r"(?:\s+ge\s+(?P<ge>\d+))?(?:\s+le\s+(?P<le>\d+))?\s*$"
+)
+
+
+# ---------------------------------------------------------------------------
+# Parsers
+# ---------------------------------------------------------------------------
+
+
+def split_json_documents(text):
+    """Split the concatenated JSON objects vtysh prints for several -c."""
+    decoder = json.JSONDecoder()
+    docs, index, text = [], 0, text or ""
+    while True:
+        while index < len(text) and text[index].isspace():
+            index += 1
+        if index >= len(text):
+            return docs
+        doc, index = decoder.raw_decode(text, index)
+        docs.append(doc)
+
+
+def parse_bgp_summary(doc):
+    """Index ``show bgp summary json`` neighbors (IPv4 unicast) by address."""
+    doc = doc or {}
+    family = doc.get("ipv4Unicast", doc if "peers" in doc else {})
+    neighbors = {}
+    for address, peer in (family.get("peers") or {}).items():
+        state = peer.get("state", "")
+        neighbors[address] = {
+            "state": state,
+            "established": state == "Established",
+            "remote_as": peer.get("remoteAs"),
+            "uptime_ms": peer.get("peerUptimeMsec", 0),
+            "prefixes_received": peer.get("pfxRcd", peer.get("prefixReceivedCount", 0)) or 0,
+            "prefixes_sent": peer.get("pfxSnt", 0) or 0,
+            "description": peer.get("desc", ""),
+        }
+    return {
+        "router_id": family.get("routerId", ""),
+        "local_as": family.get("as"),
+        "neighbors": neighbors,
+    }
+
+
+def parse_routes(doc):
+    """Index ``show ip route json`` by prefix, keeping the selected entry.
+
+    Only active next hops count (FRR omits "active" for inactive ones).
+    """
+    routes = {}
+    for prefix, entries in (doc or {}).items():
+        if not isinstance(entries, list) or not entries:
+            continue
+        entry = next((e for e in entries if e.get("selected")), entries[0])
+        routes[prefix] = {
+            "protocol": entry.get("protocol", ""),
+            "selected": bool(entry.get("selected")),
+            "installed": bool(entry.get("installed")),
+            "nexthops": sorted({
+                hop["ip"] for hop in entry.get("nexthops") or []
+                if hop.get("ip") and hop.get("active")
+            }),
+        }
+    return routes
+
+
+def parse_prefix_list(text, name):
+    """Return the entries of prefix-list ``name`` from FRR config text, by seq."""
+    entries = []
+    for line in (text or "").splitlines():
+        match = PREFIX_LIST_RE.match(line)
+        if not match or match.group("name") != name:
+            continue
+        try:
+            network = ipaddress.ip_network(match.group("prefix"), strict=False)
+        except ValueError:
+            continue
+        entries.append({
+            "seq": int(match.group("seq") or (len(entries) + 1) * 5),
+            "action": match.group("action"),
+            "prefix": str(network),
+            "ge": int(match.group("ge")) if match.group("ge") else None,
+            "le": int(match.group("le")) if match.group("le") else None,
+        })
+    return sorted(entries, key=lambda e: e["seq"])
+
+
+def prefix_list_permits(entries, prefix):
+    """FRR semantics: first matching entry by seq decides; no match is deny."""
+    network = ipaddress.ip_network(prefix, strict=False)
+    for entry in entries:
+        base = ipaddress.ip_network(entry["prefix"])
+        if base.version != network.version or not network.subnet_of(base):
+            continue
+        low = entry["ge"] or base.prefixlen
+        high = entry["le"] or (network.max_prefixlen if entry["ge"] else base.prefixlen)
+        if low <= network.prefixlen <= high:
+            return entry["action"] == "permit"
+    return False
+
+
+# ---------------------------------------------------------------------------
+# Evaluation
+# ---------------------------------------------------------------------------
+
+
+def check_pool(routes, neighbors, entries, expected_speakers=None, expected_prefixes=None):
+    """Check every BGP route permitted by the prefix-list against the speakers.
+
+    Args:
+        routes: parse_routes() result
+        neighbors: parse_bgp_summary()['neighbors']
+        entries: parse_prefix_list() result
+        expected_speakers: addresses each prefix must come from (default any speaker)
+        expected_prefixes: prefixes that must be present
+
+    Returns:
+        dict (prefixes, missing_prefixes, expected_speakers, ok)
+    """
+    expected = sorted(expected_speakers or [])
+    prefixes = {}
+    for prefix, route in sorted(routes.items()):
+        if route["protocol"] != "bgp" or not prefix_list_permits(entries, prefix):
+            continue
+        prefixes[prefix] = {
+            "speakers": route["nexthops"],
+            "installed": route["installed"],
+            "missing_speakers": [s for s in expected if s not in route["nexthops"]],
+        }
+    wanted = [str(ipaddress.ip_network(p, strict=False)) for p in expected_prefixes or []]
+    missing_prefixes = [p for p in wanted if p not in prefixes]
+    return {
+        "prefixes": prefixes,
+        "count": len(prefixes),
+        "missing_prefixes": missing_prefixes,
+        "expected_speakers": expected,
+        "incomplete": sorted(p for p, info in prefixes.items() if info["missing_speakers"]),
+        "ok": bool(prefixes) and not missing_prefixes
+        and all(not info["missing_speakers"] and info["installed"] for info in prefixes.values()),
+    }
+
+
+def build_frr_snapshot(summary_doc, routes_doc, entries, expected_speakers=None,
+                       expected_prefixes=None, expected_neighbors=None):
+    """Combine the parsed summary, route table and prefix-list check."""
+    summary = parse_bgp_summary(summary_doc)
+    routes = parse_routes(routes_doc)
+    neighbors = summary["neighbors"]
+    return {
+        "router_id": summary["router_id"],
+        "local_as": summary["local_as"],
+        "neighbors": neighbors,
+        "neighbor_count": len(neighbors),
+        "established_count": sum(1 for n in neighbors.values() if n["established"]),
+        "not_established": sorted(a for a, n in neighbors.items() if not n["established"]),
+        "neighbors_missing": sorted(
+            {a for a in list(expected_neighbors or []) + list(expected_speakers or [])
+             if a not in neighbors}),
+        "routes": routes,
+        "prefix_list": entries,
+        "pool": check_pool(routes, neighbors, entries, expected_speakers, expected_prefixes),
+    }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics(snapshot):
+    """Render Prometheus textfile metrics for sessions and MetalLB prefixes."""
+    lines = [
+        "# HELP frr_bgp_neighbor_established Whether the BGP session is Established.",
+        "# TYPE frr_bgp_neighbor_established gauge",
+    ]
+    neighbors = sorted(snapshot["neighbors"].items())
+    for address, info in neighbors:
+        lines.append('frr_bgp_neighbor_established{{neighbor="{}",remote_as="{}"}} {}'.format(
+            _escape(address), _escape(info["remote_as"]), int(info["established"])))
+    lines += [
+        "# HELP frr_bgp_neighbor_prefixes_received Prefixes accepted from the neighbor.",
+        "# TYPE frr_bgp_neighbor_prefixes_received gauge",
+    ]
+    for address, info in neighbors:
+        lines.append('frr_bgp_neighbor_prefixes_received{{neighbor="{}"}} {}'.format(
+            _escape(address), info["prefixes_received"]))
+    lines += [
+        "# HELP frr_bgp_neighbor_prefixes_sent Prefixes advertised to the neighbor.",
+        "# TYPE frr_bgp_neighbor_prefixes_sent gauge",
+    ]
+    for address, info in neighbors:
+        lines.append('frr_bgp_neighbor_prefixes_sent{{neighbor="{}"}} {}'.format(
+            _escape(address), info["prefixes_sent"]))
+    lines += [
+        "# HELP frr_bgp_neighbor_uptime_seconds Time the session has been in its current state.",
+        "# TYPE frr_bgp_neighbor_uptime_seconds gauge",
+    ]
+    for address, info in neighbors:
+        lines.append('frr_bgp_neighbor_uptime_seconds{{neighbor="{}"}} {:.3f}'.format(
+            _escape(address), (info["uptime_ms"] or 0) / 1000.0))
+    pool = snapshot["pool"]
+    lines += [
+        "# HELP frr_bgp_pool_prefix_speakers Speakers a MetalLB prefix is received from.",
+        "# TYPE frr_bgp_pool_prefix_speakers gauge",
+    ]
+    for prefix, info in sorted(pool["prefixes"].items()):
+        lines.append('frr_bgp_pool_prefix_speakers{{prefix="{}"}} {}'.format(
+            _escape(prefix), len(info["speakers"])))
+    lines += [
+        "# HELP frr_bgp_pool_prefixes MetalLB prefixes permitted by the prefix-list in the route table.",
+        "# TYPE frr_bgp_pool_prefixes gauge",
+        "frr_bgp_pool_prefixes {}".format(pool["count"]),
+        "# HELP frr_bgp_pool_ok Whether every MetalLB prefix is received from every expected speaker.",
+        "# TYPE frr_bgp_pool_ok gauge",
+        "frr_bgp_pool_ok {}".format(int(pool["ok"])),
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def write_atomic(path, text, mode=0o644):
+    """Write text to path via a temp file + rename (textfile collector safe)."""
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "w") as fh:
+        fh.write(text)
+    os.chmod(tmp, mode)
+    os.replace(tmp, path)
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            vtysh=dict(type="str", default="vtysh"),
+            config_file=dict(type="path", default="/etc/frr/frr.conf"),
+            prefix_list=dict(type="str", default="METALLB-POOL"),
+            pool_cidr=dict(type="str", default=""),
+            expected_speakers=dict(type="list", elements="str", default=[]),
+            expected_neighbors=dict(type="list", elements="str", default=[]),
+            expected_prefixes=dict(type="list", elements="str", default=[]),
+            textfile_dir=dict(type="path", default=""),
+            metrics_file=dict(type="str", default="frr_bgp.prom"),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+
+    rc, out, err = module.run_command(
+        [params["vtysh"], "-c", "show bgp summary json", "-c", "show ip route json"])
+    if rc != 0:
+        module.fail_json(msg="vtysh failed", rc=rc, stderr=err)
+    try:
+        docs = split_json_documents(out)
+    except ValueError as exc:
+        module.fail_json(msg="cannot parse vtysh JSON output: {}".format(exc), stdout=out[:2000])
+    docs += [{}] * (2 - len(docs))
+
+    config = ""
+    if os.path.exists(params["config_file"]):
+        with open(params["config_file"]) as fh:
+            config = fh.read()
+    entries = parse_prefix_list(config, params["prefix_list"])
+    if not entries and params["pool_cidr"]:
+        entries = parse_prefix_list("ip prefix-list {} seq 10 permit {} le 32".format(
+            params["prefix_list"], params["pool_cidr"]), params["prefix_list"])
+
+    snapshot = build_frr_snapshot(docs[0], docs[1], entries, params["expected_speakers"],
+                                  params["expected_prefixes"], params["expected_neighbors"])
+    metrics_path = ""
+    if params["textfile_dir"] and os.path.isdir(params["textfile_dir"]) and not module.check_mode:
+        metrics_path = os.path.join(params["textfile_dir"], params["metrics_file"])
+        write_atomic(metrics_path, render_metrics(snapshot))
+    module.exit_json(changed=False, metrics_path=metrics_path, **snapshot)
+
+
+if __name__ == "__main__":
+    main()
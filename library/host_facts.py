@@ -0,0 +1,394 @@
+#!/usr/bin/python
+"""Compact host facts
+
+Ansible module that returns only the facts this project's playbooks and
+roles read, instead of the full ``setup`` payload (hardware, mounts,
+devices, virtualization, every interface's features and offloads):
+
+  - distribution / os_family / architecture / kernel
+  - hostname, nodename, fqdn, domain
+  - date_time (same keys as setup) and uptime_seconds
+  - env, user_id/uid/gid/dir/shell
+  - pkg_mgr, service_mgr (package/service action plugins need them)
+  - default_ipv4 and per-interface ipv4/ipv6 (``ansible_facts['wg99']``)
+
+Everything comes from /etc/os-release, /proc, uname and a single
+``ip -json addr show`` call. The module always runs (it is a task, not
+``gather_facts``), so date_time is fresh even when ``gathering = smart``
+serves the rest of the facts from the jsonfile cache, and it does not set
+``module_setup``: a later play that gathers with setup still runs setup.
+"""
+
+import datetime
+import json
+import os
+import platform
+import pwd
+import socket
+import time
+
+DOCUMENTATION = r"""
+---
+module: host_facts
+short_description: Gather the compact fact set used by this project
+description:
+  - Returns distribution, platform, date_time, env, user, pkg_mgr,
+    service_mgr and network facts with the same names and layout as
+    C(ansible.builtin.setup), reading only /etc/os-release, /proc, uname and
+    one C(ip -json addr show) call.
+  - Does not set C(module_setup), so smart gathering still runs C(setup)
+    in later plays that need the full fact set.
+options:
+  network:
+    description: Collect default_ipv4 and per-interface address facts.
+    type: bool
+    default: true
+  interfaces:
+    description: Limit per-interface facts to these names (default all).
+    type: list
+    elements: str
+    default: []
+"""
+
+EXAMPLES = r"""
+- name: Gather compact host facts
+  host_facts:
+
+- name: Gather compact facts without network
+  host_facts:
+    network: false
+"""
+
+RETURN = r"""
+ansible_facts:
+  description: Compact fact set (see module docstring).
+  type: dict
+  returned: always
+elapsed_ms:
+  description: Time spent collecting the facts on the host.
+  type: float
+  returned: always
+"""
+
+# os-release ID -> (setup distribution name, os_family)
+DISTRIBUTIONS = {
+    "debian": ("Debian", "Debian"),
+    "ubuntu": ("Ubuntu", "Debian"),
+    "raspbian": ("Debian", "Debian"),
+    "linuxmint": ("Linux Mint", "Debian"),
+    "pop": ("Pop!_OS", "Debian"),
+    "kali": ("Kali", "Debian"),
+    "rhel": ("RedHat", "RedHat"),
+    "centos": ("CentOS", "RedHat"),
+    "fedora": ("Fedora", "RedHat"),
+    "rocky": ("Rocky", "RedHat"),
+    "almalinux": ("AlmaLinux", "RedHat"),
+    "ol": ("OracleLinux", "RedHat"),
+    "amzn": ("Amazon", "RedHat"),
+    "arch": ("Archlinux", "Archlinux"),
+    "manjaro": ("ManjaroLinux", "Archlinux"),
+    "opensuse-leap": ("openSUSE Leap", "Suse"),
+    "opensuse-tumbleweed": ("openSUSE Tumbleweed", "Suse"),
+    "sles": ("SLES", "Suse"),
+    "alpine": ("Alpine", "Alpine"),
+}
+
+# ID_LIKE token -> os_family for derivatives not listed above
+FAMILY_LIKE = {
+    "debian": "Debian",
+    "ubuntu": "Debian",
+    "rhel": "RedHat",
+    "fedora": "RedHat",
+    "centos": "RedHat",
+    "arch": "Archlinux",
+    "suse": "Suse",
+}
+
+PKG_MANAGERS = (
+    ("/usr/bin/apt-get", "apt"),
+    ("/usr/bin/dnf", "dnf"),
+    ("/usr/bin/yum", "yum"),
+    ("/usr/bin/pacman", "pacman"),
+    ("/usr/bin/zypper", "zypper"),
+    ("/sbin/apk", "apk"),
+)
+
+
+def parse_os_release(text):
+    """Parse /etc/os-release KEY=value lines into a dict."""
+    values = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        values[key.strip()] = value
+    return values
+
+
+def distribution_facts(os_release):
+    """Map os-release values to setup's distribution/os_family facts."""
+    dist_id = os_release.get("ID", "").lower()
+    name, family = DISTRIBUTIONS.get(dist_id, (None, None))
+    if family is None:
+        for token in os_release.get("ID_LIKE", "").lower().split():
+            if token in FAMILY_LIKE:
+                family = FAMILY_LIKE[token]
+                break
+    if name is None:
+        name = (os_release.get("NAME") or dist_id or "Unknown").split()[0]
+    version = os_release.get("VERSION_ID", "")
+    return {
+        "distribution": name,
+        "distribution_version": version,
+        "distribution_major_version": version.split(".")[0] if version else "",
+        "distribution_release": os_release.get("VERSION_CODENAME", ""),
+        "os_family": family or name,
+    }
+
+
+def date_time_facts(epoch=None):
+    """Return setup-compatible date_time facts for epoch (default: now)."""
+    epoch = time.time() if epoch is None else epoch
+    now = datetime.datetime.fromtimestamp(epoch)
+    utc = datetime.datetime.fromtimestamp(epoch, tz=datetime.timezone.utc)
+    local = now.astimezone()
+    return {
+        "year": now.strftime("%Y"),
+        "month": now.strftime("%m"),
+        "weekday": now.strftime("%A"),
+        "weekday_number": now.strftime("%w"),
+        "weeknumber": now.strftime("%W"),
+        "day": now.strftime("%d"),
+        "hour": now.strftime("%H"),
+        "minute": now.strftime("%M"),
+        "second": now.strftime("%S"),
+        "epoch": str(int(epoch)),
+        "epoch_int": str(int(epoch)),
+        "date": now.strftime("%Y-%m-%d"),
+        "time": now.strftime("%H:%M:%S"),
+        "iso8601_micro": utc.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        "iso8601": utc.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "iso8601_basic": now.strftime("%Y%m%dT%H%M%S%f"),
+        "iso8601_basic_short": now.strftime("%Y%m%dT%H%M%S"),
+        "tz": local.strftime("%Z"),
+        "tz_dst": time.tzname[1],
+        "tz_offset": local.strftime("%z"),
+    }
+
+
+def parse_proc_route(text):
+    """Return {interface, gateway} of the lowest-metric IPv4 default route.
+
+    Args:
+        text: /proc/net/route contents (little-endian hex addresses)
+    """
+    best = None
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 8 or fields[1] != "00000000" or fields[7] != "00000000":
+            continue
+        if not int(fields[3], 16) & 0x1:  # RTF_UP
+            continue
+        metric = int(fields[6])
+        if best is None or metric < best[0]:
+            gateway = socket.inet_ntoa(bytes.fromhex(fields[2])[::-1])
+            best = (metric, {"interface": fields[0], "gateway": gateway})
+    return best[1] if best else {}
+
+
+def _netmask(prefix):
+    bits = (0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF
+    return socket.inet_ntoa(bits.to_bytes(4, "big"))
+
+
+def _network(address, prefix):
+    packed = int.from_bytes(socket.inet_aton(address), "big")
+    bits = (0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF
+    return socket.inet_ntoa((packed & bits).to_bytes(4, "big"))
+
+
+def interface_facts(ip_addr_json, only=None):
+    """Convert ``ip -json addr show`` output into setup-style interface facts.
+
+    Args:
+        ip_addr_json: parsed JSON list from ip -json addr show
+        only: optional iterable of interface names to keep
+
+    Returns:
+        dict of fact key (name with '-'/':' replaced by '_') -> interface facts
+    """
+    only = set(only or ())
+    facts = {}
+    for link in ip_addr_json or []:
+        name = link.get("ifname")
+        if not name or (only and name not in only):
+            continue
+        entry = {
+            "device": name,
+            "active": "UP" in link.get("flags", []) or link.get("operstate") == "UP",
+            "mtu": link.get("mtu"),
+            "type": link.get("link_type", "unknown"),
+        }
+        if link.get("address") and link.get("link_type") == "ether":
+            entry["macaddress"] = link["address"]
+        ipv4, ipv6 = [], []
+        for addr in link.get("addr_info", []):
+            local = addr.get("local")
+            prefix = addr.get("prefixlen")
+            if not local or prefix is None:
+                continue
+            if addr.get("family") == "inet":
+                item = {
+                    "address": local,
+                    "prefix": str(prefix),
+                    "netmask": _netmask(prefix),
+                    "network": _network(local, prefix),
+                }
+                if addr.get("broadcast"):
+                    item["broadcast"] = addr["broadcast"]
+                ipv4.append(item)
+            elif addr.get("family") == "inet6":
+                ipv6.append({"address": local, "prefix": str(prefix),
+                             "scope": addr.get("scope", "")})
+        if ipv4:
+            entry["ipv4"] = ipv4[0]
+            if len(ipv4) > 1:
+                entry["ipv4_secondaries"] = ipv4[1:]
+        if ipv6:
+            entry["ipv6"] = ipv6
+        facts[name.replace("-", "_").replace(":", "_")] = entry
+    return facts
+
+
+def default_ipv4(route, interfaces):
+    """Combine the default route with its interface's primary IPv4 address."""
+    if not route:
+        return {}
+    facts = {"interface": route["interface"], "gateway": route["gateway"]}
+    iface = interfaces.get(route["interface"].replace("-", "_").replace(":", "_"), {})
+    facts.update(iface.get("ipv4", {}))
+    for key in ("macaddress", "mtu", "type"):
+        if key in iface:
+            facts[key] = iface[key]
+    return facts
+
+
+def _read(path):
+    try:
+        with open(path) as fh:
+            return fh.read()
+    except (IOError, OSError):
+        return ""
+
+
+def _user_facts():
+    entry = pwd.getpwuid(os.geteuid())
+    return {
+        "user_id": entry.pw_name,
+        "user_uid": entry.pw_uid,
+        "user_gid": entry.pw_gid,
+        "user_dir": entry.pw_dir,
+        "user_shell": entry.pw_shell,
+        "user_gecos": entry.pw_gecos,
+    }
+
+
+def _pkg_mgr():
+    for path, name in PKG_MANAGERS:
+        if os.path.exists(path):
+            return name
+    return "unknown"
+
+
+def collect(run_ip=None, network=True, only=None, epoch=None):
+    """Collect the compact fact set.
+
+    Args:
+        run_ip: callable(argv) -> (rc, stdout, stderr) for the ip command;
+                network facts are skipped when None
+        network: collect default_ipv4 and interface facts
+        only: interface names to keep (default all)
+        epoch: timestamp for date_time (default now; tests pin it)
+
+    Returns:
+        (facts dict, list of warnings)
+    """
+    warnings = []
+    uname = os.uname()
+    fqdn = socket.getfqdn()
+    facts = {
+        "system": platform.system(),
+        "kernel": uname.release,
+        "architecture": uname.machine,
+        "machine": uname.machine,
+        "nodename": uname.nodename,
+        "hostname": uname.nodename.split(".")[0],
+        "fqdn": fqdn,
+        "domain": fqdn.split(".", 1)[1] if "." in fqdn else "",
+        "date_time": date_time_facts(epoch),
+        "env": dict(os.environ),
+        "pkg_mgr": _pkg_mgr(),
+        "service_mgr": "systemd" if os.path.isdir("/run/systemd/system") else "service",
+        "host_facts_profile": "compact",
+    }
+    facts.update(distribution_facts(parse_os_release(_read("/etc/os-release"))))
+    facts.update(_user_facts())
+    uptime = _read("/proc/uptime").split()
+    if uptime:
+        facts["uptime_seconds"] = int(float(uptime[0]))
+
+    if network and run_ip is not None:
+        rc, out, err = run_ip(["ip", "-json", "addr", "show"])
+        links = []
+        if rc == 0:
+            try:
+                links = json.loads(out or "[]")
+            except ValueError:
+                warnings.append("ip -json addr show returned invalid JSON")
+        else:
+            warnings.append("ip -json addr show failed: {}".format((err or "").strip()))
+        interfaces = interface_facts(links)
+        facts["default_ipv4"] = default_ipv4(parse_proc_route(_read("/proc/net/route")),
+                                             interfaces)
+        if only:
+            keep = set(only)
+            interfaces = {key: value for key, value in interfaces.items()
+                          if value["device"] in keep}
+        facts["interfaces"] = sorted(value["device"] for value in interfaces.values())
+        facts.update(interfaces)
+    return facts, warnings
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            network=dict(type="bool", default=True),
+            interfaces=dict(type="list", elements="str", default=[]),
+        ),
+        supports_check_mode=True,
+    )
+    started = time.monotonic()
+
+    def run_ip(argv):
+        return module.run_command(argv)
+
+    facts, warnings = collect(run_ip, module.params["network"], module.params["interfaces"])
+    for warning in warnings:
+        module.warn(warning)
+    module.exit_json(
+        changed=False,
+        ansible_facts=facts,
+        elapsed_ms=round((time.monotonic() - started) * 1000, 1),
+    )
+
+
+if __name__ == "__main__":
+    main()
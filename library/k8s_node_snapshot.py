@@ -0,0 +1,324 @@
+#!/usr/bin/python
+"""Kubernetes node-state snapshot
+
+Ansible module that fetches nodes, pods, namespaces and component statuses
+with a single ``kubectl get -o json`` call and derives every fact the
+kuber_verify role needs (ready counts, roles, taints, versions, CNI type and
+CNI daemon pod coverage) in memory, instead of one ``kubectl`` process per
+jsonpath query.
+"""
+
+import json
+
+DOCUMENTATION = r"""
+---
+module: k8s_node_snapshot
+short_description: Build an indexed snapshot of cluster nodes and pods
+description:
+  - Runs C(kubectl get nodes,pods,namespaces,componentstatuses -A -o json)
+    once and returns derived node, CNI and component facts.
+  - Retries without componentstatuses when the API no longer serves them.
+options:
+  kubeconfig:
+    description: Kubeconfig used by kubectl.
+    type: path
+    default: /etc/kubernetes/admin.conf
+  kubectl:
+    description: kubectl binary.
+    type: str
+    default: kubectl
+  worker_label:
+    description: Node label key (or C(key=value) selector) that marks workers
+      for C(labeled_workers).
+    type: str
+    default: node-role.kubernetes.io/worker
+  cni_selectors:
+    description: Per-CNI namespace and pod label used to find daemon pods.
+    type: dict
+    default:
+      flannel: {namespace: kube-flannel, label: app=flannel}
+      calico: {namespace: calico-system, label: k8s-app=calico-node}
+  snapshot_file:
+    description: Read a recorded C(kubectl get -o json) List instead of
+      calling kubectl (offline debugging).
+    type: path
+"""
+
+EXAMPLES = r"""
+- name: Collect cluster node snapshot
+  k8s_node_snapshot:
+    kubeconfig: /etc/kubernetes/admin.conf
+  register: cluster_snapshot
+
+- name: Assert all workers are Ready
+  ansible.builtin.assert:
+    that:
+      - cluster_snapshot.workers.not_ready | length == 0
+"""
+
+RETURN = r"""
+nodes:
+  description: Per-node facts keyed by node name.
+  type: dict
+  returned: always
+control_plane:
+  description: names, count, ready_count and not_ready for control plane nodes.
+  type: dict
+  returned: always
+workers:
+  description: names, count, ready_count and not_ready for non-control-plane nodes.
+  type: dict
+  returned: always
+cni:
+  description: Detected CNI type and daemon pod coverage.
+  type: dict
+  returned: always
+"""
+
+CONTROL_PLANE_LABELS = (
+    "node-role.kubernetes.io/control-plane",
+    "node-role.kubernetes.io/master",
+)
+ROLE_LABEL_PREFIX = "node-role.kubernetes.io/"
+
+DEFAULT_CNI_SELECTORS = {
+    "flannel": {"namespace": "kube-flannel", "label": "app=flannel"},
+    "calico": {"namespace": "calico-system", "label": "k8s-app=calico-node"},
+}
+
+
+def _condition(obj, cond_type):
+    for cond in obj.get("status", {}).get("conditions") or []:
+        if cond.get("type") == cond_type:
+            return cond.get("status") == "True"
+    return False
+
+
+def _parse_selector(selector):
+    """Parse a simple 'k=v,k2=v2' equality selector into a dict."""
+    result = {}
+    for part in (selector or "").split(","):
+        if "=" in part:
+            key, value = part.split("=", 1)
+            result[key.strip()] = value.strip()
+    return result
+
+
+def _label_match(labels, selector):
+    return all(labels.get(k) == v for k, v in selector.items())
+
+
+def _has_label(labels, selector):
+    """Match a bare label key (presence) or a 'k=v' equality selector."""
+    if "=" in (selector or ""):
+        return _label_match(labels, _parse_selector(selector))
+    return selector in labels
+
+
+def _node_facts(node):
+    meta = node.get("metadata", {})
+    labels = meta.get("labels") or {}
+    status = node.get("status", {})
+    roles = sorted(
+        key[len(ROLE_LABEL_PREFIX):]
+        for key in labels
+        if key.startswith(ROLE_LABEL_PREFIX)
+    )
+    addresses = {a.get("type"): a.get("address") for a in status.get("addresses") or []}
+    return {
+        "name": meta.get("name"),
+        "roles": roles,
+        "control_plane": any(label in labels for label in CONTROL_PLANE_LABELS),
+        "ready": _condition(node, "Ready"),
+        "schedulable": not node.get("spec", {}).get("unschedulable", False),
+        "taints": [
+            "{}={}:{}".format(t.get("key"), t.get("value", ""), t.get("effect"))
+            if t.get("value") else "{}:{}".format(t.get("key"), t.get("effect"))
+            for t in node.get("spec", {}).get("taints") or []
+        ],
+        "kubelet_version": status.get("nodeInfo", {}).get("kubeletVersion"),
+        "internal_ip": addresses.get("InternalIP"),
+        "labels": labels,
+    }
+
+
+def _pod_facts(pod):
+    meta = pod.get("metadata", {})
+    statuses = pod.get("status", {}).get("containerStatuses") or []
+    return {
+        "name": meta.get("name"),
+        "namespace": meta.get("namespace"),
+        "labels": meta.get("labels") or {},
+        "node": pod.get("spec", {}).get("nodeName"),
+        "phase": pod.get("status", {}).get("phase"),
+        "ready": _condition(pod, "Ready"),
+        "restarts": sum(int(s.get("restartCount", 0)) for s in statuses),
+    }
+
+
+def _group_summary(nodes):
+    names = [n["name"] for n in nodes]
+    not_ready = [n["name"] for n in nodes if not n["ready"]]
+    return {
+        "names": names,
+        "count": len(names),
+        "ready_count": len(names) - len(not_ready),
+        "not_ready": not_ready,
+    }
+
+
+def build_snapshot(items, worker_label="node-role.kubernetes.io/worker",
+                   cni_selectors=None):
+    """Index a kubectl List and derive verification facts in one pass.
+
+    Args:
+        items: 'items' of a kubectl get -o json List (mixed kinds)
+        worker_label: node label key selecting labeled workers
+        cni_selectors: {cni_type: {namespace, label}} (DEFAULT_CNI_SELECTORS)
+
+    Returns:
+        dict of derived facts (nodes, control_plane, workers, versions,
+        namespaces, cni, pods, components)
+    """
+    cni_selectors = cni_selectors or DEFAULT_CNI_SELECTORS
+
+    nodes = []
+    pods = []
+    namespaces = []
+    components = {}
+    for obj in items or []:
+        kind = obj.get("kind")
+        if kind == "Node":
+            nodes.append(_node_facts(obj))
+        elif kind == "Pod":
+            pods.append(_pod_facts(obj))
+        elif kind == "Namespace":
+            namespaces.append(obj.get("metadata", {}).get("name"))
+        elif kind == "ComponentStatus":
+            conditions = obj.get("conditions") or []
+            components[obj.get("metadata", {}).get("name")] = any(
+                c.get("type") == "Healthy" and c.get("status") == "True"
+                for c in conditions
+            )
+
+    nodes.sort(key=lambda n: n["name"] or "")
+    node_index = {n["name"]: n for n in nodes}
+    control_plane = [n for n in nodes if n["control_plane"]]
+    workers = [n for n in nodes if not n["control_plane"]]
+    versions = sorted({n["kubelet_version"] for n in nodes if n["kubelet_version"]})
+    namespace_set = set(namespaces)
+
+    cni_type = "unknown"
+    for name, selector in cni_selectors.items():
+        if selector.get("namespace") in namespace_set:
+            cni_type = name
+            break
+
+    cni = {"type": cni_type, "namespace": "", "label": "", "pod_count": 0,
+           "ready_count": 0, "nodes_missing": []}
+    if cni_type != "unknown":
+        selector = cni_selectors[cni_type]
+        labels = _parse_selector(selector.get("label"))
+        cni_pods = [
+            p for p in pods
+            if p["namespace"] == selector.get("namespace") and _label_match(p["labels"], labels)
+        ]
+        covered = {p["node"] for p in cni_pods}
+        cni.update({
+            "namespace": selector.get("namespace"),
+            "label": selector.get("label"),
+            "pod_count": len(cni_pods),
+            "ready_count": sum(1 for p in cni_pods if p["ready"]),
+            "nodes_missing": [n["name"] for n in nodes if n["name"] not in covered],
+        })
+
+    pods_by_namespace = {}
+    for pod in pods:
+        ns = pods_by_namespace.setdefault(
+            pod["namespace"], {"total": 0, "running": 0, "ready": 0, "not_ready": []}
+        )
+        ns["total"] += 1
+        if pod["phase"] == "Running":
+            ns["running"] += 1
+        if pod["ready"] or pod["phase"] == "Succeeded":
+            ns["ready"] += 1
+        else:
+            ns["not_ready"].append(pod["name"])
+
+    return {
+        "nodes": node_index,
+        "node_lines": [
+            "{} {} {} {}".format(
+                n["name"],
+                "Ready" if n["ready"] else "NotReady",
+                ",".join(n["roles"]) or "<none>",
+                n["kubelet_version"],
+            )
+            for n in nodes
+        ],
+        "node_count": len(nodes),
+        "ready_count": sum(1 for n in nodes if n["ready"]),
+        "control_plane": _group_summary(control_plane),
+        "workers": _group_summary(workers),
+        "labeled_workers": [n["name"] for n in nodes if _has_label(n["labels"], worker_label)],
+        "tainted": {n["name"]: n["taints"] for n in nodes if n["taints"]},
+        "versions": versions,
+        "version_skew": len(versions) > 1,
+        "namespaces": sorted(namespace_set),
+        "cni": cni,
+        "pods": pods_by_namespace,
+        "components": components,
+        "components_unhealthy": sorted(k for k, v in components.items() if not v),
+    }
+
+
+def _fetch_items(module, kubectl, kubeconfig):
+    env = {"KUBECONFIG": kubeconfig}
+    base = [kubectl, "get", "--all-namespaces", "-o", "json"]
+    rc, out, err = module.run_command(
+        base[:2] + ["nodes,pods,namespaces,componentstatuses"] + base[2:],
+        environ_update=env,
+    )
+    if rc != 0:
+        # componentstatuses is deprecated and may be disabled on the API server
+        rc, out, err = module.run_command(
+            base[:2] + ["nodes,pods,namespaces"] + base[2:],
+            environ_update=env,
+        )
+    if rc != 0:
+        module.fail_json(msg="kubectl get failed", rc=rc, stderr=err)
+    return json.loads(out).get("items", [])
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            kubeconfig=dict(type="path", default="/etc/kubernetes/admin.conf"),
+            kubectl=dict(type="str", default="kubectl"),
+            worker_label=dict(type="str", default="node-role.kubernetes.io/worker"),
+            cni_selectors=dict(type="dict", default=DEFAULT_CNI_SELECTORS),
+            snapshot_file=dict(type="path"),
+        ),
+        supports_check_mode=True,
+    )
+
+    if module.params["snapshot_file"]:
+        with open(module.params["snapshot_file"]) as fh:
+            items = json.load(fh).get("items", [])
+    else:
+        items = _fetch_items(module, module.params["kubectl"], module.params["kubeconfig"])
+
+    snapshot = build_snapshot(
+        items,
+        worker_label=module.params["worker_label"],
+        cni_selectors=module.params["cni_selectors"],
+    )
+    module.exit_json(changed=False, **snapshot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+#!/usr/bin/python
+"""Longhorn cluster cleanup engine
+
+Ansible module used by the longhorn_clean role. Removes every Longhorn-owned
+cluster object (the Longhorn workloads, admission webhooks, longhorn.io
+custom resources, the longhorn-system namespace, the CRDs and the
+cluster-scoped RBAC, storage and priority classes) without one looped
+kubectl task per kind:
+
+  - one discovery pass: a single list of the cluster-scoped objects (CRDs
+    included) and workloads, and a single list of every longhorn.io
+    resource the CRDs define
+  - the Deployments and DaemonSets of the Longhorn namespace (longhorn-manager,
+    CSI driver, UI) go first and their pods are waited for, so no controller
+    re-creates nodes, settings, engine images or instance managers while the
+    custom resources are removed
+  - objects are deleted in dependency-ordered waves; inside a wave the
+    finalizers are stripped and the deletes issued concurrently (bounded by
+    ``parallelism``), then one list call per poll waits for the wave to go
+  - objects that reappear with finalizers while waiting (controllers still
+    running) are stripped again
+
+Every wave reports its object counts, errors and elapsed time.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DOCUMENTATION = r"""
+---
+module: longhorn_cleanup
+short_description: Remove all Longhorn cluster objects in dependency-ordered waves
+description:
+  - Discovers every Longhorn-owned object with two list calls and deletes them
+    wave by wave (workloads, webhooks, custom resources, namespace, CRDs,
+    cluster objects), stripping finalizers and deleting concurrently within a
+    wave.
+  - Workloads are deleted with foreground cascading, so their wave only ends
+    once the longhorn-manager and driver pods are gone.
+  - In check mode only the discovery runs and the plan is returned.
+options:
+  namespace:
+    description: Longhorn namespace.
+    type: str
+    default: longhorn-system
+  parallelism:
+    description: Maximum concurrent patch/delete calls within a wave.
+    type: int
+    default: 10
+  wave_timeout:
+    description: Seconds to wait for the objects of one wave to disappear.
+    type: int
+    default: 120
+  poll_interval:
+    description: Seconds between list calls while waiting for a wave.
+    type: int
+    default: 2
+  kubeconfig:
+    description: Kubeconfig used by kubectl.
+    type: path
+    default: /etc/kubernetes/admin.conf
+  kubectl:
+    description: kubectl binary.
+    type: str
+    default: kubectl
+"""
+
+EXAMPLES = r"""
+- name: Remove Longhorn cluster objects
+  longhorn_cleanup:
+    parallelism: 10
+    wave_timeout: 180
+  register: longhorn_cleanup_result
+"""
+
+RETURN = r"""
+plan:
+  description: Waves in deletion order with the objects (resource, namespace, name) of each.
+  type: list
+  returned: always
+waves:
+  description: Per wave name, objects, finalizers_stripped, deleted, remaining, errors and elapsed_ms.
+  type: list
+  returned: when not in check mode
+remaining:
+  description: Objects still present after their wave timed out.
+  type: list
+  returned: always
+progress:
+  description: One line per wave for the play output.
+  type: list
+  returned: always
+"""
+
+GROUP = "longhorn.io"
+CSI_DRIVER = "driver.longhorn.io"
+
+# Cluster-scoped kinds listed in the first discovery call: kind -> resource.
+CLUSTER_RESOURCES = {
+    "ValidatingWebhookConfiguration": "validatingwebhookconfigurations.admissionregistration.k8s.io",
+    "MutatingWebhookConfiguration": "mutatingwebhookconfigurations.admissionregistration.k8s.io",
+    "CustomResourceDefinition": "customresourcedefinitions.apiextensions.k8s.io",
+    "Namespace": "namespaces",
+    "StorageClass": "storageclasses.storage.k8s.io",
+    "ClusterRole": "clusterroles.rbac.authorization.k8s.io",
+    "ClusterRoleBinding": "clusterrolebindings.rbac.authorization.k8s.io",
+    "PriorityClass": "priorityclasses.scheduling.k8s.io",
+}
+
+# Workloads listed in the same call; only those in the Longhorn namespace are
+# removed. longhorn-manager re-creates nodes, settings, engine images and
+# instance managers while it runs, so these go before any custom resource.
+WORKLOAD_RESOURCES = {
+    "Deployment": "deployments.apps",
+    "DaemonSet": "daemonsets.apps",
+}
+
+# Longhorn resources by plural, in the wave that removes them. Leaves first
+# (snapshots, backups, jobs), then what attaches volumes, then volumes and
+# images, then the per-node managers and settings. Unknown plurals from newer
+# Longhorn versions go to the last custom resource wave.
+CR_WAVES = [
+    ("longhorn-leaf-resources", [
+        "snapshots", "backups", "backupbackingimages", "orphans", "supportbundles",
+        "systembackups", "systemrestores", "recurringjobs",
+    ]),
+    ("longhorn-attachments", [
+        "volumeattachments", "engines", "replicas", "sharemanagers",
+    ]),
+    ("longhorn-volumes", [
+        "volumes", "backingimagedatasources", "backingimages", "backupvolumes",
+    ]),
+    ("longhorn-managers", [
+        "instancemanagers", "backingimagemanagers", "engineimages", "nodes",
+        "backuptargets", "settings",
+    ]),
+]
+
+WAVE_ORDER = (
+    ["workloads", "webhooks"] + [name for name, _ in CR_WAVES]
+    + ["namespace", "crds", "cluster-objects"]
+)
+
+
+class ApiError(Exception):
+    """A patch, delete or list call against the API server failed."""
+
+
+def _ref(resource, obj):
+    meta = obj.get("metadata", {})
+    return {
+        "resource": resource,
+        "kind": obj.get("kind"),
+        "namespace": meta.get("namespace") or "",
+        "name": meta.get("name"),
+        "finalizers": list(meta.get("finalizers") or []),
+    }
+
+
+def _key(ref):
+    return (ref["kind"], ref["namespace"], ref["name"])
+
+
+def _longhorn_named(obj):
+    meta = obj.get("metadata", {})
+    labels = meta.get("labels") or {}
+    return str(meta.get("name", "")).startswith("longhorn") \
+        or labels.get("app.kubernetes.io/name") == "longhorn"
+
+
+def crd_resources(crds):
+    """Return {kind: plural.group} for the longhorn.io CRDs."""
+    resources = {}
+    for crd in crds or []:
+        spec = crd.get("spec", {})
+        if spec.get("group") == GROUP and spec.get("names", {}).get("plural"):
+            resources[spec["names"]["kind"]] = "{}.{}".format(spec["names"]["plural"], GROUP)
+    return resources
+
+
+def classify(cluster_items, cr_items, namespace="longhorn-system"):
+    """Sort discovered objects into the deletion waves.
+
+    Args:
+        cluster_items: items of the first list (CLUSTER_RESOURCES and
+            WORKLOAD_RESOURCES kinds)
+        cr_items: items of the longhorn.io custom resource list
+        namespace: Longhorn namespace
+
+    Returns:
+        list of {wave, objects} in WAVE_ORDER, empty waves omitted
+    """
+    waves = {name: [] for name in WAVE_ORDER}
+    crds = [o for o in cluster_items or [] if o.get("kind") == "CustomResourceDefinition"]
+    kinds = crd_resources(crds)
+
+    for obj in cluster_items or []:
+        kind = obj.get("kind")
+        if kind in WORKLOAD_RESOURCES:
+            if obj.get("metadata", {}).get("namespace") == namespace:
+                waves["workloads"].append(_ref(WORKLOAD_RESOURCES[kind], obj))
+            continue
+        resource = CLUSTER_RESOURCES.get(kind)
+        if resource is None:
+            continue
+        if kind in ("ValidatingWebhookConfiguration", "MutatingWebhookConfiguration"):
+            if _longhorn_named(obj):
+                waves["webhooks"].append(_ref(resource, obj))
+        elif kind == "CustomResourceDefinition":
+            if obj.get("spec", {}).get("group") == GROUP:
+                waves["crds"].append(_ref(resource, obj))
+        elif kind == "Namespace":
+            if obj.get("metadata", {}).get("name") == namespace:
+                waves["namespace"].append(_ref(resource, obj))
+        elif kind == "StorageClass":
+            if obj.get("provisioner") == CSI_DRIVER:
+                waves["cluster-objects"].append(_ref(resource, obj))
+        elif _longhorn_named(obj):
+            waves["cluster-objects"].append(_ref(resource, obj))
+
+    wave_of = {plural: name for name, plurals in CR_WAVES for plural in plurals}
+    for obj in cr_items or []:
+        resource = kinds.get(obj.get("kind"))
+        if resource is None:
+            continue
+        plural = resource.split(".", 1)[0]
+        waves[wave_of.get(plural, CR_WAVES[-1][0])].append(_ref(resource, obj))
+
+    return [
+        {"wave": name, "objects": sorted(waves[name], key=_key)}
+        for name in WAVE_ORDER if waves[name]
+    ]
+
+
+def discover(api, namespace="longhorn-system"):
+    """Run the discovery pass and return classify() of its two list calls."""
+    cluster_items = api.list(list(CLUSTER_RESOURCES.values()) + list(WORKLOAD_RESOURCES.values()))
+    crds = [o for o in cluster_items if o.get("kind") == "CustomResourceDefinition"]
+    cr_resources = sorted(set(crd_resources(crds).values()))
+    cr_items = api.list(cr_resources) if cr_resources else []
+    return classify(cluster_items, cr_items, namespace)
+
+
+def _process(api, ref):
+    """Strip the finalizers of one object, then delete it."""
+    stripped = False
+    if ref["finalizers"]:
+        api.strip_finalizers(ref)
+        stripped = True
+    api.delete(ref)
+    return stripped
+
+
+def _run_concurrently(fn, refs, parallelism):
+    """Apply fn to every ref; return (results, errors) with per-ref errors."""
+    results, errors = [], []
+    lock = threading.Lock()
+
+    def call(ref):
+        try:
+            value = fn(ref)
+        except Exception as exc:  # pylint: disable=broad-except
+            with lock:
+                errors.append("{} {}: {}".format(
+                    ref["resource"].split(".", 1)[0],
+                    "/".join(p for p in (ref["namespace"], ref["name"]) if p), exc))
+            return
+        with lock:
+            results.append(value)
+
+    if refs:
+        with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(refs)))) as pool:
+            list(pool.map(call, refs))
+    return results, errors
+
+
+def run_wave(api, wave, parallelism=10, timeout=120, interval=2,
+             sleep=time.sleep, clock=time.monotonic):
+    """Strip and delete the objects of one wave, then wait for them to go.
+
+    Returns:
+        dict with wave, objects, finalizers_stripped, deleted, remaining,
+        errors and elapsed_ms
+    """
+    started = clock()
+    refs = wave["objects"]
+    stripped, errors = _run_concurrently(lambda r: _process(api, r), refs, parallelism)
+    wanted = {_key(r): r["resource"] for r in refs}
+    resources = sorted(set(wanted.values()))
+    deadline = started + timeout
+
+    remaining = []
+    while True:
+        try:
+            live = [_ref(wanted[_key(r)], o) for o, r in
+                    ((o, _ref(None, o)) for o in api.list(resources)) if _key(r) in wanted]
+        except ApiError as exc:
+            errors.append("list {}: {}".format(",".join(resources), exc))
+            break
+        remaining = live
+        if not remaining or clock() >= deadline:
+            break
+        # Controllers that are still running may re-add finalizers.
+        again = [r for r in remaining if r["finalizers"]]
+        _, retry_errors = _run_concurrently(api.strip_finalizers, again, parallelism)
+        errors.extend(e for e in retry_errors if e not in errors)
+        sleep(interval)
+
+    return {
+        "wave": wave["wave"],
+        "objects": len(refs),
+        "finalizers_stripped": sum(1 for s in stripped if s),
+        "deleted": len(refs) - len(remaining),
+        "remaining": [
+            "/".join(p for p in (r["resource"].split(".", 1)[0], r["namespace"], r["name"]) if p)
+            for r in remaining
+        ],
+        "errors": errors,
+        "elapsed_ms": round((clock() - started) * 1000, 1),
+    }
+
+
+def cleanup(api, plan, parallelism=10, timeout=120, interval=2,
+            sleep=time.sleep, clock=time.monotonic):
+    """Run every wave of the plan in order and report progress.
+
+    Returns:
+        dict with waves, remaining, errors, progress and elapsed_ms
+    """
+    started = clock()
+    waves = []
+    for wave in plan:
+        waves.append(run_wave(api, wave, parallelism, timeout, interval, sleep, clock))
+    return {
+        "waves": waves,
+        "remaining": [name for w in waves for name in w["remaining"]],
+        "errors": [error for w in waves for error in w["errors"]],
+        "progress": [
+            "{wave}: {deleted}/{objects} deleted, {finalizers_stripped} finalizers stripped, "
+            "{left} remaining, {elapsed_ms} ms".format(left=len(w["remaining"]), **w)
+            for w in waves
+        ],
+        "elapsed_ms": round((clock() - started) * 1000, 1),
+    }
+
+
+class KubectlApi:
+    """API calls through kubectl; run is callable(argv) -> (rc, stdout, stderr)."""
+
+    def __init__(self, run, kubectl="kubectl"):
+        self.run = run
+        self.kubectl = kubectl
+
+    def _scope(self, ref):
+        return ["-n", ref["namespace"]] if ref["namespace"] else []
+
+    def _call(self, argv):
+        rc, out, err = self.run([self.kubectl] + argv)
+        if rc != 0:
+            raise ApiError((err or out or "rc {}".format(rc)).strip())
+        return out
+
+    def list(self, resources):
+        """Return the items of every resource with one kubectl get."""
+        if not resources:
+            return []
+        out = self._call(["get", ",".join(resources), "-A", "-o", "json",
+                          "--ignore-not-found"])
+        return json.loads(out).get("items", []) if out.strip() else []
+
+    def strip_finalizers(self, ref):
+        self._call(["patch", ref["resource"], ref["name"]] + self._scope(ref)
+                   + ["--type=merge", "-p", '{"metadata":{"finalizers":null}}'])
+
+    def delete(self, ref):
+        # Foreground: the workload stays listed until its pods are gone, so
+        # the wave waits for longhorn-manager to stop
+        cascade = ["--cascade=foreground"] if ref["kind"] in WORKLOAD_RESOURCES else []
+        self._call(["delete", ref["resource"], ref["name"]] + self._scope(ref)
+                   + cascade + ["--wait=false", "--ignore-not-found"])
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            namespace=dict(type="str", default="longhorn-system"),
+            parallelism=dict(type="int", default=10),
+            wave_timeout=dict(type="int", default=120),
+            poll_interval=dict(type="int", default=2),
+            kubeconfig=dict(type="path", default="/etc/kubernetes/admin.conf"),
+            kubectl=dict(type="str", default="kubectl"),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    env = {"KUBECONFIG": params["kubeconfig"]}
+
+    def run(argv):
+        return module.run_command(argv, environ_update=env)
+
+    api = KubectlApi(run, params["kubectl"])
+    try:
+        plan = discover(api, params["namespace"])
+    except ApiError as exc:
+        module.fail_json(msg="Longhorn discovery failed: {}".format(exc))
+
+    result = {
+        "plan": [
+            {"wave": w["wave"], "objects": [
+                {k: r[k] for k in ("resource", "namespace", "name")} for r in w["objects"]]}
+            for w in plan
+        ],
+        "remaining": [],
+        "progress": ["{}: {} objects".format(w["wave"], len(w["objects"])) for w in plan],
+    }
+    if module.check_mode or not plan:
+        module.exit_json(changed=bool(plan), **result)
+
+    result.update(cleanup(api, plan, params["parallelism"], params["wave_timeout"],
+                          params["poll_interval"]))
+    if result["remaining"]:
+        module.fail_json(msg="Longhorn objects still present after cleanup",
+                         changed=True, **result)
+    module.exit_json(changed=True, **result)
+
+
+if __name__ == "__main__":
+    main()
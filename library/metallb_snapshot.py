@@ -0,0 +1,445 @@
+#!/usr/bin/python
+"""MetalLB state snapshot
+
+Ansible module that collects everything the metallb_verify role checks with
+two ``kubectl get -o json`` calls (namespaces and services cluster-wide;
+deployments, daemonsets, pods, events and the MetalLB IPAddressPool /
+BGPPeer / BGPAdvertisement / L2Advertisement objects in the MetalLB
+namespace only) and evaluates them in memory:
+
+  - controller Deployment availability and speaker DaemonSet rollout
+  - speaker pod placement and pod readiness in the MetalLB namespace
+  - pool capacity, LoadBalancer IPs per pool, IPs outside every pool,
+    services still pending an IP and pools no advertisement announces
+
+When ``wait_timeout`` is set, the same batched calls are repeated until the
+controller is available and the speaker rollout is complete (one wait for
+both, instead of ``kubectl wait`` followed by ``kubectl rollout status``,
+each with its own timeout). A missing MetalLB namespace ends the wait at
+once: it will not appear by waiting.
+"""
+
+import ipaddress
+import json
+import time
+
+DOCUMENTATION = r"""
+---
+module: metallb_snapshot
+short_description: Collect and evaluate MetalLB state in one kubectl call
+description:
+  - Runs C(kubectl get namespaces,services -A -o json) and, when the MetalLB
+    namespace exists, C(kubectl get deployments,daemonsets,pods,events,
+    ipaddresspools.metallb.io,bgppeers.metallb.io,bgpadvertisements.metallb.io,
+    l2advertisements.metallb.io -n <namespace> -o json) once per attempt and
+    returns readiness, pool and LoadBalancer allocation facts.
+  - Retries without the MetalLB CRDs when they are not installed.
+  - Returns immediately (without waiting) when the namespace does not exist.
+options:
+  namespace:
+    description: MetalLB namespace.
+    type: str
+    default: metallb-system
+  kubeconfig:
+    description: Kubeconfig used by kubectl.
+    type: path
+    default: /etc/kubernetes/admin.conf
+  kubectl:
+    description: kubectl binary.
+    type: str
+    default: kubectl
+  controller:
+    description: Controller Deployment name.
+    type: str
+    default: controller
+  speaker:
+    description: Speaker DaemonSet name.
+    type: str
+    default: speaker
+  wait_timeout:
+    description: Seconds to wait for controller availability and speaker
+      rollout (0 = single snapshot).
+    type: int
+    default: 0
+  wait_interval:
+    description: Seconds between snapshots while waiting.
+    type: int
+    default: 5
+  events_tail:
+    description: Number of most recent namespace events to return.
+    type: int
+    default: 50
+  snapshot_file:
+    description: Read a recorded C(kubectl get -o json) List instead of
+      calling kubectl (offline debugging).
+    type: path
+"""
+
+EXAMPLES = r"""
+- name: Collect MetalLB state
+  metallb_snapshot:
+    namespace: metallb-system
+    wait_timeout: 180
+  register: metallb_state
+
+- name: Assert MetalLB is ready
+  ansible.builtin.assert:
+    that:
+      - metallb_state.ready
+"""
+
+RETURN = r"""
+ready:
+  description: Namespace present, controller available and speaker rolled out.
+  type: bool
+  returned: always
+controller:
+  description: found, available, replicas and ready_replicas of the controller.
+  type: dict
+  returned: always
+speaker:
+  description: found, desired, ready, updated, rollout_complete and nodes.
+  type: dict
+  returned: always
+pools:
+  description: Per pool addresses, capacity, auto_assign, allocated IPs and advertised flag.
+  type: dict
+  returned: always
+services:
+  description: LoadBalancer services with ips, pool and pending flag.
+  type: list
+  returned: always
+coverage:
+  description: allocated, pending, outside_pools and pools_not_advertised.
+  type: dict
+  returned: always
+"""
+
+# Services are needed cluster-wide (LoadBalancer IPs); everything else only
+# in the MetalLB namespace, so each poll does not list every pod and event
+CLUSTER_KINDS = "namespaces,services"
+NAMESPACE_KINDS = "deployments,daemonsets,pods,events"
+METALLB_KINDS = ("ipaddresspools.metallb.io,bgppeers.metallb.io,"
+                 "bgpadvertisements.metallb.io,l2advertisements.metallb.io")
+POOL_ANNOTATIONS = (
+    "metallb.io/ip-allocated-from-pool",
+    "metallb.universe.tf/ip-allocated-from-pool",
+)
+
+
+def _condition(obj, cond_type):
+    for cond in obj.get("status", {}).get("conditions") or []:
+        if cond.get("type") == cond_type:
+            return cond.get("status") == "True"
+    return False
+
+
+def parse_pool_range(entry):
+    """Parse an IPAddressPool address entry (CIDR or 'start-end').
+
+    Returns:
+        (first ip_address, last ip_address) or None when invalid
+    """
+    entry = str(entry).strip()
+    try:
+        if "-" in entry:
+            start, end = (ipaddress.ip_address(part.strip()) for part in entry.split("-", 1))
+            if start.version != end.version or start > end:
+                return None
+            return start, end
+        network = ipaddress.ip_network(entry, strict=False)
+        return network[0], network[-1]
+    except ValueError:
+        return None
+
+
+def _capacity(ranges):
+    return sum(int(last) - int(first) + 1 for first, last in ranges)
+
+
+def _deployment(items, namespace, name):
+    for obj in items:
+        meta = obj.get("metadata", {})
+        if obj.get("kind") == "Deployment" and meta.get("namespace") == namespace \
+                and meta.get("name") == name:
+            status = obj.get("status", {})
+            return {
+                "found": True,
+                "available": _condition(obj, "Available"),
+                "replicas": obj.get("spec", {}).get("replicas", 1),
+                "ready_replicas": status.get("readyReplicas", 0),
+            }
+    return {"found": False, "available": False, "replicas": 0, "ready_replicas": 0}
+
+
+def _daemonset(items, namespace, name):
+    for obj in items:
+        meta = obj.get("metadata", {})
+        if obj.get("kind") == "DaemonSet" and meta.get("namespace") == namespace \
+                and meta.get("name") == name:
+            status = obj.get("status", {})
+            desired = status.get("desiredNumberScheduled", 0)
+            updated = status.get("updatedNumberScheduled", 0)
+            available = status.get("numberAvailable", 0)
+            observed = status.get("observedGeneration", 0) >= meta.get("generation", 0)
+            return {
+                "found": True,
+                "desired": desired,
+                "ready": status.get("numberReady", 0),
+                "updated": updated,
+                "available": available,
+                # Same rule as kubectl rollout status for a RollingUpdate DaemonSet
+                "rollout_complete": observed and updated == desired and available == desired,
+            }
+    return {"found": False, "desired": 0, "ready": 0, "updated": 0, "available": 0,
+            "rollout_complete": False}
+
+
+def build_metallb_state(items, namespace="metallb-system", controller="controller",
+                        speaker="speaker", events_tail=50):
+    """Evaluate readiness and pool coverage from one kubectl List.
+
+    Args:
+        items: 'items' of a kubectl get -o json List (mixed kinds)
+        namespace: MetalLB namespace
+        controller: controller Deployment name
+        speaker: speaker DaemonSet name
+        events_tail: number of newest namespace events to keep
+
+    Returns:
+        dict of derived facts (see RETURN)
+    """
+    items = items or []
+    namespaces = {o.get("metadata", {}).get("name") for o in items if o.get("kind") == "Namespace"}
+
+    pods = []
+    for obj in items:
+        meta = obj.get("metadata", {})
+        if obj.get("kind") != "Pod" or meta.get("namespace") != namespace:
+            continue
+        labels = meta.get("labels") or {}
+        statuses = obj.get("status", {}).get("containerStatuses") or []
+        pods.append({
+            "name": meta.get("name"),
+            "component": labels.get("component") or labels.get("app.kubernetes.io/component", ""),
+            "node": obj.get("spec", {}).get("nodeName"),
+            "phase": obj.get("status", {}).get("phase"),
+            "ready": _condition(obj, "Ready"),
+            "restarts": sum(int(s.get("restartCount", 0)) for s in statuses),
+        })
+    pods.sort(key=lambda p: p["name"] or "")
+
+    speaker_state = _daemonset(items, namespace, speaker)
+    speaker_state["nodes"] = sorted({p["node"] for p in pods
+                                     if p["component"] == "speaker" and p["node"]})
+    controller_state = _deployment(items, namespace, controller)
+
+    pools, peers, advertisements = {}, [], []
+    for obj in items:
+        kind = obj.get("kind")
+        meta = obj.get("metadata", {})
+        spec = obj.get("spec", {})
+        if kind == "IPAddressPool":
+            entries = spec.get("addresses") or []
+            ranges = [r for r in (parse_pool_range(e) for e in entries) if r]
+            pools[meta.get("name")] = {
+                "addresses": entries,
+                "invalid": [e for e in entries if not parse_pool_range(e)],
+                "capacity": _capacity(ranges),
+                "auto_assign": spec.get("autoAssign", True),
+                "allocated": [],
+                "advertised": False,
+                "_ranges": ranges,
+            }
+        elif kind == "BGPPeer":
+            peers.append({
+                "name": meta.get("name"),
+                "peer_address": spec.get("peerAddress"),
+                "peer_asn": spec.get("peerASN"),
+                "my_asn": spec.get("myASN"),
+            })
+        elif kind in ("BGPAdvertisement", "L2Advertisement"):
+            advertisements.append({
+                "name": meta.get("name"),
+                "type": "bgp" if kind == "BGPAdvertisement" else "l2",
+                # An advertisement without pools or selectors announces every pool
+                "pools": spec.get("ipAddressPools") or [],
+                "all_pools": not spec.get("ipAddressPools")
+                and not spec.get("ipAddressPoolSelectors"),
+            })
+
+    for adv in advertisements:
+        for name, pool in pools.items():
+            if adv["all_pools"] or name in adv["pools"]:
+                pool["advertised"] = True
+
+    services, pending, outside = [], [], []
+    for obj in items:
+        if obj.get("kind") != "Service" or obj.get("spec", {}).get("type") != "LoadBalancer":
+            continue
+        meta = obj.get("metadata", {})
+        ref = "{}/{}".format(meta.get("namespace"), meta.get("name"))
+        ips = [i.get("ip") for i in obj.get("status", {}).get("loadBalancer", {}).get("ingress") or []
+               if i.get("ip")]
+        annotations = meta.get("annotations") or {}
+        pool_name = next((annotations[a] for a in POOL_ANNOTATIONS if a in annotations), "")
+        for ip in ips:
+            address = ipaddress.ip_address(ip)
+            owner = next((name for name, pool in sorted(pools.items())
+                          if any(first <= address <= last for first, last in pool["_ranges"]
+                                 if first.version == address.version)), "")
+            if owner:
+                pools[owner]["allocated"].append(ip)
+                pool_name = pool_name or owner
+            else:
+                outside.append("{} {}".format(ref, ip))
+        if not ips:
+            pending.append(ref)
+        services.append({"name": ref, "ips": ips, "pool": pool_name, "pending": not ips})
+    services.sort(key=lambda s: s["name"])
+
+    for pool in pools.values():
+        del pool["_ranges"]
+        pool["allocated"].sort(key=lambda ip: ipaddress.ip_address(ip).packed)
+
+    events = sorted(
+        (o for o in items if o.get("kind") == "Event"
+         and o.get("metadata", {}).get("namespace") == namespace),
+        key=lambda e: e.get("lastTimestamp") or e.get("eventTime")
+        or e.get("metadata", {}).get("creationTimestamp") or "",
+    )
+    event_lines = [
+        "{} {} {}/{}: {}".format(
+            e.get("type", ""), e.get("reason", ""),
+            e.get("involvedObject", {}).get("kind", ""),
+            e.get("involvedObject", {}).get("name", ""),
+            (e.get("message") or "").strip())
+        for e in events
+    ][-events_tail:] if events_tail else []
+
+    namespace_exists = namespace in namespaces
+    return {
+        "namespace": namespace,
+        "namespace_exists": namespace_exists,
+        "ready": namespace_exists and controller_state["available"]
+        and speaker_state["rollout_complete"],
+        "controller": controller_state,
+        "speaker": speaker_state,
+        "pods": pods,
+        "pod_lines": [
+            "{} {} {} ready={} restarts={}".format(
+                p["name"], p["phase"], p["node"] or "<none>", p["ready"], p["restarts"])
+            for p in pods
+        ],
+        "pods_not_ready": [p["name"] for p in pods if not p["ready"] and p["phase"] != "Succeeded"],
+        "pools": pools,
+        "bgp_peers": peers,
+        "advertisements": advertisements,
+        "services": services,
+        "coverage": {
+            "allocated": sum(len(p["allocated"]) for p in pools.values()),
+            "capacity": sum(p["capacity"] for p in pools.values()),
+            "pending": pending,
+            "outside_pools": outside,
+            "pools_not_advertised": sorted(n for n, p in pools.items() if not p["advertised"]),
+        },
+        "events": event_lines,
+    }
+
+
+def wait_for_ready(fetch, evaluate, timeout, interval, sleep=time.sleep, clock=time.monotonic):
+    """Repeat the batched fetch until the evaluated state is ready.
+
+    A state whose namespace does not exist is returned at once.
+
+    Args:
+        fetch: callable() -> (items, error message or "")
+        evaluate: callable(items) -> state dict with a 'ready' key
+        timeout: seconds to wait (0 = single attempt)
+        interval: seconds between attempts
+
+    Returns:
+        (state dict or None, attempts, error message)
+    """
+    deadline = clock() + max(timeout, 0)
+    attempts = 0
+    while True:
+        attempts += 1
+        items, error = fetch()
+        state = evaluate(items) if not error else None
+        if state and (state["ready"] or not state.get("namespace_exists", True)):
+            return state, attempts, error
+        if clock() + interval > deadline:
+            return state, attempts, error
+        sleep(interval)
+
+
+def _fetch_items(module, kubectl, kubeconfig, namespace):
+    """Run the batched kubectl gets; retry without CRDs when MetalLB is absent."""
+    env = {"KUBECONFIG": kubeconfig}
+    rc, out, err = module.run_command(
+        [kubectl, "get", CLUSTER_KINDS, "--all-namespaces", "-o", "json"], environ_update=env)
+    if rc != 0:
+        return [], "kubectl get failed: {}".format((err or "").strip())
+    items = json.loads(out).get("items", [])
+    if not any(o.get("kind") == "Namespace" and o.get("metadata", {}).get("name") == namespace
+               for o in items):
+        return items, ""
+
+    tail = ["--namespace", namespace, "-o", "json"]
+    rc, out, err = module.run_command(
+        [kubectl, "get", NAMESPACE_KINDS + "," + METALLB_KINDS] + tail, environ_update=env)
+    if rc != 0 and "resource type" in (err or ""):
+        # MetalLB CRDs not installed: still report deployments/pods
+        rc, out, err = module.run_command([kubectl, "get", NAMESPACE_KINDS] + tail,
+                                          environ_update=env)
+    if rc != 0:
+        return [], "kubectl get failed: {}".format((err or "").strip())
+    return items + json.loads(out).get("items", []), ""
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            namespace=dict(type="str", default="metallb-system"),
+            kubeconfig=dict(type="path", default="/etc/kubernetes/admin.conf"),
+            kubectl=dict(type="str", default="kubectl"),
+            controller=dict(type="str", default="controller"),
+            speaker=dict(type="str", default="speaker"),
+            wait_timeout=dict(type="int", default=0),
+            wait_interval=dict(type="int", default=5),
+            events_tail=dict(type="int", default=50),
+            snapshot_file=dict(type="path"),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+
+    if params["snapshot_file"]:
+        def fetch():
+            with open(params["snapshot_file"]) as fh:
+                return json.load(fh).get("items", []), ""
+    else:
+        def fetch():
+            return _fetch_items(module, params["kubectl"], params["kubeconfig"],
+                                params["namespace"])
+
+    def evaluate(items):
+        return build_metallb_state(items, params["namespace"], params["controller"],
+                                   params["speaker"], params["events_tail"])
+
+    started = time.monotonic()
+    state, attempts, error = wait_for_ready(fetch, evaluate, params["wait_timeout"],
+                                            max(params["wait_interval"], 1))
+    if state is None:
+        module.fail_json(msg=error, attempts=attempts)
+    module.exit_json(changed=False, attempts=attempts,
+                     waited=round(time.monotonic() - started, 1), **state)
+
+
+if __name__ == "__main__":
+    main()
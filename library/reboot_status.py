@@ -0,0 +1,215 @@
+#!/usr/bin/python
+"""Reboot status
+
+Ansible module used by reboot_required_check.yaml and reboot_hosts.yaml.
+Returns everything needed to decide on a reboot in one call, without fact
+gathering:
+
+  - whether ``/run/reboot-required`` exists and since when
+  - the packages listed in ``/run/reboot-required.pkgs``
+  - uptime and boot time from ``/proc/uptime``
+  - the running kernel (uname) and the newest kernel of the same flavour
+    (``amd64``, ``cloud-amd64``, ``rt-amd64``, ...) in ``/boot``; a newer
+    installed kernel is reported, and counts as reboot required only when
+    ``kernel_mismatch_requires_reboot`` is set
+
+The controller aggregates the per-host results with the ``reboot_report``
+filter (filter_plugins/reboot_filters.py).
+"""
+
+import os
+import re
+import time
+
+DOCUMENTATION = r"""
+---
+module: reboot_status
+short_description: Report reboot-required flag, pending packages, uptime and kernel mismatch
+description:
+  - Reads /run/reboot-required(.pkgs), /proc/uptime and /boot in one call.
+  - Never changes anything; runs without gathered facts.
+options:
+  kernel_mismatch_requires_reboot:
+    description: Count a newer installed kernel of the running flavour as reboot
+      required. Off, the mismatch is only reported (C(kernel_mismatch)).
+    type: bool
+    default: false
+  root:
+    description: Filesystem root holding run, proc and boot.
+    type: path
+    default: /
+"""
+
+EXAMPLES = r"""
+- name: Collect reboot status
+  reboot_status:
+  register: reboot_status_result
+"""
+
+RETURN = r"""
+reboot_required:
+  description: Whether the host needs a reboot (flag file or kernel mismatch).
+  type: bool
+  returned: always
+reasons:
+  description: Why a reboot is required (flag-file, kernel-mismatch).
+  type: list
+  returned: always
+packages:
+  description: Packages from /run/reboot-required.pkgs (unique, in file order).
+  type: list
+  returned: always
+required_since:
+  description: Epoch seconds the flag file was written (null without it).
+  type: float
+  returned: always
+uptime_seconds:
+  description: Seconds since boot.
+  type: int
+  returned: always
+running_kernel:
+  description: Release of the running kernel.
+  type: str
+  returned: always
+installed_kernel:
+  description: Newest kernel release of the running flavour found in /boot
+    (empty when none).
+  type: str
+  returned: always
+kernel_mismatch:
+  description: Whether installed_kernel differs from running_kernel.
+  type: bool
+  returned: always
+"""
+
+_CHUNK_RE = re.compile(r"(\d+)")
+
+
+def _version_key(release):
+    """Natural sort key: 6.1.0-18-amd64 sorts after 6.1.0-9-amd64."""
+    return [(0, int(part)) if part.isdigit() else (1, part)
+            for part in _CHUNK_RE.split(release) if part]
+
+
+def kernel_flavour(release):
+    """Flavour suffix of a kernel release: 6.1.0-18-cloud-amd64 -> cloud-amd64."""
+    parts = release.split("-")
+    last = max((i for i, part in enumerate(parts) if part[:1].isdigit()), default=-1)
+    return "-".join(parts[last + 1:])
+
+
+def parse_pkgs(text):
+    """Unique package names from reboot-required.pkgs, in file order."""
+    seen, packages = set(), []
+    for line in (text or "").splitlines():
+        name = line.strip()
+        if name and name not in seen:
+            seen.add(name)
+            packages.append(name)
+    return packages
+
+
+def parse_uptime(text):
+    """Seconds since boot from /proc/uptime (0 when unreadable)."""
+    try:
+        return int(float((text or "").split()[0]))
+    except (IndexError, ValueError):
+        return 0
+
+
+def installed_kernels(boot_files):
+    """Kernel releases from /boot vmlinuz-<release> names, oldest first."""
+    releases = {
+        name[len("vmlinuz-"):] for name in boot_files
+        if name.startswith("vmlinuz-") and not name.endswith((".old", ".bak"))
+    }
+    return sorted(releases, key=_version_key)
+
+
+def build_status(flag_mtime, pkgs_text, uptime_text, boot_files, running_kernel,
+                 kernel_mismatch_requires_reboot=False, now=None):
+    """Combine the raw inputs into the module result.
+
+    Args:
+        flag_mtime: mtime of /run/reboot-required or None when absent
+        pkgs_text: content of /run/reboot-required.pkgs ('' when absent)
+        uptime_text: content of /proc/uptime
+        boot_files: file names in /boot
+        running_kernel: uname -r
+    """
+    now = time.time() if now is None else now
+    kernels = installed_kernels(boot_files)
+    # Only a kernel of the running flavour is what the host would boot next.
+    flavour = kernel_flavour(running_kernel)
+    same_flavour = [k for k in kernels if kernel_flavour(k) == flavour]
+    newest = same_flavour[-1] if same_flavour else ""
+    mismatch = bool(newest) and newest != running_kernel
+    reasons = []
+    if flag_mtime is not None:
+        reasons.append("flag-file")
+    if mismatch and kernel_mismatch_requires_reboot:
+        reasons.append("kernel-mismatch")
+    uptime = parse_uptime(uptime_text)
+    return {
+        "reboot_required": bool(reasons),
+        "reasons": reasons,
+        "packages": parse_pkgs(pkgs_text),
+        "required_since": flag_mtime,
+        "uptime_seconds": uptime,
+        "boot_time": int(now - uptime),
+        "running_kernel": running_kernel,
+        "installed_kernel": newest,
+        "installed_kernels": kernels,
+        "kernel_mismatch": mismatch,
+    }
+
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8", errors="replace") as fh:
+            return fh.read()
+    except OSError:
+        return ""
+
+
+def collect(root="/", running_kernel=None, kernel_mismatch_requires_reboot=False):
+    """Read the reboot inputs under root and return build_status()."""
+    flag = os.path.join(root, "run", "reboot-required")
+    try:
+        flag_mtime = os.path.getmtime(flag)
+    except OSError:
+        flag_mtime = None
+    try:
+        boot_files = os.listdir(os.path.join(root, "boot"))
+    except OSError:
+        boot_files = []
+    return build_status(
+        flag_mtime,
+        _read(flag + ".pkgs"),
+        _read(os.path.join(root, "proc", "uptime")),
+        boot_files,
+        running_kernel or os.uname().release,
+        kernel_mismatch_requires_reboot,
+    )
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            kernel_mismatch_requires_reboot=dict(type="bool", default=False),
+            root=dict(type="path", default="/"),
+        ),
+        supports_check_mode=True,
+    )
+    result = collect(module.params["root"],
+                     kernel_mismatch_requires_reboot=module.params[
+                         "kernel_mismatch_requires_reboot"])
+    module.exit_json(changed=False, **result)
+
+
+if __name__ == "__main__":
+    main()
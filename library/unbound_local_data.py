@@ -0,0 +1,399 @@
+#!/usr/bin/python
+"""Incremental Unbound local-data updates
+
+Ansible module that applies the records of the deployed zone file
+(``/etc/unbound/unbound.conf.d/zone.conf``, rendered by dns_server) to the
+running Unbound through ``unbound-control`` instead of reloading it:
+
+  - the live records are read once with ``unbound-control list_local_data``
+  - only names whose record set differs are touched: one
+    ``local_datas_remove`` call with every changed/removed name and one
+    ``local_datas`` call with every added RR, both fed on stdin
+  - the cache is left alone, so the watchdog does not sit out a cooldown
+    while it warms up again after a reload
+
+``reload_required`` is returned instead of touching Unbound when the zone
+file contains directives other than local-data/local-data-ptr that changed
+since the last apply (structural change), when unbound-control cannot reach
+the daemon, or when the post-apply verification does not match. The caller
+reloads Unbound in that case.
+
+Managed names are the names under ``zone``, every name present in the zone
+file, PTR records pointing at them, and the names recorded in ``state_file``
+on the previous apply; other local data (Unbound's default local zones) is
+never modified. TTLs are not compared.
+"""
+
+import hashlib
+import ipaddress
+import json
+import os
+import re
+
+DOCUMENTATION = r"""
+---
+module: unbound_local_data
+short_description: Apply Unbound local-data changes through unbound-control
+description:
+  - Diffs the local-data and local-data-ptr entries of an Unbound config file
+    against C(unbound-control list_local_data) and applies the difference
+    with one C(local_datas_remove) and one C(local_datas) call.
+  - Returns C(reload_required) for structural changes or when the live
+    update is not possible; the caller reloads Unbound.
+options:
+  zone:
+    description: Managed zone (e.g. C(cluster.local)); live names under it
+      that are not in the config are removed.
+    type: str
+    required: true
+  config_file:
+    description: Unbound config file holding the desired local data.
+    type: path
+    default: /etc/unbound/unbound.conf.d/zone.conf
+  unbound_control:
+    description: unbound-control binary.
+    type: str
+    default: unbound-control
+  state_file:
+    description: Names and structure hash of the last apply.
+    type: path
+    default: /var/lib/unbound/ansible-local-data.json
+  verify:
+    description: Re-read list_local_data after applying and require a match.
+    type: bool
+    default: true
+  dry_run:
+    description: Compute the diff without applying it (implied by check mode).
+    type: bool
+    default: false
+"""
+
+EXAMPLES = r"""
+- name: Apply DNS record changes live via unbound-control
+  unbound_local_data:
+    zone: "{{ dns_zone }}"
+  register: dns_live_apply
+
+- name: Reload Unbound for structural zone changes
+  ansible.builtin.systemd_service:
+    name: unbound
+    state: reloaded
+  when: dns_live_apply.reload_required
+"""
+
+RETURN = r"""
+added:
+  description: RRs added (C(name TYPE rdata)).
+  type: list
+  returned: always
+removed:
+  description: RRs no longer present after the apply.
+  type: list
+  returned: always
+removed_names:
+  description: Names cleared with local_datas_remove (changed or removed).
+  type: list
+  returned: always
+unchanged:
+  description: Number of managed RRs already in sync.
+  type: int
+  returned: always
+reload_required:
+  description: Whether the caller must reload Unbound.
+  type: bool
+  returned: always
+reason:
+  description: Why a reload is required (empty otherwise).
+  type: str
+  returned: always
+"""
+
+NAME_RDATA_TYPES = ("CNAME", "PTR", "NS", "MX", "SRV", "DNAME")
+
+_DIRECTIVE_RE = re.compile(r'^\s*(local-data|local-data-ptr)\s*:\s*"(.*)"\s*(#.*)?$')
+
+
+def _name(value):
+    value = value.strip().lower()
+    return value if value.endswith(".") else value + "."
+
+
+def _rdata(rtype, value):
+    value = " ".join(value.split())
+    if rtype in ("A", "AAAA"):
+        try:
+            return str(ipaddress.ip_address(value))
+        except ValueError:
+            return value
+    if rtype in NAME_RDATA_TYPES:
+        parts = value.split()
+        parts[-1] = _name(parts[-1])
+        return " ".join(parts).lower()
+    return value
+
+
+def parse_rr(text):
+    """Parse 'name [ttl] [IN] TYPE rdata' into a (name, type, rdata) tuple.
+
+    Returns None for lines that are not resource records.
+    """
+    tokens = text.split()
+    if len(tokens) < 3:
+        return None
+    name, rest = tokens[0], tokens[1:]
+    if rest and rest[0].isdigit():
+        rest = rest[1:]
+    if rest and rest[0].upper() in ("IN", "CH", "HS"):
+        rest = rest[1:]
+    if len(rest) < 2:
+        return None
+    rtype = rest[0].upper()
+    return (_name(name), rtype, _rdata(rtype, " ".join(rest[1:])))
+
+
+def ptr_rr(text):
+    """Convert a local-data-ptr value ('IP name') into a PTR RR tuple."""
+    parts = text.split()
+    if len(parts) < 2:
+        return None
+    try:
+        address = ipaddress.ip_address(parts[0])
+    except ValueError:
+        return None
+    return (_name(address.reverse_pointer), "PTR", _name(parts[-1]))
+
+
+def rr_line(rr):
+    """Render an RR tuple in the form unbound-control local_data accepts."""
+    return "{} {} {}".format(*rr)
+
+
+def parse_zone_config(text):
+    """Split an Unbound config file into desired RRs and a structure hash.
+
+    Returns:
+        (set of RR tuples, sha256 of every non-data, non-comment line)
+    """
+    records = set()
+    structure = []
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = _DIRECTIVE_RE.match(line)
+        if match:
+            rr = ptr_rr(match.group(2)) if match.group(1) == "local-data-ptr" \
+                else parse_rr(match.group(2))
+            if rr:
+                records.add(rr)
+                continue
+        structure.append(" ".join(line.split()))
+    digest = hashlib.sha256("\n".join(structure).encode("utf-8")).hexdigest()
+    return records, digest
+
+
+def parse_list_local_data(text):
+    """Parse 'unbound-control list_local_data' output into a set of RR tuples."""
+    records = set()
+    for line in text.splitlines():
+        rr = parse_rr(line)
+        if rr:
+            records.add(rr)
+    return records
+
+
+def _in_zone(name, zone):
+    zone = _name(zone) if zone else ""
+    return bool(zone) and (name == zone or name.endswith("." + zone))
+
+
+def managed_names(desired, live, zone, previous=()):
+    """Return the live/desired names this module owns."""
+    names = {rr[0] for rr in desired} | {_name(n) for n in previous}
+    names |= {rr[0] for rr in live if _in_zone(rr[0], zone)}
+    # PTRs pointing at managed names (reverse names of removed hosts)
+    names |= {rr[0] for rr in live if rr[1] == "PTR" and (rr[2] in names or _in_zone(rr[2], zone))}
+    return names
+
+
+def plan(desired, live, zone, previous=()):
+    """Compute the per-name changes between desired and live local data.
+
+    A name is cleared and re-added when its record set differs at all, since
+    local_data appends to an existing RRset instead of replacing it.
+
+    Returns:
+        dict with remove_names, add (RR tuples), removed (RR tuples),
+        unchanged (int) and names (managed names after the apply)
+    """
+    names = managed_names(desired, live, zone, previous)
+    live_by_name = {}
+    for rr in live:
+        if rr[0] in names:
+            live_by_name.setdefault(rr[0], set()).add(rr)
+    desired_by_name = {}
+    for rr in desired:
+        desired_by_name.setdefault(rr[0], set()).add(rr)
+
+    remove_names, add, removed = [], [], []
+    unchanged = 0
+    for name in sorted(names):
+        want = desired_by_name.get(name, set())
+        have = live_by_name.get(name, set())
+        if want == have:
+            unchanged += len(want)
+            continue
+        if have:
+            remove_names.append(name)
+            removed.extend(sorted(have - want))
+            add.extend(sorted(want))
+        else:
+            add.extend(sorted(want))
+    return {
+        "remove_names": remove_names,
+        "add": add,
+        "removed": removed,
+        "unchanged": unchanged,
+        "names": sorted(desired_by_name),
+    }
+
+
+def apply_plan(run, control, changes):
+    """Apply a plan with one local_datas_remove and one local_datas call.
+
+    Args:
+        run: callable(argv, data) -> (rc, stdout, stderr)
+        control: unbound-control argv prefix (list)
+        changes: plan() result
+
+    Returns:
+        (ok, error message)
+    """
+    batches = (
+        ("local_datas_remove", changes["remove_names"]),
+        ("local_datas", [rr_line(rr) for rr in changes["add"]]),
+    )
+    for command, lines in batches:
+        if not lines:
+            continue
+        rc, out, err = run(control + [command], "\n".join(lines) + "\n")
+        # unbound-control exits 0 even on some per-line errors; check output
+        if rc != 0 or "error" in (out or "").lower():
+            return False, "{} failed: {}".format(command, (err or out or "").strip())
+    return True, ""
+
+
+def live_update(run, control, config_text, zone, state=None, dry_run=False, verify=True):
+    """Diff config_text against the running Unbound and apply the changes.
+
+    Returns:
+        (result dict, new state dict or None when nothing must be stored)
+    """
+    desired, structure = parse_zone_config(config_text)
+    state = state or {}
+    result = {
+        "changed": False,
+        "added": [],
+        "removed": [],
+        "removed_names": [],
+        "unchanged": 0,
+        "reload_required": False,
+        "reason": "",
+    }
+
+    # Missing state: compare against a pure local-data file (the template)
+    previous_structure = state.get("structure", parse_zone_config("server:")[1])
+    if structure != previous_structure:
+        result.update(changed=True, reload_required=True,
+                      reason="zone file directives changed (structural change)")
+        if dry_run:
+            return result, None
+        return result, {"structure": structure, "names": sorted({rr[0] for rr in desired})}
+
+    rc, out, err = run(control + ["list_local_data"], None)
+    if rc != 0:
+        result.update(changed=True, reload_required=True,
+                      reason="unbound-control list_local_data failed: {}".format(
+                          (err or out or "").strip()))
+        return result, None
+
+    changes = plan(desired, parse_list_local_data(out), zone, state.get("names", ()))
+    result.update(
+        added=[rr_line(rr) for rr in changes["add"]],
+        removed=[rr_line(rr) for rr in changes["removed"]],
+        removed_names=changes["remove_names"],
+        unchanged=changes["unchanged"],
+        changed=bool(changes["add"] or changes["remove_names"]),
+    )
+    new_state = {"structure": structure, "names": changes["names"]}
+    if dry_run or not result["changed"]:
+        return result, (None if dry_run else new_state)
+
+    ok, error = apply_plan(run, control, changes)
+    if ok and verify:
+        rc, out, err = run(control + ["list_local_data"], None)
+        leftover = plan(desired, parse_list_local_data(out), zone, changes["names"])
+        if rc != 0 or leftover["add"] or leftover["remove_names"]:
+            ok, error = False, "live records do not match the zone file after apply"
+    if not ok:
+        result.update(reload_required=True, reason=error)
+    return result, new_state
+
+
+def _read_text(path):
+    try:
+        with open(path) as fh:
+            return fh.read()
+    except (IOError, OSError):
+        return None
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            zone=dict(type="str", required=True),
+            config_file=dict(type="path", default="/etc/unbound/unbound.conf.d/zone.conf"),
+            unbound_control=dict(type="str", default="unbound-control"),
+            state_file=dict(type="path", default="/var/lib/unbound/ansible-local-data.json"),
+            verify=dict(type="bool", default=True),
+            dry_run=dict(type="bool", default=False),
+        ),
+        supports_check_mode=True,
+    )
+    config_text = _read_text(module.params["config_file"])
+    if config_text is None:
+        module.fail_json(msg="Cannot read {}".format(module.params["config_file"]))
+
+    state_text = _read_text(module.params["state_file"])
+    state = json.loads(state_text) if state_text else None
+
+    def run(argv, data):
+        return module.run_command(argv, data=data)
+
+    result, new_state = live_update(
+        run,
+        [module.params["unbound_control"]],
+        config_text,
+        module.params["zone"],
+        state=state,
+        dry_run=module.params["dry_run"] or module.check_mode,
+        verify=module.params["verify"],
+    )
+    if new_state is not None:
+        state_dir = os.path.dirname(module.params["state_file"])
+        if state_dir and not os.path.isdir(state_dir):
+            os.makedirs(state_dir, mode=0o755)
+        with open(module.params["state_file"], "w") as fh:
+            json.dump(new_state, fh)
+    result["diff"] = {"prepared": "\n".join(
+        ["- {}".format(line) for line in result["removed"]]
+        + ["+ {}".format(line) for line in result["added"]])}
+    module.exit_json(**result)
+
+
+if __name__ == "__main__":
+    main()
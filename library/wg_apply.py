@@ -0,0 +1,534 @@
+#!/usr/bin/python
+"""Live WireGuard config apply
+
+Ansible module that compares a rendered wg-quick config with the running
+interface (``wg show <iface> dump``) and applies the difference without
+restarting ``wg-quick@<iface>``:
+
+  - peers added, removed or changed (AllowedIPs, Endpoint, keepalive, PSK)
+    are applied atomically with ``wg syncconf <iface> <(wg-quick strip ...)``
+  - routes for added/removed AllowedIPs are updated with ``ip route``
+    (wg syncconf does not touch routes; wg-quick only adds them at start)
+
+Existing peers keep their handshakes, so ``serial: 1`` rollouts do not drop
+traffic cluster-wide. A restart is only reported (``restart_required``) when
+an [Interface] field changes: PrivateKey, ListenPort and FwMark are compared
+with the dump, Address with ``ip addr``, and the wg-quick-only fields (DNS,
+MTU, Table, Pre/PostUp, Pre/PostDown, SaveConfig) with the snapshot stored
+in ``state_file`` on the previous apply.
+
+In check mode (or with ``dry_run``) nothing is applied and the peer diff is
+returned as ``diff_lines``.
+"""
+
+import ipaddress
+import json
+import os
+
+DOCUMENTATION = r"""
+---
+module: wg_apply
+short_description: Apply WireGuard peer changes live with wg syncconf
+description:
+  - Diffs the rendered config against C(wg show <interface> dump) and applies
+    peer changes with C(wg syncconf) plus C(ip route), without restarting
+    the interface.
+  - Reports C(restart_required) when [Interface] fields changed or the
+    interface is not running; the caller restarts wg-quick in that case.
+options:
+  interface:
+    description: WireGuard interface name.
+    type: str
+    required: true
+  config_path:
+    description: Rendered wg-quick config. Defaults to
+      C(/etc/wireguard/<interface>.conf).
+    type: path
+  state_file:
+    description: Snapshot of the last applied wg-quick [Interface] fields.
+      Defaults to C(/etc/wireguard/.<interface>.interface.json).
+    type: path
+  dry_run:
+    description: Compute and return the diff without applying it (implied
+      by check mode).
+    type: bool
+    default: false
+  dump_file:
+    description: Read a recorded C(wg show <interface> dump) instead of
+      calling wg (offline debugging).
+    type: path
+  snapshot_only:
+    description: Only record the wg-quick [Interface] fields of config_path
+      in state_file. Run after wg-quick was started or restarted, so the
+      next apply can compare them.
+    type: bool
+    default: false
+"""
+
+EXAMPLES = r"""
+- name: Apply WireGuard peer changes live
+  wg_apply:
+    interface: "{{ vault_wg_interface }}"
+  register: wg_live_apply
+
+- name: Restart only when [Interface] changed
+  ansible.builtin.systemd_service:
+    name: "wg-quick@{{ vault_wg_interface }}"
+    state: restarted
+  when: wg_live_apply.restart_required
+
+- name: Record the [Interface] fields wg-quick is running with
+  wg_apply:
+    interface: "{{ vault_wg_interface }}"
+    snapshot_only: true
+"""
+
+RETURN = r"""
+restart_required:
+  description: True when [Interface] fields changed, no state_file snapshot
+    exists yet or the interface is down.
+  type: bool
+  returned: always
+interface_changes:
+  description: Names of changed [Interface] fields (values are never returned).
+  type: list
+  returned: always
+peer_diff:
+  description: added, removed and updated peers (keys shortened).
+  type: dict
+  returned: always
+route_changes:
+  description: CIDRs whose routes are added/removed.
+  type: dict
+  returned: always
+diff_lines:
+  description: Human-readable peer diff.
+  type: list
+  returned: always
+"""
+
+WG_QUICK_FIELDS = (
+    "address", "dns", "mtu", "table",
+    "preup", "postup", "predown", "postdown", "saveconfig",
+)
+FIELD_NAMES = {
+    "address": "Address", "dns": "DNS", "mtu": "MTU", "table": "Table",
+    "preup": "PreUp", "postup": "PostUp", "predown": "PreDown",
+    "postdown": "PostDown", "saveconfig": "SaveConfig",
+}
+MULTI_FIELDS = ("address", "dns", "allowedips", "preup", "postup", "predown", "postdown")
+NONE = "(none)"
+
+
+def _split_list(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _norm_cidr(value):
+    try:
+        return str(ipaddress.ip_network(value, strict=False))
+    except ValueError:
+        return value
+
+
+def _norm_address(value):
+    try:
+        return str(ipaddress.ip_interface(value))
+    except ValueError:
+        return value
+
+
+def parse_config(text):
+    """Parse a wg-quick config into (interface, peers).
+
+    interface: dict of lower-cased keys; list values for multi-value fields.
+    peers: dict keyed by public key with allowed_ips (set), endpoint,
+    persistent_keepalive, preshared_key and name (first comment line in
+    the [Peer] section, as written by server.conf.j2/client.conf.j2).
+    """
+    interface = {}
+    peers = []
+    section = None
+    current = None
+    for raw in (text or "").splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            if section == "peer" and current is not None and not current.get("name"):
+                current["name"] = line.lstrip("#").strip().split(" - ")[0]
+            continue
+        if line.startswith("["):
+            section = line.strip("[]").strip().lower()
+            if section == "peer":
+                current = {"allowed_ips": [], "name": ""}
+                peers.append(current)
+            continue
+        if "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        key = key.strip().lower()
+        # wg-quick strips everything after '#', in every section
+        value = value.split("#", 1)[0].strip()
+        if section == "interface":
+            if key in MULTI_FIELDS:
+                interface.setdefault(key, []).extend(
+                    _split_list(value) if key in ("address", "dns") else [value]
+                )
+            else:
+                interface[key] = value
+        elif section == "peer" and current is not None:
+            if key == "allowedips":
+                current["allowed_ips"].extend(_norm_cidr(c) for c in _split_list(value))
+            elif key == "publickey":
+                current["public_key"] = value
+            elif key == "endpoint":
+                current["endpoint"] = value
+            elif key == "persistentkeepalive":
+                current["persistent_keepalive"] = value
+            elif key == "presharedkey":
+                current["preshared_key"] = value
+
+    by_key = {}
+    for peer in peers:
+        if not peer.get("public_key"):
+            continue
+        by_key[peer["public_key"]] = {
+            "name": peer.get("name", ""),
+            "allowed_ips": set(peer["allowed_ips"]),
+            "endpoint": peer.get("endpoint") or NONE,
+            "persistent_keepalive": _keepalive(peer.get("persistent_keepalive")),
+            "preshared_key": peer.get("preshared_key") or NONE,
+        }
+    return interface, by_key
+
+
+def _keepalive(value):
+    if value in (None, "", "off", "0", 0):
+        return "off"
+    return str(value).strip()
+
+
+def parse_dump(text):
+    """Parse ``wg show <iface> dump`` into (interface, peers).
+
+    The first line describes the interface (private-key, public-key,
+    listen-port, fwmark); every following line is one peer.
+    """
+    lines = [line for line in (text or "").splitlines() if line.strip()]
+    if not lines:
+        return None, {}
+    fields = lines[0].split("\t")
+    interface = {
+        "privatekey": fields[0],
+        "publickey": fields[1] if len(fields) > 1 else "",
+        "listenport": fields[2] if len(fields) > 2 else "",
+        "fwmark": fields[3] if len(fields) > 3 else "off",
+    }
+    peers = {}
+    for line in lines[1:]:
+        fields = line.split("\t")
+        if len(fields) < 8:
+            continue
+        allowed = set() if fields[3] == NONE else {_norm_cidr(c) for c in _split_list(fields[3])}
+        peers[fields[0]] = {
+            "preshared_key": fields[1],
+            "endpoint": fields[2],
+            "allowed_ips": allowed,
+            "latest_handshake": int(fields[4] or 0),
+            "persistent_keepalive": _keepalive(fields[7]),
+        }
+    return interface, peers
+
+
+def _short(key):
+    return key[:8] + "..." if key else ""
+
+
+def _endpoint_changed(desired, live):
+    """Compare endpoints; hostnames cannot be compared with the resolved dump value."""
+    if desired == NONE:
+        # Roaming peers without a configured endpoint keep whatever they use
+        return False
+    host = desired.rsplit(":", 1)[0].strip("[]")
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return desired != live
+
+
+def diff_peers(desired, live):
+    """Return peer_diff {added, removed, updated} between config and dump."""
+    added = []
+    removed = []
+    updated = []
+    for key, want in desired.items():
+        have = live.get(key)
+        if have is None:
+            added.append({"public_key": _short(key), "name": want["name"],
+                          "allowed_ips": sorted(want["allowed_ips"])})
+            continue
+        changes = {}
+        add_ips = sorted(want["allowed_ips"] - have["allowed_ips"])
+        remove_ips = sorted(have["allowed_ips"] - want["allowed_ips"])
+        if add_ips or remove_ips:
+            changes["allowed_ips"] = {"add": add_ips, "remove": remove_ips}
+        if _endpoint_changed(want["endpoint"], have["endpoint"]):
+            changes["endpoint"] = [have["endpoint"], want["endpoint"]]
+        if want["persistent_keepalive"] != have["persistent_keepalive"]:
+            changes["persistent_keepalive"] = [have["persistent_keepalive"],
+                                               want["persistent_keepalive"]]
+        if want["preshared_key"] != have["preshared_key"]:
+            changes["preshared_key"] = ["(changed)", "(changed)"]
+        if changes:
+            updated.append({"public_key": _short(key), "name": want["name"], "changes": changes})
+    for key, have in live.items():
+        if key not in desired:
+            removed.append({"public_key": _short(key), "name": "",
+                            "allowed_ips": sorted(have["allowed_ips"])})
+    return {"added": added, "removed": removed, "updated": updated}
+
+
+def route_changes(desired, live):
+    """Return the CIDRs whose routes must be added or removed."""
+    want = set().union(*(p["allowed_ips"] for p in desired.values())) if desired else set()
+    have = set().union(*(p["allowed_ips"] for p in live.values())) if live else set()
+    return {"add": sorted(want - have), "remove": sorted(have - want)}
+
+
+def interface_changes(desired, live, live_addresses=None, applied=None):
+    """Return the names of [Interface] fields that differ from the running state.
+
+    Args:
+        desired: parsed [Interface] of the rendered config
+        live: interface dict from parse_dump
+        live_addresses: CIDRs currently on the interface (None = unknown)
+        applied: wg-quick field snapshot from the previous apply (None = unknown)
+    """
+    changed = []
+    if desired.get("privatekey", "") != live.get("privatekey", ""):
+        changed.append("PrivateKey")
+    listen = desired.get("listenport", "")
+    if listen and listen != live.get("listenport", ""):
+        changed.append("ListenPort")
+    fwmark = desired.get("fwmark", "off")
+    live_fwmark = live.get("fwmark", "off")
+    if str(fwmark).lower() not in ("off", "0", "") or live_fwmark not in ("off", "0"):
+        if _fwmark_int(fwmark) != _fwmark_int(live_fwmark):
+            changed.append("FwMark")
+    if live_addresses is not None:
+        want = sorted(_norm_address(a) for a in desired.get("address", []))
+        have = sorted(_norm_address(a) for a in live_addresses)
+        if want != have:
+            changed.append("Address")
+    if applied is not None:
+        for field in WG_QUICK_FIELDS:
+            if field == "address" and live_addresses is not None:
+                continue
+            if desired.get(field) != applied.get(field):
+                changed.append(FIELD_NAMES[field])
+    return changed
+
+
+def _fwmark_int(value):
+    value = str(value).strip().lower()
+    if value in ("", "off"):
+        return 0
+    return int(value, 16) if value.startswith("0x") else int(value)
+
+
+def wg_quick_snapshot(interface):
+    """Return the wg-quick-only [Interface] fields (no keys) for state_file."""
+    return {field: interface.get(field) for field in WG_QUICK_FIELDS}
+
+
+def route_commands(interface_name, routes, table=None):
+    """Build ip route commands mirroring what wg-quick does at startup."""
+    if str(table or "").lower() == "off":
+        return []
+    suffix = ["table", str(table)] if table and str(table).lower() != "auto" else []
+    commands = []
+    for cidr in routes["add"]:
+        family = "-6" if ":" in cidr else "-4"
+        commands.append(["ip", family, "route", "replace", cidr, "dev", interface_name] + suffix)
+    for cidr in routes["remove"]:
+        family = "-6" if ":" in cidr else "-4"
+        commands.append(["ip", family, "route", "del", cidr, "dev", interface_name] + suffix)
+    return commands
+
+
+def needs_policy_routing(routes):
+    """wg-quick handles /0 AllowedIPs with fwmark rules, which needs a restart."""
+    return any(cidr.endswith("/0") for cidr in routes["add"] + routes["remove"])
+
+
+def diff_lines(peer_diff, routes, changes):
+    """Render a readable diff for dry runs and task output."""
+    lines = []
+    for field in changes:
+        lines.append("~ [Interface] {} (restart required)".format(field))
+    for peer in peer_diff["added"]:
+        lines.append("+ peer {} {} allowed-ips {}".format(
+            peer["name"] or "?", peer["public_key"], ", ".join(peer["allowed_ips"])))
+    for peer in peer_diff["removed"]:
+        lines.append("- peer {} allowed-ips {}".format(
+            peer["public_key"], ", ".join(peer["allowed_ips"]) or NONE))
+    for peer in peer_diff["updated"]:
+        for field, change in sorted(peer["changes"].items()):
+            if field == "allowed_ips":
+                detail = " ".join(["+" + c for c in change["add"]] + ["-" + c for c in change["remove"]])
+            else:
+                detail = "{} -> {}".format(change[0], change[1])
+            lines.append("~ peer {} {} {}: {}".format(
+                peer["name"] or "?", peer["public_key"], field, detail))
+    for cidr in routes["add"]:
+        lines.append("+ route {}".format(cidr))
+    for cidr in routes["remove"]:
+        lines.append("- route {}".format(cidr))
+    return lines
+
+
+def plan(config_text, dump_text, live_addresses=None, applied=None):
+    """Compute the full apply plan from config text and dump text.
+
+    Returns:
+        dict with running, restart_required, interface_changes, peer_diff,
+        route_changes, peers_changed, diff_lines and table
+    """
+    desired_iface, desired_peers = parse_config(config_text)
+    live_iface, live_peers = parse_dump(dump_text)
+    if live_iface is None:
+        return {
+            "running": False,
+            "restart_required": True,
+            "interface_changes": ["(interface not running)"],
+            "peer_diff": {"added": [], "removed": [], "updated": []},
+            "route_changes": {"add": [], "remove": []},
+            "peers_changed": False,
+            "diff_lines": ["! interface not running; wg-quick start required"],
+            "table": desired_iface.get("table"),
+        }
+    changes = interface_changes(desired_iface, live_iface, live_addresses, applied)
+    if applied is None:
+        # PostUp/DNS/MTU/... are invisible in the dump; without a snapshot of
+        # what wg-quick last started with, only a restart is known to apply them
+        changes.append("(no applied snapshot)")
+    peer_diff = diff_peers(desired_peers, live_peers)
+    routes = route_changes(desired_peers, live_peers)
+    if needs_policy_routing(routes) and str(desired_iface.get("table", "auto")).lower() == "auto":
+        changes.append("AllowedIPs /0 (policy routing)")
+    return {
+        "running": True,
+        "restart_required": bool(changes),
+        "interface_changes": changes,
+        "peer_diff": peer_diff,
+        "route_changes": routes,
+        "peers_changed": any(peer_diff.values()),
+        "diff_lines": diff_lines(peer_diff, routes, changes),
+        "table": desired_iface.get("table"),
+    }
+
+
+def _read_text(path):
+    try:
+        with open(path) as fh:
+            return fh.read()
+    except (IOError, OSError):
+        return None
+
+
+def _write_snapshot(state_file, config_text):
+    desired_iface, _ = parse_config(config_text)
+    with open(state_file, "w") as fh:
+        json.dump(wg_quick_snapshot(desired_iface), fh)
+    os.chmod(state_file, 0o600)
+
+
+def _live_addresses(module, interface):
+    rc, out, _ = module.run_command(["ip", "-o", "addr", "show", "dev", interface])
+    if rc != 0:
+        return None
+    addresses = []
+    for line in out.splitlines():
+        fields = line.split()
+        for i, field in enumerate(fields[:-1]):
+            if field in ("inet", "inet6"):
+                addresses.append(fields[i + 1])
+    return addresses
+
+
+def main():
+    # Imported here so the pure helpers above stay importable from
+    # tests/ without Ansible installed (CI python-tests only has pytest).
+    from ansible.module_utils.basic import AnsibleModule
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            interface=dict(type="str", required=True),
+            config_path=dict(type="path"),
+            state_file=dict(type="path"),
+            dry_run=dict(type="bool", default=False),
+            dump_file=dict(type="path"),
+            snapshot_only=dict(type="bool", default=False),
+        ),
+        supports_check_mode=True,
+    )
+    iface = module.params["interface"]
+    config_path = module.params["config_path"] or "/etc/wireguard/{}.conf".format(iface)
+    state_file = module.params["state_file"] or "/etc/wireguard/.{}.interface.json".format(iface)
+    dry_run = module.params["dry_run"] or module.check_mode
+
+    config_text = _read_text(config_path)
+    if config_text is None:
+        module.fail_json(msg="Cannot read {}".format(config_path))
+
+    if module.params["snapshot_only"]:
+        if not module.check_mode:
+            _write_snapshot(state_file, config_text)
+        module.exit_json(changed=False, state_file=state_file)
+
+    if module.params["dump_file"]:
+        dump_text = _read_text(module.params["dump_file"]) or ""
+        addresses = None
+    else:
+        rc, dump_text, _ = module.run_command(["wg", "show", iface, "dump"])
+        if rc != 0:
+            dump_text = ""
+        addresses = _live_addresses(module, iface) if dump_text else None
+
+    applied_text = _read_text(state_file)
+    applied = json.loads(applied_text) if applied_text else None
+
+    result = plan(config_text, dump_text, live_addresses=addresses, applied=applied)
+    result["changed"] = bool(result["peers_changed"] or result["route_changes"]["add"]
+                             or result["route_changes"]["remove"])
+    result["applied"] = False
+    result["diff"] = {"prepared": "\n".join(result["diff_lines"])}
+
+    if dry_run or not result["running"]:
+        module.exit_json(**result)
+
+    if not result["restart_required"]:
+        if result["peers_changed"]:
+            rc, stripped, err = module.run_command(["wg-quick", "strip", config_path])
+            if rc != 0:
+                module.fail_json(msg="wg-quick strip failed", stderr=err, **result)
+            rc, _, err = module.run_command(["wg", "syncconf", iface, "/dev/stdin"], data=stripped)
+            if rc != 0:
+                module.fail_json(msg="wg syncconf failed", stderr=err, **result)
+        for cmd in route_commands(iface, result["route_changes"], result["table"]):
+            rc, _, err = module.run_command(cmd)
+            if rc != 0 and cmd[3] == "replace":
+                module.fail_json(msg="{} failed".format(" ".join(cmd)), stderr=err, **result)
+        result["applied"] = True
+
+    # Snapshot the wg-quick-only fields; when restart_required is set the
+    # caller restarts wg-quick right after this task.
+    _write_snapshot(state_file, config_text)
+
+    module.exit_json(**result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# Managed by Ansible (dns_server role) - DO NOT EDIT
+"""Unbound forwarding watchdog (Python mode)
+
+Runs from unbound-watchdog.timer. Each run is one sample:
+
+  - every test domain is queried concurrently over UDP against the local
+    resolver (A record, RD set), so one slow upstream costs at most
+    ``--timeout`` instead of TIMEOUT x TRIES per domain in sequence
+  - the sample (per-domain success and latency) is appended to a rolling
+    window in ``--state-file``
+  - resolver latency percentiles and success ratios over the window are
+    written to the node-exporter textfile directory
+
+Recovery only happens on sustained degradation. A sample is degraded when no
+domain resolves or the fastest answer is slower than ``--slow-ms``. After
+``--sustained`` degraded samples in a row the cache is flushed once; if the
+next ``--sustained`` samples still fail outright (not merely slow), Unbound is
+restarted and a cooldown starts. Orphaned unbound processes are handled like
+the shell watchdog (kill all, start, cooldown).
+
+Only the standard library is used; the script runs on any host with python3.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+QTYPE_A = 1
+QCLASS_IN = 1
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+# ---------------------------------------------------------------------------
+# DNS wire format
+# ---------------------------------------------------------------------------
+
+
+def build_query(domain, query_id):
+    """Build a recursive A query for domain."""
+    header = struct.pack(">HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    qname = b"".join(
+        bytes([len(label)]) + label.encode("idna")
+        for label in domain.rstrip(".").split(".") if label
+    ) + b"\x00"
+    return header + qname + struct.pack(">HH", QTYPE_A, QCLASS_IN)
+
+
+def _skip_name(data, offset):
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += length + 1
+
+
+def parse_response(data, query_id):
+    """Return (rcode, number of A answers) for a response, or None if invalid."""
+    if len(data) < 12:
+        return None
+    rid, flags, qdcount, ancount = struct.unpack(">HHHH", data[:8])
+    if rid != query_id or not flags & 0x8000:
+        return None
+    offset = 12
+    try:
+        for _ in range(qdcount):
+            offset = _skip_name(data, offset) + 4
+        answers = 0
+        for _ in range(ancount):
+            offset = _skip_name(data, offset)
+            rtype, _, _, rdlength = struct.unpack(">HHIH", data[offset:offset + 10])
+            offset += 10 + rdlength
+            if rtype == QTYPE_A and rdlength == 4:
+                answers += 1
+    except (IndexError, struct.error):
+        return None
+    return flags & 0x000F, answers
+
+
+def probe(domain, server="127.0.0.1", port=53, timeout=2.0, clock=time.monotonic):
+    """Query domain once over UDP and return a result dict."""
+    query_id = random.randint(0, 0xFFFF)
+    started = clock()
+    result = {"domain": domain, "ok": False, "latency_ms": None, "rcode": None, "error": ""}
+    family = socket.AF_INET6 if ":" in server else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        sock.settimeout(timeout)
+        sock.sendto(build_query(domain, query_id), (server, port))
+        while True:
+            remaining = timeout - (clock() - started)
+            if remaining <= 0:
+                raise socket.timeout()
+            sock.settimeout(remaining)
+            data, _ = sock.recvfrom(4096)
+            parsed = parse_response(data, query_id)
+            if parsed is not None:
+                break
+        rcode, answers = parsed
+        result["rcode"] = rcode
+        result["latency_ms"] = round((clock() - started) * 1000.0, 3)
+        result["ok"] = rcode == 0 and answers > 0
+        if not result["ok"]:
+            result["error"] = "rcode {} with {} A answers".format(rcode, answers)
+    except socket.timeout:
+        result["error"] = "timeout"
+    except OSError as exc:
+        result["error"] = str(exc)
+    finally:
+        sock.close()
+    return result
+
+
+def probe_all(domains, server="127.0.0.1", port=53, timeout=2.0, prober=probe):
+    """Query every domain concurrently; results keep the order of domains."""
+    if not domains:
+        return []
+    with ThreadPoolExecutor(max_workers=len(domains)) as pool:
+        futures = [pool.submit(prober, d, server, port, timeout) for d in domains]
+        return [f.result() for f in futures]
+
+
+# ---------------------------------------------------------------------------
+# Rolling window and decisions
+# ---------------------------------------------------------------------------
+
+
+def make_sample(results, now, slow_ms):
+    """Summarize one probe round."""
+    latencies = [r["latency_ms"] for r in results if r["ok"]]
+    ok = bool(latencies)
+    best = min(latencies) if latencies else None
+    return {
+        "ts": now,
+        "ok": ok,
+        "best_ms": best,
+        "degraded": not ok or best > slow_ms,
+        "domains": {r["domain"]: {"ok": r["ok"], "latency_ms": r["latency_ms"]} for r in results},
+    }
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(-(-fraction * len(ordered) // 1)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _trailing(window, predicate):
+    count = 0
+    for sample in reversed(window):
+        if not predicate(sample):
+            break
+        count += 1
+    return count
+
+
+def decide(state, now, sustained=3, cooldown=120):
+    """Pick the recovery action for the current window.
+
+    Returns one of 'none', 'cooldown', 'flush', 'restart' and updates the
+    escalation bookkeeping in state.
+    """
+    window = state["window"]
+    if now - state.get("last_restart", 0) < cooldown:
+        return "cooldown"
+    degraded = _trailing(window, lambda s: s["degraded"])
+    if degraded == 0:
+        state["flushed_at"] = None
+        return "none"
+    if degraded < sustained:
+        return "none"
+    if state.get("flushed_at") is None:
+        state["flushed_at"] = degraded
+        return "flush"
+    failing = _trailing(window, lambda s: not s["ok"])
+    if degraded - state["flushed_at"] >= sustained and failing >= sustained:
+        state["flushed_at"] = None
+        return "restart"
+    return "none"
+
+
+def record(state, sample, window_size):
+    """Append sample and trim the rolling window."""
+    state.setdefault("window", []).append(sample)
+    del state["window"][:-window_size]
+    return state
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics(state, sample, action):
+    """Render Prometheus textfile metrics for the window and latest sample."""
+    window = state["window"]
+    lines = [
+        "# HELP unbound_watchdog_probe_success Whether the test domain resolved in the last run.",
+        "# TYPE unbound_watchdog_probe_success gauge",
+    ]
+    for domain, info in sorted(sample["domains"].items()):
+        lines.append('unbound_watchdog_probe_success{{domain="{}"}} {}'.format(
+            _escape(domain), int(info["ok"])))
+    lines += [
+        "# HELP unbound_watchdog_probe_latency_seconds Latency of the last probe per domain.",
+        "# TYPE unbound_watchdog_probe_latency_seconds gauge",
+    ]
+    for domain, info in sorted(sample["domains"].items()):
+        if info["latency_ms"] is not None:
+            lines.append('unbound_watchdog_probe_latency_seconds{{domain="{}"}} {:.6f}'.format(
+                _escape(domain), info["latency_ms"] / 1000.0))
+
+    latencies = [d["latency_ms"] for s in window for d in s["domains"].values() if d["ok"]]
+    probes = [d for s in window for d in s["domains"].values()]
+    lines += [
+        "# HELP unbound_watchdog_latency_seconds Resolver latency percentiles over the rolling window.",
+        "# TYPE unbound_watchdog_latency_seconds gauge",
+    ]
+    for fraction in PERCENTILES:
+        value = percentile(latencies, fraction)
+        if value is not None:
+            lines.append('unbound_watchdog_latency_seconds{{quantile="{}"}} {:.6f}'.format(
+                fraction, value / 1000.0))
+    lines += [
+        "# HELP unbound_watchdog_success_ratio Share of successful probes in the rolling window.",
+        "# TYPE unbound_watchdog_success_ratio gauge",
+        "unbound_watchdog_success_ratio {:.4f}".format(
+            sum(1 for d in probes if d["ok"]) / len(probes) if probes else 0.0),
+        "# HELP unbound_watchdog_window_samples Samples in the rolling window.",
+        "# TYPE unbound_watchdog_window_samples gauge",
+        "unbound_watchdog_window_samples {}".format(len(window)),
+        "# HELP unbound_watchdog_degraded_streak Consecutive degraded samples.",
+        "# TYPE unbound_watchdog_degraded_streak gauge",
+        "unbound_watchdog_degraded_streak {}".format(_trailing(window, lambda s: s["degraded"])),
+        "# HELP unbound_watchdog_last_action_timestamp_seconds Last time each recovery action ran.",
+        "# TYPE unbound_watchdog_last_action_timestamp_seconds gauge",
+    ]
+    for name in ("flush", "restart"):
+        lines.append('unbound_watchdog_last_action_timestamp_seconds{{action="{}"}} {}'.format(
+            name, int(state.get("last_" + name, 0))))
+    lines += [
+        "# HELP unbound_watchdog_action Action taken in the last run (1 for the taken action).",
+        "# TYPE unbound_watchdog_action gauge",
+    ]
+    for name in ("none", "cooldown", "flush", "restart"):
+        lines.append('unbound_watchdog_action{{action="{}"}} {}'.format(name, int(name == action)))
+    return "\n".join(lines) + "\n"
+
+
+def write_atomic(path, text, mode=0o644):
+    """Write text to path via a temp file + rename (textfile collector safe)."""
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "w") as fh:
+        fh.write(text)
+    os.chmod(tmp, mode)
+    os.replace(tmp, path)
+
+
+def load_state(path):
+    try:
+        with open(path) as fh:
+            state = json.load(fh)
+    except (IOError, OSError, ValueError):
+        state = {}
+    state.setdefault("window", [])
+    return state
+
+
+# ---------------------------------------------------------------------------
+# Host actions
+# ---------------------------------------------------------------------------
+
+
+def log(message):
+    subprocess.run(["logger", "-t", "unbound-watchdog", "-p", "daemon.warning", message],
+                   check=False)
+
+
+def unbound_process_count():
+    proc = subprocess.run(["pgrep", "-x", "unbound"], stdout=subprocess.PIPE,
+                          universal_newlines=True, check=False)
+    return len([line for line in proc.stdout.split() if line.strip()])
+
+
+def run_action(action, state, now):
+    if action == "flush":
+        subprocess.run(["unbound-control", "flush_zone", "."], stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=False)
+        state["last_flush"] = now
+    elif action == "restart":
+        subprocess.run(["systemctl", "restart", "unbound"], check=False)
+        state["last_restart"] = now
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--domain", action="append", dest="domains", default=[],
+                        help="test domain (repeat for several)")
+    parser.add_argument("--server", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=53)
+    parser.add_argument("--timeout", type=float, default=2.0, help="per-query timeout (s)")
+    parser.add_argument("--slow-ms", type=float, default=1500.0,
+                        help="fastest answer slower than this marks the sample degraded")
+    parser.add_argument("--sustained", type=int, default=3,
+                        help="degraded samples in a row before flush (and again before restart)")
+    parser.add_argument("--window", type=int, default=30, help="samples kept in the state file")
+    parser.add_argument("--cooldown", type=int, default=120, help="seconds after a restart")
+    parser.add_argument("--state-file", default="/var/lib/unbound/watchdog-state.json")
+    parser.add_argument("--textfile-dir", default="",
+                        help="node-exporter textfile directory (empty disables metrics)")
+    parser.add_argument("--metrics-file", default="unbound_watchdog.prom")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    now = time.time()
+    state = load_state(args.state_file)
+
+    # Orphaned unbound processes (SO_REUSEPORT) steal queries: kill and restart
+    count = unbound_process_count()
+    if count > 1:
+        log("ORPHAN: found {} unbound processes, expected 1 - killing all and restarting".format(count))
+        subprocess.run(["killall", "-9", "unbound"], check=False)
+        time.sleep(1)
+        subprocess.run(["systemctl", "start", "unbound"], check=False)
+        state["last_restart"] = now
+        write_atomic(args.state_file, json.dumps(state), mode=0o600)
+        return 0
+
+    results = probe_all(args.domains, args.server, args.port, args.timeout)
+    sample = make_sample(results, now, args.slow_ms)
+    record(state, sample, args.window)
+    action = decide(state, now, sustained=args.sustained, cooldown=args.cooldown)
+
+    if action == "flush":
+        log("{} degraded samples in a row (best {} ms) - flushing cache".format(
+            args.sustained, sample["best_ms"]))
+    elif action == "restart":
+        log("resolution still failing {} samples after flush - restarting unbound".format(
+            args.sustained))
+    run_action(action, state, now)
+
+    write_atomic(args.state_file, json.dumps(state), mode=0o600)
+    if args.textfile_dir and os.path.isdir(args.textfile_dir):
+        write_atomic(os.path.join(args.textfile_dir, args.metrics_file),
+                     render_metrics(state, sample, action))
+    return 0 if sample["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
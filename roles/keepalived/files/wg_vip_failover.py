@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# Managed by Ansible (keepalived role) - DO NOT EDIT
+"""WireGuard API VIP failover helper
+
+Called on the WireGuard gateway (through wg-api-vip-failover.sh, which the
+keepalived notify script runs over SSH) when a control plane becomes
+keepalived MASTER. Moves the API VIP /32 to the new owner's AllowedIPs:
+
+  - ``wg show <iface> dump`` is read once for every peer's AllowedIPs
+  - the new AllowedIPs of every control plane are computed in memory (VIP
+    removed everywhere, added to the owner; a peer left empty falls back to
+    its WireGuard /32)
+  - all changed peers are applied with a single ``wg set`` call, so the old
+    and the new owner switch in one netlink update
+
+Each phase is timed; the result (owner, changed peers, read/compute/apply/
+total milliseconds) is logged to syslog and written to ``--state-file``.
+
+Only the standard library is used; the script runs on any host with python3.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+# ---------------------------------------------------------------------------
+# Pure helpers
+# ---------------------------------------------------------------------------
+
+
+def parse_dump(text):
+    """Return {public_key: [allowed ip, ...]} from ``wg show <iface> dump``.
+
+    The first line describes the interface and is skipped; peer lines are
+    public-key, preshared-key, endpoint, allowed-ips, latest-handshake,
+    rx, tx, persistent-keepalive (tab separated).
+    """
+    peers = {}
+    for line in text.splitlines()[1:]:
+        fields = line.split("\t")
+        if len(fields) < 4:
+            continue
+        allowed = fields[3].strip()
+        peers[fields[0]] = [] if allowed in ("", "(none)") else [
+            item.strip() for item in allowed.split(",") if item.strip()
+        ]
+    return peers
+
+
+def plan_failover(planes, live, owner, vip):
+    """Compute the new AllowedIPs of every control plane.
+
+    Args:
+        planes: {name: {public_key, fallback}} from the planes file
+        live: parse_dump() result
+        owner: plane name that now holds the VIP
+        vip: VIP CIDR (e.g. 203.0.113.10/32)
+
+    Returns:
+        (list of (name, public_key, old list, new list) for changed peers,
+         list of warnings)
+    """
+    if owner not in planes:
+        raise ValueError("unknown owner '{}'".format(owner))
+    changes, warnings = [], []
+    # Old owner first: its VIP removal and the new owner's addition go out in
+    # the same wg set call, in this order
+    ordered = sorted(planes, key=lambda name: (name == owner, name))
+    for name in ordered:
+        plane = planes[name]
+        key = plane.get("public_key") or ""
+        if not key:
+            warnings.append("missing public key for '{}'".format(name))
+            continue
+        if key not in live:
+            # wg set would create a new endpoint-less peer; leave it alone
+            warnings.append("peer '{}' not present on the interface".format(name))
+            continue
+        fallback = [plane["fallback"]] if plane.get("fallback") else []
+        current = live[key] or fallback
+        new = [cidr for cidr in current if cidr != vip]
+        if name == owner:
+            new.append(vip)
+        new = new or fallback
+        if set(new) != set(live[key]):
+            changes.append((name, key, live[key], new))
+    return changes, warnings
+
+
+def wg_set_argv(wg, interface, changes):
+    """Build the single ``wg set`` argv applying every change."""
+    argv = [wg, "set", interface]
+    for _, key, _, new in changes:
+        argv += ["peer", key, "allowed-ips", ",".join(new)]
+    return argv
+
+
+def failover(run, wg, interface, planes, owner, vip, dry_run=False, clock=time.monotonic):
+    """Read the live peers, plan and apply the VIP move.
+
+    Args:
+        run: callable(argv) -> (rc, stdout, stderr)
+        clock: monotonic clock (tests may pin it)
+
+    Returns:
+        result dict (ok, owner, changed, warnings, error, timings_ms)
+    """
+    started = clock()
+    result = {
+        "ok": False,
+        "owner": owner,
+        "interface": interface,
+        "vip": vip,
+        "changed": [],
+        "warnings": [],
+        "error": "",
+        "dry_run": dry_run,
+        "timings_ms": {},
+    }
+
+    rc, out, err = run([wg, "show", interface, "dump"])
+    read_done = clock()
+    result["timings_ms"]["read"] = round((read_done - started) * 1000, 3)
+    if rc != 0:
+        result["error"] = "wg show {} dump failed: {}".format(interface, (err or "").strip())
+        return result
+
+    try:
+        changes, warnings = plan_failover(planes, parse_dump(out), owner, vip)
+    except ValueError as exc:
+        result["error"] = str(exc)
+        return result
+    planned = clock()
+    result["timings_ms"]["compute"] = round((planned - read_done) * 1000, 3)
+    result["warnings"] = warnings
+    result["changed"] = [
+        {"name": name, "old": ",".join(old), "new": ",".join(new)}
+        for name, _, old, new in changes
+    ]
+
+    if changes and not dry_run:
+        rc, out, err = run(wg_set_argv(wg, interface, changes))
+        if rc != 0:
+            result["error"] = "wg set failed: {}".format((err or out or "").strip())
+    applied = clock()
+    result["timings_ms"]["apply"] = round((applied - planned) * 1000, 3)
+    result["timings_ms"]["total"] = round((applied - started) * 1000, 3)
+    result["ok"] = not result["error"]
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Host side
+# ---------------------------------------------------------------------------
+
+
+def run_command(argv):
+    proc = subprocess.run(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=False)
+    return proc.returncode, proc.stdout, proc.stderr
+
+
+def log(message):
+    try:
+        subprocess.run(["logger", "-t", "keepalived-wg-failover", message], check=False)
+    except OSError:
+        sys.stderr.write(message + "\n")
+
+
+def write_atomic(path, text, mode=0o644):
+    """Write text to path via a temp file + rename."""
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "w") as fh:
+        fh.write(text)
+    os.chmod(tmp, mode)
+    os.replace(tmp, path)
+
+
+def load_planes(path):
+    """Load {name: {public_key, fallback}} written by the keepalived role."""
+    with open(path) as fh:
+        data = json.load(fh)
+    return data.get("planes", data)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("owner", help="control plane name that now holds the VIP")
+    parser.add_argument("--interface", required=True)
+    parser.add_argument("--vip", required=True, help="VIP CIDR, e.g. 203.0.113.10/32")
+    parser.add_argument("--planes", required=True, help="planes JSON file")
+    parser.add_argument("--wg", default="wg")
+    parser.add_argument("--state-file", default="",
+                        help="write the last result as JSON (empty disables)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the plan without running wg set")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.vip or args.vip.startswith("/"):
+        log("VIP CIDR is not configured")
+        return 1
+    try:
+        planes = load_planes(args.planes)
+    except (IOError, OSError, ValueError) as exc:
+        log("cannot read planes file {}: {}".format(args.planes, exc))
+        return 1
+
+    result = failover(run_command, args.wg, args.interface, planes, args.owner,
+                      args.vip, dry_run=args.dry_run)
+    result["timestamp"] = time.time()
+    for warning in result["warnings"]:
+        log(warning)
+    if result["ok"]:
+        log("set API VIP owner={} on {} ({}): {} peer(s) changed in {:.1f} ms".format(
+            args.owner, args.interface, args.vip, len(result["changed"]),
+            result["timings_ms"]["total"]))
+    else:
+        log("failover to {} failed: {}".format(args.owner, result["error"]))
+    if args.state_file:
+        write_atomic(args.state_file, json.dumps(result, indent=2) + "\n")
+    if args.dry_run:
+        print(json.dumps(result, indent=2))
+    return 0 if result["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
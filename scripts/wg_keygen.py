@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""WireGuard key generation for vault_secrets.yml
+
+Generates the server keypair and one Curve25519 keypair per entry of
+``vault_wg_peers`` in-process and prints them as YAML ready to paste into
+the vault:
+
+    vault_wg_server_private_key / vault_wg_server_public_key
+    vault_wg_peer_private_keys  / vault_wg_peer_public_keys
+
+Compared to the old generate_wg_keys.sh loop (two ``wg`` forks per peer):
+
+  - keys come from ``cryptography`` or PyNaCl when installed, otherwise from
+    the pure-Python RFC 7748 X25519 below, so ``wg`` is not required at all
+  - the vault is decrypted through a pipe (``ansible-vault view`` stdout) and
+    never written to a temp file
+  - ``--only-missing`` keeps every existing key and only generates keys for
+    peers (or the server) without one, for incremental rotation
+
+Usage:
+    python3 scripts/wg_keygen.py > wg_keys.yaml
+    python3 scripts/wg_keygen.py --only-missing > wg_keys.yaml
+    ansible-vault view vault_secrets.yml | python3 scripts/wg_keygen.py --input -
+"""
+
+import argparse
+import base64
+import os
+import subprocess
+import sys
+
+import yaml
+
+KEY_LEN = 32
+
+# ---------------------------------------------------------------------------
+# X25519
+# ---------------------------------------------------------------------------
+
+_P = 2 ** 255 - 19
+_A24 = 121665
+_BASEPOINT = (9).to_bytes(KEY_LEN, "little")
+
+
+def clamp(raw):
+    """Clamp 32 random bytes into an X25519 private scalar (as wg genkey does)."""
+    key = bytearray(raw)
+    key[0] &= 248
+    key[31] &= 127
+    key[31] |= 64
+    return bytes(key)
+
+
+def x25519(scalar, u_point):
+    """Pure-Python X25519 scalar multiplication (RFC 7748, section 5)."""
+    k = int.from_bytes(clamp(scalar), "little")
+    u = bytearray(u_point)
+    u[31] &= 127
+    x1 = int.from_bytes(u, "little")
+    x2, z2, x3, z3 = 1, 0, x1, 1
+    swap = 0
+    for t in reversed(range(255)):
+        k_t = (k >> t) & 1
+        swap ^= k_t
+        if swap:
+            x2, x3, z2, z3 = x3, x2, z3, z2
+        swap = k_t
+        a, b = x2 + z2, x2 - z2
+        aa, bb = a * a % _P, b * b % _P
+        e = aa - bb
+        c, d = x3 + z3, x3 - z3
+        da, cb = d * a % _P, c * b % _P
+        x3 = (da + cb) ** 2 % _P
+        z3 = x1 * (da - cb) ** 2 % _P
+        x2 = aa * bb % _P
+        z2 = e * (aa + _A24 * e) % _P
+    if swap:
+        x2, z2 = x3, z3
+    return (x2 * pow(z2, _P - 2, _P) % _P).to_bytes(KEY_LEN, "little")
+
+
+def _public_from_private_python(private):
+    return x25519(private, _BASEPOINT)
+
+
+def _public_from_private_cryptography(private):
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+    key = X25519PrivateKey.from_private_bytes(private)
+    return key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+
+
+def _public_from_private_nacl(private):
+    from nacl.bindings import crypto_scalarmult_base
+
+    return crypto_scalarmult_base(private)
+
+
+def select_backend():
+    """Return (name, public_from_private) for the fastest available backend."""
+    try:
+        import cryptography.hazmat.primitives.asymmetric.x25519  # noqa: F401
+        return "cryptography", _public_from_private_cryptography
+    except ImportError:
+        pass
+    try:
+        import nacl.bindings  # noqa: F401
+        return "nacl", _public_from_private_nacl
+    except ImportError:
+        pass
+    return "python", _public_from_private_python
+
+
+# ---------------------------------------------------------------------------
+# Key generation
+# ---------------------------------------------------------------------------
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+def generate_keypair(public_from_private=_public_from_private_python, urandom=os.urandom):
+    """Return a (private, public) pair of base64 strings, like wg genkey | wg pubkey."""
+    private = clamp(urandom(KEY_LEN))
+    return _b64(private), _b64(public_from_private(private))
+
+
+def public_key(private_b64, public_from_private=_public_from_private_python):
+    """Derive the base64 public key for a base64 private key (wg pubkey)."""
+    raw = base64.b64decode(private_b64, validate=True)
+    if len(raw) != KEY_LEN:
+        raise ValueError("WireGuard keys are {} bytes, got {}".format(KEY_LEN, len(raw)))
+    return _b64(public_from_private(clamp(raw)))
+
+
+def peer_names(vault):
+    """Return peer names from vault_wg_peers in vault order, skipping unnamed entries."""
+    names = []
+    for peer in (vault or {}).get("vault_wg_peers") or []:
+        name = peer.get("name") if isinstance(peer, dict) else None
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def build_keys(vault, only_missing=False, public_from_private=_public_from_private_python,
+               urandom=os.urandom):
+    """Compute server and peer keys for a decrypted vault dict.
+
+    Args:
+        vault: parsed vault_secrets.yml
+        only_missing: keep existing private keys, generate only absent ones
+        public_from_private: raw 32-byte private -> raw public (backend)
+        urandom: randomness source (tests)
+
+    Returns:
+        dict with server_private, server_public, server_generated,
+        private_keys, public_keys (ordered like vault_wg_peers) and
+        generated (peer names that got new keys)
+    """
+    vault = vault or {}
+    existing = (vault.get("vault_wg_peer_private_keys") or {}) if only_missing else {}
+    generated = []
+
+    server_private = vault.get("vault_wg_server_private_key") if only_missing else None
+    server_generated = not server_private
+    if server_generated:
+        server_private, server_public = generate_keypair(public_from_private, urandom)
+    else:
+        server_public = public_key(server_private, public_from_private)
+
+    private_keys = {}
+    public_keys = {}
+    for name in peer_names(vault):
+        if existing.get(name):
+            private_keys[name] = existing[name]
+            public_keys[name] = public_key(existing[name], public_from_private)
+        else:
+            private_keys[name], public_keys[name] = generate_keypair(public_from_private, urandom)
+            generated.append(name)
+
+    return {
+        "server_private": server_private,
+        "server_public": server_public,
+        "server_generated": server_generated,
+        "private_keys": private_keys,
+        "public_keys": public_keys,
+        "generated": generated,
+    }
+
+
+def render_yaml(keys):
+    """Render build_keys() output in the layout generate_wg_keys.sh used."""
+    generated = set(keys["generated"])
+    server_marker = "  # new" if keys["server_generated"] else ""
+    lines = [
+        "# WireGuard Keys - Add to vault_secrets.yml",
+        'vault_wg_server_private_key: "{}"{}'.format(keys["server_private"], server_marker),
+        'vault_wg_server_public_key: "{}"{}'.format(keys["server_public"], server_marker),
+    ]
+    for section, mapping in (
+        ("vault_wg_peer_private_keys", keys["private_keys"]),
+        ("vault_wg_peer_public_keys", keys["public_keys"]),
+    ):
+        if not mapping:
+            continue
+        lines.extend(["", section + ":"])
+        for name, value in mapping.items():
+            marker = "  # new" if name in generated else ""
+            lines.append('  {}: "{}"{}'.format(name, value, marker))
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Vault access
+# ---------------------------------------------------------------------------
+
+
+def read_vault(vault_file, password_file):
+    """Decrypt vault_file via ansible-vault and parse it without touching disk."""
+    if not os.path.isfile(password_file):
+        sys.exit(
+            "Error: Vault password script not found: {}\n\n"
+            "Ensure vault_password_client.sh exists and is executable:\n"
+            "  chmod +x vault_password_client.sh\n\n"
+            "For GPG setup details, see SECURITY.md".format(password_file)
+        )
+    proc = subprocess.run(
+        ["ansible-vault", "view", vault_file, "--vault-password-file", password_file],
+        stdout=subprocess.PIPE,
+        check=False,
+    )
+    if proc.returncode != 0:
+        sys.exit("Error: ansible-vault view {} failed (rc={})".format(vault_file, proc.returncode))
+    return yaml.safe_load(proc.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vault-file", default="vault_secrets.yml")
+    parser.add_argument(
+        "--vault-password-file",
+        default=os.environ.get("ANSIBLE_VAULT_PASSWORD_FILE", "./vault_password_client.sh"),
+    )
+    parser.add_argument(
+        "--input", metavar="FILE",
+        help="read already-decrypted vault YAML from FILE ('-' for stdin)",
+    )
+    parser.add_argument(
+        "--only-missing", action="store_true",
+        help="keep existing keys, only generate keys for peers without one",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        if args.input == "-":
+            vault = yaml.safe_load(sys.stdin)
+        elif args.input:
+            with open(args.input) as fh:
+                vault = yaml.safe_load(fh)
+        else:
+            vault = read_vault(args.vault_file, args.vault_password_file)
+    except yaml.YAMLError as exc:
+        sys.exit("Error parsing vault: {}".format(exc))
+
+    backend, public_from_private = select_backend()
+    keys = build_keys(vault, only_missing=args.only_missing,
+                      public_from_private=public_from_private)
+
+    if not keys["private_keys"]:
+        print("\nWarning: No peers found in vault_wg_peers\nSkipping peer key generation",
+              file=sys.stderr)
+    print(
+        "Generated {} keypair(s) with the {} backend".format(
+            len(keys["generated"]) + int(keys["server_generated"]), backend),
+        file=sys.stderr,
+    )
+    sys.stdout.write(render_yaml(keys))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
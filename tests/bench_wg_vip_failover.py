@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Benchmark: end-to-end API VIP switchover time against a stub wg.
+
+Runs roles/keepalived/files/wg_vip_failover.py as keepalived would (a fresh
+python3 process per switchover, alternating owners) against the stub wg in
+tests/fixtures/wg_vip_failover/, and compares it with the call pattern of
+the previous bash helper: one ``wg show <iface> allowed-ips`` and one
+``wg set`` per control plane, in sequence (its trim/remove_cidr subshells
+are not counted, so the legacy figure is a lower bound).
+
+Usage:
+  python3 tests/bench_wg_vip_failover.py
+  python3 tests/bench_wg_vip_failover.py --runs 50 --planes 3 --workers 40 --delay-ms 2
+
+--delay-ms adds a fixed cost to every wg call to stand in for netlink round
+trips on a real gateway. Reported numbers are wall-clock milliseconds per
+switchover (p50 / p95 / max) and wg invocations per switchover.
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HELPER = os.path.join(HERE, "..", "roles", "keepalived", "files", "wg_vip_failover.py")
+STUB = os.path.join(HERE, "fixtures", "wg_vip_failover", "wg")
+VIP = "203.0.113.100/32"
+
+
+def _key(index):
+    return base64.b64encode(bytes([index % 256, index // 256]) * 16).decode()
+
+
+def _setup(workdir, planes, workers):
+    plane_map, peers = {}, {}
+    for i in range(planes):
+        key = _key(i + 1)
+        fallback = "100.65.0.{}/32".format(11 + i)
+        plane_map["plane-{}".format(i + 1)] = {"public_key": key, "fallback": fallback}
+        peers[key] = [fallback] + ([VIP] if i == 0 else [])
+    for i in range(workers):
+        peers[_key(1000 + i)] = ["100.65.{}.{}/32".format(1 + i // 200, 1 + i % 200)]
+    state_path = os.path.join(workdir, "wg.json")
+    with open(state_path, "w") as fh:
+        json.dump({"interface": "wg99", "peers": peers, "calls": []}, fh)
+    planes_path = os.path.join(workdir, "planes.json")
+    with open(planes_path, "w") as fh:
+        json.dump({"planes": plane_map}, fh)
+    return state_path, planes_path, plane_map
+
+
+def _calls(state_path):
+    with open(state_path) as fh:
+        return len(json.load(fh)["calls"])
+
+
+def _reset_calls(state_path):
+    with open(state_path) as fh:
+        state = json.load(fh)
+    state["calls"] = []
+    with open(state_path, "w") as fh:
+        json.dump(state, fh)
+
+
+def run_helper(env, planes_path, owner, state_file):
+    subprocess.run(
+        [sys.executable, HELPER, owner, "--interface", "wg99", "--vip", VIP,
+         "--planes", planes_path, "--state-file", state_file, "--wg", STUB],
+        env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_legacy(env, plane_map, owner):
+    """Replay the bash helper's wg calls: show allowed-ips + set, per plane."""
+    for name, plane in plane_map.items():
+        out = subprocess.run([STUB, "show", "wg99", "allowed-ips"], env=env, check=True,
+                             stdout=subprocess.PIPE, universal_newlines=True).stdout
+        current = []
+        for line in out.splitlines():
+            fields = line.split()
+            if fields and fields[0] == plane["public_key"]:
+                current = [c for c in fields[1:] if c != "(none)"]
+        new = [c for c in current if c != VIP] + ([VIP] if name == owner else [])
+        subprocess.run([STUB, "set", "wg99", "peer", plane["public_key"], "allowed-ips",
+                        ",".join(new or [plane["fallback"]])], env=env, check=True)
+
+
+def _stats(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return "p50 {:7.1f}  p95 {:7.1f}  max {:7.1f}".format(pick(0.5), pick(0.95), ordered[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--planes", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_wg_vip_")
+    state_path, planes_path, plane_map = _setup(workdir, args.planes, args.workers)
+    env = dict(os.environ, WG_STUB_STATE=state_path, WG_STUB_DELAY_MS=str(args.delay_ms))
+    owners = list(plane_map)
+    result_file = os.path.join(workdir, "result.json")
+
+    results = {}
+    for label, switch in (
+        ("python helper", lambda owner: run_helper(env, planes_path, owner, result_file)),
+        ("legacy pattern", lambda owner: run_legacy(env, plane_map, owner)),
+    ):
+        samples, internal = [], []
+        _reset_calls(state_path)
+        for run in range(args.runs):
+            owner = owners[(run + 1) % len(owners)]
+            started = time.monotonic()
+            switch(owner)
+            samples.append((time.monotonic() - started) * 1000)
+            if label == "python helper":
+                with open(result_file) as fh:
+                    internal.append(json.load(fh)["timings_ms"]["total"])
+        results[label] = (samples, _calls(state_path) / float(args.runs), internal)
+
+    print("VIP switchover, {} planes, {} other peers, {} runs, stub delay {} ms".format(
+        args.planes, args.workers, args.runs, args.delay_ms))
+    for label, (samples, calls, internal) in results.items():
+        print("  {:15s} wall ms: {}  wg calls/switch: {:.0f}".format(label, _stats(samples), calls))
+        if internal:
+            print("  {:15s} in-helper ms (read+compute+apply): {}".format("", _stats(internal)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
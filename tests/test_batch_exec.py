@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Unit tests for the batch_exec module.
+
+Tests command validation and the concurrent runner of library/batch_exec.py
+with real ``/bin/sh`` commands (echo, exit codes, sleep), so no Ansible or
+remote host is required. Timing assertions use generous margins.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from batch_exec import (
+    NOT_FOUND_RC,
+    TIMEOUT_RC,
+    run_batch,
+    run_command,
+    validate_commands,
+)
+
+
+def _raises(fn, *args):
+    try:
+        fn(*args)
+    except ValueError as exc:
+        return str(exc)
+    raise AssertionError("expected ValueError")
+
+
+def _batch(commands, parallelism=8, timeout=10):
+    return run_batch(validate_commands(commands, timeout), parallelism)
+
+
+# ---------------------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------------------
+
+
+def test_validate_splits_and_wraps_shell():
+    """Strings are shlex-split, lists kept and shell commands wrapped in sh -c."""
+    commands = validate_commands([
+        {"name": "split", "cmd": "grep -E '^frontend|bind' /etc/haproxy/haproxy.cfg"},
+        {"name": "argv", "cmd": ["systemctl", "is-active", "haproxy"], "timeout": 3},
+        {"name": "pipe", "cmd": "ss -tln | wc -l", "shell": True},
+    ], 10)
+    assert commands[0]["argv"] == ["grep", "-E", "^frontend|bind", "/etc/haproxy/haproxy.cfg"]
+    assert commands[1]["argv"] == ["systemctl", "is-active", "haproxy"]
+    assert commands[1]["timeout"] == 3.0
+    assert commands[2]["argv"] == ["/bin/sh", "-c", "ss -tln | wc -l"]
+    assert commands[2]["timeout"] == 10.0
+
+
+def test_validate_collects_every_error():
+    """Missing/duplicate names, empty commands and bad timeouts are all reported."""
+    msg = _raises(validate_commands, [
+        {"cmd": "true"},
+        {"name": "a", "cmd": "true"},
+        {"name": "a", "cmd": "true"},
+        {"name": "empty", "cmd": ""},
+        {"name": "empty-shell", "cmd": " ", "shell": True},
+        {"name": "slow", "cmd": "true", "timeout": 0},
+        "not-a-dict",
+    ])
+    assert "command #0: missing name" in msg
+    assert "command a: duplicate name" in msg
+    assert "command empty: missing cmd" in msg
+    assert "command empty-shell: missing cmd" in msg
+    assert "command slow: invalid timeout 0" in msg
+    assert "command #6: expected a mapping" in msg
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+
+def test_outputs_keyed_by_name_like_command_results():
+    """Each output carries rc, stdout(_lines) and stderr like ansible command."""
+    result = _batch([
+        {"name": "ok", "cmd": "printf 'a\\nb\\n'", "shell": True},
+        {"name": "fail", "cmd": "echo oops >&2; exit 3", "shell": True},
+        {"name": "stdin", "cmd": ["cat"], "stdin": "piped"},
+    ])
+    ok = result["outputs"]["ok"]
+    assert ok["rc"] == 0 and ok["stdout"] == "a\nb" and ok["stdout_lines"] == ["a", "b"]
+    assert result["outputs"]["fail"]["rc"] == 3
+    assert result["outputs"]["fail"]["stderr"] == "oops"
+    assert result["outputs"]["stdin"]["stdout"] == "piped"
+    assert result["failed"] == ["fail"]
+    assert result["timed_out"] == []
+
+
+def test_missing_binary_reported_not_raised():
+    """A missing executable becomes rc 127 instead of failing the batch."""
+    result = run_command(["/nonexistent/probe"], 5)
+    assert result["rc"] == NOT_FOUND_RC
+    assert "nonexistent" in result["stderr"]
+
+
+def test_timeout_kills_pipeline():
+    """A timed-out shell pipeline is killed with its children and marked."""
+    started = time.monotonic()
+    result = _batch([
+        {"name": "hang", "cmd": "sleep 30 | cat", "shell": True, "timeout": 0.3},
+        {"name": "quick", "cmd": "true"},
+    ])
+    assert time.monotonic() - started < 5
+    assert result["outputs"]["hang"]["timed_out"]
+    assert result["outputs"]["hang"]["rc"] == TIMEOUT_RC
+    assert result["timed_out"] == ["hang"]
+    assert result["failed"] == ["hang"]
+    assert result["outputs"]["quick"]["rc"] == 0
+
+
+def test_commands_run_concurrently():
+    """Four 0.4 s commands finish in about one command's time, not four."""
+    started = time.monotonic()
+    result = _batch([{"name": str(i), "cmd": "sleep 0.4"} for i in range(4)], parallelism=4)
+    assert time.monotonic() - started < 1.2
+    assert result["failed"] == []
+
+
+def test_parallelism_bounds_workers():
+    """With parallelism 1 the runner never overlaps two commands."""
+    active, peak = [0], [0]
+
+    def runner(argv, timeout, stdin):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        active[0] -= 1
+        return {"rc": 0, "stdout": argv[0], "stderr": "", "timed_out": False, "elapsed_ms": 0}
+
+    commands = validate_commands([{"name": str(i), "cmd": "true"} for i in range(4)])
+    result = run_batch(commands, parallelism=1, runner=runner)
+    assert peak[0] == 1
+    assert list(result["outputs"]) == ["0", "1", "2", "3"]
+
+
+def test_empty_batch():
+    """No commands yields empty outputs."""
+    result = run_batch([], 4)
+    assert result["outputs"] == {} and result["failed"] == []
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nbatch_exec: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Unit tests for the calico_bgp_apply module.
+
+Tests rendering, diffing and apply planning of library/calico_bgp_apply.py
+against a recorded ``kubectl get bgpconfigurations,bgppeers -o json`` list in
+tests/fixtures/calico_bgp_apply/. No cluster or kubectl is required.
+
+Fixture cluster:
+  BGPConfiguration default  listenPort 178, NodeIP, plus Calico-set fields
+  BGPPeer edge-a            100.65.0.1 AS 64512 (managed)
+  BGPPeer edge-b            100.65.0.2 AS 64512 (managed)
+  BGPPeer old-edge          100.65.0.9 AS 64512 (managed, no longer wanted)
+  BGPPeer manual-peer       198.51.100.1 AS 64600 (not managed)
+
+Note: addresses use 100.65.x and RFC 5737 TEST-NET ranges to satisfy the
+pre-commit security hook.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from calico_bgp_apply import (
+    MANAGED_LABEL,
+    configuration_changed,
+    diff_objects,
+    plan,
+    render_manifest,
+    render_objects,
+    summarize,
+)
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "calico_bgp_apply")
+CONFIG = {"listenPort": 178, "bindMode": "NodeIP"}
+PEERS = [
+    {"name": "edge-a", "peerIP": "100.65.0.1", "asNumber": 64512},
+    {"name": "edge-b", "peerIP": "100.65.0.2", "asNumber": 64512},
+]
+
+
+def _live():
+    with open(os.path.join(FIXTURES, "live.json")) as fh:
+        return json.load(fh)["items"]
+
+
+def _status(results):
+    return {(r["kind"], r["name"]): r["status"] for r in results}
+
+
+def _raises(fn, *args):
+    try:
+        fn(*args)
+    except ValueError as exc:
+        return str(exc)
+    raise AssertionError("expected ValueError")
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+
+def test_render_objects_labels_and_types():
+    """Objects carry the managed label; string ports and ASNs become ints."""
+    objects = render_objects({"listenPort": "178", "bindMode": "NodeIP"},
+                             [{"name": "edge-a", "peerIP": "100.65.0.1", "asNumber": "64512"}])
+    assert [o["kind"] for o in objects] == ["BGPConfiguration", "BGPPeer"]
+    assert objects[0]["metadata"]["name"] == "default"
+    assert objects[0]["spec"]["listenPort"] == 178
+    assert objects[1]["spec"] == {"peerIP": "100.65.0.1", "asNumber": 64512}
+    assert objects[1]["metadata"]["labels"][MANAGED_LABEL] == "ansible-calico-bgp"
+
+
+def test_render_objects_collects_every_error():
+    """Invalid name, peerIP, ASN and duplicates are all reported at once."""
+    msg = _raises(render_objects, None, [
+        {"name": "Bad_Name", "peerIP": "100.65.0.1", "asNumber": 64512},
+        {"name": "no-ip", "asNumber": 64512},
+        {"name": "bad-asn", "peerIP": "100.65.0.3", "asNumber": 0},
+        {"name": "edge-a", "peerIP": "100.65.0.4", "asNumber": 64512},
+        {"name": "edge-a", "peerIP": "100.65.0.5", "asNumber": 64512},
+        "not-a-dict",
+    ])
+    assert "peer Bad_Name: invalid or missing name" in msg
+    assert "peer no-ip: invalid or missing peerIP" in msg
+    assert "peer bad-asn: invalid asNumber 0" in msg
+    assert "peer edge-a: duplicate name" in msg
+    assert "peer #5: expected a mapping" in msg
+
+
+def test_peer_ip_with_port_and_selector_peers():
+    """peerIP may carry a port; selector peers need neither peerIP nor asNumber."""
+    objects = render_objects(None, [
+        {"name": "v4-port", "peerIP": "100.65.0.1:179", "asNumber": 64512},
+        {"name": "v6-port", "peerIP": "[2001:db8::1]:179", "asNumber": 64512},
+        {"name": "mesh", "peerSelector": "has(route-reflector)"},
+    ])
+    assert [o["metadata"]["name"] for o in objects] == ["v4-port", "v6-port", "mesh"]
+
+
+def test_manifest_is_multi_document():
+    """Every object is its own --- document and parses back as JSON."""
+    objects = render_objects(CONFIG, PEERS)
+    manifest = render_manifest(objects)
+    docs = [d for d in manifest.split("---\n") if d.strip()]
+    assert len(docs) == 3
+    assert [json.loads(d) for d in docs] == objects
+    assert render_manifest([]) == ""
+
+
+# ---------------------------------------------------------------------------
+# Diff and plan
+# ---------------------------------------------------------------------------
+
+
+def test_unchanged_ignores_fields_set_by_others():
+    """Fields Calico adds (logSeverityScreen, mesh) and metadata do not count."""
+    results = diff_objects(render_objects(CONFIG, PEERS), _live())
+    assert all(r["status"] == "unchanged" for r in results)
+    assert summarize(results) == {"created": 0, "changed": 0, "unchanged": 3, "pruned": 0}
+
+
+def test_changed_reports_fields():
+    """A new listenPort and a changed peer ASN are reported per field."""
+    peers = [dict(PEERS[0], asNumber=64513), PEERS[1]]
+    results = diff_objects(render_objects({"listenPort": 177, "bindMode": "NodeIP"}, peers),
+                           _live())
+    by_name = {r["name"]: r for r in results}
+    assert by_name["default"]["status"] == "changed"
+    assert by_name["default"]["fields"] == ["listenPort"]
+    assert by_name["edge-a"]["fields"] == ["asNumber"]
+    assert by_name["edge-b"]["status"] == "unchanged"
+
+
+def test_missing_label_is_drift():
+    """An object created by hand without the managed label is re-applied."""
+    live = _live()
+    del live[1]["metadata"]["labels"]
+    results = diff_objects(render_objects(None, PEERS), live)
+    assert _status(results)[("BGPPeer", "edge-a")] == "changed"
+
+
+def test_label_only_drift_is_not_a_configuration_change():
+    """Labelling a hand-made BGPConfiguration is applied without a restart."""
+    live = _live()
+    del live[0]["metadata"]["labels"]
+    results, to_apply, _ = plan(render_objects(CONFIG, PEERS), live)
+    assert _status(results)[("BGPConfiguration", "default")] == "changed"
+    assert [o["metadata"]["name"] for o in to_apply] == ["default"]
+    assert configuration_changed(results) is False
+
+
+def test_spec_change_is_a_configuration_change():
+    """A created BGPConfiguration or a changed spec field needs a restart."""
+    live = _live()
+    del live[0]["metadata"]["labels"]
+    results = diff_objects(render_objects({"listenPort": 177, "bindMode": "NodeIP"}, PEERS),
+                           live)
+    assert configuration_changed(results) is True
+    assert configuration_changed(diff_objects(render_objects(CONFIG, PEERS), [])) is True
+    assert configuration_changed(diff_objects(render_objects(CONFIG, PEERS), _live())) is False
+
+
+def test_plan_applies_only_created_and_changed():
+    """Unchanged objects are left out of the single apply batch."""
+    peers = PEERS + [{"name": "edge-c", "peerIP": "100.65.0.3", "asNumber": 64512}]
+    results, to_apply, to_delete = plan(render_objects(CONFIG, peers), _live())
+    assert _status(results)[("BGPPeer", "edge-c")] == "created"
+    assert [o["metadata"]["name"] for o in to_apply] == ["edge-c"]
+    assert to_delete == []
+
+
+def test_prune_only_managed_peers():
+    """Pruning deletes managed peers that are gone, never unmanaged ones."""
+    results, to_apply, to_delete = plan(render_objects(CONFIG, PEERS), _live(), prune=True)
+    assert to_apply == []
+    assert to_delete == [("BGPPeer", "old-edge")]
+    assert ("BGPPeer", "manual-peer") not in _status(results)
+
+
+def test_empty_cluster_creates_everything():
+    """Without live objects every desired object is created."""
+    results, to_apply, _ = plan(render_objects(CONFIG, PEERS), [])
+    assert summarize(results)["created"] == 3
+    assert len(to_apply) == 3
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\ncalico_bgp_apply: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Unit tests for the cni_matrix module.
+
+Tests the pure helpers of library/cni_matrix.py against a recorded probe pod
+List (tests/fixtures/cni_matrix/pods.json) and recorded probe output. The
+generated probe script is also executed with the local /bin/sh against the
+stub wget/nslookup in tests/fixtures/cni_matrix/bin, so its quoting and
+output format are exercised without a cluster.
+
+Fixture probes (cni-test namespace, one per node):
+  site-a-plane1   100.65.0.10 Ready
+  site-a-worker1  100.65.1.10 Ready
+  site-a-worker2  100.65.2.10 Ready
+  site-b-worker1  no IP, not Ready
+
+Note: pod addresses use 100.65.x and RFC 5737 TEST-NET ranges to satisfy the
+pre-commit security hook.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from cni_matrix import (
+    build_matrix,
+    parse_probe_output,
+    percentile,
+    probe_pods,
+    probe_script,
+    probe_targets,
+    run_probes,
+)
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "cni_matrix")
+SERVICES = [{"name": "clusterip", "url": "http://203.0.113.20:8080/"}]
+DNS = ["kubernetes.default.svc.cluster.local"]
+
+
+def _probes(ready_only=True):
+    with open(os.path.join(FIXTURES, "pods.json")) as fh:
+        probes = probe_pods(json.load(fh)["items"])
+    return [p for p in probes if p["ready"]] if ready_only else probes
+
+
+def _targets():
+    return probe_targets(_probes(), 80, SERVICES, DNS)
+
+
+def _run_script(script, **env):
+    full_env = dict(os.environ, PATH=os.path.join(FIXTURES, "bin") + os.pathsep + os.environ["PATH"])
+    full_env.update(env)
+    proc = subprocess.run(["/bin/sh", "-s"], input=script, env=full_env,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=False)
+    return proc.returncode, proc.stdout, proc.stderr
+
+
+# ---------------------------------------------------------------------------
+# Probes and targets
+# ---------------------------------------------------------------------------
+
+
+def test_probe_pods_sorted_by_node():
+    """Probes are sorted by node; unready pods keep ready=False."""
+    probes = _probes(ready_only=False)
+    assert [p["node"] for p in probes] == [
+        "site-a-plane1", "site-a-worker1", "site-a-worker2", "site-b-worker1"]
+    assert probes[0]["ip"] == "100.65.0.10"
+    assert not probes[-1]["ready"]
+
+
+def test_targets_cover_every_probe_service_and_dns():
+    """Every probe checks N pods + services + DNS names."""
+    targets = _targets()
+    assert [(k, n) for k, n, _ in targets] == [
+        ("pod", "site-a-plane1"), ("pod", "site-a-worker1"), ("pod", "site-a-worker2"),
+        ("service", "clusterip"), ("dns", "kubernetes.default.svc.cluster.local")]
+    assert "http://100.65.1.10:80/" in targets[1][2]
+
+
+def test_probe_script_runs_targets_in_background():
+    """One background job per target and a final wait."""
+    script = probe_script(_targets(), samples=2, timeout=3)
+    assert script.count(" &\n") == 5
+    assert script.rstrip().endswith("wait")
+    assert "-T 3" in script
+    assert "{timeout}" not in script
+
+
+# ---------------------------------------------------------------------------
+# Script execution (local sh + stub wget/nslookup)
+# ---------------------------------------------------------------------------
+
+
+def test_script_output_parses():
+    """The generated script runs under sh and reports every target."""
+    rc, out, err = _run_script(probe_script(_targets(), samples=2, timeout=1),
+                               CNI_STUB_UNREACHABLE="100.65.2.10",
+                               CNI_STUB_NXDOMAIN="kubernetes.default.svc.cluster.local")
+    assert rc == 0, err
+    parsed = parse_probe_output(out)
+    assert len(parsed) == 5
+    assert parsed[("pod", "site-a-worker1")][0] == 2
+    assert len(parsed[("pod", "site-a-worker1")][1]) == 2
+    assert parsed[("pod", "site-a-worker2")] == (0, [])
+    assert parsed[("dns", "kubernetes.default.svc.cluster.local")] == (0, [])
+
+
+def test_script_quotes_service_urls():
+    """Service URLs with shell metacharacters reach wget unmodified."""
+    targets = [("service", "odd", "wget -q -O /dev/null -T {timeout} 'http://203.0.113.5/?a=1&b=2'")]
+    rc, out, _ = _run_script(probe_script(targets, samples=1), CNI_STUB_UNREACHABLE="a=1&b=2")
+    assert rc == 0
+    assert parse_probe_output(out)[("service", "odd")] == (0, [])
+
+
+# ---------------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------------
+
+
+def test_parse_probe_output_recorded():
+    """Recorded output: microseconds become milliseconds, noise is ignored."""
+    with open(os.path.join(FIXTURES, "probe_site-a-plane1.txt")) as fh:
+        parsed = parse_probe_output(fh.read())
+    assert parsed[("pod", "site-a-worker1")] == (3, [1.21, 1.18, 1.302])
+    assert parsed[("pod", "site-a-worker2")] == (0, [])
+    assert len(parsed) == 5
+
+
+def test_percentile_nearest_rank():
+    """Nearest-rank percentiles; empty input gives None."""
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 90) == 90.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([4.0], 99) == 4.0
+    assert percentile([], 50) is None
+
+
+def test_build_matrix_from_recorded_output():
+    """Failed pairs, partial DNS and missing probes are all reported."""
+    with open(os.path.join(FIXTURES, "probe_site-a-plane1.txt")) as fh:
+        recorded = fh.read()
+    probes = _probes()
+    outputs = {
+        "probe-site-a-plane1": (0, recorded, ""),
+        "probe-site-a-worker1": (1, "", "error: unable to upgrade connection"),
+    }
+    result = build_matrix(probes, outputs, _targets(), samples=3)
+    row = result["matrix"]["site-a-plane1"]
+    assert row["site-a-plane1"]["ok"]
+    assert row["site-a-worker1"]["p50_ms"] == 1.21
+    assert not row["site-a-worker2"]["ok"]
+    assert "site-a-plane1 -> site-a-worker2 (pod)" in result["failures"]
+    assert "site-a-plane1 -> kubernetes.default.svc.cluster.local (dns)" in result["failures"]
+    assert result["errors"] == [
+        "probe-site-a-worker1: error: unable to upgrade connection",
+        "probe-site-a-worker2: not run",
+    ]
+    assert result["summary"]["pod_pairs"] == 9
+    assert result["summary"]["same_node_failed"] == 2
+    assert result["summary"]["cross_node_failed"] == 5
+    assert not result["summary"]["ok"]
+    assert result["latency_ms"]["pod"]["count"] == 6
+    assert result["latency_ms"]["service"]["p50"] == 0.95
+    assert result["matrix_lines"][0].startswith("site-a-plane1: site-a-plane1=0.395ms")
+    assert "site-a-worker2=FAIL(0/3)" in result["matrix_lines"][0]
+
+
+def test_build_matrix_all_ok():
+    """A full matrix with every sample received is ok."""
+    probes = _probes()
+    targets = probe_targets(probes, 80)
+    line = "".join("R pod {} 1 500\n".format(p["node"]) for p in probes)
+    outputs = {p["name"]: (0, line, "") for p in probes}
+    result = build_matrix(probes, outputs, targets, samples=1)
+    assert result["summary"]["ok"]
+    assert result["failures"] == []
+    assert result["latency_ms"]["pod"] == {
+        "count": 9, "p50": 0.5, "p90": 0.5, "p99": 0.5, "max": 0.5}
+
+
+# ---------------------------------------------------------------------------
+# Concurrency
+# ---------------------------------------------------------------------------
+
+
+def test_run_probes_concurrent_and_bounded():
+    """Probes run concurrently, never more than parallelism at once."""
+    probes = [{"name": "probe-{}".format(i)} for i in range(8)]
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def run(argv, data):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return 0, argv[-1] + ":" + data, ""
+
+    started = time.monotonic()
+    outputs = run_probes(run, probes, "script", lambda name: ["exec", name], parallelism=4)
+    elapsed = time.monotonic() - started
+    assert peak[0] == 4
+    assert elapsed < 0.35
+    assert outputs["probe-3"] == (0, "probe-3:script", "")
+    assert run_probes(run, [], "script", lambda name: [name]) == {}
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\ncni_matrix: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""Unit tests for the deb_packages module.
+
+Tests the dpkg version comparison, the deb822 parsers and the upgrade, hold
+and autoremove planning of library/deb_packages.py against a recorded
+filesystem root in tests/fixtures/deb_packages/root (dpkg status, apt
+extended_states and apt lists for bookworm, bookworm-backports and
+experimental). No dpkg or apt is required.
+
+Fixture host:
+  upgrades     base-files, curl, libc6, libcurl4, kubelet, python3-old,
+               tzdata, wireguard-tools (installed from backports)
+  held         containerd.io (dpkg hold)
+  no upgrade   vim (newer only in backports), curl 8.x (experimental only)
+  autoremove   python3-old, linux-image-6.1.0-17-amd64 (old kernel, kept by
+               the APT::NeverAutoRemove list in apt-config-dump.txt)
+  kept         postfix (provides mail-transport-agent for bsd-mailx)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from deb_packages import (
+    autoremove_argv,
+    build_state,
+    candidate_version,
+    compare_versions,
+    load_candidates,
+    parse_dependencies,
+    parse_extended_states,
+    parse_never_autoremove,
+    parse_paragraphs,
+    parse_release_flags,
+    parse_status,
+    plan_changes,
+    transaction_argv,
+)
+
+
+ROOT = os.path.join(os.path.dirname(__file__), "fixtures", "deb_packages", "root")
+LISTS = os.path.join(ROOT, "var", "lib", "apt", "lists")
+APT_CONFIG = os.path.join(os.path.dirname(__file__), "fixtures", "deb_packages",
+                          "apt-config-dump.txt")
+
+
+def _installed():
+    with open(os.path.join(ROOT, "var", "lib", "dpkg", "status")) as fh:
+        return parse_status(fh)
+
+
+def _auto():
+    with open(os.path.join(ROOT, "var", "lib", "apt", "extended_states")) as fh:
+        return parse_extended_states(fh)
+
+
+def _names(entries):
+    return [e["name"] for e in entries]
+
+
+# ---------------------------------------------------------------------------
+# Versions
+# ---------------------------------------------------------------------------
+
+
+def test_compare_versions_dpkg_rules():
+    """Epochs, tildes, revisions and numeric runs order like dpkg."""
+    assert compare_versions("1.0", "1.0") == 0
+    assert compare_versions("1.0-1", "1.0-2") < 0
+    assert compare_versions("1:1.0", "2.0") > 0
+    assert compare_versions("1.0~rc1", "1.0") < 0
+    assert compare_versions("1.0~~", "1.0~") < 0
+    assert compare_versions("1.10", "1.9") > 0
+    assert compare_versions("1.0+deb12u5", "1.0+deb12u4") > 0
+    assert compare_versions("1.0-1~bpo12+2", "1.0-1~bpo12+1") > 0
+    assert compare_versions("1.0-1~bpo12+1", "1.0-1") < 0
+    assert compare_versions("1.001", "1.1") == 0
+    assert compare_versions("2025b-0+deb12u1", "2024a-0+deb12u1") > 0
+
+
+def test_candidate_version_priorities():
+    """Higher priority wins first; the installed version is never downgraded."""
+    assert candidate_version({"2.0": 100, "1.5": 500}, "1.0") == "1.5"
+    assert candidate_version({"2.0": 100}, "1.0") == "2.0"
+    assert candidate_version({"2.0": 1}, "1.0") == "1.0"
+    assert candidate_version({"0.9": 500}, "1.0") == "1.0"
+    assert candidate_version({"1.0": 500, "1.1": 500}) == "1.1"
+
+
+# ---------------------------------------------------------------------------
+# Parsers
+# ---------------------------------------------------------------------------
+
+
+def test_paragraphs_and_continuation_lines():
+    """Multi-line fields are joined and unwanted fields dropped."""
+    paras = list(parse_paragraphs([
+        "Package: a\n", "Description: short\n", " long line\n", "\n",
+        "Package: b\n", "Version: 1\n",
+    ]))
+    assert paras == [{"Package": "a", "Description": "short\nlong line"},
+                     {"Package": "b", "Version": "1"}]
+    assert list(parse_paragraphs(["Package: a\n", "Version: 1\n"], {"Package"})) == [
+        {"Package": "a"}]
+
+
+def test_dependencies_alternatives_and_qualifiers():
+    """Versions, arch qualifiers and alternatives are reduced to names."""
+    assert parse_dependencies("libc6 (>= 2.34), default-mta | mail-transport-agent, "
+                              "zlib1g:any, foo [amd64]") == [
+        ["libc6"], ["default-mta", "mail-transport-agent"], ["zlib1g"], ["foo"]]
+    assert parse_dependencies("") == []
+
+
+def test_status_installed_holds_and_config_files():
+    """Config-files-only packages are skipped; holds and essentials flagged."""
+    installed = _installed()
+    assert ("old-config-only", "amd64") not in installed
+    assert installed[("containerd.io", "amd64")]["hold"]
+    assert installed[("base-files", "amd64")]["essential"]
+    assert installed[("postfix", "amd64")]["provides"] == ["default-mta", "mail-transport-agent"]
+    assert len(installed) == 16
+
+
+def test_extended_states_auto_flags():
+    """Only Auto-Installed: 1 entries count as automatic."""
+    auto = _auto()
+    assert ("libc6", "amd64") in auto
+    assert ("kubelet", "amd64") not in auto
+
+
+def test_release_flags_signed_inrelease():
+    """The PGP armor of InRelease is skipped before reading the fields."""
+    path = os.path.join(LISTS, "deb.debian.org_debian_dists_bookworm-backports_InRelease")
+    with open(path) as fh:
+        assert parse_release_flags(fh) == (True, True)
+    assert parse_release_flags(["Suite: stable\n"]) == (False, False)
+
+
+def test_candidates_respect_suite_priorities():
+    """Backports upgrade only what came from backports; experimental never wins."""
+    candidates = load_candidates(LISTS, _installed())
+    assert candidates[("curl", "amd64")] == "7.88.1-10+deb12u5"
+    assert candidates[("vim", "amd64")] == "2:9.0.1378-2"
+    assert candidates[("wireguard-tools", "amd64")] == "1.0.20210914-1~bpo12+2"
+
+
+# ---------------------------------------------------------------------------
+# Planning
+# ---------------------------------------------------------------------------
+
+
+def test_plan_upgrade_hold_autoremove_sets():
+    """The fixture host yields the documented upgrade, hold and autoremove sets."""
+    plan = build_state(ROOT, autoremove=True)
+    assert _names(plan["upgrades"]) == [
+        "base-files", "curl", "kubelet", "libc6", "libcurl4", "python3-old", "tzdata",
+        "wireguard-tools"]
+    assert plan["held"] == [{"name": "containerd.io", "arch": "amd64",
+                             "installed": "1.6.20-1", "candidate": "1.6.28-1",
+                             "reason": "dpkg hold"}]
+    assert plan["autoremove"] == ["linux-image-6.1.0-17-amd64", "python3-old"]
+    assert plan["summary"] == {"installed": 16, "upgradable": 9, "upgrades": 8,
+                               "held": 1, "autoremove": 2}
+    assert plan["auto_upgraded"] == ["libc6", "libcurl4", "python3-old"]
+
+
+def test_hold_option_and_never_autoremove():
+    """Extra holds move packages to held; keep patterns protect kernels."""
+    plan = build_state(ROOT, hold=["kubelet"], never_autoremove=[r"^linux-image-"],
+                       autoremove=True)
+    assert "kubelet" not in _names(plan["upgrades"])
+    assert {"kubelet": "hold option"} == {
+        h["name"]: h["reason"] for h in plan["held"] if h["name"] == "kubelet"}
+    assert plan["autoremove"] == ["python3-old"]
+    assert build_state(ROOT)["autoremove"] == []
+
+
+def test_apt_never_autoremove_keeps_fallback_kernel():
+    """APT::NeverAutoRemove from apt-config dump keeps the kernels apt keeps."""
+    with open(APT_CONFIG) as fh:
+        patterns = parse_never_autoremove(fh)
+    assert "^firmware-linux.*" in patterns
+    assert r"^linux-image-6\.1\.0-17-amd64$" in patterns
+    assert "" not in patterns and "linux-.*" not in patterns
+    plan = build_state(ROOT, never_autoremove=patterns, autoremove=True)
+    assert plan["autoremove"] == ["python3-old"]
+
+
+def test_virtual_provider_kept():
+    """postfix is auto-installed but provides the MTA bsd-mailx depends on."""
+    plan = plan_changes(_installed(), {}, _auto(), autoremove=True)
+    assert "postfix" not in plan["autoremove"]
+    assert plan["upgrades"] == []
+
+
+def test_single_transaction_argv():
+    """Upgrades are one safe apt-get upgrade that never removes packages."""
+    plan = build_state(ROOT, autoremove=True)
+    argv = transaction_argv(plan)
+    assert argv[:5] == ["apt-get", "upgrade", "-y", "--with-new-pkgs", "--no-remove"]
+    assert "Dpkg::Options::=--force-confold" in argv
+    assert "curl" in argv and "wireguard-tools" in argv and "python3-old" in argv
+    assert "containerd.io" not in argv
+    assert not [arg for arg in argv if arg.endswith("-") and not arg.startswith("-")]
+    assert transaction_argv({"upgrades": [], "autoremove": []}) is None
+
+
+def test_removals_left_to_apt_autoremove():
+    """Removals only run through apt-get autoremove, and only when planned."""
+    assert autoremove_argv(build_state(ROOT, autoremove=True))[:3] == [
+        "apt-get", "autoremove", "-y"]
+    assert autoremove_argv(build_state(ROOT)) is None
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\ndeb_packages: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Unit tests for the Unbound zone filter plugins.
+
+Tests dns_zone_model and dns_zone_render from filter_plugins/dns_zone_filters.py,
+which build roles/dns_server/templates/zone.conf.j2 from dns_records.
+
+Note: All IPs use RFC 5737 TEST-NET ranges (203.0.113.0/24, 198.51.100.0/24)
+and the RFC 3849 documentation prefix to satisfy the pre-commit security hook.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "filter_plugins"))
+
+from dns_zone_filters import AnsibleFilterError, dns_zone_model, dns_zone_render
+
+ZONE = "cluster.local"
+
+
+def _a(name, ip, **extra):
+    record = {"type": "A", "name": name, "ip": ip}
+    record.update(extra)
+    return record
+
+
+def _raises(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+    except AnsibleFilterError as exc:
+        return str(exc)
+    raise AssertionError("expected AnsibleFilterError")
+
+
+# ---------------------------------------------------------------------------
+# Normalization, sorting and dedup
+# ---------------------------------------------------------------------------
+
+
+def test_records_sorted_and_qualified():
+    """Records are sorted deterministically and get absolute names."""
+    model = dns_zone_model(
+        [_a("k8s-worker1", "203.0.113.21"), _a("k8s-api", "203.0.113.10")], ZONE)
+    assert [r["fqdn"] for r in model["records"]] == [
+        "k8s-api.cluster.local.", "k8s-worker1.cluster.local."]
+    assert model["by_name"]["k8s-api.cluster.local."] == [{"type": "A", "value": "203.0.113.10"}]
+
+
+def test_output_independent_of_input_order():
+    """Shuffled input renders byte-identical output."""
+    records = [_a("b", "203.0.113.2"), _a("a", "203.0.113.1"), _a("c", "198.51.100.3")]
+    assert dns_zone_render(records, ZONE) == dns_zone_render(list(reversed(records)), ZONE)
+
+
+def test_exact_duplicates_dropped():
+    """Same name/type/value (case-insensitive) is kept once and reported."""
+    model = dns_zone_model(
+        [_a("k8s-api", "203.0.113.10"), {"type": "a", "name": "K8S-API", "ip": "203.0.113.10"}],
+        ZONE)
+    assert model["summary"]["records"] == 1
+    assert model["duplicates"] == ["k8s-api.cluster.local. A 203.0.113.10"]
+
+
+def test_absolute_name_kept():
+    """Names ending in a dot are not suffixed with the zone."""
+    model = dns_zone_model([_a("nas.example.org.", "198.51.100.5")], ZONE)
+    assert model["records"][0]["fqdn"] == "nas.example.org."
+
+
+# ---------------------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------------------
+
+
+def test_conflicting_values_rejected():
+    """A repeated name with a different IP is a conflict by default."""
+    msg = _raises(dns_zone_model,
+                  [_a("k8s-api", "203.0.113.10"), _a("k8s-api", "203.0.113.11")], ZONE)
+    assert "conflicting A values" in msg
+
+
+def test_multi_value_allowed_when_enabled():
+    """allow_multi_value keeps round-robin A records."""
+    model = dns_zone_model([_a("k8s-api", "203.0.113.10"), _a("k8s-api", "203.0.113.11")],
+                           ZONE, allow_multi_value=True)
+    assert model["summary"]["records"] == 2
+    assert model["ptr"] == {"203.0.113.10": "k8s-api.cluster.local.",
+                            "203.0.113.11": "k8s-api.cluster.local."}
+
+
+def test_cname_conflicts_with_other_types():
+    """CNAME next to an A record on the same name is rejected."""
+    msg = _raises(dns_zone_model,
+                  [_a("api", "203.0.113.10"), {"type": "CNAME", "name": "api", "target": "k8s-api"}],
+                  ZONE)
+    assert "CNAME cannot coexist" in msg
+
+
+def test_all_errors_reported_at_once():
+    """Every invalid record is listed in one error message."""
+    msg = _raises(dns_zone_model, [
+        _a("bad-ip", "203.0.113.300"),
+        {"type": "A", "name": "no-ip"},
+        {"type": "MX", "name": "mail", "ip": "203.0.113.5"},
+        _a("-bad-name", "203.0.113.6"),
+        {"type": "AAAA", "name": "v6", "ip": "203.0.113.7"},
+        "not-a-dict",
+    ], ZONE)
+    assert "invalid IP address" in msg
+    assert "A record without ip" in msg
+    assert "unsupported type MX" in msg
+    assert "invalid DNS name" in msg
+    assert "needs an IPv6 address" in msg
+    assert "expected a mapping" in msg
+
+
+def test_non_strict_drops_invalid_records():
+    """strict=False keeps valid records and returns the errors."""
+    model = dns_zone_model([_a("ok", "203.0.113.1"), _a("bad", "nope")], ZONE, strict=False)
+    assert [r["name"] for r in model["records"]] == ["ok"]
+    assert len(model["errors"]) == 1
+
+
+# ---------------------------------------------------------------------------
+# PTR generation and rendering
+# ---------------------------------------------------------------------------
+
+
+def test_ptr_first_name_wins_unless_preferred():
+    """Shared addresses get one PTR; ptr: true overrides the sorted first name."""
+    records = [_a("alpha", "203.0.113.10"), _a("k8s-api", "203.0.113.10")]
+    assert dns_zone_model(records, ZONE)["ptr"] == {"203.0.113.10": "alpha.cluster.local."}
+    records[1]["ptr"] = True
+    assert dns_zone_model(records, ZONE)["ptr"] == {"203.0.113.10": "k8s-api.cluster.local."}
+
+
+def test_ptr_opt_out_and_disable():
+    """ptr: false skips a record; generate_ptr=False disables PTRs entirely."""
+    model = dns_zone_model([_a("vip", "203.0.113.10", ptr=False)], ZONE)
+    assert model["ptr"] == {}
+    model = dns_zone_model([_a("host", "203.0.113.11")], ZONE, generate_ptr=False)
+    assert model["ptr"] == {}
+
+
+def test_rendered_block():
+    """The rendered block matches the Unbound local-data syntax."""
+    rendered = dns_zone_render([
+        _a("k8s-api", "203.0.113.10"),
+        {"type": "AAAA", "name": "k8s-api", "ip": "2001:DB8::10"},
+        {"type": "CNAME", "name": "api", "target": "k8s-api"},
+    ], ZONE)
+    assert rendered == (
+        "# BEGIN ANSIBLE MANAGED DNS ZONE\n"
+        "server:\n"
+        '    local-data: "api.cluster.local. CNAME k8s-api.cluster.local."\n'
+        '    local-data: "k8s-api.cluster.local. A 203.0.113.10"\n'
+        '    local-data: "k8s-api.cluster.local. AAAA 2001:db8::10"\n'
+        '    local-data-ptr: "203.0.113.10 k8s-api.cluster.local."\n'
+        '    local-data-ptr: "2001:db8::10 k8s-api.cluster.local."\n'
+        "# END ANSIBLE MANAGED DNS ZONE\n"
+    )
+
+
+def test_large_zone_single_pass():
+    """A few thousand records index and render without per-record work outside the filter."""
+    records = [_a("host{}".format(i), "198.51.100.{}".format(i % 250 + 1)) for i in range(2000)]
+    model = dns_zone_model(records, ZONE, allow_multi_value=True)
+    assert model["summary"]["records"] == 2000
+    assert model["summary"]["ptr"] == 250
+    assert model["rendered"].count("local-data:") == 2000
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\ndns_zone_filters: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Unit tests for the folder_state module.
+
+Tests classify_folders and parse_mount_table from library/folder_state.py
+against temporary directories and recorded mount/fstab text; no root access
+or real NFS mounts are required. The last section runs the module through
+``ansible localhost -m`` when Ansible is installed (CI unit-tests job).
+
+Note: NFS servers use RFC 5737 TEST-NET addresses to satisfy the pre-commit
+security hook.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "library")
+sys.path.insert(0, LIBRARY)
+
+from folder_state import classify_folders, parse_mount_table
+
+
+PROC_MOUNTS = """\
+sysfs /sys sysfs rw,nosuid,nodev,noexec,relatime 0 0
+203.0.113.5:/srv/nfs/share /mnt/share nfs4 rw,relatime,vers=4.2 0 0
+/dev/sdb1 /mnt/with\\040space ext4 rw,relatime 0 0
+"""
+
+FSTAB = """\
+# <file system> <mount point> <type> <options> <dump> <pass>
+UUID=abcd / ext4 defaults 0 1
+203.0.113.5:/srv/nfs/share/ /mnt/share nfs defaults 0 0
+"""
+
+
+def _tmpdir():
+    return tempfile.mkdtemp(prefix="folder_state_")
+
+
+# ---------------------------------------------------------------------------
+# parse_mount_table tests
+# ---------------------------------------------------------------------------
+
+
+def test_parse_mount_table_skips_comments():
+    """Comments and blank lines are ignored."""
+    entries = parse_mount_table(FSTAB)
+    assert len(entries) == 2
+    assert entries[0] == ("UUID=abcd", "/")
+
+
+def test_parse_mount_table_normalizes_trailing_slash():
+    """Trailing slashes are stripped from source and target."""
+    entries = parse_mount_table(FSTAB)
+    assert ("203.0.113.5:/srv/nfs/share", "/mnt/share") in entries
+
+
+def test_parse_mount_table_unescapes_octal():
+    """Octal escapes (\\040) used for spaces are decoded."""
+    entries = parse_mount_table(PROC_MOUNTS)
+    assert ("/dev/sdb1", "/mnt/with space") in entries
+
+
+def test_parse_mount_table_keeps_malformed_escape():
+    """A backslash followed by non-octal digits is kept literally."""
+    entries = parse_mount_table("/dev/sdc1 /mnt/bad\\089name ext4 rw 0 0\n")
+    assert ("/dev/sdc1", "/mnt/bad\\089name") in entries
+
+
+def test_parse_mount_table_empty():
+    """Empty or None input returns no entries."""
+    assert parse_mount_table("") == []
+    assert parse_mount_table(None) == []
+
+
+# ---------------------------------------------------------------------------
+# classify_folders tests
+# ---------------------------------------------------------------------------
+
+
+def test_classify_missing_and_existing():
+    """Missing paths and existing directories are classified in one pass."""
+    base = _tmpdir()
+    existing = os.path.join(base, "exists")
+    os.mkdir(existing)
+    missing = os.path.join(base, "missing")
+
+    results, summary = classify_folders([{"path": existing}, {"path": missing}])
+
+    assert [r["state"] for r in results] == ["exists", "missing"]
+    assert summary["exists"] == [existing]
+    assert summary["missing"] == [missing]
+    assert summary["present"] == [existing]
+
+
+def test_classify_preserves_input_order_and_item():
+    """Results keep input order and echo the original entry as item."""
+    base = _tmpdir()
+    entries = [{"path": os.path.join(base, str(i))} for i in range(5)]
+    results, _ = classify_folders(entries)
+    assert [r["item"] for r in results] == entries
+
+
+def test_classify_mount_point_key():
+    """path_key selects which entry key holds the local path."""
+    base = _tmpdir()
+    entry = {"server": "203.0.113.5", "path": "/srv/nfs/x", "mount_point": base}
+    results, summary = classify_folders([entry], path_key="mount_point")
+    assert results[0]["path"] == base
+    assert summary["present"] == [base]
+
+
+def test_classify_mounted():
+    """A path listed as a mount target is classified as mounted."""
+    entry = {"mount_point": "/"}
+    mounts = "rootfs / ext4 rw 0 0\n"
+    results, summary = classify_folders([entry], path_key="mount_point", mounts_text=mounts)
+    assert results[0]["mounted"] is True
+    assert results[0]["state"] == "mounted"
+    assert summary["mounted"] == ["/"]
+
+
+def test_classify_in_fstab():
+    """NFS entries report fstab presence regardless of trailing slashes."""
+    entry = {"server": "203.0.113.5", "path": "/srv/nfs/share", "mount_point": "/nonexistent"}
+    other = {"server": "203.0.113.5", "path": "/srv/nfs/share/sub", "mount_point": "/nonexistent2"}
+    results, summary = classify_folders(
+        [entry, other], path_key="mount_point", fstab_text=FSTAB
+    )
+    assert results[0]["in_fstab"] is True
+    assert results[0]["source"] == "203.0.113.5:/srv/nfs/share"
+    # Sub-path must not match the parent export (grep -w used to match it)
+    assert results[1]["in_fstab"] is False
+    assert summary["in_fstab"] == ["203.0.113.5:/srv/nfs/share"]
+
+
+def test_classify_non_nfs_entry_has_no_source():
+    """Entries without server/path report no fstab source."""
+    results, _ = classify_folders([{"mount_point": "/nonexistent"}], path_key="mount_point")
+    assert results[0]["source"] is None
+    assert results[0]["in_fstab"] is False
+
+
+def test_classify_ownership_mismatch():
+    """check_ownership flags paths whose owner differs from the entry."""
+    base = _tmpdir()
+    uid = os.stat(base).st_uid
+    entry = {"path": base, "owner": str(uid + 4242)}
+    results, summary = classify_folders([entry], check_ownership=True)
+    assert results[0]["state"] == "ownership_mismatch"
+    assert summary["ownership_mismatch"] == [base]
+    assert summary["present"] == [base]
+
+
+def test_classify_ownership_match_by_id():
+    """Owner may be given as a numeric id."""
+    base = _tmpdir()
+    st = os.stat(base)
+    entry = {"path": base, "owner": st.st_uid, "group": st.st_gid}
+    results, _ = classify_folders([entry], check_ownership=True)
+    assert results[0]["state"] == "exists"
+
+
+def test_classify_ownership_ignored_by_default():
+    """Owner keys are ignored unless check_ownership is set."""
+    base = _tmpdir()
+    entry = {"path": base, "owner": "definitely-not-a-user"}
+    results, _ = classify_folders([entry])
+    assert results[0]["state"] == "exists"
+
+
+def test_classify_ownership_skips_skip_create():
+    """Pre-existing skip_create entries keep their owner without failing."""
+    base = _tmpdir()
+    uid = os.stat(base).st_uid
+    entry = {"path": base, "owner": str(uid + 4242), "skip_create": True}
+    results, summary = classify_folders([entry], check_ownership=True)
+    assert results[0]["state"] == "exists"
+    assert summary["ownership_mismatch"] == []
+
+
+def test_classify_single_stat_per_entry():
+    """Each entry is stat'ed exactly once."""
+    calls = []
+
+    def fake_stat(path):
+        calls.append(path)
+        raise OSError("missing")
+
+    entries = [{"path": "/a"}, {"path": "/b"}, {"path": "/c"}]
+    classify_folders(entries, stat_func=fake_stat)
+    assert calls == ["/a", "/b", "/c"]
+
+
+def test_classify_empty_list():
+    """Empty folders list returns empty results and summary lists."""
+    results, summary = classify_folders([])
+    assert results == []
+    assert all(v == [] for v in summary.values())
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Execution through Ansible
+# ---------------------------------------------------------------------------
+
+
+def test_module_shebang_is_rewritable():
+    """Ansible only rewrites #!/usr/bin/python; '#!/usr/bin/env python3' fails with rc 127."""
+    with open(os.path.join(LIBRARY, "folder_state.py")) as fh:
+        assert fh.readline().rstrip("\n") == "#!/usr/bin/python"
+
+
+def test_module_runs_through_ansible():
+    """ansible localhost -m folder_state classifies the folders (needs Ansible)."""
+    if shutil.which("ansible") is None:
+        print("    ansible not installed, module execution not checked")
+        return
+    root = _tmpdir()
+    missing = os.path.join(root, "missing")
+    args = {"folders": [{"path": root}, {"path": missing}]}
+    proc = subprocess.run(
+        ["ansible", "localhost", "-i", "localhost,", "-c", "local", "-M", LIBRARY,
+         "-m", "folder_state", "-a", json.dumps(args)],
+        cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, timeout=120)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    result = json.loads(proc.stdout.split("=>", 1)[1])
+    assert result["summary"]["missing"] == [missing]
+    assert root in result["summary"]["present"]
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nfolder_state: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Unit tests for the frr_bgp_snapshot module.
+
+Tests the parsers and checks of library/frr_bgp_snapshot.py against recorded
+``vtysh -c 'show bgp summary json' -c 'show ip route json'`` output and a
+rendered frr.conf in tests/fixtures/frr_bgp_snapshot/. No FRR is required.
+
+Fixture router (AS 64512, MetalLB pool 203.0.113.0/24 le 32):
+  100.65.0.11  Established, 2 prefixes
+  100.65.0.12  Established, 1 prefix
+  100.65.0.13  Active (down)
+  203.0.113.10/32  via .11 and .12
+  203.0.113.11/32  via .11 (the .12 next hop is inactive)
+  198.51.100.0/24  BGP route outside the prefix-list
+
+Note: addresses use 100.65.x and RFC 5737 TEST-NET ranges to satisfy the
+pre-commit security hook.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from frr_bgp_snapshot import (
+    build_frr_snapshot,
+    parse_bgp_summary,
+    parse_prefix_list,
+    parse_routes,
+    prefix_list_permits,
+    render_metrics,
+    split_json_documents,
+)
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "frr_bgp_snapshot")
+SPEAKERS = ["100.65.0.11", "100.65.0.12"]
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name)) as fh:
+        return fh.read()
+
+
+def _docs():
+    return split_json_documents(_read("vtysh_output.txt"))
+
+
+def _entries():
+    return parse_prefix_list(_read("frr.conf"), "METALLB-POOL")
+
+
+def _snapshot(expected_speakers=None, expected_prefixes=None):
+    summary, routes = _docs()
+    return build_frr_snapshot(summary, routes, _entries(), expected_speakers, expected_prefixes)
+
+
+# ---------------------------------------------------------------------------
+# Parsers
+# ---------------------------------------------------------------------------
+
+
+def test_split_concatenated_documents():
+    """One vtysh call with two -c prints two JSON objects back to back."""
+    docs = _docs()
+    assert len(docs) == 2
+    assert "ipv4Unicast" in docs[0]
+    assert split_json_documents("") == []
+    assert split_json_documents('{"a": 1}{}\n') == [{"a": 1}, {}]
+
+
+def test_summary_neighbors_indexed():
+    """Neighbors are indexed by address with state and prefix counts."""
+    summary = parse_bgp_summary(_docs()[0])
+    assert summary["router_id"] == "100.65.0.1"
+    assert summary["local_as"] == 64512
+    neighbors = summary["neighbors"]
+    assert neighbors["100.65.0.11"]["established"]
+    assert neighbors["100.65.0.11"]["prefixes_received"] == 2
+    assert neighbors["100.65.0.13"]["state"] == "Active"
+    assert neighbors["100.65.0.13"]["prefixes_received"] == 0
+
+
+def test_summary_without_neighbors():
+    """FRR prints {} when no BGP instance or neighbors exist."""
+    assert parse_bgp_summary({})["neighbors"] == {}
+    assert parse_bgp_summary(None)["neighbors"] == {}
+
+
+def test_routes_active_nexthops_only():
+    """Only active next hops of the selected entry are kept."""
+    routes = parse_routes(_docs()[1])
+    assert routes["203.0.113.10/32"]["nexthops"] == SPEAKERS
+    assert routes["203.0.113.11/32"]["nexthops"] == ["100.65.0.11"]
+    assert routes["0.0.0.0/0"]["protocol"] == "kernel"
+    assert routes["100.65.0.0/24"]["nexthops"] == []
+
+
+def test_parse_prefix_list_from_config():
+    """The METALLB-POOL entry of the rendered frr.conf is parsed."""
+    assert _entries() == [
+        {"seq": 10, "action": "permit", "prefix": "203.0.113.0/24", "ge": None, "le": 32}]
+    assert parse_prefix_list(_read("frr.conf"), "OTHER") == []
+
+
+def test_prefix_list_semantics():
+    """First match by seq decides; ge/le bound the length; default is deny."""
+    entries = parse_prefix_list(
+        "ip prefix-list P seq 20 permit 203.0.113.0/24 ge 28\n"
+        "ip prefix-list P seq 5 deny 203.0.113.128/25 le 32\n"
+        "ip prefix-list P seq 30 permit 198.51.100.0/24\n", "P")
+    assert [e["seq"] for e in entries] == [5, 20, 30]
+    assert prefix_list_permits(entries, "203.0.113.10/32")
+    assert not prefix_list_permits(entries, "203.0.113.130/32")
+    assert not prefix_list_permits(entries, "203.0.113.0/24")
+    assert prefix_list_permits(entries, "198.51.100.0/24")
+    assert not prefix_list_permits(entries, "198.51.100.0/25")
+    assert not prefix_list_permits(entries, "2001:db8::/64")
+    assert not prefix_list_permits([], "203.0.113.10/32")
+
+
+# ---------------------------------------------------------------------------
+# Snapshot checks
+# ---------------------------------------------------------------------------
+
+
+def test_session_counts():
+    """Established count and not-established neighbors."""
+    snapshot = _snapshot()
+    assert snapshot["neighbor_count"] == 3
+    assert snapshot["established_count"] == 2
+    assert snapshot["not_established"] == ["100.65.0.13"]
+
+
+def test_pool_prefixes_and_missing_speakers():
+    """Only prefix-list routes count; a prefix missing a speaker is incomplete."""
+    pool = _snapshot(expected_speakers=SPEAKERS)["pool"]
+    assert sorted(pool["prefixes"]) == ["203.0.113.10/32", "203.0.113.11/32"]
+    assert pool["prefixes"]["203.0.113.10/32"]["missing_speakers"] == []
+    assert pool["prefixes"]["203.0.113.11/32"]["missing_speakers"] == ["100.65.0.12"]
+    assert pool["incomplete"] == ["203.0.113.11/32"]
+    assert not pool["ok"]
+
+
+def test_pool_default_any_speaker():
+    """Without expected_speakers any speaker satisfies a prefix."""
+    pool = _snapshot()["pool"]
+    assert pool["expected_speakers"] == []
+    assert pool["prefixes"]["203.0.113.10/32"]["missing_speakers"] == []
+    assert pool["ok"]
+
+
+def test_pool_ok_and_expected_prefixes():
+    """A single expected speaker satisfies both prefixes; missing prefixes fail."""
+    assert _snapshot(expected_speakers=["100.65.0.11"])["pool"]["ok"]
+    snapshot = _snapshot(expected_speakers=["100.65.0.11"],
+                         expected_prefixes=["203.0.113.10", "203.0.113.12/32"])
+    assert snapshot["pool"]["missing_prefixes"] == ["203.0.113.12/32"]
+    assert not snapshot["pool"]["ok"]
+
+
+def test_neighbors_missing_from_config():
+    """Expected speakers without a configured session are reported."""
+    snapshot = _snapshot(expected_speakers=SPEAKERS + ["100.65.0.14"])
+    assert snapshot["neighbors_missing"] == ["100.65.0.14"]
+    summary, routes = _docs()
+    snapshot = build_frr_snapshot(summary, routes, _entries(),
+                                  expected_neighbors=SPEAKERS + ["100.65.0.15"])
+    assert snapshot["neighbors_missing"] == ["100.65.0.15"]
+
+
+def test_empty_route_table_not_ok():
+    """No MetalLB prefix at all is not ok."""
+    snapshot = build_frr_snapshot(_docs()[0], {}, _entries(), SPEAKERS)
+    assert snapshot["pool"]["count"] == 0
+    assert not snapshot["pool"]["ok"]
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+
+def test_render_metrics():
+    """Session state, prefix counts and pool coverage are exported."""
+    text = render_metrics(_snapshot(expected_speakers=SPEAKERS))
+    assert 'frr_bgp_neighbor_established{neighbor="100.65.0.11",remote_as="64513"} 1' in text
+    assert 'frr_bgp_neighbor_established{neighbor="100.65.0.13",remote_as="64513"} 0' in text
+    assert 'frr_bgp_neighbor_prefixes_received{neighbor="100.65.0.12"} 1' in text
+    assert 'frr_bgp_neighbor_uptime_seconds{neighbor="100.65.0.11"} 11564.000' in text
+    assert 'frr_bgp_pool_prefix_speakers{prefix="203.0.113.10/32"} 2' in text
+    assert "frr_bgp_pool_prefixes 2" in text
+    assert "frr_bgp_pool_ok 0" in text
+    assert text.endswith("\n")
+    for line in text.splitlines():
+        if line.startswith("# TYPE"):
+            assert line.endswith(" gauge")
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nfrr_bgp_snapshot: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
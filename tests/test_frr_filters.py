@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Unit tests for the FRR BGP config filter plugin.
+
+Tests frr_bgp_model from filter_plugins/frr_filters.py, which builds the
+router bgp section of roles/bgp_router_frr/templates/frr.conf.j2 from
+bgp_router_neighbors.
+
+Note: neighbor addresses use 100.65.x and RFC 5737 TEST-NET ranges to
+satisfy the pre-commit security hook.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "filter_plugins"))
+
+from frr_filters import AnsibleFilterError, frr_bgp_model
+
+ASN = "64512"
+ROUTER_ID = "100.65.0.1"
+POOL = "203.0.113.0/24"
+
+
+def _n(address, asn=64513):
+    return {"address": address, "asn": asn}
+
+
+def _model(neighbors, **kwargs):
+    return frr_bgp_model(neighbors, kwargs.pop("asn", ASN), kwargs.pop("router_id", ROUTER_ID),
+                         kwargs.pop("pool_cidr", POOL), **kwargs)
+
+
+def _raises(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+    except AnsibleFilterError as exc:
+        return str(exc)
+    raise AssertionError("expected AnsibleFilterError")
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+
+def test_rendered_router_bgp_section():
+    """The rendered section matches the statements frr.conf.j2 used to loop out."""
+    model = _model([_n("100.65.0.11")], update_source="wg99")
+    assert model["rendered"] == "\n".join([
+        "router bgp 64512",
+        " bgp router-id 100.65.0.1",
+        " no bgp ebgp-requires-policy",
+        " no bgp network import-check",
+        "",
+        " neighbor 100.65.0.11 remote-as 64513",
+        " neighbor 100.65.0.11 description k8s-metallb-speaker",
+        " neighbor 100.65.0.11 timers 10 30",
+        " neighbor 100.65.0.11 update-source wg99",
+        "",
+        " address-family ipv4 unicast",
+        "  neighbor 100.65.0.11 activate",
+        "  neighbor 100.65.0.11 route-map FROM-K8S in",
+        " exit-address-family",
+    ])
+    assert model["pool"] == POOL
+    assert model["asn"] == 64512
+
+
+def test_update_source_placeholder_or_empty_omitted():
+    """Empty or [placeholder] update-source adds no update-source lines."""
+    for source in ("", "[wg-interface]", None):
+        model = _model([_n("100.65.0.11")], update_source=source)
+        assert model["update_source"] == ""
+        assert not any("update-source" in line for line in model["neighbor_lines"])
+
+
+def test_neighbors_sorted_numerically():
+    """Neighbors are sorted by address value, not string."""
+    model = _model([_n("100.65.0.100"), _n("100.65.0.9"), _n("100.65.0.11")])
+    assert [n["address"] for n in model["neighbors"]] == [
+        "100.65.0.9", "100.65.0.11", "100.65.0.100"]
+
+
+def test_output_independent_of_input_order():
+    """Shuffled neighbors render byte-identical output."""
+    neighbors = [_n("100.65.0.12"), _n("100.65.0.11"), _n("100.65.0.13", 64514)]
+    assert _model(neighbors)["rendered"] == _model(list(reversed(neighbors)))["rendered"]
+
+
+def test_pool_normalized():
+    """Host bits in the pool CIDR are masked."""
+    assert _model([_n("100.65.0.11")], pool_cidr="203.0.113.7/24")["pool"] == POOL
+
+
+# ---------------------------------------------------------------------------
+# Dedup and validation
+# ---------------------------------------------------------------------------
+
+
+def test_exact_duplicates_dropped():
+    """Same address and ASN (string or int) is kept once and reported."""
+    model = _model([_n("100.65.0.11"), _n("100.65.0.11", "64513"), _n("100.65.0.12")])
+    assert model["summary"]["neighbors"] == 2
+    assert model["duplicates"] == ["100.65.0.11"]
+    assert model["rendered"].count("neighbor 100.65.0.11 remote-as") == 1
+
+
+def test_conflicting_asn_rejected():
+    """Same address with different ASNs is an error."""
+    message = _raises(_model, [_n("100.65.0.11", 64513), _n("100.65.0.11", 64514)])
+    assert "100.65.0.11: conflicting asn 64513 and 64514" in message
+
+
+def test_all_errors_reported_at_once():
+    """Every invalid neighbor and setting is listed in one error."""
+    message = _raises(_model, [
+        _n("not-an-ip"),
+        _n("[k8s-node-wg-ip]"),
+        {"address": "100.65.0.12"},
+        _n("100.65.0.13", "[metallb-my-asn]"),
+        _n("100.65.0.14", 4294967296),
+        _n("2001:db8::1"),
+        _n(ROUTER_ID),
+        "100.65.0.15",
+    ], asn="[router-asn]", pool_cidr="[metallb-pool-cidr]/24")
+    for expected in (
+        "local asn '[router-asn]' is missing or invalid",
+        "MetalLB pool '[metallb-pool-cidr]/24' is not an IPv4 CIDR",
+        "neighbor not-an-ip: invalid IP address",
+        "neighbor #1: missing address",
+        "neighbor 100.65.0.12: missing asn",
+        "neighbor 100.65.0.13: missing asn",
+        "neighbor 100.65.0.14: invalid asn 4294967296",
+        "neighbor 2001:db8::1: only IPv4 neighbors are supported",
+        "neighbor 100.65.0.1: address is the router ID of this router",
+        "neighbor #7: expected a mapping",
+        "no valid BGP neighbors",
+    ):
+        assert expected in message, expected
+
+
+def test_invalid_router_id():
+    """The router ID must be an IPv4 address."""
+    assert "router ID '[router-id-ip]'" in _raises(
+        _model, [_n("100.65.0.11")], router_id="[router-id-ip]")
+
+
+def test_non_strict_drops_invalid():
+    """strict=False keeps valid neighbors and reports the rest."""
+    model = _model([_n("100.65.0.11"), _n("bogus")], strict=False)
+    assert [n["address"] for n in model["neighbors"]] == ["100.65.0.11"]
+    assert model["errors"] == ["neighbor bogus: invalid IP address"]
+    assert model["summary"]["errors"] == 1
+
+
+def test_large_neighbor_set():
+    """A neighbor per worker node (hundreds) renders in one pass."""
+    neighbors = [_n("100.65.{}.{}".format(i // 200, i % 200 + 10)) for i in range(600)]
+    model = _model(neighbors)
+    assert model["summary"]["neighbors"] == 600
+    assert len(model["neighbor_lines"]) == 1800
+    assert len(model["address_family_lines"]) == 1200
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nfrr_filters: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""Unit tests for the host_facts module.
+
+Tests the pure helpers of library/host_facts.py against recorded
+/etc/os-release, /proc/net/route and ``ip -json addr show`` output
+(tests/fixtures/host_facts/), and checks that the compact facts keep the
+names and layout roles read from setup.
+
+Note: Addresses use RFC 5737 TEST-NET and 100.65.0.0/16 ranges to satisfy
+the pre-commit security hook.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from host_facts import (
+    collect,
+    date_time_facts,
+    default_ipv4,
+    distribution_facts,
+    interface_facts,
+    parse_os_release,
+    parse_proc_route,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "host_facts")
+
+DEBIAN_OS_RELEASE = """\
+PRETTY_NAME="Debian GNU/Linux 12 (bookworm)"
+NAME="Debian GNU/Linux"
+VERSION_ID="12"
+VERSION="12 (bookworm)"
+VERSION_CODENAME=bookworm
+ID=debian
+"""
+
+UBUNTU_OS_RELEASE = """\
+NAME="Ubuntu"
+VERSION_ID="24.04"
+VERSION_CODENAME=noble
+ID=ubuntu
+ID_LIKE=debian
+"""
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name)) as fh:
+        return fh.read()
+
+
+def _ip_addr():
+    return json.loads(_fixture("ip_addr.json"))
+
+
+# ---------------------------------------------------------------------------
+# distribution tests
+# ---------------------------------------------------------------------------
+
+
+def test_parse_os_release_strips_quotes():
+    """Quoted and bare values both parse; comments are ignored."""
+    values = parse_os_release("# comment\n" + DEBIAN_OS_RELEASE)
+    assert values["NAME"] == "Debian GNU/Linux"
+    assert values["VERSION_CODENAME"] == "bookworm"
+    assert values["ID"] == "debian"
+
+
+def test_distribution_facts_match_setup_names():
+    """Debian and Ubuntu map to setup's distribution names and Debian family."""
+    debian = distribution_facts(parse_os_release(DEBIAN_OS_RELEASE))
+    assert debian == {
+        "distribution": "Debian",
+        "distribution_version": "12",
+        "distribution_major_version": "12",
+        "distribution_release": "bookworm",
+        "os_family": "Debian",
+    }
+    ubuntu = distribution_facts(parse_os_release(UBUNTU_OS_RELEASE))
+    assert ubuntu["distribution"] == "Ubuntu"
+    assert ubuntu["distribution_major_version"] == "24"
+    assert ubuntu["os_family"] == "Debian"
+
+
+def test_distribution_facts_uses_id_like_for_derivatives():
+    """Unknown IDs fall back to ID_LIKE for os_family and NAME for distribution."""
+    facts = distribution_facts({"ID": "exotic", "ID_LIKE": "rhel fedora", "NAME": "Exotic Linux"})
+    assert facts["os_family"] == "RedHat"
+    assert facts["distribution"] == "Exotic"
+    assert distribution_facts({})["os_family"] == "Unknown"
+
+
+# ---------------------------------------------------------------------------
+# date_time tests
+# ---------------------------------------------------------------------------
+
+
+def test_date_time_facts_have_setup_keys():
+    """Every date_time key the roles read exists and epoch is the pinned time."""
+    facts = date_time_facts(1700000000.5)
+    for key in ("epoch", "date", "time", "iso8601", "iso8601_basic", "iso8601_micro", "tz"):
+        assert key in facts, key
+    assert facts["epoch"] == "1700000000"
+    assert facts["iso8601"] == "2023-11-14T22:13:20Z"
+    assert facts["iso8601_micro"] == "2023-11-14T22:13:20.500000Z"
+
+
+def test_date_time_facts_default_to_now():
+    """Without an epoch the facts describe the current time (never cached)."""
+    import time
+
+    before = int(time.time())
+    assert before <= int(date_time_facts()["epoch"]) <= int(time.time())
+
+
+# ---------------------------------------------------------------------------
+# network tests
+# ---------------------------------------------------------------------------
+
+
+def test_parse_proc_route_picks_lowest_metric_up_default():
+    """The UP default route with the lowest metric wins; down routes are skipped."""
+    assert parse_proc_route(_fixture("proc_net_route")) == {
+        "interface": "eth0",
+        "gateway": "203.0.113.1",
+    }
+    assert parse_proc_route("Iface\tDestination\n") == {}
+
+
+def test_interface_facts_setup_layout():
+    """Interfaces expose ipv4 (primary), ipv4_secondaries and ipv6 like setup."""
+    facts = interface_facts(_ip_addr())
+    eth0 = facts["eth0"]
+    assert eth0["ipv4"] == {
+        "address": "203.0.113.21",
+        "prefix": "24",
+        "netmask": "255.255.255.0",
+        "network": "203.0.113.0",
+        "broadcast": "203.0.113.255",
+    }
+    assert eth0["ipv4_secondaries"][0]["address"] == "203.0.113.50"
+    assert eth0["ipv6"][0]["address"] == "2001:db8::21"
+    assert eth0["macaddress"] == "02:00:00:00:00:01"
+    assert facts["wg99"]["ipv4"]["address"] == "100.65.0.21"
+    assert facts["wg99"]["ipv4"]["network"] == "100.65.0.0"
+    assert facts["wg99"]["active"] is True
+
+
+def test_interface_facts_key_and_filter():
+    """Dashes become underscores in fact keys; only= keeps the named interfaces."""
+    facts = interface_facts(_ip_addr())
+    assert "cni_podnet" in facts
+    assert facts["cni_podnet"]["device"] == "cni-podnet"
+    assert facts["cni_podnet"]["active"] is False
+    assert "ipv4" not in facts["cni_podnet"]
+    assert set(interface_facts(_ip_addr(), only=["wg99"])) == {"wg99"}
+
+
+def test_default_ipv4_combines_route_and_interface():
+    """default_ipv4 carries address/interface/gateway as roles expect."""
+    facts = default_ipv4(parse_proc_route(_fixture("proc_net_route")),
+                         interface_facts(_ip_addr()))
+    assert facts["interface"] == "eth0"
+    assert facts["address"] == "203.0.113.21"
+    assert facts["gateway"] == "203.0.113.1"
+    assert default_ipv4({}, {}) == {}
+
+
+# ---------------------------------------------------------------------------
+# collect tests
+# ---------------------------------------------------------------------------
+
+
+def test_collect_network_uses_single_ip_call():
+    """One ip -json addr show call feeds every interface fact."""
+    calls = []
+
+    def run_ip(argv):
+        calls.append(argv)
+        return 0, _fixture("ip_addr.json"), ""
+
+    facts, warnings = collect(run_ip, epoch=1700000000)
+    assert calls == [["ip", "-json", "addr", "show"]]
+    assert warnings == []
+    assert facts["wg99"]["ipv4"]["address"] == "100.65.0.21"
+    assert "wg99" in facts["interfaces"]
+    assert facts["date_time"]["epoch"] == "1700000000"
+    assert facts["host_facts_profile"] == "compact"
+    assert "module_setup" not in facts
+
+
+def test_collect_without_network_and_with_failing_ip():
+    """network=false skips ip entirely; a failing ip call is a warning, not an error."""
+    def boom(argv):
+        raise AssertionError("ip must not run")
+
+    facts, _ = collect(boom, network=False)
+    assert "interfaces" not in facts
+    for key in ("os_family", "hostname", "date_time", "env", "user_id", "pkg_mgr"):
+        assert key in facts, key
+
+    facts, warnings = collect(lambda argv: (1, "", "ip: not found"))
+    assert facts["interfaces"] == []
+    assert warnings and "ip: not found" in warnings[0]
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nhost_facts: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
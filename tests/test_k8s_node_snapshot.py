@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Unit tests for the k8s_node_snapshot module.
+
+Tests build_snapshot from library/k8s_node_snapshot.py against a recorded
+``kubectl get nodes,pods,namespaces,componentstatuses -A -o json`` List in
+tests/fixtures/kuber_verify_cluster.json. No live cluster is required.
+
+Fixture cluster:
+  site-a-plane1   control plane, Ready, NoSchedule taint
+  site-a-worker1  worker (labeled), Ready
+  site-a-worker2  worker (labeled), Ready, older kubelet, flannel pod not Ready
+  site-b-worker1  worker, NotReady, no flannel pod
+
+Note: node addresses use RFC 5737 TEST-NET ranges to satisfy the pre-commit
+security hook.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from k8s_node_snapshot import build_snapshot
+
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "kuber_verify_cluster.json")
+
+
+def _items():
+    with open(FIXTURE) as fh:
+        return json.load(fh)["items"]
+
+
+def _snapshot(**kwargs):
+    return build_snapshot(_items(), **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Node facts
+# ---------------------------------------------------------------------------
+
+
+def test_node_counts():
+    """Total and Ready node counts come from one pass over the List."""
+    snap = _snapshot()
+    assert snap["node_count"] == 4
+    assert snap["ready_count"] == 3
+
+
+def test_control_plane_summary():
+    """Control plane nodes are detected by role label."""
+    cp = _snapshot()["control_plane"]
+    assert cp["names"] == ["site-a-plane1"]
+    assert cp["ready_count"] == 1
+    assert cp["not_ready"] == []
+
+
+def test_worker_summary():
+    """Workers are every non-control-plane node; NotReady ones are listed."""
+    workers = _snapshot()["workers"]
+    assert workers["names"] == ["site-a-worker1", "site-a-worker2", "site-b-worker1"]
+    assert workers["count"] == 3
+    assert workers["ready_count"] == 2
+    assert workers["not_ready"] == ["site-b-worker1"]
+
+
+def test_labeled_workers():
+    """labeled_workers honours worker_label (verify_worker_label_selector)."""
+    snap = _snapshot()
+    assert snap["labeled_workers"] == ["site-a-worker1", "site-a-worker2"]
+    assert _snapshot(worker_label="missing/label")["labeled_workers"] == []
+    assert _snapshot(worker_label="node-role.kubernetes.io/worker=worker")["labeled_workers"] == [
+        "site-a-worker1",
+        "site-a-worker2",
+    ]
+
+
+def test_node_roles_and_ip():
+    """Roles are derived from node-role.kubernetes.io/* labels."""
+    nodes = _snapshot()["nodes"]
+    assert nodes["site-a-plane1"]["roles"] == ["control-plane"]
+    assert nodes["site-a-worker1"]["roles"] == ["worker"]
+    assert nodes["site-b-worker1"]["roles"] == []
+    assert nodes["site-a-worker1"]["internal_ip"] == "203.0.113.21"
+
+
+def test_node_lines():
+    """node_lines mirror the NAME STATUS ROLES VERSION columns of kubectl."""
+    lines = _snapshot()["node_lines"]
+    assert lines[0] == "site-a-plane1 Ready control-plane v1.30.2"
+    assert lines[-1] == "site-b-worker1 NotReady <none> v1.30.2"
+
+
+def test_taints():
+    """Taints are rendered as key[=value]:effect and indexed per node."""
+    tainted = _snapshot()["tainted"]
+    assert tainted["site-a-plane1"] == ["node-role.kubernetes.io/control-plane:NoSchedule"]
+    assert "dedicated=db:NoSchedule" in tainted["site-b-worker1"]
+    assert "site-a-worker1" not in tainted
+
+
+def test_versions_and_skew():
+    """Distinct kubelet versions are reported and skew is flagged."""
+    snap = _snapshot()
+    assert snap["versions"] == ["v1.30.1", "v1.30.2"]
+    assert snap["version_skew"] is True
+
+
+# ---------------------------------------------------------------------------
+# CNI facts
+# ---------------------------------------------------------------------------
+
+
+def test_cni_detection_flannel():
+    """Flannel is detected from the kube-flannel namespace."""
+    cni = _snapshot()["cni"]
+    assert cni["type"] == "flannel"
+    assert cni["namespace"] == "kube-flannel"
+    assert cni["label"] == "app=flannel"
+
+
+def test_cni_pod_coverage():
+    """CNI daemon pods are counted and nodes without one are listed."""
+    cni = _snapshot()["cni"]
+    assert cni["pod_count"] == 3
+    assert cni["ready_count"] == 2
+    assert cni["nodes_missing"] == ["site-b-worker1"]
+
+
+def test_cni_detection_calico():
+    """Calico is detected when only calico-system exists."""
+    items = [i for i in _items() if i["kind"] != "Namespace"]
+    items.append({"kind": "Namespace", "metadata": {"name": "calico-system"}})
+    items.append({
+        "kind": "Pod",
+        "metadata": {"name": "calico-node-1", "namespace": "calico-system",
+                     "labels": {"k8s-app": "calico-node"}},
+        "spec": {"nodeName": "site-a-plane1"},
+        "status": {"phase": "Running", "conditions": [{"type": "Ready", "status": "True"}]},
+    })
+    cni = build_snapshot(items)["cni"]
+    assert cni["type"] == "calico"
+    assert cni["pod_count"] == 1
+    assert len(cni["nodes_missing"]) == 3
+
+
+def test_cni_unknown():
+    """No known CNI namespace yields type unknown and zero counts."""
+    items = [i for i in _items() if i["kind"] != "Namespace"]
+    cni = build_snapshot(items)["cni"]
+    assert cni["type"] == "unknown"
+    assert cni["pod_count"] == 0
+
+
+# ---------------------------------------------------------------------------
+# Pods and components
+# ---------------------------------------------------------------------------
+
+
+def test_pods_by_namespace():
+    """Completed pods count as ready; not-ready pods are listed."""
+    pods = _snapshot()["pods"]
+    assert pods["kube-system"]["total"] == 4
+    assert pods["kube-system"]["running"] == 3
+    assert pods["kube-system"]["not_ready"] == []
+    assert pods["kube-flannel"]["not_ready"] == ["kube-flannel-ds-ccccc"]
+
+
+def test_component_statuses():
+    """Component health is indexed and unhealthy components listed."""
+    snap = _snapshot()
+    assert snap["components"]["scheduler"] is True
+    assert snap["components_unhealthy"] == ["etcd-0"]
+
+
+def test_empty_items():
+    """An empty List produces an empty but well-formed snapshot."""
+    snap = build_snapshot([])
+    assert snap["node_count"] == 0
+    assert snap["workers"]["names"] == []
+    assert snap["cni"]["type"] == "unknown"
+    assert snap["version_skew"] is False
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nk8s_node_snapshot: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
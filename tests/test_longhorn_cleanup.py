@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""Unit tests for the longhorn_cleanup module.
+
+Tests discovery, wave classification and the concurrent cleanup engine of
+library/longhorn_cleanup.py against FakeApiServer, an in-memory API server
+stub loaded from tests/fixtures/longhorn_cleanup/cluster.json. The stub
+enforces the behaviour that makes cleanup order matter:
+
+  - objects with finalizers are only marked for deletion until stripped
+  - the Longhorn admission webhooks reject longhorn.io changes while present
+  - a namespace or CRD is only removed once nothing is left inside it
+  - listing a resource whose CRD is gone fails
+  - while the longhorn-manager DaemonSet exists, a controller re-creates the
+    nodes, settings, engine images and instance managers it owns
+
+No cluster or kubectl is required.
+"""
+
+import copy
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from longhorn_cleanup import (
+    CLUSTER_RESOURCES,
+    WORKLOAD_RESOURCES,
+    ApiError,
+    KubectlApi,
+    classify,
+    cleanup,
+    crd_resources,
+    discover,
+)
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "longhorn_cleanup")
+
+MANAGER = ("DaemonSet", "longhorn-system", "longhorn-manager")
+# Kinds longhorn-manager keeps re-creating while it runs
+MANAGED_KINDS = ("Node", "Setting", "EngineImage", "InstanceManager")
+
+
+def _items():
+    with open(os.path.join(FIXTURES, "cluster.json")) as fh:
+        return json.load(fh)["items"]
+
+
+class FakeApiServer:
+    """In-memory API server stub with finalizer, webhook, cascade and controller semantics."""
+
+    def __init__(self, items, latency=0.0, readd=(), controllers=True):
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.kinds = dict(CLUSTER_RESOURCES)
+        self.kinds.update(WORKLOAD_RESOURCES)
+        self.kinds.update(crd_resources([o for o in items
+                                         if o["kind"] == "CustomResourceDefinition"]))
+        for obj in items:
+            self.objects[self._key(obj)] = copy.deepcopy(obj)
+        self.managed = {k: copy.deepcopy(o) for k, o in self.objects.items()
+                        if controllers and k[0] in MANAGED_KINDS}
+        self.latency = latency
+        self.readd = set(readd)
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+    @staticmethod
+    def _key(obj):
+        meta = obj["metadata"]
+        return (obj["kind"], meta.get("namespace") or "", meta["name"])
+
+    def _enter(self, call):
+        with self.lock:
+            self.calls.append(call)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _leave(self):
+        with self.lock:
+            self.active -= 1
+
+    def _crd_present(self, resource):
+        return ("CustomResourceDefinition", "", resource) in self.objects
+
+    def _webhook_blocks(self, key):
+        group_kinds = {k for k, r in self.kinds.items() if r.endswith(".longhorn.io")}
+        webhooks = [k for k in self.objects
+                    if k[0].endswith("WebhookConfiguration") and k[2].startswith("longhorn")]
+        return key[0] in group_kinds and bool(webhooks)
+
+    def _reconcile(self):
+        """longhorn-manager re-creates the objects it owns while it runs."""
+        manager = self.objects.get(MANAGER)
+        if manager is None or manager["metadata"].get("deletionTimestamp"):
+            return
+        crds_present = all(self._crd_present(self.kinds[k[0]]) for k in self.managed)
+        for key, obj in self.managed.items():
+            if crds_present and key not in self.objects:
+                self.objects[key] = copy.deepcopy(obj)
+
+    def _reap(self):
+        """Remove marked objects whose finalizers and contents are gone."""
+        changed = True
+        while changed:
+            changed = False
+            for key, obj in list(self.objects.items()):
+                meta = obj["metadata"]
+                if not meta.get("deletionTimestamp") or meta.get("finalizers"):
+                    continue
+                if key[0] == "Namespace" and any(k[1] == key[2] for k in self.objects):
+                    continue
+                if key[0] == "CustomResourceDefinition" and any(
+                        self.kinds.get(k[0]) == key[2] for k in self.objects):
+                    continue
+                del self.objects[key]
+                changed = True
+        self._reconcile()
+
+    # API used by the engine ------------------------------------------------
+
+    def list(self, resources):
+        self._enter(("list", tuple(resources)))
+        try:
+            with self.lock:
+                self._reconcile()
+                for resource in resources:
+                    if resource.endswith(".longhorn.io") and not self._crd_present(resource):
+                        raise ApiError("the server doesn't have a resource type "
+                                       "\"{}\"".format(resource))
+                return [copy.deepcopy(o) for k, o in sorted(self.objects.items())
+                        if self.kinds.get(k[0]) in resources]
+        finally:
+            self._leave()
+
+    def strip_finalizers(self, ref):
+        self._enter(("patch", ref["kind"], ref["name"]))
+        try:
+            with self.lock:
+                key = (ref["kind"], ref["namespace"], ref["name"])
+                if self._webhook_blocks(key):
+                    raise ApiError("admission webhook denied the request")
+                obj = self.objects.get(key)
+                if obj is None:
+                    return
+                if key in self.readd:
+                    # A controller still running puts its finalizer back once.
+                    self.readd.discard(key)
+                    return
+                obj["metadata"]["finalizers"] = []
+                self._reap()
+        finally:
+            self._leave()
+
+    def delete(self, ref):
+        self._enter(("delete", ref["kind"], ref["name"]))
+        try:
+            with self.lock:
+                key = (ref["kind"], ref["namespace"], ref["name"])
+                if self._webhook_blocks(key):
+                    raise ApiError("admission webhook denied the request")
+                obj = self.objects.get(key)
+                if obj is None:
+                    return
+                obj["metadata"]["deletionTimestamp"] = "2026-01-01T00:00:00Z"
+                self._reap()
+        finally:
+            self._leave()
+
+
+def _fake(**kwargs):
+    return FakeApiServer(_items(), **kwargs)
+
+
+def _run(api, plan, **kwargs):
+    kwargs.setdefault("interval", 0)
+    return cleanup(api, plan, sleep=lambda _: None, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Discovery
+# ---------------------------------------------------------------------------
+
+
+def test_discovery_uses_two_list_calls():
+    """Cluster objects and all longhorn.io resources are listed once each."""
+    api = _fake()
+    discover(api)
+    lists = [c for c in api.calls if c[0] == "list"]
+    assert len(lists) == 2
+    assert "volumes.longhorn.io" in lists[1][1]
+    assert "ipaddresspools.metallb.io" not in lists[1][1]
+
+
+def test_classify_selects_only_longhorn_objects():
+    """Unrelated webhooks, CRDs, namespaces, classes and RBAC are left alone."""
+    plan = discover(_fake())
+    names = {r["name"] for w in plan for r in w["objects"]}
+    assert {"longhorn-webhook-validator", "longhorn-system", "volumes.longhorn.io",
+            "longhorn", "longhorn-role", "longhorn-bind", "longhorn-critical",
+            "longhorn-manager", "longhorn-ui"} <= names
+    assert not names & {"metallb-webhook-configuration", "metallb-system", "local-path",
+                        "ipaddresspools.metallb.io", "cluster-admin", "system-node-critical",
+                        "coredns"}
+
+
+def test_waves_in_dependency_order():
+    """Workloads, webhooks, CRs leaf to managers, then namespace, CRDs, cluster objects."""
+    plan = discover(_fake())
+    assert [w["wave"] for w in plan] == [
+        "workloads", "webhooks", "longhorn-leaf-resources", "longhorn-attachments", "longhorn-volumes",
+        "longhorn-managers", "namespace", "crds", "cluster-objects",
+    ]
+    by_wave = {w["wave"]: {r["kind"] for r in w["objects"]} for w in plan}
+    assert by_wave["longhorn-attachments"] == {"Engine", "Replica"}
+    assert by_wave["longhorn-volumes"] == {"Volume"}
+    # Kinds this module does not know yet are removed with the managers.
+    assert "FutureFeature" in by_wave["longhorn-managers"]
+
+
+def test_classify_empty_cluster():
+    """A cluster without Longhorn yields an empty plan."""
+    assert classify([], []) == []
+    assert discover(FakeApiServer([])) == []
+
+
+# ---------------------------------------------------------------------------
+# Cleanup
+# ---------------------------------------------------------------------------
+
+
+def test_cleanup_removes_everything_longhorn():
+    """Every planned object is gone; unrelated objects survive."""
+    api = _fake()
+    result = _run(api, discover(api))
+    assert result["remaining"] == [] and result["errors"] == []
+    left = {k[2] for k in api.objects}
+    assert left == {"metallb-webhook-configuration", "ipaddresspools.metallb.io",
+                    "metallb-system", "local-path", "cluster-admin", "system-node-critical",
+                    "coredns"}
+
+
+def test_finalizers_stripped_and_reported():
+    """Objects with finalizers are stripped before delete and counted per wave."""
+    api = _fake()
+    result = _run(api, discover(api))
+    by_wave = {w["wave"]: w for w in result["waves"]}
+    assert by_wave["longhorn-attachments"]["finalizers_stripped"] == 3
+    assert by_wave["longhorn-managers"]["finalizers_stripped"] == 3
+    assert by_wave["longhorn-managers"]["deleted"] == 6
+    assert all("ms" in line for line in result["progress"])
+
+
+def test_readded_finalizer_stripped_while_waiting():
+    """A finalizer re-added by a live controller is stripped on the next poll."""
+    api = _fake(readd=[("Volume", "longhorn-system", "pvc-0001")])
+    result = _run(api, discover(api))
+    assert result["remaining"] == []
+    patches = [c for c in api.calls if c == ("patch", "Volume", "pvc-0001")]
+    assert len(patches) == 2
+
+
+def test_wrong_order_is_blocked_by_webhook():
+    """Without the webhook wave first, longhorn.io changes are rejected."""
+    api = _fake()
+    plan = [w for w in discover(api) if w["wave"] not in ("workloads", "webhooks")]
+    result = _run(api, plan[:1], timeout=0)
+    assert any("admission webhook denied" in e for e in result["errors"])
+    assert result["remaining"]
+
+
+def test_running_manager_recreates_objects():
+    """With longhorn-manager still running, the managers wave never empties."""
+    api = _fake()
+    plan = [w for w in discover(api) if w["wave"] != "workloads"]
+    clock = iter(range(0, 1000, 10))
+    result = cleanup(api, plan, timeout=30, interval=1,
+                     sleep=lambda _: None, clock=lambda: next(clock))
+    assert "nodes/longhorn-system/k8s-worker-1" in result["remaining"]
+
+
+def test_workloads_wave_stops_the_manager_first():
+    """Deleting the workloads first lets every later wave finish."""
+    api = _fake()
+    result = _run(api, discover(api))
+    assert result["waves"][0]["wave"] == "workloads"
+    assert result["waves"][0]["deleted"] == 4
+    assert result["remaining"] == []
+
+
+def test_timeout_reports_remaining():
+    """Objects that never go away are reported after the wave timeout."""
+    volume = ("Volume", "longhorn-system", "pvc-0001")
+    clock = iter(range(0, 1000, 10))
+    api = _fake()
+    plan = [w for w in discover(api) if w["wave"] in ("webhooks", "longhorn-volumes")]
+    original = api.strip_finalizers
+
+    def sticky(ref):
+        # The controller re-adds its finalizer after every strip.
+        api.readd.add(volume)
+        original(ref)
+
+    api.strip_finalizers = sticky
+    result = cleanup(api, plan, timeout=30, interval=1,
+                     sleep=lambda _: None, clock=lambda: next(clock))
+    assert result["remaining"] == ["volumes/longhorn-system/pvc-0001"]
+
+
+def test_deletes_bounded_and_concurrent():
+    """Calls inside a wave overlap but never exceed parallelism."""
+    api = _fake(latency=0.02)
+    plan = discover(api)
+    _run(api, plan, parallelism=3)
+    assert api.peak == 3
+    serial = _fake(latency=0.02)
+    _run(serial, discover(serial), parallelism=1)
+    assert serial.peak == 1
+
+
+# ---------------------------------------------------------------------------
+# kubectl calls
+# ---------------------------------------------------------------------------
+
+
+def test_kubectl_api_argv():
+    """KubectlApi issues one get per list and namespaced patch/delete calls."""
+    calls = []
+
+    def run(argv):
+        calls.append(argv)
+        if argv[1] == "get":
+            return 0, json.dumps({"items": [{"kind": "Volume"}]}), ""
+        return 0, "", ""
+
+    api = KubectlApi(run, "kubectl")
+    ref = {"resource": "volumes.longhorn.io", "kind": "Volume",
+           "namespace": "longhorn-system", "name": "pvc-0001", "finalizers": ["longhorn.io"]}
+    assert api.list(["volumes.longhorn.io", "engines.longhorn.io"]) == [{"kind": "Volume"}]
+    api.strip_finalizers(ref)
+    api.delete(dict(ref, resource="namespaces", namespace="", name="longhorn-system"))
+    assert calls[0] == ["kubectl", "get", "volumes.longhorn.io,engines.longhorn.io", "-A",
+                        "-o", "json", "--ignore-not-found"]
+    assert calls[1] == ["kubectl", "patch", "volumes.longhorn.io", "pvc-0001", "-n",
+                        "longhorn-system", "--type=merge", "-p",
+                        '{"metadata":{"finalizers":null}}']
+    assert calls[2] == ["kubectl", "delete", "namespaces", "longhorn-system",
+                        "--wait=false", "--ignore-not-found"]
+    api.delete({"resource": "daemonsets.apps", "kind": "DaemonSet",
+                "namespace": "longhorn-system", "name": "longhorn-manager", "finalizers": []})
+    assert calls[3] == ["kubectl", "delete", "daemonsets.apps", "longhorn-manager", "-n",
+                        "longhorn-system", "--cascade=foreground", "--wait=false",
+                        "--ignore-not-found"]
+
+
+def test_kubectl_api_errors_raise():
+    """A failing kubectl call raises ApiError with its stderr."""
+    api = KubectlApi(lambda argv: (1, "", "forbidden\n"))
+    try:
+        api.list(["volumes.longhorn.io"])
+    except ApiError as exc:
+        assert str(exc) == "forbidden"
+    else:
+        raise AssertionError("expected ApiError")
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nlonghorn_cleanup: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Unit tests for the metallb_snapshot module.
+
+Tests build_metallb_state and wait_for_ready from library/metallb_snapshot.py
+against a recorded ``kubectl get ... -A -o json`` List in
+tests/fixtures/metallb_snapshot/cluster.json. No live cluster is required.
+
+Fixture cluster (metallb-system):
+  controller      Available
+  speaker         3 desired, 2 ready (speaker-ccccc on site-b-worker1 not Ready)
+  pool public     203.0.113.240/29, advertised by public-adv
+  pool internal   100.65.10.10-100.65.10.19 (+ one invalid entry), not advertised
+  services        apps/web (public), apps/db (internal), apps/pending (no IP),
+                  apps/stray (198.51.100.7, outside every pool)
+
+Note: addresses use RFC 5737 TEST-NET / 100.65.x ranges to satisfy the
+pre-commit security hook.
+"""
+
+import copy
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from metallb_snapshot import build_metallb_state, parse_pool_range, wait_for_ready
+
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "metallb_snapshot", "cluster.json")
+
+
+def _items():
+    with open(FIXTURE) as fh:
+        return json.load(fh)["items"]
+
+
+def _state(items=None, **kwargs):
+    return build_metallb_state(_items() if items is None else items, **kwargs)
+
+
+def _rolled_out(items):
+    items = copy.deepcopy(items)
+    for obj in items:
+        if obj["kind"] == "DaemonSet":
+            obj["status"].update(numberReady=3, numberAvailable=3)
+    return items
+
+
+# ---------------------------------------------------------------------------
+# Readiness
+# ---------------------------------------------------------------------------
+
+
+def test_controller_available():
+    """Controller Deployment Available condition is reported."""
+    state = _state()
+    assert state["namespace_exists"]
+    assert state["controller"]["found"]
+    assert state["controller"]["available"]
+
+
+def test_speaker_rollout_incomplete_blocks_ready():
+    """2 of 3 speakers available means rollout incomplete and not ready."""
+    state = _state()
+    assert state["speaker"]["desired"] == 3
+    assert state["speaker"]["ready"] == 2
+    assert not state["speaker"]["rollout_complete"]
+    assert not state["ready"]
+
+
+def test_ready_after_rollout():
+    """All speakers available and generation observed means ready."""
+    assert _state(_rolled_out(_items()))["ready"]
+
+
+def test_stale_observed_generation_not_complete():
+    """A DaemonSet whose status lags its generation is still rolling out."""
+    items = _rolled_out(_items())
+    for obj in items:
+        if obj["kind"] == "DaemonSet":
+            obj["metadata"]["generation"] = 4
+    assert not _state(items)["speaker"]["rollout_complete"]
+
+
+def test_missing_namespace():
+    """Without the namespace nothing is found and state is not ready."""
+    state = _state(namespace="other-system")
+    assert not state["namespace_exists"]
+    assert not state["controller"]["found"]
+    assert not state["speaker"]["found"]
+    assert state["pods"] == []
+    assert not state["ready"]
+
+
+def test_speaker_nodes_and_pods_not_ready():
+    """Speaker placement comes from namespace pods only; unready pods are listed."""
+    state = _state()
+    assert state["speaker"]["nodes"] == ["site-a-worker1", "site-a-worker2", "site-b-worker1"]
+    assert state["pods_not_ready"] == ["speaker-ccccc"]
+    assert len(state["pod_lines"]) == 4
+    assert "restarts=4" in state["pod_lines"][-1]
+
+
+# ---------------------------------------------------------------------------
+# Pools and allocation coverage
+# ---------------------------------------------------------------------------
+
+
+def test_parse_pool_range():
+    """CIDR and start-end ranges parse; garbage and reversed ranges do not."""
+    first, last = parse_pool_range("203.0.113.240/29")
+    assert (str(first), str(last)) == ("203.0.113.240", "203.0.113.247")
+    first, last = parse_pool_range("100.65.10.10 - 100.65.10.19")
+    assert int(last) - int(first) == 9
+    assert parse_pool_range("not-an-ip") is None
+    assert parse_pool_range("100.65.10.19-100.65.10.10") is None
+    assert parse_pool_range("100.65.10.1-2001:db8::1") is None
+
+
+def test_pool_capacity_and_invalid_entries():
+    """Capacity counts every address; invalid entries are reported."""
+    pools = _state()["pools"]
+    assert pools["public"]["capacity"] == 8
+    assert pools["internal"]["capacity"] == 10
+    assert pools["internal"]["invalid"] == ["not-an-ip"]
+    assert pools["internal"]["auto_assign"] is False
+
+
+def test_allocation_per_pool():
+    """LoadBalancer IPs are attributed to the pool containing them."""
+    state = _state()
+    assert state["pools"]["public"]["allocated"] == ["203.0.113.241"]
+    assert state["pools"]["internal"]["allocated"] == ["100.65.10.12"]
+    assert state["coverage"]["allocated"] == 2
+    assert state["coverage"]["capacity"] == 18
+
+
+def test_pending_and_outside_services():
+    """Services without IPs are pending; IPs outside all pools are flagged."""
+    state = _state()
+    assert state["coverage"]["pending"] == ["apps/pending"]
+    assert state["coverage"]["outside_pools"] == ["apps/stray 198.51.100.7"]
+    by_name = {s["name"]: s for s in state["services"]}
+    assert "default/kubernetes" not in by_name
+    assert by_name["apps/web"]["pool"] == "public"
+    assert by_name["apps/db"]["pool"] == "internal"
+    assert by_name["apps/pending"]["pending"]
+
+
+def test_pools_not_advertised():
+    """Pools not referenced by any advertisement are reported."""
+    state = _state()
+    assert state["pools"]["public"]["advertised"]
+    assert state["coverage"]["pools_not_advertised"] == ["internal"]
+    assert [p["name"] for p in state["bgp_peers"]] == ["edge-router"]
+
+
+def test_advertisement_without_pools_covers_all():
+    """An advertisement with no pool list or selector announces every pool."""
+    items = _items()
+    items.append({"kind": "L2Advertisement",
+                  "metadata": {"name": "all", "namespace": "metallb-system"}, "spec": {}})
+    assert _state(items)["coverage"]["pools_not_advertised"] == []
+
+
+def test_events_sorted_and_tailed():
+    """Only namespace events, oldest first, limited to events_tail."""
+    events = _state()["events"]
+    assert len(events) == 2
+    assert events[0].startswith("Normal Scheduled")
+    assert events[-1].startswith("Warning Unhealthy Pod/speaker-ccccc")
+    assert _state(events_tail=1)["events"] == [events[-1]]
+
+
+# ---------------------------------------------------------------------------
+# Waiting
+# ---------------------------------------------------------------------------
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_wait_until_ready():
+    """The batched fetch is repeated until the state becomes ready."""
+    clock = _Clock()
+    snapshots = [_items(), _items(), _rolled_out(_items())]
+
+    def fetch():
+        return snapshots.pop(0), ""
+
+    state, attempts, error = wait_for_ready(fetch, _state, 180, 5, clock.sleep, clock)
+    assert state["ready"]
+    assert attempts == 3
+    assert error == ""
+    assert clock.now == 10
+
+
+def test_wait_gives_up_at_timeout():
+    """The last (not ready) state is returned once the timeout is reached."""
+    clock = _Clock()
+    state, attempts, _ = wait_for_ready(lambda: (_items(), ""), _state, 12, 5,
+                                        clock.sleep, clock)
+    assert not state["ready"]
+    assert attempts == 3
+
+
+def test_wait_stops_when_namespace_missing():
+    """A missing MetalLB namespace is returned at once instead of polling."""
+    clock = _Clock()
+    state, attempts, _ = wait_for_ready(lambda: ([], ""), _state, 180, 5, clock.sleep, clock)
+    assert not state["namespace_exists"]
+    assert attempts == 1
+    assert clock.now == 0
+
+
+def test_no_wait_single_attempt_and_error():
+    """wait_timeout 0 fetches once; a fetch error returns no state."""
+    clock = _Clock()
+    state, attempts, error = wait_for_ready(lambda: ([], "kubectl get failed: x"), _state, 0, 5,
+                                            clock.sleep, clock)
+    assert state is None
+    assert attempts == 1
+    assert error.startswith("kubectl get failed")
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nmetallb_snapshot: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
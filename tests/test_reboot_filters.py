@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Unit tests for the reboot report filter.
+
+Tests reboot_report from filter_plugins/reboot_filters.py on hostvars built
+from plain dicts shaped like registered reboot_status results, and that its
+``required`` list plans waves with the topology filters.
+
+Note: host names use generic alpha/beta site prefixes instead of inventory
+names to satisfy the pre-commit security hook.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "filter_plugins"))
+
+from reboot_filters import AnsibleFilterError, reboot_report
+from topology_filters import topology_waves
+
+GROUPS = {
+    "all": ["alpha_plane1", "alpha_plane2", "alpha_worker1", "alpha_worker2", "beta_worker1"],
+    "planes_all": ["alpha_plane1", "alpha_plane2"],
+    "workers_all": ["alpha_worker1", "alpha_worker2"],
+    "vas_workers_all": ["beta_worker1"],
+}
+
+
+def _status(reasons=(), packages=(), running="6.1.0-18-amd64", installed="6.1.0-18-amd64",
+            uptime=7200):
+    return {"reboot_status_result": {
+        "changed": False,
+        "reboot_required": bool(reasons),
+        "reasons": list(reasons),
+        "packages": list(packages),
+        "uptime_seconds": uptime,
+        "running_kernel": running,
+        "installed_kernel": installed,
+    }}
+
+
+HOSTVARS = {
+    "alpha_plane1": _status(["flag-file"], ["libc6"]),
+    "alpha_plane2": _status(["flag-file", "kernel-mismatch"], ["libc6", "linux-image-amd64"],
+                            running="6.1.0-17-amd64", uptime=200000),
+    "alpha_worker1": _status(),
+    "alpha_worker2": _status(["flag-file"], ["libc6"]),
+    "beta_worker1": {"reboot_status_result": {"failed": True, "msg": "Permission denied"}},
+}
+HOSTS = ["alpha_plane1", "alpha_plane2", "alpha_worker1", "alpha_worker2", "beta_worker1"]
+
+
+# ---------------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------------
+
+
+def test_hosts_are_partitioned():
+    """Every host is required, not required or unknown, in play order."""
+    report = reboot_report(HOSTVARS, HOSTS)
+    assert report["required"] == ["alpha_plane1", "alpha_plane2", "alpha_worker2"]
+    assert report["not_required"] == ["alpha_worker1"]
+    assert report["unknown"] == ["beta_worker1"]
+    assert report["summary"] == {"hosts": 5, "required": 3, "not_required": 1, "unknown": 1}
+
+
+def test_reasons_and_packages_map_to_hosts():
+    """by_reason and packages invert the per-host lists."""
+    report = reboot_report(HOSTVARS, HOSTS)
+    assert report["by_reason"] == {
+        "flag-file": ["alpha_plane1", "alpha_plane2", "alpha_worker2"],
+        "kernel-mismatch": ["alpha_plane2"],
+    }
+    assert report["packages"] == {
+        "libc6": ["alpha_plane1", "alpha_plane2", "alpha_worker2"],
+        "linux-image-amd64": ["alpha_plane2"],
+    }
+
+
+def test_missing_and_skipped_results_are_unknown():
+    """Hosts without a usable result never count as not requiring a reboot."""
+    hostvars = {"alpha_worker1": {}, "alpha_worker2": {"reboot_status_result": {"skipped": True}}}
+    report = reboot_report(hostvars, ["alpha_worker1", "alpha_worker2", "alpha_plane1"])
+    assert report["unknown"] == ["alpha_worker1", "alpha_worker2", "alpha_plane1"]
+    assert report["lines"][0] == "alpha_worker1: UNKNOWN (no result)"
+
+
+def test_report_lines():
+    """Lines show reasons, uptime, kernel change and packages."""
+    lines = reboot_report(HOSTVARS, HOSTS)["lines"]
+    assert lines[1] == (
+        "alpha_plane2: REBOOT [flag-file, kernel-mismatch] (uptime 2d7h, "
+        "kernel 6.1.0-17-amd64 -> 6.1.0-18-amd64, pkgs: libc6, linux-image-amd64)")
+    assert lines[2] == "alpha_worker1: ok (uptime 2h0m)"
+    assert lines[4] == "beta_worker1: UNKNOWN (Permission denied)"
+
+
+def test_custom_register_name():
+    """key selects the variable the result was registered as."""
+    hostvars = {"alpha_worker1": {"rb": HOSTVARS["alpha_plane1"]["reboot_status_result"]}}
+    assert reboot_report(hostvars, ["alpha_worker1"], key="rb")["required"] == ["alpha_worker1"]
+
+
+def test_string_hosts_rejected():
+    """A pattern string instead of a host list is an error, not per-char hosts."""
+    try:
+        reboot_report(HOSTVARS, "workers_all")
+    except AnsibleFilterError as exc:
+        assert "list of hosts" in str(exc)
+    else:
+        raise AssertionError("expected AnsibleFilterError")
+
+
+# ---------------------------------------------------------------------------
+# Wave planning
+# ---------------------------------------------------------------------------
+
+
+def test_required_hosts_plan_topology_waves():
+    """Only pending hosts are waved, and control planes never reboot together."""
+    waves = topology_waves(reboot_report(HOSTVARS, HOSTS)["required"], GROUPS)
+    assert waves == [["alpha_plane1", "alpha_worker2"], ["alpha_plane2"]]
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nreboot_filters: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
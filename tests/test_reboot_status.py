@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Unit tests for the reboot_status module.
+
+Tests the parsers and build_status() of library/reboot_status.py on plain
+strings, and collect() against tests/fixtures/reboot_status/root, a fake
+filesystem root with run/reboot-required(.pkgs), proc/uptime and a /boot
+holding three amd64 kernels and a cloud-amd64 one (plus an .old copy that
+must be ignored).
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from reboot_status import (
+    build_status,
+    collect,
+    installed_kernels,
+    kernel_flavour,
+    parse_pkgs,
+    parse_uptime,
+)
+
+FIXTURE_ROOT = os.path.join(os.path.dirname(__file__), "fixtures", "reboot_status", "root")
+
+BOOT = ["vmlinuz-6.1.0-9-amd64", "vmlinuz-6.1.0-18-amd64", "config-6.1.0-18-amd64"]
+MIXED_BOOT = BOOT + ["vmlinuz-6.1.0-20-cloud-amd64", "vmlinuz-6.1.0-21-rt-amd64"]
+
+
+# ---------------------------------------------------------------------------
+# Parsers
+# ---------------------------------------------------------------------------
+
+
+def test_parse_pkgs_dedupes_in_file_order():
+    """Duplicate package lines collapse, blank lines are dropped."""
+    assert parse_pkgs("libc6\n\nlinux-image-amd64\nlibc6\n") == ["libc6", "linux-image-amd64"]
+    assert parse_pkgs("") == []
+
+
+def test_parse_uptime():
+    """The first /proc/uptime field is truncated to seconds; junk gives 0."""
+    assert parse_uptime("90061.73 1234.00\n") == 90061
+    assert parse_uptime("") == 0
+    assert parse_uptime("garbage") == 0
+
+
+def test_installed_kernels_natural_order():
+    """-18 sorts after -9; .old/.bak copies and non-kernel files are ignored."""
+    files = BOOT + ["vmlinuz-6.1.0-17-amd64.old", "vmlinuz-6.1.0-19-amd64.bak", "initrd.img-6.1.0-18-amd64"]
+    assert installed_kernels(files) == ["6.1.0-9-amd64", "6.1.0-18-amd64"]
+
+
+# ---------------------------------------------------------------------------
+# build_status
+# ---------------------------------------------------------------------------
+
+
+def test_no_reboot_when_running_newest_kernel():
+    """No flag file and running the newest kernel means nothing to do."""
+    status = build_status(None, "", "3600.0 0", BOOT, "6.1.0-18-amd64", now=10000)
+    assert status["reboot_required"] is False
+    assert status["reasons"] == []
+    assert status["kernel_mismatch"] is False
+    assert status["required_since"] is None
+    assert status["uptime_seconds"] == 3600
+    assert status["boot_time"] == 6400
+
+
+def test_flag_file_is_a_reason():
+    """The flag file alone requires a reboot and reports its packages."""
+    status = build_status(5000.0, "libc6\n", "10 0", BOOT, "6.1.0-18-amd64", now=10000)
+    assert status["reboot_required"] is True
+    assert status["reasons"] == ["flag-file"]
+    assert status["packages"] == ["libc6"]
+    assert status["required_since"] == 5000.0
+
+
+def test_kernel_flavour():
+    """The flavour is everything after the last numeric release component."""
+    assert kernel_flavour("6.1.0-18-amd64") == "amd64"
+    assert kernel_flavour("6.1.0-18-cloud-amd64") == "cloud-amd64"
+    assert kernel_flavour("6.1.0-21-rt-amd64") == "rt-amd64"
+    assert kernel_flavour("6.6.13+bpo-arm64") == "arm64"
+    assert kernel_flavour("5.15.0-91-generic") == "generic"
+
+
+def test_kernel_mismatch_is_a_reason():
+    """With kernel_mismatch_requires_reboot a newer kernel requires a reboot."""
+    status = build_status(None, "", "10 0", BOOT, "6.1.0-9-amd64",
+                          kernel_mismatch_requires_reboot=True, now=10000)
+    assert status["reboot_required"] is True
+    assert status["reasons"] == ["kernel-mismatch"]
+    assert status["installed_kernel"] == "6.1.0-18-amd64"
+    assert status["kernel_mismatch"] is True
+
+
+def test_kernel_mismatch_informational_by_default():
+    """By default the mismatch is only reported."""
+    status = build_status(None, "", "10 0", BOOT, "6.1.0-9-amd64", now=10000)
+    assert status["reboot_required"] is False
+    assert status["kernel_mismatch"] is True
+
+
+def test_other_flavours_are_not_a_mismatch():
+    """Newer cloud/rt kernels do not count against a running amd64 kernel."""
+    status = build_status(None, "", "10 0", MIXED_BOOT, "6.1.0-18-amd64",
+                          kernel_mismatch_requires_reboot=True, now=10000)
+    assert status["installed_kernel"] == "6.1.0-18-amd64"
+    assert status["kernel_mismatch"] is False
+    cloud = build_status(None, "", "10 0", MIXED_BOOT, "6.1.0-19-cloud-amd64", now=10000)
+    assert cloud["installed_kernel"] == "6.1.0-20-cloud-amd64"
+    assert cloud["kernel_mismatch"] is True
+
+
+def test_empty_boot_is_not_a_mismatch():
+    """Hosts without readable /boot kernels (containers) never mismatch."""
+    status = build_status(None, "", "10 0", [], "6.1.0-9-amd64", now=10000)
+    assert status["installed_kernel"] == ""
+    assert status["kernel_mismatch"] is False
+    assert status["reboot_required"] is False
+
+
+# ---------------------------------------------------------------------------
+# collect
+# ---------------------------------------------------------------------------
+
+
+def test_collect_fixture_root():
+    """collect() reads every input from the fixture root in one pass."""
+    status = collect(FIXTURE_ROOT, running_kernel="6.1.0-17-amd64",
+                     kernel_mismatch_requires_reboot=True)
+    assert status["reasons"] == ["flag-file", "kernel-mismatch"]
+    assert status["installed_kernel"] == "6.1.0-18-amd64"
+    assert status["packages"] == ["linux-image-6.1.0-18-amd64", "libc6"]
+    assert status["uptime_seconds"] == 1234567
+    assert status["installed_kernels"] == ["6.1.0-9-amd64", "6.1.0-17-amd64", "6.1.0-18-amd64",
+                                           "6.1.0-20-cloud-amd64"]
+    assert isinstance(status["required_since"], float)
+
+
+def test_collect_missing_root():
+    """A root without any of the files yields a clean, reboot-free result."""
+    status = collect(os.path.join(FIXTURE_ROOT, "missing"), running_kernel="6.1.0-18-amd64")
+    assert status["reboot_required"] is False
+    assert status["packages"] == []
+    assert status["uptime_seconds"] == 0
+    assert status["installed_kernels"] == []
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nreboot_status: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
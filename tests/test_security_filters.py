@@ -16,6 +16,8 @@ from security_filters import (
     truncate_string,
     truncate_keys_in_string,
     redact_pattern,
+    sanitize_output,
+    SanitizationEngine,
 )
 
 
@@ -300,6 +302,66 @@ def test_truncate_keys_in_string():
     return failed == 0
 
 
+def test_sanitize_output():
+    """Test single-pass output sanitization engine."""
+    key = "A" * 43 + "="
+    tests = [
+        # IP/port masking identical to sanitize_security
+        ("[internal-ip]:51840", sanitize_security("[internal-ip]:51840")),
+        ("bind 0.0.0.0:51840", sanitize_security("bind 0.0.0.0:51840")),
+        ("listening on port 8111", sanitize_security("listening on port 8111")),
+        ("port 203.0.113.5", sanitize_security("port 203.0.113.5")),
+        ("udp 53 tcp: 443 203.0.113.9", sanitize_security("udp 53 tcp: 443 203.0.113.9")),
+        ("tcp://198.51.100.1:80", sanitize_security("tcp://198.51.100.1:80")),
+        ("invalid IP 300.400.500.600:99999", "invalid IP 300.400.500.600:99999"),
+
+        # WireGuard secrets are redacted
+        ("private key: " + key, "private key: [REDACTED]"),
+        ("PrivateKey = " + key, "PrivateKey = [REDACTED]"),
+        ("PresharedKey=" + key, "PresharedKey=[REDACTED]"),
+        ("preshared key: (hidden)", "preshared key: [REDACTED]"),
+
+        # Other WireGuard keys are truncated
+        ("peer: " + key, "peer: " + "A" * 20 + "...[TRUNCATED]"),
+
+        # Mixed config block in one pass
+        (
+            "PrivateKey = " + key + "\nEndpoint = 198.51.100.7:51840",
+            "PrivateKey = [REDACTED]\nEndpoint = ***.51.100.7.:***1840",
+        ),
+
+        # Edge cases
+        ("", ""),
+        (None, None),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for input_text, expected in tests:
+        result = sanitize_output(input_text)
+        # Idempotent: masking masked output changes nothing
+        again = sanitize_output(result)
+        if result == expected and again == result:
+            passed += 1
+        else:
+            failed += 1
+            print(f"FAIL: sanitize_output('{input_text}')")
+            print(f"  Expected: {expected}")
+            print(f"  Got:      {result}")
+            print(f"  Re-run:   {again}")
+
+    engine = SanitizationEngine(mask_char="#", truncate_keys=False)
+    if engine("port 8080 peer: " + key) == "port ###080 peer: " + key:
+        passed += 1
+    else:
+        failed += 1
+        print("FAIL: SanitizationEngine(mask_char='#', truncate_keys=False)")
+
+    print(f"\nsanitize_output: {passed} passed, {failed} failed")
+    return failed == 0
+
+
 def run_all_tests():
     """Run all unit tests."""
     print("=" * 70)
@@ -317,6 +379,7 @@ def run_all_tests():
         "truncate_string": test_truncate_string(),
         "truncate_keys_in_string": test_truncate_keys_in_string(),
         "redact_pattern": test_redact_pattern(),
+        "sanitize_output": test_sanitize_output(),
     }
 
     print()
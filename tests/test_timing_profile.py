@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Unit tests for the timing_profile callback plugin.
+
+Tests the TimingProfile collector from callback_plugins/timing_profile.py
+with a fake clock, so durations are exact and no Ansible run is needed.
+
+Note: host labels use RFC 5737 TEST-NET addresses to satisfy the pre-commit
+security hook; they double as sanitization inputs.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "callback_plugins"))
+
+from timing_profile import TimingProfile
+
+
+class FakeClock:
+    """Monotonic clock advanced manually by the tests."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def _profile(sanitize=True):
+    clock = FakeClock()
+    profile = TimingProfile(clock=clock, sanitize=sanitize)
+    profile.playbook = "wireguard_manage.yaml"
+    profile.play = "Manage WireGuard network"
+    return profile, clock
+
+
+def _run(profile, clock, host, key, task, seconds, role="", items=None):
+    profile.start(host, key, task, role)
+    for label, item_seconds in items or []:
+        clock.advance(item_seconds)
+        profile.item(host, key, label)
+    clock.advance(seconds)
+    return profile.finish(host, key)
+
+
+# ---------------------------------------------------------------------------
+# Record collection
+# ---------------------------------------------------------------------------
+
+
+def test_task_duration_recorded():
+    """finish() records the wall time since start()."""
+    profile, clock = _profile()
+    record = _run(profile, clock, "lb-main", "t1", "Render config", 2.5, role="wireguard")
+    assert record["duration"] == 2.5
+    assert record["role"] == "wireguard"
+    assert record["play"] == "Manage WireGuard network"
+
+
+def test_item_durations_are_deltas():
+    """Each loop item is timed from the previous item (or task start)."""
+    profile, clock = _profile()
+    record = _run(profile, clock, "lb-main", "t1", "Loop", 0.0,
+                  items=[("a", 1.0), ("b", 3.0)])
+    assert [i["duration"] for i in record["items"]] == [1.0, 3.0]
+    assert record["duration"] == 4.0
+
+
+def test_unknown_finish_ignored():
+    """finish()/item() for a task that never started are no-ops."""
+    profile, _ = _profile()
+    profile.item("lb-main", "nope", "x")
+    assert profile.finish("lb-main", "nope") is None
+    assert profile.records == []
+
+
+def test_long_item_label_truncated():
+    """Item labels are capped so folded stacks stay readable."""
+    profile, clock = _profile()
+    record = _run(profile, clock, "h", "t", "Loop", 0, items=[("x" * 200, 1.0)])
+    assert len(record["items"][0]["item"]) == 60
+
+
+# ---------------------------------------------------------------------------
+# Sanitization
+# ---------------------------------------------------------------------------
+
+
+def test_host_and_item_labels_sanitized():
+    """IP host names and item labels go through sanitize_security."""
+    profile, clock = _profile()
+    record = _run(profile, clock, "203.0.113.22", "t", "Ping 198.51.100.7", 1.0,
+                  items=[("198.51.100.7", 1.0)])
+    assert "203.0.113.22" not in record["host"]
+    assert record["host"] == "***.0.113.22"
+    assert "198.51.100.7" not in record["task"]
+    assert record["items"][0]["item"] == "***.51.100.7"
+
+
+def test_sanitize_can_be_disabled():
+    """sanitize=False keeps labels verbatim."""
+    profile, clock = _profile(sanitize=False)
+    record = _run(profile, clock, "203.0.113.22", "t", "Task", 1.0)
+    assert record["host"] == "203.0.113.22"
+
+
+# ---------------------------------------------------------------------------
+# Aggregation and output
+# ---------------------------------------------------------------------------
+
+
+def test_top_aggregates_hosts():
+    """top() ranks tasks by total time across hosts and names the slowest host."""
+    profile, clock = _profile()
+    _run(profile, clock, "host-a", "t1", "Fast", 1.0)
+    _run(profile, clock, "host-a", "t2", "Slow", 5.0)
+    _run(profile, clock, "host-b", "t2", "Slow", 7.0)
+    top = profile.top(1)
+    assert len(top) == 1
+    assert top[0]["task"] == "Slow"
+    assert top[0]["total"] == 12.0
+    assert top[0]["hosts"] == 2
+    assert top[0]["slowest_host"] == "host-b"
+
+
+def test_folded_stack_format():
+    """Folded lines are playbook;play;role;task;host <ms>."""
+    profile, clock = _profile()
+    _run(profile, clock, "host-a", "t1", "Render config", 1.5, role="wireguard")
+    assert profile.folded() == [
+        "wireguard_manage.yaml;Manage WireGuard network;wireguard;Render config;host-a 1500"
+    ]
+
+
+def test_folded_stack_items_and_escaping():
+    """Loop items become leaf frames and ';' in labels is escaped."""
+    profile, clock = _profile()
+    _run(profile, clock, "host-a", "t1", "a;b", 0, items=[("peer1", 0.25), ("peer2", 0.75)])
+    lines = profile.folded()
+    assert "wireguard_manage.yaml;Manage WireGuard network;a:b;host-a;peer1 250" in lines
+    assert "wireguard_manage.yaml;Manage WireGuard network;a:b;host-a;peer2 750" in lines
+
+
+def test_folded_stack_merges_serial_batches():
+    """Identical stacks from separate serial batches are summed."""
+    profile, clock = _profile()
+    _run(profile, clock, "host-a", "t1", "Task", 1.0)
+    _run(profile, clock, "host-a", "t1", "Task", 2.0)
+    assert profile.folded() == [
+        "wireguard_manage.yaml;Manage WireGuard network;Task;host-a 3000"
+    ]
+
+
+def test_to_dict_totals_and_json():
+    """The JSON profile has per-role and per-host totals and serialises."""
+    profile, clock = _profile()
+    _run(profile, clock, "host-a", "t1", "A", 1.0, role="wireguard")
+    _run(profile, clock, "host-b", "t2", "B", 2.0)
+    data = profile.to_dict()
+    assert data["total_seconds"] == 3.0
+    assert data["roles"] == {"(no role)": 2.0, "wireguard": 1.0}
+    assert data["hosts"] == {"host-b": 2.0, "host-a": 1.0}
+    json.dumps(data)
+
+
+def test_add_section_embedded():
+    """Registered sections (e.g. cache stats) appear in the JSON profile."""
+    profile, _ = _profile()
+    profile.add_section("cache_stats", lambda: {"hits": 3, "misses": 1})
+    assert profile.to_dict()["cache_stats"] == {"hits": 3, "misses": 1}
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\ntiming_profile: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Unit tests for the topology batching filters.
+
+Tests resolve_hosts, topology_plan and the topology_hosts/topology_serial
+helpers from filter_plugins/topology_filters.py, which replace ``serial: 1``
+in mutation playbooks with topology-aware waves.
+
+Note: host names use generic alpha/beta site prefixes instead of inventory
+names to satisfy the pre-commit security hook.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "filter_plugins"))
+
+from topology_filters import (
+    AnsibleFilterError,
+    resolve_hosts,
+    topology_hosts,
+    topology_plan,
+    topology_serial,
+    topology_waves,
+)
+
+GROUPS = {
+    "all": ["alpha_plane1", "alpha_plane2", "alpha_worker1", "alpha_worker2",
+            "beta_worker1", "alpha_router", "beta_router", "alpha_router2", "db1"],
+    "planes_all": ["alpha_plane1", "alpha_plane2"],
+    "workers_all": ["alpha_worker1", "alpha_worker2"],
+    "vas_workers_all": ["beta_worker1"],
+    "bgp_routers": ["alpha_router", "alpha_router2", "beta_router"],
+    "db": ["db1"],
+    "wireguard_cluster": ["alpha_plane1", "alpha_plane2", "alpha_worker1", "alpha_worker2",
+                          "beta_worker1", "alpha_router", "beta_router", "alpha_router2", "db1"],
+}
+
+
+# ---------------------------------------------------------------------------
+# Pattern resolution
+# ---------------------------------------------------------------------------
+
+
+def test_resolve_union_intersection_exclusion():
+    """':' unions, '&' intersections and '!' exclusions follow Ansible semantics."""
+    assert resolve_hosts("planes_all:workers_all", GROUPS) == [
+        "alpha_plane1", "alpha_plane2", "alpha_worker1", "alpha_worker2"]
+    assert resolve_hosts("wireguard_cluster:&workers_all", GROUPS) == [
+        "alpha_worker1", "alpha_worker2"]
+    assert resolve_hosts("wireguard_cluster:!bgp_routers:!db", GROUPS) == [
+        "alpha_plane1", "alpha_plane2", "alpha_worker1", "alpha_worker2", "beta_worker1"]
+
+
+def test_resolve_globs_and_limit():
+    """Globs match host and group names; limit narrows the result."""
+    assert resolve_hosts("beta_*", GROUPS) == ["beta_worker1", "beta_router"]
+    assert resolve_hosts("wireguard_cluster", GROUPS, limit="planes_all,db1") == [
+        "alpha_plane1", "alpha_plane2", "db1"]
+
+
+# ---------------------------------------------------------------------------
+# Wave planning
+# ---------------------------------------------------------------------------
+
+
+def test_control_planes_never_together():
+    """Each control plane lands in a different wave."""
+    for wave in topology_waves("wireguard_cluster", GROUPS):
+        assert len([h for h in wave if h in GROUPS["planes_all"]]) <= 1
+
+
+def test_one_bgp_router_per_site():
+    """Routers of the same site are split; different sites share a wave."""
+    waves = topology_waves("bgp_routers", GROUPS)
+    assert waves == [["alpha_router", "beta_router"], ["alpha_router2"]]
+
+
+def test_workers_bounded_batch():
+    """Workers go in batches of 25% (at least one), never all at once."""
+    waves = topology_waves("workers_all:vas_workers_all", GROUPS)
+    assert waves == [["alpha_worker1"], ["alpha_worker2"], ["beta_worker1"]]
+    many = {"workers_all": ["w{}".format(i) for i in range(8)], "all": []}
+    assert topology_serial("workers_all", many) == [2, 2, 2, 2]
+
+
+def test_wireguard_servers_exclusive():
+    """WireGuard servers run one at a time in waves of their own, first."""
+    groups = dict(GROUPS, wireguard_servers=["alpha_hub", "beta_hub"])
+    groups["all"] = GROUPS["all"] + ["alpha_hub", "beta_hub"]
+    waves = topology_waves("wireguard_servers:planes_all", groups)
+    assert waves == [["alpha_hub"], ["beta_hub"], ["alpha_plane1"], ["alpha_plane2"]]
+
+
+def test_full_cluster_plan():
+    """hosts + serial reproduce the waves exactly."""
+    plan = topology_plan("wireguard_cluster", GROUPS)
+    assert plan["waves"] == [
+        ["alpha_plane1", "alpha_router", "beta_router", "alpha_worker1", "db1"],
+        ["alpha_plane2", "alpha_router2", "alpha_worker2"],
+        ["beta_worker1"],
+    ]
+    assert plan["serial"] == [5, 3, 1]
+    assert plan["hosts"] == [h for wave in plan["waves"] for h in wave]
+    assert plan["assignments"]["alpha_plane2"] == {
+        "role": "control_plane", "site": "alpha", "wave": 2}
+    assert plan["assignments"]["db1"]["role"] == "other"
+
+
+def test_limit_recomputes_waves():
+    """With --limit, serial matches the limited host list."""
+    assert topology_serial("wireguard_cluster", GROUPS, limit="planes_all") == [1, 1]
+    assert topology_hosts("wireguard_cluster", GROUPS, limit="planes_all") == [
+        "alpha_plane1", "alpha_plane2"]
+
+
+def test_limit_regex_and_file():
+    """--limit ~regex and @retry-file select hosts like Ansible does."""
+    assert resolve_hosts("wireguard_cluster", GROUPS, limit="~plane[12]$") == [
+        "alpha_plane1", "alpha_plane2"]
+    retry = os.path.join(tempfile.mkdtemp(prefix="topology_"), "site.retry")
+    with open(retry, "w") as fh:
+        fh.write("alpha_worker2\nbeta_router\n")
+    assert resolve_hosts("wireguard_cluster", GROUPS, limit="@" + retry) == [
+        "alpha_worker2", "beta_router"]
+
+
+def test_limit_unreadable_file_fails():
+    """A missing @file is an error, not a silently empty play."""
+    try:
+        resolve_hosts("wireguard_cluster", GROUPS, limit="@/nonexistent/site.retry")
+    except AnsibleFilterError as exc:
+        assert "site.retry" in str(exc)
+    else:
+        raise AssertionError("expected AnsibleFilterError")
+
+
+def test_policy_overrides():
+    """topology_policy can change parallelism and site mapping."""
+    policy = {
+        "roles": [{"name": "worker", "groups": ["workers_all", "vas_workers_all"],
+                   "max_parallel": 2}],
+        "default_max_parallel": 1,
+    }
+    waves = topology_waves("workers_all:vas_workers_all:db", GROUPS, policy)
+    assert waves == [["alpha_worker1", "alpha_worker2", "db1"], ["beta_worker1"]]
+
+    sites = {"roles": [{"name": "bgp", "groups": ["bgp_routers"], "max_parallel": 1,
+                        "per_site": True}],
+             "sites": {"one": ["bgp_routers"]}}
+    assert topology_serial("bgp_routers", GROUPS, sites) == [1, 1, 1]
+
+
+def test_max_parallel_override_keeps_roles():
+    """The max_parallel map changes one role and keeps the default roles."""
+    policy = {"max_parallel": {"worker": 2}}
+    assert topology_serial("workers_all:vas_workers_all", GROUPS, policy) == [2, 1]
+    assert topology_serial("planes_all", GROUPS, policy) == [1, 1]
+    assert topology_serial("workers_all:vas_workers_all", GROUPS) == [1, 1, 1]
+    assert policy == {"max_parallel": {"worker": 2}}
+
+
+def test_empty_target():
+    """No matching hosts keeps the original pattern and a valid serial."""
+    assert topology_hosts("missing_group", GROUPS) == "missing_group"
+    assert topology_serial("missing_group", GROUPS) == [1]
+
+
+def test_invalid_policy_rejected():
+    """A non-numeric max_parallel is a filter error."""
+    try:
+        topology_plan("planes_all", GROUPS, {"roles": [
+            {"name": "cp", "groups": ["planes_all"], "max_parallel": "one"}]})
+    except AnsibleFilterError as exc:
+        assert "max_parallel" in str(exc)
+    else:
+        raise AssertionError("expected AnsibleFilterError")
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\ntopology_filters: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Unit tests for the unbound_local_data module.
+
+Tests the parsers, plan and live_update from library/unbound_local_data.py.
+live_update drives the stub unbound-control in
+tests/fixtures/unbound_local_data/, which keeps local data in a JSON file and
+implements list_local_data / local_datas / local_datas_remove with Unbound's
+semantics, so no Unbound daemon is required.
+
+Note: All IPs use RFC 5737 TEST-NET ranges to satisfy the pre-commit
+security hook.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from unbound_local_data import (
+    live_update,
+    parse_list_local_data,
+    parse_rr,
+    parse_zone_config,
+    plan,
+    ptr_rr,
+)
+
+STUB = os.path.join(os.path.dirname(__file__), "fixtures", "unbound_local_data", "unbound-control")
+ZONE = "cluster.local"
+
+DEFAULT_LOCAL_DATA = [
+    "localhost. A 127.0.0.1",
+    "localhost. NS localhost.",
+    "1.0.0.127.in-addr.arpa. PTR localhost.",
+]
+
+ZONE_CONF = """# BEGIN ANSIBLE MANAGED DNS ZONE
+server:
+    local-data: "k8s-api.cluster.local. A 203.0.113.10"
+    local-data: "k8s-worker1.cluster.local. A 203.0.113.21"
+    local-data-ptr: "203.0.113.10 k8s-api.cluster.local."
+    local-data-ptr: "203.0.113.21 k8s-worker1.cluster.local."
+# END ANSIBLE MANAGED DNS ZONE
+"""
+
+IN_SYNC = DEFAULT_LOCAL_DATA + [
+    "k8s-api.cluster.local. A 203.0.113.10",
+    "k8s-worker1.cluster.local. A 203.0.113.21",
+    "10.113.0.203.in-addr.arpa. PTR k8s-api.cluster.local.",
+    "21.113.0.203.in-addr.arpa. PTR k8s-worker1.cluster.local.",
+]
+
+
+class StubControl:
+    """Runs the stub unbound-control against a temporary state file."""
+
+    def __init__(self, records, down=False):
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as fh:
+            json.dump({"records": list(records), "calls": [], "down": down}, fh)
+
+    def __call__(self, argv, data):
+        env = dict(os.environ, UNBOUND_STUB_STATE=self.path)
+        proc = subprocess.run([sys.executable] + argv, input=data or "", env=env,
+                              capture_output=True, text=True, check=False)
+        return proc.returncode, proc.stdout, proc.stderr
+
+    def state(self):
+        with open(self.path) as fh:
+            return json.load(fh)
+
+    def close(self):
+        os.unlink(self.path)
+
+
+def _update(records, config=ZONE_CONF, **kwargs):
+    stub = StubControl(records, down=kwargs.pop("down", False))
+    try:
+        result, state = live_update(stub, [STUB], config, ZONE, **kwargs)
+        return result, state, stub.state()
+    finally:
+        stub.close()
+
+
+# ---------------------------------------------------------------------------
+# Parser tests
+# ---------------------------------------------------------------------------
+
+
+def test_parse_rr_forms():
+    """Config form and list_local_data form normalize to the same tuple."""
+    expected = ("k8s-api.cluster.local.", "A", "203.0.113.10")
+    assert parse_rr("K8S-API.cluster.local A 203.0.113.10") == expected
+    assert parse_rr("k8s-api.cluster.local.\t3600\tIN\tA\t203.0.113.10") == expected
+    assert parse_rr("api.cluster.local. CNAME K8S-API.cluster.local") == \
+        ("api.cluster.local.", "CNAME", "k8s-api.cluster.local.")
+    assert parse_rr("garbage") is None
+
+
+def test_ptr_rr():
+    """local-data-ptr values become reverse-name PTR RRs."""
+    assert ptr_rr("203.0.113.10 k8s-api.cluster.local") == \
+        ("10.113.0.203.in-addr.arpa.", "PTR", "k8s-api.cluster.local.")
+    assert ptr_rr("not-an-ip name") is None
+
+
+def test_parse_zone_config_structure_hash():
+    """Only non-data directives affect the structure hash."""
+    records, digest = parse_zone_config(ZONE_CONF)
+    assert len(records) == 4
+    changed_data = ZONE_CONF.replace("203.0.113.21", "203.0.113.22")
+    assert parse_zone_config(changed_data)[1] == digest
+    structural = ZONE_CONF.replace("server:\n", "server:\n    local-zone: \"cluster.local.\" static\n")
+    assert parse_zone_config(structural)[1] != digest
+
+
+def test_parse_list_local_data():
+    """Tab-separated list_local_data output parses with TTL and class dropped."""
+    out = "k8s-api.cluster.local.\t3600\tIN\tA\t203.0.113.10\nlocalhost.\t10800\tIN\tNS\tlocalhost.\n"
+    assert parse_list_local_data(out) == {
+        ("k8s-api.cluster.local.", "A", "203.0.113.10"),
+        ("localhost.", "NS", "localhost."),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Plan tests
+# ---------------------------------------------------------------------------
+
+
+def test_plan_in_sync():
+    """Nothing to do when live data matches the config."""
+    desired, _ = parse_zone_config(ZONE_CONF)
+    live = {parse_rr(line) for line in IN_SYNC}
+    changes = plan(desired, live, ZONE)
+    assert changes["add"] == [] and changes["remove_names"] == []
+    assert changes["unchanged"] == 4
+
+
+def test_plan_ignores_default_local_zones():
+    """localhost and other default local data are never managed."""
+    desired, _ = parse_zone_config(ZONE_CONF)
+    live = {parse_rr(line) for line in DEFAULT_LOCAL_DATA}
+    changes = plan(desired, live, ZONE)
+    assert changes["remove_names"] == []
+    assert len(changes["add"]) == 4
+
+
+def test_plan_changed_ip_replaces_name():
+    """A changed address clears the name (and its PTR) before re-adding."""
+    desired, _ = parse_zone_config(ZONE_CONF.replace("203.0.113.21", "203.0.113.22"))
+    live = {parse_rr(line) for line in IN_SYNC}
+    changes = plan(desired, live, ZONE)
+    assert changes["remove_names"] == ["21.113.0.203.in-addr.arpa.", "k8s-worker1.cluster.local."]
+    assert ("k8s-worker1.cluster.local.", "A", "203.0.113.22") in changes["add"]
+    assert ("22.113.0.203.in-addr.arpa.", "PTR", "k8s-worker1.cluster.local.") in changes["add"]
+
+
+# ---------------------------------------------------------------------------
+# live_update against the stub unbound-control
+# ---------------------------------------------------------------------------
+
+
+def test_live_update_noop_single_list_call():
+    """An in-sync zone costs one list_local_data call and no reload."""
+    result, state, stub = _update(IN_SYNC)
+    assert result["changed"] is False
+    assert result["reload_required"] is False
+    assert stub["calls"] == ["list_local_data"]
+    assert state["names"]
+
+
+def test_live_update_batches_changes():
+    """Adds, changes and removals use one remove and one add call."""
+    live = IN_SYNC + ["old-host.cluster.local. A 203.0.113.99",
+                      "99.113.0.203.in-addr.arpa. PTR old-host.cluster.local."]
+    config = ZONE_CONF.replace("203.0.113.21", "203.0.113.22").replace(
+        "# END", '    local-data: "new-host.cluster.local. A 198.51.100.7"\n# END')
+    result, _, stub = _update(live, config=config)
+    assert result["changed"] is True
+    assert result["reload_required"] is False
+    assert stub["calls"] == ["list_local_data", "local_datas_remove", "local_datas",
+                             "list_local_data"]
+    assert "old-host.cluster.local." in result["removed_names"]
+    assert "new-host.cluster.local. A 198.51.100.7" in result["added"]
+    assert "old-host.cluster.local. A 203.0.113.99" in result["removed"]
+    records = set(stub["records"])
+    assert "k8s-worker1.cluster.local. A 203.0.113.22" in records
+    assert "k8s-worker1.cluster.local. A 203.0.113.21" not in records
+    assert not any(r.startswith("old-host") or r.startswith("99.113") for r in records)
+    assert set(DEFAULT_LOCAL_DATA) <= records
+
+
+def test_live_update_removes_previous_out_of_zone_names():
+    """Absolute names outside the zone are removed via the stored state."""
+    live = IN_SYNC + ["nas.example.org. A 198.51.100.5"]
+    result, _, stub = _update(live, state={"structure": parse_zone_config(ZONE_CONF)[1],
+                                           "names": ["nas.example.org."]})
+    assert result["removed_names"] == ["nas.example.org."]
+    assert "nas.example.org. A 198.51.100.5" not in stub["records"]
+
+
+def test_live_update_dry_run():
+    """dry_run reports the diff without calling local_datas."""
+    result, state, stub = _update(DEFAULT_LOCAL_DATA, dry_run=True)
+    assert len(result["added"]) == 4
+    assert stub["calls"] == ["list_local_data"]
+    assert state is None
+
+
+def test_live_update_structural_change_requires_reload():
+    """New non-data directives fall back to a reload without touching Unbound."""
+    config = ZONE_CONF.replace("server:\n", "server:\n    local-zone: \"cluster.local.\" static\n")
+    result, state, stub = _update(IN_SYNC, config=config)
+    assert result["reload_required"] is True
+    assert "structural" in result["reason"]
+    assert stub["calls"] == []
+    # Stored so the next run compares against the new structure
+    assert state["structure"] == parse_zone_config(config)[1]
+
+
+def test_live_update_daemon_unreachable_requires_reload():
+    """unbound-control failures fall back to a reload."""
+    result, state, _ = _update(IN_SYNC, down=True)
+    assert result["reload_required"] is True
+    assert "list_local_data failed" in result["reason"]
+    assert state is None
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nunbound_local_data: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
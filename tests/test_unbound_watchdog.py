@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Unit tests for the Python Unbound watchdog.
+
+Tests the DNS wire helpers, concurrent probing, rolling-window escalation and
+textfile metrics from roles/dns_server/files/unbound_watchdog.py. Probes run
+against a fake UDP resolver on 127.0.0.1 started by the tests; no Unbound,
+dig or root access is required.
+
+Note: answers use RFC 5737 TEST-NET addresses to satisfy the pre-commit
+security hook.
+"""
+
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "roles", "dns_server", "files"))
+
+from unbound_watchdog import (
+    build_query,
+    decide,
+    make_sample,
+    parse_response,
+    percentile,
+    probe,
+    probe_all,
+    record,
+    render_metrics,
+)
+
+
+class FakeResolver:
+    """UDP resolver answering A queries from a {domain: (delay, rcode, answers)} map.
+
+    Unknown domains are never answered (timeout).
+    """
+
+    def __init__(self, zones):
+        self.zones = zones
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self._stop = False
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        self.sock.settimeout(0.1)
+        while not self._stop:
+            try:
+                data, addr = self.sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._answer, args=(data, addr), daemon=True).start()
+
+    def _answer(self, data, addr):
+        qid = struct.unpack(">H", data[:2])[0]
+        offset, labels = 12, []
+        while data[offset]:
+            labels.append(data[offset + 1:offset + 1 + data[offset]].decode())
+            offset += data[offset] + 1
+        question = data[12:offset + 5]
+        entry = self.zones.get(".".join(labels))
+        if entry is None:
+            return
+        delay, rcode, answers = entry
+        time.sleep(delay)
+        reply = struct.pack(">HHHHHH", qid, 0x8180 | rcode, 1, len(answers), 0, 0) + question
+        for address in answers:
+            reply += b"\xc0\x0c" + struct.pack(">HHIH", 1, 1, 60, 4) + socket.inet_aton(address)
+        try:
+            self.sock.sendto(reply, addr)
+        except OSError:
+            pass
+
+    def close(self):
+        self._stop = True
+        self.sock.close()
+
+
+def _sample(ok=True, best=20.0, ts=0, slow_ms=1500):
+    results = [{"domain": "a.test", "ok": ok, "latency_ms": best if ok else None}]
+    return make_sample(results, ts, slow_ms)
+
+
+def _run(samples, sustained=3, cooldown=120):
+    """Feed samples one per minute and return the action after each."""
+    state = {"window": []}
+    actions = []
+    for i, sample in enumerate(samples):
+        now = 1000 + i * 60
+        sample["ts"] = now
+        record(state, sample, 30)
+        action = decide(state, now, sustained=sustained, cooldown=cooldown)
+        if action == "restart":
+            state["last_restart"] = now
+        actions.append(action)
+    return actions
+
+
+# ---------------------------------------------------------------------------
+# Wire format
+# ---------------------------------------------------------------------------
+
+
+def test_build_query_layout():
+    """Query has RD set, one question, and a length-prefixed QNAME."""
+    query = build_query("ghcr.io", 0x1234)
+    assert query[:4] == b"\x12\x34\x01\x00"
+    assert query[12:] == b"\x04ghcr\x02io\x00\x00\x01\x00\x01"
+
+
+def test_parse_response_rejects_wrong_id():
+    """Responses for another query id are ignored."""
+    reply = struct.pack(">HHHHHH", 1, 0x8180, 0, 0, 0, 0)
+    assert parse_response(reply, 2) is None
+    assert parse_response(reply, 1) == (0, 0)
+
+
+# ---------------------------------------------------------------------------
+# Probing
+# ---------------------------------------------------------------------------
+
+
+def test_probe_outcomes():
+    """Answer, NXDOMAIN, empty answer and timeout are told apart."""
+    server = FakeResolver({
+        "ok.test": (0, 0, ["203.0.113.5"]),
+        "nx.test": (0, 3, []),
+        "cname-only.test": (0, 0, []),
+    })
+    try:
+        ok = probe("ok.test", port=server.port, timeout=1)
+        nx = probe("nx.test", port=server.port, timeout=1)
+        empty = probe("cname-only.test", port=server.port, timeout=1)
+        lost = probe("silent.test", port=server.port, timeout=0.2)
+    finally:
+        server.close()
+    assert ok["ok"] is True and ok["latency_ms"] is not None
+    assert nx["ok"] is False and nx["rcode"] == 3
+    assert empty["ok"] is False and empty["rcode"] == 0
+    assert lost["ok"] is False and lost["error"] == "timeout"
+
+
+def test_probe_all_is_concurrent():
+    """Slow domains are probed in parallel, not one after another."""
+    server = FakeResolver({
+        "slow1.test": (0.4, 0, ["203.0.113.1"]),
+        "slow2.test": (0.4, 0, ["203.0.113.2"]),
+        "slow3.test": (0.4, 0, ["203.0.113.3"]),
+    })
+    try:
+        started = time.monotonic()
+        results = probe_all(["slow1.test", "slow2.test", "slow3.test"], port=server.port,
+                            timeout=2)
+        elapsed = time.monotonic() - started
+    finally:
+        server.close()
+    assert [r["domain"] for r in results] == ["slow1.test", "slow2.test", "slow3.test"]
+    assert all(r["ok"] for r in results)
+    assert elapsed < 1.0
+
+
+# ---------------------------------------------------------------------------
+# Escalation
+# ---------------------------------------------------------------------------
+
+
+def test_single_failure_does_not_flush():
+    """A transient failure is recorded but no action is taken."""
+    assert _run([_sample(), _sample(ok=False), _sample()]) == ["none", "none", "none"]
+
+
+def test_sustained_failure_flushes_then_restarts():
+    """Flush after N failures, restart after N more, then cooldown."""
+    actions = _run([_sample(ok=False) for _ in range(8)])
+    assert actions == ["none", "none", "flush", "none", "none", "restart", "cooldown", "flush"]
+
+
+def test_recovery_after_flush_resets_escalation():
+    """A healthy sample after a flush prevents the restart."""
+    samples = [_sample(ok=False)] * 3 + [_sample()] + [_sample(ok=False)] * 3
+    actions = _run([dict(s) for s in samples])
+    assert actions == ["none", "none", "flush", "none", "none", "none", "flush"]
+
+
+def test_slow_upstream_flushes_but_never_restarts():
+    """Slow-but-working resolution is degraded, yet never triggers a restart."""
+    actions = _run([_sample(best=2500.0) for _ in range(9)])
+    assert actions.count("flush") == 1
+    assert "restart" not in actions
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+
+def test_percentile_nearest_rank():
+    """Nearest-rank percentiles over the window."""
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) is None
+
+
+def test_render_metrics():
+    """Textfile output has per-domain gauges, window percentiles and action."""
+    state = {"window": [], "last_flush": 1700000000}
+    for latency in (10.0, 20.0, 30.0):
+        record(state, make_sample([
+            {"domain": "google.com", "ok": True, "latency_ms": latency},
+            {"domain": "ghcr.io", "ok": False, "latency_ms": None},
+        ], 0, 1500), 30)
+    text = render_metrics(state, state["window"][-1], "none")
+    assert 'unbound_watchdog_probe_success{domain="google.com"} 1' in text
+    assert 'unbound_watchdog_probe_success{domain="ghcr.io"} 0' in text
+    assert 'unbound_watchdog_latency_seconds{quantile="0.5"} 0.020000' in text
+    assert "unbound_watchdog_success_ratio 0.5000" in text
+    assert 'unbound_watchdog_last_action_timestamp_seconds{action="flush"} 1700000000' in text
+    assert 'unbound_watchdog_action{action="none"} 1' in text
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nunbound_watchdog: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Unit tests for the wg_apply module.
+
+Tests parse_config, parse_dump and plan from library/wg_apply.py against a
+rendered server config and recorded ``wg show <iface> dump`` outputs in
+tests/fixtures/wg_apply/; no wg binary or WireGuard interface is needed.
+
+Note: endpoints and routed CIDRs use RFC 5737 TEST-NET addresses and keys are
+dummy byte patterns, to satisfy the pre-commit security hook.
+"""
+
+import base64
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "library"))
+
+from wg_apply import (
+    diff_peers,
+    interface_changes,
+    parse_config,
+    parse_dump,
+    plan,
+    route_commands,
+    wg_quick_snapshot,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "wg_apply")
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name)) as fh:
+        return fh.read()
+
+
+def _key(n):
+    return base64.b64encode(bytes([n]) * 32).decode()
+
+
+CONFIG = _fixture("server.conf")
+# Snapshot state_file would hold after wg-quick last started with CONFIG
+APPLIED = wg_quick_snapshot(parse_config(CONFIG)[0])
+
+
+# ---------------------------------------------------------------------------
+# Parser tests
+# ---------------------------------------------------------------------------
+
+
+def test_parse_config_interface_and_peers():
+    """[Interface] fields and every [Peer] are parsed; names come from comments."""
+    interface, peers = parse_config(CONFIG)
+    assert interface["listenport"] == "51900"
+    assert interface["address"] == ["100.65.0.1/24"]
+    assert interface["postup"] == ["iptables -A FORWARD -i wg99 -j ACCEPT"]
+    assert len(peers) == 3
+    assert peers[_key(2)]["name"] == "worker-a2"
+    assert peers[_key(2)]["allowed_ips"] == {"100.65.0.2/32", "203.0.113.0/24"}
+    assert peers[_key(3)]["persistent_keepalive"] == "25"
+
+
+def test_parse_config_strips_inline_comments():
+    """Inline '#' comments are dropped like wg-quick strip does."""
+    interface, _ = parse_config("[Interface]\nListenPort = 51900 # main port\n")
+    assert interface["listenport"] == "51900"
+
+
+def test_parse_dump():
+    """The first dump line is the interface, the rest are peers."""
+    interface, peers = parse_dump(_fixture("dump_peers_changed.txt"))
+    assert interface["listenport"] == "51900"
+    assert interface["fwmark"] == "off"
+    assert set(peers) == {_key(2), _key(4), _key(5)}
+    assert peers[_key(5)]["allowed_ips"] == {"100.65.0.5/32", "198.51.100.0/24"}
+    assert peers[_key(4)]["persistent_keepalive"] == "off"
+
+
+def test_parse_dump_empty():
+    """An empty dump (interface down) has no interface line."""
+    assert parse_dump("") == (None, {})
+
+
+# ---------------------------------------------------------------------------
+# Diff / plan tests
+# ---------------------------------------------------------------------------
+
+
+def test_plan_in_sync_is_noop():
+    """A dump matching the config yields no changes and no restart."""
+    result = plan(CONFIG, _fixture("dump_in_sync.txt"), applied=APPLIED)
+    assert result["restart_required"] is False
+    assert result["peers_changed"] is False
+    assert result["route_changes"] == {"add": [], "remove": []}
+    assert result["diff_lines"] == []
+
+
+def test_plan_hostname_endpoint_not_compared():
+    """Endpoints given as hostnames are not flagged against resolved IPs."""
+    result = plan(CONFIG, _fixture("dump_in_sync.txt"), applied=APPLIED)
+    assert not any("endpoint" in line for line in result["diff_lines"])
+
+
+def test_plan_peer_changes_applied_live():
+    """Added, removed and updated peers are applied without a restart."""
+    result = plan(CONFIG, _fixture("dump_peers_changed.txt"), applied=APPLIED)
+    diff = result["peer_diff"]
+    assert result["restart_required"] is False
+    assert [p["name"] for p in diff["added"]] == ["worker-b1"]
+    assert [p["allowed_ips"] for p in diff["removed"]] == [["100.65.0.5/32", "198.51.100.0/24"]]
+    updated = {p["name"]: p["changes"] for p in diff["updated"]}
+    assert updated["worker-a2"]["allowed_ips"] == {"add": ["203.0.113.0/24"], "remove": []}
+    assert updated["lb-main"]["persistent_keepalive"] == ["off", "25"]
+
+
+def test_plan_route_changes():
+    """Routes follow the union of AllowedIPs across peers."""
+    result = plan(CONFIG, _fixture("dump_peers_changed.txt"), applied=APPLIED)
+    assert result["route_changes"] == {
+        "add": ["100.65.0.3/32", "203.0.113.0/24"],
+        "remove": ["100.65.0.5/32", "198.51.100.0/24"],
+    }
+
+
+def test_plan_diff_lines_hide_keys():
+    """Dry-run output shows peer names and shortened keys only."""
+    result = plan(CONFIG, _fixture("dump_peers_changed.txt"), applied=APPLIED)
+    text = "\n".join(result["diff_lines"])
+    assert "+ peer worker-b1" in text
+    assert "+ route 203.0.113.0/24" in text
+    assert _key(3) not in text
+    assert _key(1) not in text
+
+
+def test_plan_listen_port_requires_restart():
+    """A ListenPort change is an [Interface] change and requires a restart."""
+    result = plan(CONFIG, _fixture("dump_listen_port_changed.txt"), applied=APPLIED)
+    assert result["restart_required"] is True
+    assert result["interface_changes"] == ["ListenPort"]
+
+
+def test_plan_without_snapshot_requires_restart():
+    """Without a state_file snapshot, wg-quick-only fields are unknown: restart."""
+    result = plan(CONFIG, _fixture("dump_in_sync.txt"))
+    assert result["restart_required"] is True
+    assert result["interface_changes"] == ["(no applied snapshot)"]
+
+
+def test_plan_interface_down_requires_start():
+    """No dump output means the interface must be started by wg-quick."""
+    result = plan(CONFIG, "")
+    assert result["running"] is False
+    assert result["restart_required"] is True
+
+
+def test_interface_address_change_detected():
+    """Address drift on the live interface requires a restart."""
+    interface, _ = parse_config(CONFIG)
+    live, _ = parse_dump(_fixture("dump_in_sync.txt"))
+    assert interface_changes(interface, live, live_addresses=["100.65.0.1/24"]) == []
+    assert interface_changes(interface, live, live_addresses=["100.65.0.9/24"]) == ["Address"]
+
+
+def test_interface_wg_quick_fields_compared_with_snapshot():
+    """PostUp and other wg-quick fields are compared with the stored snapshot."""
+    interface, _ = parse_config(CONFIG)
+    live, _ = parse_dump(_fixture("dump_in_sync.txt"))
+    snapshot = wg_quick_snapshot(interface)
+    assert interface_changes(interface, live, applied=snapshot) == []
+    snapshot["postup"] = ["iptables -A FORWARD -i wg99 -j DROP"]
+    assert interface_changes(interface, live, applied=snapshot) == ["PostUp"]
+
+
+def test_interface_private_key_change():
+    """A rotated server key requires a restart."""
+    interface, _ = parse_config(CONFIG)
+    live, _ = parse_dump(_fixture("dump_in_sync.txt"))
+    live["privatekey"] = _key(9)
+    assert interface_changes(interface, live) == ["PrivateKey"]
+
+
+def test_default_route_requires_restart():
+    """Adding a /0 AllowedIP needs wg-quick policy routing, so it restarts."""
+    config = CONFIG.replace("AllowedIPs = 100.65.0.3/32", "AllowedIPs = 0.0.0.0/0")
+    result = plan(config, _fixture("dump_in_sync.txt"), applied=APPLIED)
+    assert result["restart_required"] is True
+
+
+def test_diff_peers_psk_change_hidden():
+    """Preshared key changes are reported without values."""
+    desired = {"k": {"name": "p", "allowed_ips": set(), "endpoint": "(none)",
+                     "persistent_keepalive": "off", "preshared_key": "secret-new"}}
+    live = {"k": {"allowed_ips": set(), "endpoint": "(none)",
+                  "persistent_keepalive": "off", "preshared_key": "secret-old"}}
+    changes = diff_peers(desired, live)["updated"][0]["changes"]
+    assert "secret" not in str(changes)
+
+
+# ---------------------------------------------------------------------------
+# Route command tests
+# ---------------------------------------------------------------------------
+
+
+def test_route_commands_main_table():
+    """Routes are replaced/deleted on the interface like wg-quick does."""
+    cmds = route_commands("wg99", {"add": ["203.0.113.0/24"], "remove": ["198.51.100.0/24"]})
+    assert cmds == [
+        ["ip", "-4", "route", "replace", "203.0.113.0/24", "dev", "wg99"],
+        ["ip", "-4", "route", "del", "198.51.100.0/24", "dev", "wg99"],
+    ]
+
+
+def test_route_commands_table_off_and_custom():
+    """Table = off skips routes; a numeric table is passed through."""
+    routes = {"add": ["203.0.113.0/24"], "remove": []}
+    assert route_commands("wg99", routes, "off") == []
+    assert route_commands("wg99", routes, "1234")[0][-2:] == ["table", "1234"]
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nwg_apply: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
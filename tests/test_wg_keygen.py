@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Unit tests for the in-process WireGuard key generator.
+
+Tests x25519, build_keys and render_yaml from scripts/wg_keygen.py. The
+X25519 implementation is checked against the RFC 7748 test vectors; no wg
+binary, ansible-vault or real vault file is needed.
+
+Note: peer names are generic (no real infrastructure names) to satisfy the
+pre-commit security hook.
+"""
+
+import base64
+import io
+import os
+import sys
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import wg_keygen
+from wg_keygen import build_keys, clamp, generate_keypair, public_key, render_yaml, x25519
+
+
+def _vault(*names, **extra):
+    vault = {"vault_wg_peers": [{"name": n, "host_group": "grp_" + n} for n in names]}
+    vault.update(extra)
+    return vault
+
+
+def _counter_urandom():
+    """Deterministic urandom replacement: each call returns a distinct block."""
+    state = {"n": 0}
+
+    def urandom(size):
+        state["n"] += 1
+        return bytes([state["n"]]) * size
+
+    return urandom
+
+
+# ---------------------------------------------------------------------------
+# X25519 tests
+# ---------------------------------------------------------------------------
+
+
+def test_x25519_rfc7748_vector_1():
+    """RFC 7748 section 5.2, first scalar multiplication vector."""
+    scalar = bytes.fromhex("a546e36bf0527c9d3b16154b82465edd62144c0ac1fc5a18506a2244ba449ac4")
+    u_point = bytes.fromhex("e6db6867583030db3594c1a424b15f7c726624ec26b3353b10a903a6d0ab1c4c")
+    expected = "c3da55379de9c6908e94ea4df28d084f32eccf03491c71f754b4075577a28552"
+    assert x25519(scalar, u_point).hex() == expected
+
+
+def test_x25519_rfc7748_vector_2():
+    """RFC 7748 section 5.2, second scalar multiplication vector."""
+    scalar = bytes.fromhex("4b66e9d4d1b4673c5ad22691957d6af5c11b6421e0ea01d42ca4169e7918ba0d")
+    u_point = bytes.fromhex("e5210f12786811d3f4b7959d0538ae2c31dbe7106fc03c3efc4cd549c715a493")
+    expected = "95cbde9476e8907d7aade45cb4b873f88b595a68799fa152e6f8f7647aac7957"
+    assert x25519(scalar, u_point).hex() == expected
+
+
+def test_x25519_rfc7748_diffie_hellman():
+    """RFC 7748 section 6.1: Bob's public key and a symmetric shared secret."""
+    alice = bytes.fromhex("77076d0a7311a5fdfa1b52b4c5ce4f8f1d6e24faabd5a7a01ad6e83d1a8e96d3")
+    bob = bytes.fromhex("5dab087e624a8a4b79e17f8b83800ee66f3bb1292618b6fd1c2f8b27ff88e0eb")
+    alice_pub = wg_keygen._public_from_private_python(alice)
+    bob_pub = wg_keygen._public_from_private_python(bob)
+    assert bob_pub.hex() == "de9edb7d7b7dc1b4d35b61c2ece435373f8343c85b78674dadfc7e146f882b4f"
+    assert x25519(alice, bob_pub) == x25519(bob, alice_pub)
+
+
+def test_clamp_sets_wireguard_bits():
+    """clamp() clears the low 3 bits and sets bit 254 like wg genkey."""
+    key = clamp(b"\xff" * 32)
+    assert key[0] & 7 == 0
+    assert key[31] & 128 == 0
+    assert key[31] & 64 == 64
+
+
+# ---------------------------------------------------------------------------
+# Key generation tests
+# ---------------------------------------------------------------------------
+
+
+def test_generate_keypair_format():
+    """Keys are 44-char base64 strings decoding to 32 bytes."""
+    private, public = generate_keypair()
+    for key in (private, public):
+        assert len(key) == 44
+        assert len(base64.b64decode(key)) == 32
+    assert public_key(private) == public
+
+
+def test_public_key_rejects_bad_length():
+    """A truncated private key is rejected."""
+    try:
+        public_key(base64.b64encode(b"short").decode())
+    except ValueError as exc:
+        assert "32 bytes" in str(exc)
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_build_keys_one_pair_per_peer_in_order():
+    """Every named peer gets a keypair, in vault_wg_peers order."""
+    vault = _vault("peer-b", "peer-a", "peer-c")
+    vault["vault_wg_peers"].append({"host_group": "unnamed"})
+    keys = build_keys(vault, urandom=_counter_urandom())
+    assert list(keys["private_keys"]) == ["peer-b", "peer-a", "peer-c"]
+    assert list(keys["public_keys"]) == ["peer-b", "peer-a", "peer-c"]
+    assert keys["server_generated"] is True
+    assert len(set(keys["private_keys"].values())) == 3
+
+
+def test_build_keys_full_run_ignores_existing():
+    """Without only_missing every key is regenerated."""
+    existing, _ = generate_keypair()
+    vault = _vault("peer-a", vault_wg_peer_private_keys={"peer-a": existing})
+    keys = build_keys(vault)
+    assert keys["private_keys"]["peer-a"] != existing
+    assert keys["generated"] == ["peer-a"]
+
+
+def test_build_keys_only_missing_keeps_existing():
+    """only_missing keeps existing private keys and re-derives their public keys."""
+    existing, existing_pub = generate_keypair()
+    server, server_pub = generate_keypair()
+    vault = _vault(
+        "peer-a", "peer-new",
+        vault_wg_peer_private_keys={"peer-a": existing},
+        vault_wg_server_private_key=server,
+    )
+    keys = build_keys(vault, only_missing=True)
+    assert keys["private_keys"]["peer-a"] == existing
+    assert keys["public_keys"]["peer-a"] == existing_pub
+    assert keys["server_private"] == server
+    assert keys["server_public"] == server_pub
+    assert keys["server_generated"] is False
+    assert keys["generated"] == ["peer-new"]
+
+
+def test_build_keys_no_peers():
+    """An empty vault still yields a server keypair and no peer keys."""
+    keys = build_keys({})
+    assert keys["private_keys"] == {}
+    assert keys["server_generated"] is True
+
+
+def test_backend_is_selected():
+    """select_backend always returns a working backend."""
+    name, backend = wg_keygen.select_backend()
+    assert name in ("cryptography", "nacl", "python")
+    private = clamp(b"\x01" * 32)
+    assert backend(private) == wg_keygen._public_from_private_python(private)
+
+
+# ---------------------------------------------------------------------------
+# Output tests
+# ---------------------------------------------------------------------------
+
+
+def test_render_yaml_is_vault_compatible():
+    """Rendered YAML parses back into the vault variable names."""
+    keys = build_keys(_vault("peer-a", "peer-b"))
+    parsed = yaml.safe_load(render_yaml(keys))
+    assert parsed["vault_wg_server_private_key"] == keys["server_private"]
+    assert parsed["vault_wg_peer_private_keys"] == keys["private_keys"]
+    assert parsed["vault_wg_peer_public_keys"] == keys["public_keys"]
+
+
+def test_render_yaml_marks_new_keys():
+    """Only newly generated entries carry the '# new' marker."""
+    existing, _ = generate_keypair()
+    vault = _vault("peer-a", "peer-b", vault_wg_peer_private_keys={"peer-a": existing})
+    text = render_yaml(build_keys(vault, only_missing=True))
+    lines = [line for line in text.splitlines() if "peer-" in line]
+    assert all(line.endswith("# new") for line in lines if "peer-b" in line)
+    assert not any(line.endswith("# new") for line in lines if "peer-a" in line)
+
+
+def test_main_reads_vault_from_stdin():
+    """--input - reads decrypted vault YAML from a pipe."""
+    stdin, stdout = sys.stdin, sys.stdout
+    sys.stdin = io.StringIO(yaml.safe_dump(_vault("peer-a")))
+    sys.stdout = io.StringIO()
+    try:
+        assert wg_keygen.main(["--input", "-"]) == 0
+        output = sys.stdout.getvalue()
+    finally:
+        sys.stdin, sys.stdout = stdin, stdout
+    assert "peer-a" in yaml.safe_load(output)["vault_wg_peer_public_keys"]
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nwg_keygen: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()
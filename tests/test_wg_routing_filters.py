@@ -2,7 +2,9 @@
 """Unit tests for WireGuard routing filter plugins.
 
 Tests build_peers_extra_cidrs and peers_in_groups from
-filter_plugins/wg_routing_filters.py.
+filter_plugins/wg_routing_filters.py, the RoutingCache memoization layer
+behind the registered filters, and the wg_assign_client_ports /
+wg_peers_for_host / wg_config_fingerprint helpers used by the wireguard role.
 
 These are the most critical routing functions in the repo:
 build_peers_extra_cidrs computes which WireGuard peer owns which CIDR.
@@ -13,15 +15,28 @@ Note: All IPs and hostnames use RFC 5737 TEST-NET ranges (203.0.113.0/24,
 hook. No real infrastructure values appear in this file.
 """
 
+import multiprocessing
 import sys
 import os
+import tempfile
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "filter_plugins"))
+# Keep the module-wide cache in memory; disk tests pass their own directory.
+os.environ["WG_ROUTING_CACHE_DIR"] = ""
 
 from wg_routing_filters import (
+    AnsibleFilterError,
+    RoutingCache,
+    _stable_hash,
     build_peers_extra_cidrs,
+    cached_build_peers_extra_cidrs,
+    cached_peers_in_groups,
+    get_cache,
     peers_in_groups,
     validate_vip_overrides,
+    wg_assign_client_ports,
+    wg_config_fingerprint,
+    wg_peers_for_host,
 )
 
 
@@ -558,6 +573,336 @@ def test_validate_vip_empty_inputs():
     assert validate_vip_overrides(None, None) == []
 
 
+# ---------------------------------------------------------------------------
+# RoutingCache / memoized filter tests
+# ---------------------------------------------------------------------------
+
+
+def _cluster_args():
+    peers = [_worker_a_peer(), _worker_b_peer(), _server_peer()]
+    groups = _make_groups(
+        ("site_a_worker2", ["host-a2"]),
+        ("site_b_worker1", ["host-b1"]),
+        ("lb_main", ["host-lb"]),
+        ("unrelated", ["host-x"]),
+    )
+    return peers, groups, ["host-a2", "host-b1"]
+
+
+def test_cache_lru_hit_returns_equal_copy():
+    """Second lookup is served from the LRU and returns an independent copy."""
+    cache = RoutingCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"a": ["203.0.113.0/24"]}
+
+    first = cache.get_or_compute("f", ["x"], compute)
+    first["a"].append("mutated")
+    second = cache.get_or_compute("f", ["x"], compute)
+    assert calls == [1]
+    assert second == {"a": ["203.0.113.0/24"]}
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_cache_lru_evicts_oldest():
+    """Entries beyond maxsize are evicted least-recently-used first."""
+    cache = RoutingCache(maxsize=2)
+    for key in ("a", "b", "c"):
+        cache.get_or_compute("f", [key], lambda: key)
+    assert cache.stats()["lru_entries"] == 2
+    calls = []
+    cache.get_or_compute("f", ["a"], lambda: calls.append(1) or "a")
+    assert calls == [1]
+
+
+def test_cache_disk_survives_new_process():
+    """A fresh cache (new run / forked worker) reads results from disk."""
+    cache_dir = tempfile.mkdtemp(prefix="wg_routing_cache_")
+    RoutingCache(cache_dir=cache_dir).get_or_compute("f", ["k"], lambda: ["198.51.100.0/24"])
+
+    fresh = RoutingCache(cache_dir=cache_dir)
+    value = fresh.get_or_compute("f", ["k"], lambda: ["recomputed"])
+    assert value == ["198.51.100.0/24"]
+    stats = fresh.stats()
+    assert stats["source"] == "process"
+    assert stats["misses"] == 0 and stats["disk_hits"] == 1
+
+
+def test_cache_stats_flushed_once_per_process():
+    """Counters stay in memory until flush_stats() appends a single line."""
+    cache_dir = tempfile.mkdtemp(prefix="wg_routing_cache_")
+    cache = RoutingCache(cache_dir=cache_dir)
+    for _ in range(3):
+        cache.get_or_compute("f", ["k"], lambda: 1)
+    assert not os.path.exists(os.path.join(cache_dir, "stats.log"))
+    cache.flush_stats()
+    with open(os.path.join(cache_dir, "stats.log")) as fh:
+        assert len(fh.readlines()) == 1
+    assert cache.stats()["lookups"] == 0
+    stats = RoutingCache(cache_dir=cache_dir).stats(since=0)
+    assert stats["source"] == "disk"
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_cache_ignores_shared_directory():
+    """A directory other users can access is never read from or written to."""
+    cache_dir = tempfile.mkdtemp(prefix="wg_routing_cache_")
+    os.chmod(cache_dir, 0o777)
+    planted = "f-{}.json".format(_stable_hash(["k"]))
+    with open(os.path.join(cache_dir, planted), "w") as fh:
+        fh.write('"planted"')
+    cache = RoutingCache(cache_dir=cache_dir)
+    assert cache.get_or_compute("f", ["k"], lambda: "computed") == "computed"
+    cache.flush_stats()
+    assert os.listdir(cache_dir) == [planted]
+
+
+def _worker_lookups(cache):
+    cache.get_or_compute("f", ["k"], lambda: 1)
+    cache.get_or_compute("f", ["k"], lambda: 1)
+
+
+def test_cache_stats_include_forked_workers():
+    """A forked worker flushes its own counters when it exits."""
+    cache_dir = tempfile.mkdtemp(prefix="wg_routing_cache_")
+    cache = RoutingCache(cache_dir=cache_dir)
+    cache.get_or_compute("f", ["parent"], lambda: 0)
+    worker = multiprocessing.get_context("fork").Process(target=_worker_lookups, args=(cache,))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+    stats = cache.stats(since=0)
+    assert stats["misses"] == 2 and stats["hits"] == 1
+
+
+def test_cache_disk_ttl_expires():
+    """Entries older than ttl are recomputed."""
+    cache_dir = tempfile.mkdtemp(prefix="wg_routing_cache_")
+    RoutingCache(cache_dir=cache_dir).get_or_compute("f", ["k"], lambda: "old")
+    value = RoutingCache(cache_dir=cache_dir, ttl=-1).get_or_compute("f", ["k"], lambda: "new")
+    assert value == "new"
+
+
+def test_cache_stats_since_filters_events():
+    """stats(since=...) only counts events recorded after the given time."""
+    cache_dir = tempfile.mkdtemp(prefix="wg_routing_cache_")
+    cache = RoutingCache(cache_dir=cache_dir)
+    cache.get_or_compute("f", ["k"], lambda: 1)
+    assert cache.stats(since=4102444800)["lookups"] == 0
+    assert cache.stats(since=0)["lookups"] == 1
+
+
+def test_cached_filter_matches_uncached():
+    """Memoized build_peers_extra_cidrs returns the uncached result."""
+    get_cache().clear()
+    peers, groups, workers = _cluster_args()
+    expected = build_peers_extra_cidrs(
+        peers, groups, [], workers, "203.0.113.0/24", "198.51.100.0/24"
+    )
+    for _ in range(3):
+        result = cached_build_peers_extra_cidrs(
+            peers, groups, [], workers, "203.0.113.0/24", "198.51.100.0/24"
+        )
+        assert result == expected
+    assert get_cache().stats()["hits"] >= 2
+
+
+def test_cached_filter_ignores_unrelated_groups():
+    """Changes to groups no peer references keep the cache key stable."""
+    get_cache().clear()
+    peers, groups, workers = _cluster_args()
+    cached_peers_in_groups(peers, groups, workers)
+    groups["unrelated"] = ["host-y", "host-z"]
+    cached_peers_in_groups(peers, groups, workers)
+    assert get_cache().stats()["hits"] == 1
+
+
+def test_cached_filter_key_changes_with_membership():
+    """Changing a referenced group's members invalidates the entry."""
+    get_cache().clear()
+    peers, groups, workers = _cluster_args()
+    before = cached_peers_in_groups(peers, groups, workers)
+    groups["site_b_worker1"] = ["host-other"]
+    after = cached_peers_in_groups(peers, groups, workers)
+    assert before == ["worker-a2", "worker-b1"]
+    assert after == ["worker-a2"]
+    assert get_cache().stats()["misses"] == 2
+
+
+# ---------------------------------------------------------------------------
+# wg_assign_client_ports tests
+# ---------------------------------------------------------------------------
+
+
+def _expect_error(fn, *args):
+    try:
+        fn(*args)
+    except AnsibleFilterError as exc:
+        return str(exc)
+    raise AssertionError("expected an error")
+
+
+def test_assign_ports_by_index():
+    """Peers without a port get start + index, as strings."""
+    peers = [{"name": "a"}, {"name": "b"}, {"name": "c"}]
+    result = wg_assign_client_ports(peers, "51900")
+    assert [p["client_listen_port"] for p in result] == ["51900", "51901", "51902"]
+
+
+def test_assign_ports_keeps_explicit_and_index_gaps():
+    """Explicit ports are kept and auto ports still follow the vault index."""
+    peers = [{"name": "a"}, {"name": "b", "client_listen_port": "52500"}, {"name": "c"}]
+    result = wg_assign_client_ports(peers, 51900)
+    assert [p["client_listen_port"] for p in result] == ["51900", "52500", "51902"]
+
+
+def test_assign_ports_does_not_mutate_input():
+    """The input peer dicts are left untouched."""
+    peers = [{"name": "a"}]
+    wg_assign_client_ports(peers, 51900)
+    assert "client_listen_port" not in peers[0]
+
+
+def test_assign_ports_explicit_collision():
+    """Two explicit equal ports are reported with both peer names."""
+    peers = [
+        {"name": "a", "client_listen_port": "52500"},
+        {"name": "b", "client_listen_port": 52500},
+    ]
+    msg = _expect_error(wg_assign_client_ports, peers, 51900)
+    assert "collision" in msg and "a" in msg and "b" in msg
+
+
+def test_assign_ports_explicit_collides_with_auto():
+    """An explicit port equal to another peer's auto port is a collision."""
+    peers = [{"name": "a"}, {"name": "b", "client_listen_port": "51900"}]
+    assert "collision" in _expect_error(wg_assign_client_ports, peers, 51900)
+
+
+def test_assign_ports_invalid_explicit():
+    """Non-numeric or out-of-range explicit ports are rejected."""
+    assert "not a port" in _expect_error(
+        wg_assign_client_ports, [{"name": "a", "client_listen_port": "[client-port]"}], 51900
+    )
+    assert "out of range" in _expect_error(
+        wg_assign_client_ports, [{"name": "a", "client_listen_port": 70000}], 51900
+    )
+
+
+def test_assign_ports_placeholder_start_only_needed_for_auto():
+    """A placeholder start is fine when every peer has an explicit port."""
+    peers = [{"name": "a", "client_listen_port": "52500"}]
+    assert wg_assign_client_ports(peers, "[port-range-start]", "[port-range-end]")[0][
+        "client_listen_port"
+    ] == "52500"
+    assert "vault_wg_client_port_start" in _expect_error(
+        wg_assign_client_ports, [{"name": "a"}], "[port-range-start]"
+    )
+
+
+def test_assign_ports_beyond_range_end():
+    """Auto ports past port_end are rejected."""
+    peers = [{"name": "a"}, {"name": "b"}]
+    assert "beyond" in _expect_error(wg_assign_client_ports, peers, 51900, 51900)
+
+
+def test_assign_ports_large_peer_list():
+    """Large peer lists are handled in one pass with unique ports."""
+    peers = [{"name": "peer{}".format(i)} for i in range(5000)]
+    result = wg_assign_client_ports(peers, 20000)
+    assert len({p["client_listen_port"] for p in result}) == 5000
+
+
+# ---------------------------------------------------------------------------
+# wg_peers_for_host tests
+# ---------------------------------------------------------------------------
+
+
+def test_peers_for_host_matches_group():
+    """Only peers whose host_group contains the host are returned, in order."""
+    peers = [_worker_a_peer(), _worker_b_peer(), _server_peer(), {"name": "no-group"}]
+    groups = _make_groups(
+        ("site_a_worker2", ["host-a2", "host-shared"]),
+        ("site_b_worker1", ["host-b1"]),
+        ("lb_main", ["host-shared"]),
+    )
+    assert [p["name"] for p in wg_peers_for_host(peers, groups, "host-shared")] == [
+        "worker-a2", "lb-main"
+    ]
+    assert wg_peers_for_host(peers, groups, "host-b1") == [_worker_b_peer()]
+
+
+def test_peers_for_host_unknown_group_or_host():
+    """Peers in groups missing from inventory and unknown hosts yield nothing."""
+    peers = [_worker_a_peer()]
+    assert wg_peers_for_host(peers, {}, "host-a2") == []
+    assert wg_peers_for_host(peers, _make_groups(("site_a_worker2", ["x"])), "host-a2") == []
+    assert wg_peers_for_host(None, {}, "host-a2") == []
+
+
+# ---------------------------------------------------------------------------
+# wg_config_fingerprint tests
+# ---------------------------------------------------------------------------
+
+
+def _fingerprint_inputs():
+    peers = [_worker_a_peer(), _server_peer(), _db_peer()]
+    groups = _make_groups(
+        ("site_a_worker2", ["host-a2"]),
+        ("lb_main", ["host-lb"]),
+        ("db", ["host-db"]),
+        ("bgp_routers", ["host-lb"]),
+        ("unrelated", ["host-x"]),
+    )
+    params = {"template": "[Interface]", "private_key": "k1", "postup": []}
+    return params, peers, groups
+
+
+def test_fingerprint_stable():
+    """Same inputs give the same fingerprint regardless of dict order."""
+    params, peers, groups = _fingerprint_inputs()
+    first = wg_config_fingerprint(params, peers, groups, "host-a2")
+    reordered = dict(reversed(list(params.items())))
+    assert wg_config_fingerprint(reordered, peers, groups, "host-a2") == first
+    assert len(first) == 64
+
+
+def test_fingerprint_ignores_unrelated_groups():
+    """Groups that do not affect membership bits leave the fingerprint unchanged."""
+    params, peers, groups = _fingerprint_inputs()
+    before = wg_config_fingerprint(params, peers, groups, "host-a2")
+    groups["unrelated"] = ["host-y"]
+    groups["site_a_worker2"] = ["host-a2", "host-a3"]
+    assert wg_config_fingerprint(params, peers, groups, "host-a2") == before
+
+
+def test_fingerprint_changes_with_inputs():
+    """Keys, rules, template text, peers and BGP membership all change the fingerprint."""
+    params, peers, groups = _fingerprint_inputs()
+    base = wg_config_fingerprint(params, peers, groups, "host-a2")
+    changes = [
+        (dict(params, private_key="k2"), peers, groups),
+        (dict(params, postup=["iptables -A X"]), peers, groups),
+        (dict(params, template="[Interface]\n"), peers, groups),
+        (params, peers + [_worker_b_peer()], groups),
+        (params, peers, dict(groups, bgp_routers=["host-lb", "host-db"])),
+    ]
+    for args in changes:
+        assert wg_config_fingerprint(*args, "host-a2") != base
+
+
+def test_fingerprint_is_per_host():
+    """The host's own membership is part of the fingerprint."""
+    params, peers, groups = _fingerprint_inputs()
+    assert wg_config_fingerprint(params, peers, groups, "host-a2") != wg_config_fingerprint(
+        params, peers, groups, "host-db"
+    )
+
+
 # ---------------------------------------------------------------------------
 # Test runner
 # ---------------------------------------------------------------------------
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Unit tests for the WireGuard API VIP failover helper.
+
+Tests roles/keepalived/files/wg_vip_failover.py: the pure dump parser and
+failover planner, and end-to-end switchovers against a stub wg
+(tests/fixtures/wg_vip_failover/wg) that keeps peers in a JSON file and
+implements WireGuard's AllowedIPs semantics.
+
+Note: Addresses use RFC 5737 TEST-NET and 100.65.0.0/16 ranges to satisfy
+the pre-commit security hook.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HELPER_DIR = os.path.join(os.path.dirname(__file__), "..", "roles", "keepalived", "files")
+sys.path.insert(0, HELPER_DIR)
+
+from wg_vip_failover import failover, parse_dump, plan_failover, wg_set_argv
+
+HELPER = os.path.join(HELPER_DIR, "wg_vip_failover.py")
+STUB = os.path.join(os.path.dirname(__file__), "fixtures", "wg_vip_failover", "wg")
+
+VIP = "203.0.113.100/32"
+KEY_A = "AQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQE="
+KEY_B = "AgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgI="
+KEY_C = "AwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwM="
+KEY_WORKER = "CQkJCQkJCQkJCQkJCQkJCQkJCQkJCQkJCQkJCQkJCQk="
+
+PLANES = {
+    "plane-a": {"public_key": KEY_A, "fallback": "100.65.0.11/32"},
+    "plane-b": {"public_key": KEY_B, "fallback": "100.65.0.12/32"},
+    "plane-c": {"public_key": KEY_C, "fallback": "100.65.0.13/32"},
+}
+
+
+def _live():
+    return {
+        KEY_A: ["100.65.0.11/32", VIP, "198.51.100.0/24"],
+        KEY_B: ["100.65.0.12/32"],
+        KEY_C: ["100.65.0.13/32"],
+        KEY_WORKER: ["100.65.0.21/32"],
+    }
+
+
+class StubWg:
+    """Runs the stub wg against a temporary JSON state file."""
+
+    def __init__(self, peers, interface="wg99"):
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as fh:
+            json.dump({"interface": interface, "peers": peers, "calls": []}, fh)
+
+    def __call__(self, argv):
+        env = dict(os.environ, WG_STUB_STATE=self.path)
+        proc = subprocess.run([sys.executable, STUB] + argv[1:], env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              universal_newlines=True, check=False)
+        return proc.returncode, proc.stdout, proc.stderr
+
+    def state(self):
+        with open(self.path) as fh:
+            return json.load(fh)
+
+
+# ---------------------------------------------------------------------------
+# parse_dump / plan_failover tests
+# ---------------------------------------------------------------------------
+
+
+def test_parse_dump_skips_interface_line_and_none():
+    """The interface line is skipped and '(none)' means no AllowedIPs."""
+    dump = (
+        "PRIVATE\tPUBLIC\t51820\toff\n"
+        "{}\t(none)\t198.51.100.1:51820\t100.65.0.11/32,{}\t0\t0\t0\t25\n"
+        "{}\t(none)\t(none)\t(none)\t0\t0\t0\toff\n"
+    ).format(KEY_A, VIP, KEY_B)
+    assert parse_dump(dump) == {KEY_A: ["100.65.0.11/32", VIP], KEY_B: []}
+
+
+def test_plan_moves_vip_old_owner_first():
+    """The VIP leaves plane-a and joins plane-b; old owner is listed first."""
+    changes, warnings = plan_failover(PLANES, _live(), "plane-b", VIP)
+    assert warnings == []
+    assert [(name, new) for name, _, _, new in changes] == [
+        ("plane-a", ["100.65.0.11/32", "198.51.100.0/24"]),
+        ("plane-b", ["100.65.0.12/32", VIP]),
+    ]
+
+
+def test_plan_is_noop_when_owner_already_holds_vip():
+    """Re-running for the current owner changes nothing."""
+    changes, _ = plan_failover(PLANES, _live(), "plane-a", VIP)
+    assert changes == []
+
+
+def test_plan_uses_fallback_for_empty_peers():
+    """A peer with no AllowedIPs gets its WireGuard /32 back."""
+    live = _live()
+    live[KEY_C] = []
+    changes, _ = plan_failover(PLANES, live, "plane-a", VIP)
+    assert [(name, new) for name, _, _, new in changes] == [("plane-c", ["100.65.0.13/32"])]
+
+
+def test_plan_skips_missing_peers_and_keys():
+    """Planes without a key or without a live peer are reported, never created."""
+    planes = dict(PLANES, **{"plane-d": {"public_key": "", "fallback": "100.65.0.14/32"}})
+    live = _live()
+    del live[KEY_C]
+    changes, warnings = plan_failover(planes, live, "plane-b", VIP)
+    assert {name for name, _, _, _ in changes} == {"plane-a", "plane-b"}
+    assert any("plane-d" in w for w in warnings)
+    assert any("plane-c" in w for w in warnings)
+
+
+def test_plan_rejects_unknown_owner():
+    """An owner not in the planes file is an error."""
+    try:
+        plan_failover(PLANES, _live(), "plane-x", VIP)
+    except ValueError as exc:
+        assert "plane-x" in str(exc)
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_wg_set_argv_is_single_call():
+    """Every changed peer goes into one wg set argv."""
+    changes, _ = plan_failover(PLANES, _live(), "plane-b", VIP)
+    argv = wg_set_argv("wg", "wg99", changes)
+    assert argv[:3] == ["wg", "set", "wg99"]
+    assert argv.count("peer") == 2
+    assert argv[argv.index(KEY_B) + 2] == "100.65.0.12/32," + VIP
+
+
+# ---------------------------------------------------------------------------
+# End-to-end tests (stub wg)
+# ---------------------------------------------------------------------------
+
+
+def test_failover_reads_once_and_sets_once():
+    """A switchover is exactly one dump and one set; the VIP ends on the owner."""
+    stub = StubWg(_live())
+    result = failover(stub, "wg", "wg99", PLANES, "plane-c", VIP)
+    assert result["ok"], result
+    state = stub.state()
+    assert state["calls"] == ["show wg99 dump", "set wg99 peer"]
+    assert VIP in state["peers"][KEY_C]
+    assert VIP not in state["peers"][KEY_A]
+    assert "198.51.100.0/24" in state["peers"][KEY_A]
+    assert state["peers"][KEY_WORKER] == ["100.65.0.21/32"]
+    for phase in ("read", "compute", "apply", "total"):
+        assert result["timings_ms"][phase] >= 0
+    assert result["timings_ms"]["total"] >= result["timings_ms"]["apply"]
+
+
+def test_failover_dry_run_and_noop_skip_wg_set():
+    """Dry runs and no-op switchovers only read the dump."""
+    stub = StubWg(_live())
+    result = failover(stub, "wg", "wg99", PLANES, "plane-b", VIP, dry_run=True)
+    assert result["ok"] and len(result["changed"]) == 2
+    assert stub.state()["calls"] == ["show wg99 dump"]
+    result = failover(stub, "wg", "wg99", PLANES, "plane-a", VIP)
+    assert result["ok"] and result["changed"] == []
+    assert stub.state()["calls"] == ["show wg99 dump", "show wg99 dump"]
+
+
+def test_failover_reports_wg_errors():
+    """A missing interface is reported, not raised."""
+    stub = StubWg(_live(), interface="wg0")
+    result = failover(stub, "wg", "wg99", PLANES, "plane-b", VIP)
+    assert not result["ok"]
+    assert "No such device" in result["error"]
+
+
+def test_cli_writes_state_file_with_timings():
+    """The CLI applies the switch and records timings in --state-file."""
+    stub = StubWg(_live())
+    workdir = tempfile.mkdtemp(prefix="wg_vip_failover_")
+    planes_path = os.path.join(workdir, "planes.json")
+    state_path = os.path.join(workdir, "state.json")
+    with open(planes_path, "w") as fh:
+        json.dump({"planes": PLANES}, fh)
+    proc = subprocess.run(
+        [sys.executable, HELPER, "plane-b", "--interface", "wg99", "--vip", VIP,
+         "--planes", planes_path, "--state-file", state_path, "--wg", STUB],
+        env=dict(os.environ, WG_STUB_STATE=stub.path),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=False)
+    assert proc.returncode == 0, proc.stderr
+    with open(state_path) as fh:
+        recorded = json.load(fh)
+    assert recorded["owner"] == "plane-b"
+    assert recorded["timings_ms"]["total"] > 0
+    assert VIP in stub.state()["peers"][KEY_B]
+
+
+# ---------------------------------------------------------------------------
+# Test runner
+# ---------------------------------------------------------------------------
+
+
+def _run_tests():
+    """Run all tests and report results."""
+    test_functions = [
+        obj
+        for name, obj in globals().items()
+        if name.startswith("test_") and callable(obj)
+    ]
+
+    passed = 0
+    failed = 0
+    errors = []
+
+    for test_fn in sorted(test_functions, key=lambda f: f.__name__):
+        try:
+            test_fn()
+            passed += 1
+            print(f"  PASS: {test_fn.__name__}")
+        except AssertionError as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  FAIL: {test_fn.__name__}: {exc}")
+        except Exception as exc:
+            failed += 1
+            errors.append((test_fn.__name__, str(exc)))
+            print(f"  ERROR: {test_fn.__name__}: {exc}")
+
+    print(f"\nwg_vip_failover: {passed} passed, {failed} failed")
+
+    if errors:
+        print("\nFailures:")
+        for name, msg in errors:
+            print(f"  {name}: {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _run_tests()